@@ -2,6 +2,7 @@
 Main Flask application entry point.
 """
 from datetime import datetime, timezone
+import click
 from app import create_app, db
 
 # Create Flask application
@@ -24,6 +25,55 @@ def init_db():
         # Create all tables
         db.create_all()
         print("Database tables created successfully")
+        
+        if app.config.get('RUCHER_STATS_MATERIALIZED', False):
+            from app.utils.rucher_stats import create_stats_view
+            try:
+                create_stats_view(db.session)
+                db.session.commit()
+                print("Materialized view rucher_stats created")
+            except Exception as e:
+                db.session.rollback()
+                print(f"Warning: Could not create rucher_stats view: {e}")
+
+
+@app.cli.command()
+def refresh_overlaps():
+    """Rebuild the precomputed apiary forage overlaps."""
+    with app.app_context():
+        from app.utils.overlaps import refresh_overlaps as rebuild
+        count = rebuild(db.session)
+        db.session.commit()
+        print(f"{count} overlapping apiary pairs at {app.config['RUCHER_OVERLAP_RADIUS']:g} m")
+
+
+@app.cli.command()
+def refresh_stats():
+    """Refresh the rucher_stats materialized view."""
+    with app.app_context():
+        from app.utils.rucher_stats import refresh_stats_view
+        if refresh_stats_view(db.session):
+            print("Materialized view rucher_stats refreshed")
+        else:
+            print("rucher_stats not refreshed (RUCHER_STATS_MATERIALIZED off, or the refresh failed)")
+
+
+@app.cli.command()
+def rebuild_anomaly_state():
+    """Rebuild the anomaly detection checkpoints from stored measurements."""
+    with app.app_context():
+        from app.utils.anomaly import replay_history
+        count = replay_history(db.session, app.config)
+        db.session.commit()
+        print(f"Anomaly state rebuilt from {count} measurements")
+
+
+@app.cli.command()
+@click.option('--until-idle', is_flag=True, help='Exit once no job is queued or running.')
+def run_jobs(until_idle):
+    """Run queued background jobs until stopped (SIGTERM or Ctrl-C)."""
+    from app.utils.jobs import run_worker
+    run_worker(app, until_idle=until_idle)
 
 
 @app.cli.command()
@@ -5,8 +5,10 @@ from flask import Flask, jsonify
 from flask_sqlalchemy import SQLAlchemy
 from flask_cors import CORS
 
+from app.session import RoutingSession
+
 # Initialize extensions
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 
 def create_app(config_object=None):
@@ -29,14 +31,26 @@ def create_app(config_object=None):
     app.config.from_object(config_object)
     
     # Initialize extensions
+    from app.utils.db_pool import init_db_pool
+    init_db_pool(app, db)
     db.init_app(app)
     CORS(app, origins=app.config.get('CORS_ORIGINS', '*'))
     
+    from app.utils.metrics import init_metrics
+    from app.utils.profiling import init_profiling
+    from app.utils.replicas import init_replicas
+    init_metrics(app)
+    init_profiling(app)
+    init_replicas(app)
+    
     # Register blueprints
     with app.app_context():
-        from app.routes import geo, health, docs
+        from app.routes import geo, health, docs, export, measurements, jobs
         
         app.register_blueprint(geo.bp)
+        app.register_blueprint(export.bp)
+        app.register_blueprint(measurements.bp)
+        app.register_blueprint(jobs.bp)
         app.register_blueprint(health.bp)
         app.register_blueprint(docs.bp)
 
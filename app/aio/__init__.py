@@ -0,0 +1,122 @@
+"""
+ASGI application serving the I/O-bound endpoints asynchronously.
+
+The geo collection, nearby, KNN, reverse-geocode and measurement export
+endpoints run on the event loop with async SQLAlchemy (asyncpg) and geopy's
+aiohttp adapter, so one worker can keep many slow queries and geocoder
+calls in flight. Every other route, and any request an async handler hands
+back, is served by the regular Flask app through a WSGI bridge.
+
+Requires the optional async dependencies (starlette, asyncpg, aiohttp, a2wsgi).
+"""
+from contextlib import AsyncExitStack, asynccontextmanager
+
+import anyio
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.requests import Request
+from starlette.routing import Mount, Route
+
+from app import create_app
+from app.aio import routes
+from app.aio.db import create_async_db
+from app.utils.warmup import warm_up
+
+
+class AsyncEndpoint:
+    """
+    ASGI endpoint running an async handler with a fallback to the Flask app.
+
+    The request body is read up front so it can be replayed to the fallback
+    if the handler returns None.
+    """
+
+    def __init__(self, handler, fallback):
+        self.handler = handler
+        self.fallback = fallback
+
+    async def __call__(self, scope, receive, send):
+        body = b''
+        more_body = True
+        while more_body:
+            message = await receive()
+            body += message.get('body', b'')
+            more_body = message.get('more_body', False)
+
+        async def replay():
+            return {'type': 'http.request', 'body': body, 'more_body': False}
+
+        response = await self.handler(Request(scope, replay))
+        if response is None:
+            await self.fallback(scope, replay, send)
+        else:
+            await response(scope, replay, send)
+
+
+def create_asgi_app(config_object=None):
+    """
+    Build the ASGI application.
+
+    Args:
+        config_object: Configuration object to use (as for create_app)
+
+    Returns:
+        Starlette application
+    """
+    from a2wsgi import WSGIMiddleware
+
+    flask_app = create_app(config_object)
+    wsgi = WSGIMiddleware(flask_app, workers=flask_app.config.get('ASYNC_WSGI_WORKERS', 10))
+
+    def endpoint(path, handler, methods=('GET',)):
+        return Route(path, AsyncEndpoint(handler, wsgi), methods=list(methods))
+
+    @asynccontextmanager
+    async def lifespan(app):
+        async with AsyncExitStack() as stack:
+            app.state.engine, app.state.sessionmaker = create_async_db(flask_app.config)
+            if app.state.engine is not None:
+                stack.push_async_callback(app.state.engine.dispose)
+
+            try:
+                from geopy.adapters import AioHTTPAdapter
+                from geopy.geocoders import Nominatim
+            except ImportError:
+                app.state.geolocator = None
+            else:
+                app.state.geolocator = await stack.enter_async_context(
+                    Nominatim(user_agent="beetrackapi", adapter_factory=AioHTTPAdapter)
+                )
+
+            if flask_app.config.get('WARMUP_ENABLED', False):
+                await anyio.to_thread.run_sync(warm_up, flask_app)
+            yield
+
+    cors_origins = flask_app.config.get('CORS_ORIGINS', '*')
+    app = Starlette(
+        routes=[
+            endpoint('/api/geo/ruches', routes.get_all_ruches),
+            endpoint('/api/geo/ruches/nearby', routes.nearby_ruches),
+            endpoint('/api/geo/ruches/knn', routes.knn_ruches, methods=('POST',)),
+            endpoint('/api/geo/ruches/{id:int}', routes.get_ruche),
+            endpoint('/api/geo/ruchers', routes.get_all_ruchers),
+            endpoint('/api/geo/ruchers/{id:int}', routes.get_rucher),
+            endpoint('/api/geo/reverse-geocode', routes.reverse_geocode),
+            endpoint('/api/export/measurements', routes.export_measurements),
+            Mount('', app=wsgi),
+        ],
+        middleware=[
+            Middleware(
+                CORSMiddleware,
+                allow_origins=cors_origins.split(',') if isinstance(cors_origins, str) else cors_origins,
+                allow_methods=['*'],
+                allow_headers=['*']
+            )
+        ],
+        lifespan=lifespan
+    )
+    app.state.flask_app = flask_app
+    # Set by the lifespan handler; None until startup (and when unavailable)
+    app.state.engine = app.state.sessionmaker = app.state.geolocator = None
+    return app
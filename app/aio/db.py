@@ -0,0 +1,95 @@
+"""
+Async SQLAlchemy engine (asyncpg) for the ASGI entry point.
+"""
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import NullPool
+
+from app.utils.db_pool import statement_timeout_for
+
+# Engine options that carry over from SQLALCHEMY_ENGINE_OPTIONS; connect_args
+# are psycopg2-specific and rebuilt below for asyncpg.
+POOL_OPTIONS = ('pool_size', 'max_overflow', 'pool_timeout', 'pool_recycle', 'pool_pre_ping')
+
+
+def async_database_url(database_uri: str) -> Optional[str]:
+    """
+    Translate a PostgreSQL URI to its asyncpg equivalent.
+
+    Args:
+        database_uri: SQLALCHEMY_DATABASE_URI of the Flask app
+
+    Returns:
+        str, or None if the database is not PostgreSQL
+    """
+    url = make_url(database_uri)
+    if url.get_backend_name() not in ('postgresql', 'postgres'):
+        return None
+    query = dict(url.query)
+    if 'sslmode' in query:
+        # asyncpg spells libpq's sslmode as ssl
+        query['ssl'] = query.pop('sslmode')
+    return url.set(drivername='postgresql+asyncpg', query=query).render_as_string(hide_password=False)
+
+
+def create_async_db(config):
+    """
+    Create the async engine and session factory from the Flask config.
+
+    Pool sizes and the default statement timeout follow the sync engine
+    settings. Each ASGI worker process holds its own pool.
+
+    Args:
+        config: Flask application config
+
+    Returns:
+        tuple: (AsyncEngine, async_sessionmaker), or (None, None) when the
+        database is not PostgreSQL
+    """
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    url = async_database_url(config['SQLALCHEMY_DATABASE_URI'])
+    if url is None:
+        return None, None
+
+    sync_options = config.get('SQLALCHEMY_ENGINE_OPTIONS') or {}
+    options = {name: sync_options[name] for name in POOL_OPTIONS if name in sync_options}
+
+    if config.get('DB_PGBOUNCER', False):
+        # Transaction pooling cannot keep prepared statements across transactions
+        options['poolclass'] = NullPool
+        options['connect_args'] = {'statement_cache_size': 0, 'prepared_statement_cache_size': 0}
+    elif config.get('DB_STATEMENT_TIMEOUT_MS'):
+        options['connect_args'] = {
+            'server_settings': {'statement_timeout': str(int(config['DB_STATEMENT_TIMEOUT_MS']))}
+        }
+
+    engine = create_async_engine(url, **options)
+    return engine, async_sessionmaker(engine, expire_on_commit=False)
+
+
+@asynccontextmanager
+async def session_scope(sessionmaker, config, endpoint: str):
+    """
+    Open a read session for one request.
+
+    Applies the per-route statement timeout (DB_ROUTE_STATEMENT_TIMEOUTS uses
+    the Flask endpoint names, so one setting covers both entry points).
+
+    Args:
+        sessionmaker: Async session factory
+        config: Flask application config
+        endpoint: Flask endpoint name of the equivalent sync route
+
+    Yields:
+        AsyncSession inside a transaction
+    """
+    async with sessionmaker() as session:
+        async with session.begin():
+            timeout = statement_timeout_for(config, endpoint)
+            if timeout:
+                await session.execute(text(f'SET LOCAL statement_timeout = {int(timeout)}'))
+            yield session
@@ -0,0 +1,267 @@
+"""
+Async handlers for the I/O-bound geo and export endpoints.
+
+Handlers mirror the Flask routes of the same name and share their parsing,
+queries and serializers. A handler returns None to hand the request over
+to the Flask app (e.g. ?cluster=true or FlatGeobuf output, which are
+CPU-bound and gain nothing from the event loop).
+"""
+from sqlalchemy import select
+from starlette.responses import JSONResponse, Response, StreamingResponse
+
+from app.aio.db import session_scope
+from app.models import Ruche, Rucher
+from app.utils.columnar import (
+    ARROW_MIMETYPE, COLUMNAR_FORMATS, MEASUREMENT_LAYER, ArrowStreamEncoder, prepare_export, record_batch
+)
+from app.utils.geojson import to_geojson
+from app.utils.query_params import (
+    NEARBY_COLUMNS, KNN_COLUMNS, collection_criteria, knn_params, knn_results, measurement_criteria,
+    nearby_feature, nearby_params, parse_lat_lon
+)
+from app.utils.spatial import knn_statement, nearby_statement
+from app.utils.spatial_index import get_spatial_index
+
+
+def _error(message, status):
+    return JSONResponse({'error': message}, status_code=status)
+
+
+def _json_bytes(payload):
+    return Response(payload, media_type='application/json')
+
+
+def _spatial_index(flask_app):
+    with flask_app.app_context():
+        return get_spatial_index()
+
+
+async def _collection(request, model_class, layer, filter_names, endpoint):
+    flask_app = request.app.state.flask_app
+    try:
+        parsed = collection_criteria(model_class, request.query_params, filter_names)
+    except ValueError as e:
+        return _error(str(e), 400)
+
+    if request.query_params.get('format', 'geojson').lower() in COLUMNAR_FORMATS:
+        return None
+    if request.query_params.get('cluster', '').lower() == 'true':
+        return None
+    if request.query_params.get('include'):
+        return None
+    if request.query_params.get('zoom') or request.query_params.get('simplify'):
+        return None
+
+    index = _spatial_index(flask_app)
+    if index is not None:
+        payload = index.collection_payload(layer, parsed)
+        if payload is not None:
+            return _json_bytes(payload)
+
+    if request.app.state.sessionmaker is None:
+        return None
+
+    try:
+        async with session_scope(request.app.state.sessionmaker, flask_app.config, endpoint) as session:
+            instances = (await session.scalars(select(model_class).where(*parsed['criteria']))).all()
+        return JSONResponse(to_geojson(list(instances)))
+    except Exception as e:
+        flask_app.logger.error(f"Error fetching {layer}: {str(e)}")
+        return _error('Internal server error', 500)
+
+
+async def get_all_ruches(request):
+    """Async GET /api/geo/ruches."""
+    return await _collection(request, Ruche, 'ruches', ('active', 'rucher_id'), 'geo.get_all_ruches')
+
+
+async def get_all_ruchers(request):
+    """Async GET /api/geo/ruchers."""
+    return await _collection(request, Rucher, 'ruchers', (), 'geo.get_all_ruchers')
+
+
+async def _single(request, model_class, label, endpoint):
+    flask_app = request.app.state.flask_app
+    if request.app.state.sessionmaker is None:
+        return None
+
+    instance_id = request.path_params['id']
+    try:
+        async with session_scope(request.app.state.sessionmaker, flask_app.config, endpoint) as session:
+            instance = await session.get(model_class, instance_id)
+
+        if not instance:
+            return _error(f'{label} not found', 404)
+
+        geojson = to_geojson(instance)
+        if geojson is None:
+            return _error('Invalid geometry', 500)
+
+        return JSONResponse(geojson)
+    except Exception as e:
+        flask_app.logger.error(f"Error fetching {label.lower()} {instance_id}: {str(e)}")
+        return _error('Internal server error', 500)
+
+
+async def get_ruche(request):
+    """Async GET /api/geo/ruches/{id}."""
+    return await _single(request, Ruche, 'Ruche', 'geo.get_ruche')
+
+
+async def get_rucher(request):
+    """Async GET /api/geo/ruchers/{id}."""
+    return await _single(request, Rucher, 'Rucher', 'geo.get_rucher')
+
+
+async def nearby_ruches(request):
+    """Async GET /api/geo/ruches/nearby."""
+    flask_app = request.app.state.flask_app
+    try:
+        params = nearby_params(request.query_params, flask_app.config.get('NEARBY_MAX_LIMIT', 5000))
+    except ValueError as e:
+        return _error(str(e), 400)
+
+    index = _spatial_index(flask_app)
+    if index is not None:
+        return _json_bytes(index.nearby_payload(params))
+
+    if request.app.state.sessionmaker is None:
+        return None
+
+    statement = nearby_statement(
+        Ruche,
+        NEARBY_COLUMNS,
+        params['lon'],
+        params['lat'],
+        params['radius_meters'],
+        order_by_distance=params['order'] == 'distance',
+        limit=params['limit']
+    )
+
+    try:
+        async with session_scope(request.app.state.sessionmaker, flask_app.config, 'geo.nearby_ruches') as session:
+            features = [nearby_feature(row) for row in await session.execute(statement)]
+    except Exception as e:
+        flask_app.logger.error(f"Error in nearby query: {str(e)}")
+        # Same 500 body as the Flask geo.nearby_ruches route
+        return _error(str(e), 500)
+
+    if params['order'] == 'distance':
+        features.sort(key=lambda feature: feature['properties']['distance_meters'])
+
+    return JSONResponse({'type': 'FeatureCollection', 'query': params, 'features': features})
+
+
+async def knn_ruches(request):
+    """Async POST /api/geo/ruches/knn."""
+    flask_app = request.app.state.flask_app
+    try:
+        data = await request.json()
+    except ValueError:
+        data = None
+
+    try:
+        params = knn_params(
+            data,
+            flask_app.config.get('KNN_MAX_POINTS', 1000),
+            flask_app.config.get('KNN_MAX_K', 100)
+        )
+    except ValueError as e:
+        return _error(str(e), 400)
+
+    index = _spatial_index(flask_app)
+    if index is not None:
+        return _json_bytes(index.knn_payload(params))
+
+    if request.app.state.sessionmaker is None:
+        return None
+
+    statement = knn_statement(
+        Ruche,
+        KNN_COLUMNS,
+        params['longitudes'],
+        params['latitudes'],
+        params['k'],
+        params['criteria']
+    )
+
+    try:
+        async with session_scope(request.app.state.sessionmaker, flask_app.config, 'geo.knn_ruches') as session:
+            results = knn_results(params['latitudes'], params['longitudes'], await session.execute(statement))
+    except Exception as e:
+        flask_app.logger.error(f"Error in KNN query: {str(e)}")
+        # Same 500 body as the Flask geo.knn_ruches route
+        return _error(str(e), 500)
+
+    return JSONResponse({'k': params['k'], 'results': results})
+
+
+async def reverse_geocode(request):
+    """Async GET /api/geo/reverse-geocode, using geopy's aiohttp adapter."""
+    geolocator = request.app.state.geolocator
+    if geolocator is None:
+        return None
+
+    try:
+        lat = float(request.query_params['lat'])
+        lon = float(request.query_params['lon'])
+    except (KeyError, ValueError):
+        return _error('lat and lon parameters required', 400)
+
+    try:
+        parse_lat_lon(lat, lon)
+    except ValueError:
+        return _error('Invalid coordinates', 400)
+
+    try:
+        location = await geolocator.reverse(f"{lat}, {lon}")
+        return JSONResponse({
+            'lat': lat,
+            'lon': lon,
+            'address': location.address,
+            'country': location.address.split(',')[-1].strip()
+        })
+    except Exception:
+        # Fallback if reverse geocoding fails
+        return JSONResponse({
+            'lat': lat,
+            'lon': lon,
+            'address': 'Address not found',
+            'country': 'Unknown'
+        })
+
+
+async def export_measurements(request):
+    """Async GET /api/export/measurements (Arrow IPC; FlatGeobuf is left to Flask)."""
+    flask_app = request.app.state.flask_app
+    fmt = request.query_params.get('format', 'arrow').lower()
+    if fmt != 'arrow' or request.app.state.sessionmaker is None:
+        return None
+
+    try:
+        criteria = measurement_criteria(request.query_params)
+    except ValueError as e:
+        return _error(str(e), 400)
+
+    try:
+        import pyarrow as pa
+    except ImportError as e:
+        return _error(f'Output format not available: {str(e)}', 501)
+
+    encoding, schema, statement = prepare_export(pa, MEASUREMENT_LAYER, 'arrow', criteria)
+    batch_size = flask_app.config.get('EXPORT_BATCH_SIZE', 10000)
+    sessionmaker = request.app.state.sessionmaker
+
+    async def generate():
+        encoder = ArrowStreamEncoder(pa, schema)
+        async with session_scope(sessionmaker, flask_app.config, 'export.export_measurements') as session:
+            result = await session.stream(statement.execution_options(yield_per=batch_size))
+            async for rows in result.partitions():
+                yield encoder.write(record_batch(pa, schema, rows, encoding))
+        yield encoder.close()
+
+    return StreamingResponse(
+        generate(),
+        media_type=ARROW_MIMETYPE,
+        headers={'Content-Disposition': f'attachment; filename={MEASUREMENT_LAYER["name"]}.arrow'}
+    )
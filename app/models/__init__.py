@@ -3,8 +3,11 @@ Database models for BeeTrack application.
 """
 from app.models.ruche import Ruche
 from app.models.rucher import Rucher
+from app.models.rucher_overlap import RucherOverlap
 from app.models.measurement import Measurement
 from app.models.alert_rule import AlertRule
 from app.models.alert import Alert
+from app.models.anomaly_state import AnomalyState
+from app.models.job import Job
 
-__all__ = ['Ruche', 'Rucher', 'Measurement', 'AlertRule', 'Alert']
+__all__ = ['Ruche', 'Rucher', 'RucherOverlap', 'Measurement', 'AlertRule', 'Alert', 'AnomalyState', 'Job']
@@ -12,8 +12,11 @@ class AlertRule(db.Model):
     Attributes:
         id: Primary key
         ruche_id: Foreign key to ruche (hive)
-        rule_type: Type of alert rule (e.g., 'temperature', 'weight', 'humidity')
-        params: JSON parameters for the rule (thresholds, etc.)
+        rule_type: Type of alert rule (e.g., 'temperature', 'weight', 'humidity',
+            'geofence', 'anomaly')
+        params: JSON parameters for the rule (thresholds, etc.; 'geofence'
+            takes {"radius": meters} around the hive's registered location,
+            'anomaly' optional "metrics", "z_threshold" and "drift_threshold")
         notify_in_app: Whether to notify in application
         notify_whatsapp: Whether to send WhatsApp notification
         whatsapp_number: WhatsApp number for notifications
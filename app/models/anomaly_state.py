@@ -0,0 +1,46 @@
+"""
+Checkpointed anomaly detection state per hive and metric.
+"""
+from datetime import datetime, timezone
+from sqlalchemy import Column, Integer, Float, String, ForeignKey, DateTime, LargeBinary
+from app import db
+
+
+class AnomalyState(db.Model):
+    """
+    Incremental statistics of one hive metric, as of its last measurement.
+    
+    Written back after every ingested batch by app.utils.anomaly, so the
+    detector resumes from here after a restart instead of rescanning history.
+    
+    Attributes:
+        ruche_id: Foreign key to ruche (hive)
+        metric: Measurement column ('weight', 'temperature', 'humidity')
+        count: Number of measurements folded into the state
+        level: EWMA of the deseasonalized value
+        variance: EWMA variance of the residuals
+        trend: EWMA of the level change per hour
+        trend_baseline: Slow EWMA of trend (the series' usual trend)
+        trend_variance: Slow EWMA variance of trend around trend_baseline
+        season: Hour-of-day offsets from the level (24 float64, little-endian)
+        last_recorded_at: recorded_at of the last measurement folded in
+        last_alert_at: When the last anomaly alert was raised for this metric
+        updated_at: Timestamp of the last checkpoint
+    """
+    __tablename__ = 'anomaly_states'
+    
+    ruche_id = Column(Integer, ForeignKey('ruches.id', ondelete='CASCADE'), primary_key=True)
+    metric = Column(String(50), primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+    level = Column(Float, nullable=False)
+    variance = Column(Float, nullable=False)
+    trend = Column(Float, nullable=False)
+    trend_baseline = Column(Float, nullable=False)
+    trend_variance = Column(Float, nullable=False)
+    season = Column(LargeBinary, nullable=False)
+    last_recorded_at = Column(DateTime, nullable=False)
+    last_alert_at = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), nullable=False)
+    
+    def __repr__(self):
+        return f'<AnomalyState Ruche {self.ruche_id} {self.metric}: {self.count} samples>'
@@ -0,0 +1,79 @@
+"""
+Background job model.
+"""
+from datetime import datetime, timezone
+from sqlalchemy import Column, Integer, String, Text, DateTime, JSON, LargeBinary, Index, text
+from sqlalchemy.orm import deferred
+from app import db
+
+PENDING_CONDITION = "status IN ('queued', 'running')"
+
+
+class Job(db.Model):
+    """
+    Long computation run by the job worker (flask run-jobs) outside the web workers.
+    
+    Rows are claimed with FOR UPDATE SKIP LOCKED by app.utils.jobs, so several
+    workers can share the queue.
+    
+    Attributes:
+        id: Primary key
+        kind: Registered job kind ('clusters', 'export_measurements', ...)
+        params: JSON parameters, validated when the job was submitted
+        key: Hash of kind and params; at most one pending job per key
+        status: queued, running, succeeded or failed
+        attempts: Number of times the job was claimed
+        worker: Host and pid of the worker running the job
+        result: Result payload (deferred: loaded only when fetched)
+        result_path: Name of the result file in JOBS_RESULT_DIR, for kinds
+            writing large results to a file instead of result
+        result_type: MIME type of the result
+        error: Error message of a failed job
+        created_at: Timestamp of submission
+        started_at: Timestamp of the last claim
+        heartbeat_at: Last sign of life of the worker running the job
+        finished_at: Timestamp the job succeeded or failed
+    """
+    __tablename__ = 'jobs'
+    
+    id = Column(Integer, primary_key=True)
+    kind = Column(String(50), nullable=False)
+    params = Column(JSON, nullable=False)
+    key = Column(String(64), nullable=False)
+    status = Column(String(20), nullable=False, default='queued')
+    attempts = Column(Integer, nullable=False, default=0)
+    worker = Column(String(255), nullable=True)
+    result = deferred(Column(LargeBinary, nullable=True))
+    result_path = Column(String(255), nullable=True)
+    result_type = Column(String(100), nullable=True)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), nullable=False)
+    started_at = Column(DateTime, nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    
+    __table_args__ = (
+        # Identical submissions share the pending job
+        Index('idx_jobs_pending_key', 'key', unique=True,
+              postgresql_where=text(PENDING_CONDITION), sqlite_where=text(PENDING_CONDITION)),
+        # Queue scan of the workers
+        Index('idx_jobs_queued', 'id', postgresql_where=text("status = 'queued'")),
+    )
+    
+    def __repr__(self):
+        return f'<Job {self.id}: {self.kind} {self.status}>'
+    
+    def to_dict(self):
+        """Convert model to dictionary (without the result)."""
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'params': self.params,
+            'status': self.status,
+            'attempts': self.attempts,
+            'result_type': self.result_type,
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
@@ -2,7 +2,7 @@
 Measurement model for sensor data from hives.
 """
 from datetime import datetime, timezone
-from sqlalchemy import Column, Integer, Float, ForeignKey, DateTime, JSON
+from sqlalchemy import Column, Integer, Float, ForeignKey, DateTime, JSON, Index
 from app import db
 
 
@@ -31,6 +31,11 @@ class Measurement(db.Model):
     signal = Column(Float, nullable=True)
     raw = Column(JSON, nullable=True)
     
+    __table_args__ = (
+        # Latest measurements per hive (apiary stats, time series queries)
+        Index('idx_measurements_ruche_recorded', 'ruche_id', 'recorded_at'),
+    )
+    
     # Relationship
     ruche = db.relationship('Ruche', back_populates='measurements')
     
@@ -2,7 +2,7 @@
 Ruche (Hive) model with PostGIS geometry support.
 """
 from datetime import datetime, timezone
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Boolean, JSON
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Boolean, JSON, Index, func
 from geoalchemy2 import Geometry
 from app import db
 
@@ -30,6 +30,11 @@ class Ruche(db.Model):
     geom = Column(Geometry(geometry_type='POINT', srid=4326), nullable=False)
     active = Column(Boolean, default=True, nullable=False)
     
+    __table_args__ = (
+        # Geography index so geodesic KNN (<->) and ST_DWithin queries are index-assisted
+        Index('idx_ruches_geom_geography', func.geography(geom), postgresql_using='gist'),
+    )
+    
     # Relationship
     rucher = db.relationship('Rucher', back_populates='ruches')
     measurements = db.relationship('Measurement', back_populates='ruche', cascade='all, delete-orphan')
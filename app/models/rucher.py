@@ -2,10 +2,35 @@
 Rucher (Apiary) model with PostGIS geometry support.
 """
 from datetime import datetime, timezone
-from sqlalchemy import Column, Integer, String, Text, DateTime
+from sqlalchemy import Column, Computed, Integer, String, Text, DateTime, Index, func
+from sqlalchemy.orm import deferred
 from geoalchemy2 import Geometry
 from app import db
 
+# Highest zoom level of each simplified zoom band; beyond the last one the
+# full-resolution geometry is served
+SIMPLIFIED_ZOOMS = (4, 8, 12)
+
+
+def pixel_degrees(zoom):
+    """Size in degrees of one pixel of a 256 px web map tile at a zoom level."""
+    return 360.0 / (256 * 2 ** zoom)
+
+
+def _simplified_geometry(zoom):
+    """
+    Generated column holding geom simplified for a zoom band.
+    
+    The tolerance is one pixel at the band's highest zoom, so the error is
+    below screen resolution at every zoom of the band. PostgreSQL recomputes
+    the column on every insert and update of geom. Deferred: only loaded
+    when a simplified geometry is requested.
+    """
+    return deferred(Column(
+        Geometry(geometry_type='GEOMETRY', srid=4326, spatial_index=False),
+        Computed(f'ST_SimplifyPreserveTopology(geom, {pixel_degrees(zoom)!r})', persisted=True)
+    ))
+
 
 class Rucher(db.Model):
     """
@@ -16,6 +41,7 @@ class Rucher(db.Model):
         name: Apiary name
         description: Description of the apiary
         geom: PostGIS Point or Polygon geometry
+        geom_z4, geom_z8, geom_z12: geom simplified for zoom bands 0-4, 5-8 and 9-12
         created_at: Timestamp of creation
     """
     __tablename__ = 'ruchers'
@@ -25,6 +51,14 @@ class Rucher(db.Model):
     description = Column(Text, nullable=True)
     geom = Column(Geometry(geometry_type='GEOMETRY', srid=4326), nullable=False)
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), nullable=False)
+    geom_z4 = _simplified_geometry(4)
+    geom_z8 = _simplified_geometry(8)
+    geom_z12 = _simplified_geometry(12)
+    
+    __table_args__ = (
+        # Geography index so the ST_DWithin self-join of the overlap analysis is index-assisted
+        Index('idx_ruchers_geom_geography', func.geography(geom), postgresql_using='gist'),
+    )
     
     # Relationship
     ruches = db.relationship('Ruche', back_populates='rucher')
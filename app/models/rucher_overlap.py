@@ -0,0 +1,39 @@
+"""
+Precomputed forage overlap between pairs of apiaries.
+"""
+from datetime import datetime, timezone
+from sqlalchemy import Column, Integer, Float, ForeignKey, DateTime, Index
+from app import db
+
+
+class RucherOverlap(db.Model):
+    """
+    Pair of apiaries whose forage areas overlap at a given radius.
+    
+    Each pair is stored once, with rucher_a_id < rucher_b_id. Rows are
+    maintained by app.utils.overlaps when apiaries are added or moved.
+    
+    Attributes:
+        rucher_a_id: Apiary with the smaller id
+        rucher_b_id: Apiary with the larger id
+        radius: Forage radius in meters the pair was computed with
+        distance: Geodesic distance between the apiaries in meters
+        overlap_area: Area of the intersection of both forage areas in m²
+        computed_at: Timestamp of computation
+    """
+    __tablename__ = 'rucher_overlaps'
+    
+    rucher_a_id = Column(Integer, ForeignKey('ruchers.id', ondelete='CASCADE'), primary_key=True)
+    rucher_b_id = Column(Integer, ForeignKey('ruchers.id', ondelete='CASCADE'), primary_key=True)
+    radius = Column(Float, primary_key=True)
+    distance = Column(Float, nullable=False)
+    overlap_area = Column(Float, nullable=False)
+    computed_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), nullable=False)
+    
+    __table_args__ = (
+        # Lookups of the pairs of one apiary from either side
+        Index('idx_rucher_overlaps_b', 'rucher_b_id'),
+    )
+    
+    def __repr__(self):
+        return f'<RucherOverlap {self.rucher_a_id}-{self.rucher_b_id} at {self.radius} m>'
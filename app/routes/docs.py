@@ -20,6 +20,24 @@ def api_documentation():
         'api_version': current_app.config.get('API_VERSION', '1.0.0'),
         'description': 'Flask API microservice for serving GeoJSON data for beekeeping management',
         'endpoints': {
+            'health_live': {
+                'path': '/health/live',
+                'method': 'GET',
+                'description': 'Liveness probe; never touches the database',
+                'response': 'JSON with status alive'
+            },
+            'health_ready': {
+                'path': '/health/ready',
+                'method': 'GET',
+                'description': 'Readiness probe from the cached background database probe, pool saturation and replication lag',
+                'response': 'JSON with health checks; 503 when not ready'
+            },
+            'metrics': {
+                'path': '/metrics (served at the root, outside /api)',
+                'method': 'GET',
+                'description': 'Prometheus metrics: per-route latency and response size histograms, SQL count and time per request, serialization and clustering time',
+                'response': 'Prometheus text exposition format'
+            },
             'health': {
                 'path': '/health',
                 'method': 'GET',
@@ -30,6 +48,9 @@ def api_documentation():
                 'path': '/status',
                 'method': 'GET',
                 'description': 'API status with configuration details',
+                'parameters': {
+                    'exact': 'Exact row counts with COUNT(*) instead of planner estimates (true/false)'
+                },
                 'response': 'JSON with status information'
             },
             'geo_ruches_all': {
@@ -42,9 +63,11 @@ def api_documentation():
                     'cluster': 'Enable clustering (true/false)',
                     'radius': 'Filter by radius in meters (requires lat and lon)',
                     'lat': 'Latitude for radius search',
-                    'lon': 'Longitude for radius search'
+                    'lon': 'Longitude for radius search',
+                    'bbox': 'Filter by bounding box (min_lon,min_lat,max_lon,max_lat)',
+                    'format': 'geojson (default), arrow (Arrow IPC stream) or fgb (FlatGeobuf)'
                 },
-                'response': 'GeoJSON FeatureCollection'
+                'response': 'GeoJSON FeatureCollection, Arrow IPC stream or FlatGeobuf file; 202 with a job when clustering more than JOBS_CLUSTER_THRESHOLD hives'
             },
             'geo_ruche_single': {
                 'path': '/geo/ruches/<id>',
@@ -62,9 +85,34 @@ def api_documentation():
                 'query_parameters': {
                     'radius': 'Filter by radius in meters (requires lat and lon)',
                     'lat': 'Latitude for radius search',
-                    'lon': 'Longitude for radius search'
+                    'lon': 'Longitude for radius search',
+                    'bbox': 'Filter by bounding box (min_lon,min_lat,max_lon,max_lat)',
+                    'format': 'geojson (default), arrow (Arrow IPC stream) or fgb (FlatGeobuf)',
+                    'include': "'stats' to add a stats property (hive aggregates) to each apiary, GeoJSON only",
+                    'zoom': 'Map zoom level; serves geometries precomputed below screen resolution for zooms 0-12',
+                    'simplify': "Simplification tolerance in degrees, or 'false' for full resolution (instead of zoom)"
                 },
-                'response': 'GeoJSON FeatureCollection'
+                'response': 'GeoJSON FeatureCollection, Arrow IPC stream or FlatGeobuf file'
+            },
+            'geo_rucher_stats': {
+                'path': '/geo/ruchers/<id>/stats',
+                'method': 'GET',
+                'description': 'Hive aggregates of an apiary, computed in one query',
+                'path_parameters': {
+                    'id': 'Rucher (apiary) ID'
+                },
+                'response': 'JSON with hive_count, active_count, centroid, extent ([min_lon, min_lat, max_lon, max_lat]), latest_avg_weight and latest_weight_at'
+            },
+            'geo_ruchers_overlaps': {
+                'path': '/geo/ruchers/overlaps',
+                'method': 'GET',
+                'description': 'Pairs of apiaries whose forage areas overlap (index-assisted ST_DWithin self-join)',
+                'query_parameters': {
+                    'radius': 'Forage radius in meters around each apiary (default RUCHER_OVERLAP_RADIUS, 3000)',
+                    'rucher_id': 'Only the pairs involving this apiary',
+                    'min_area': 'Only overlaps larger than this area in square meters'
+                },
+                'response': "JSON with source ('precomputed' or 'live'), count and overlaps: rucher_a and rucher_b (id, name), distance (m) and overlap_area (m²), largest first"
             },
             'geo_rucher_single': {
                 'path': '/geo/ruchers/<id>',
@@ -73,8 +121,150 @@ def api_documentation():
                 'path_parameters': {
                     'id': 'Rucher (apiary) ID'
                 },
+                'query_parameters': {
+                    'zoom': 'Map zoom level; serves the geometry precomputed below screen resolution for zooms 0-12',
+                    'simplify': "Simplification tolerance in degrees, or 'false' for full resolution (instead of zoom)"
+                },
                 'response': 'GeoJSON Feature'
             },
+            'geo_ruches_bulk': {
+                'path': '/geo/ruches/bulk',
+                'method': 'POST',
+                'description': 'Insert or update many hives in one statement; the whole batch is validated first',
+                'body': {
+                    'type': 'FeatureCollection',
+                    'features': 'Point features (at most BULK_MAX_FEATURES); an id (Feature.id or properties.id) updates that hive, no id inserts one. Properties: name (required), rucher_id, active, queen_info'
+                },
+                'response': 'JSON with inserted, updated and ids; 400 listing every invalid feature (nothing written)'
+            },
+            'geo_ruchers_bulk': {
+                'path': '/geo/ruchers/bulk',
+                'method': 'POST',
+                'description': 'Insert or update many apiaries in one statement; the whole batch is validated first',
+                'body': {
+                    'type': 'FeatureCollection',
+                    'features': 'Features of any geometry type (at most BULK_MAX_FEATURES); an id updates that apiary, no id inserts one. Properties: name (required), description'
+                },
+                'response': 'JSON with inserted, updated and ids; 400 listing every invalid feature (nothing written)'
+            },
+            'geo_ruches_nearby': {
+                'path': '/geo/ruches/nearby',
+                'method': 'GET',
+                'description': 'Get hives within a radius of a point, with distances',
+                'query_parameters': {
+                    'lat': 'Latitude of the center point',
+                    'lon': 'Longitude of the center point',
+                    'radius': 'Radius in meters (default 1000)',
+                    'order': "'distance' to return the nearest hives first (index-assisted KNN)",
+                    'limit': 'Maximum number of hives, at most NEARBY_MAX_LIMIT (default: every hive within the radius)'
+                },
+                'response': 'GeoJSON FeatureCollection with distance_meters properties'
+            },
+            'geo_ruches_density': {
+                'path': '/geo/ruches/density',
+                'method': 'GET',
+                'description': 'Hive counts aggregated into hexagonal or square grid cells (ST_HexagonGrid/ST_SquareGrid), for low-zoom maps',
+                'query_parameters': {
+                    'bbox': 'Area to aggregate (min_lon,min_lat,max_lon,max_lat), required',
+                    'cell_size': 'Cell size in Web Mercator meters (default DENSITY_DEFAULT_CELL_SIZE)',
+                    'shape': 'hexagon (default) or square',
+                    'active': 'Filter by hive active status (true/false)',
+                    'measurements': 'Add avg_weight, avg_temperature and avg_humidity of the latest measurements (true/false)',
+                    'format': "geojson (default) or mvt (Mapbox Vector Tile, layer 'density')"
+                },
+                'response': 'GeoJSON FeatureCollection of non-empty cells (i, j, count) or an MVT tile; cached per cell size'
+            },
+            'geo_interpolate': {
+                'path': '/geo/interpolate',
+                'method': 'GET',
+                'description': "Inverse-distance-weighted grid of the hives' latest temperature or humidity",
+                'query_parameters': {
+                    'var': 'temperature (default) or humidity',
+                    'bbox': 'Area to interpolate (min_lon,min_lat,max_lon,max_lat), required',
+                    'resolution': 'Cell size in degrees (default: INTERPOLATION_DEFAULT_CELLS across the bbox)',
+                    'format': 'raster (default) or geojson',
+                    'levels': 'Comma-separated isoband breakpoints for geojson (default: 10 equal bands)'
+                },
+                'response': 'float32 cells (NaN for no value) described by X-Raster-Width/Height/Bounds headers, or a GeoJSON FeatureCollection of isobands; cached per data version'
+            },
+            'geo_ruches_knn': {
+                'path': '/geo/ruches/knn',
+                'method': 'POST',
+                'description': 'Get the k nearest hives to each of many points in one query',
+                'body': {
+                    'points': 'List of {"lat": ..., "lon": ...} objects',
+                    'k': 'Number of neighbours per point (default 5)',
+                    'active': 'Optional filter on hive active status (true/false)'
+                },
+                'response': 'JSON with one FeatureCollection per input point, ordered by distance'
+            },
+            'geo_distance': {
+                'path': '/geo/distance',
+                'method': 'GET',
+                'description': 'WGS84 geodesic distance between two points, computed without a database round trip',
+                'query_parameters': {
+                    'lat1': 'Latitude of the first point',
+                    'lon1': 'Longitude of the first point',
+                    'lat2': 'Latitude of the second point',
+                    'lon2': 'Longitude of the second point'
+                },
+                'response': 'JSON with distance in meters and kilometers'
+            },
+            'geo_distance_matrix': {
+                'path': '/geo/distance/matrix',
+                'method': 'POST',
+                'description': 'N x M distance matrix between origins and destinations, vectorized with NumPy',
+                'body': {
+                    'origins': 'List of {"lat": ..., "lon": ...} objects',
+                    'destinations': 'List of {"lat": ..., "lon": ...} objects',
+                    'method': "'geodesic' (WGS84, default) or 'haversine' (sphere, faster)"
+                },
+                'response': 'JSON with the matrix of distances in meters (rows follow origins)'
+            },
+            'export_measurements': {
+                'path': '/export/measurements',
+                'method': 'GET',
+                'description': 'Bulk export of measurements in a columnar binary format',
+                'query_parameters': {
+                    'format': 'arrow (default) or fgb',
+                    'ruche_id': 'Filter by ruche (hive) ID',
+                    'start': 'Only measurements recorded at or after this ISO 8601 timestamp',
+                    'end': 'Only measurements recorded before this ISO 8601 timestamp'
+                },
+                'response': 'Arrow IPC stream or FlatGeobuf file'
+            },
+            'measurements_ingest': {
+                'path': '/measurements',
+                'method': 'POST',
+                'description': 'Ingest a batch of sensor measurements; GPS fixes in raw.gps are checked against hive geofences, and hives with an anomaly rule are scored for outliers and drifts',
+                'body': {
+                    'measurements': 'List (at most MEASUREMENTS_MAX_BATCH) of {"ruche_id", "recorded_at", "weight", "temperature", "humidity", "signal", "raw"}; only ruche_id is required',
+                    'raw.gps': '{"lat": ..., "lon": ...} fix compared with the hive location for hives with a geofence alert rule'
+                },
+                'response': 'JSON with inserted and the alerts raised: geofence (rule_id, ruche_id, displacement, radius, location) and anomaly (kind outlier or drift, metric, value, expected, z, drift); 400 listing every invalid measurement'
+            },
+            'jobs_submit': {
+                'path': '/jobs',
+                'method': 'POST',
+                'description': 'Submit a background job, run by the job worker (flask run-jobs) instead of a web worker',
+                'body': {
+                    'kind': 'clusters, ruches_cluster, export_measurements or reverse_geocode',
+                    'params': 'clusters: {"n_clusters"}; ruches_cluster: the /geo/ruches filters; export_measurements: the /export/measurements parameters; reverse_geocode: {"points": [[lat, lon], ...]}'
+                },
+                'response': '202 with the job (id, status, status_url) and a Location header; an identical pending job is returned instead of queuing another'
+            },
+            'jobs_status': {
+                'path': '/jobs/<id>',
+                'method': 'GET',
+                'description': 'Status of a job: queued, running, succeeded or failed',
+                'response': 'JSON with the job; result_url once it succeeded, error if it failed'
+            },
+            'jobs_result': {
+                'path': '/jobs/<id>/result',
+                'method': 'GET',
+                'description': 'Result of a succeeded job, kept JOBS_RESULT_TTL seconds',
+                'response': 'The payload the synchronous endpoint would return (JSON, Arrow IPC or FlatGeobuf); 409 while the job is pending or if it failed; 410 if an export result file is gone'
+            },
             'documentation': {
                 'path': '/ or /docs',
                 'method': 'GET',
@@ -88,7 +278,11 @@ def api_documentation():
             'spatial_queries': 'Radius-based queries and distance calculations',
             'clustering': 'DBSCAN-based spatial clustering',
             'coordinate_validation': 'Automatic coordinate validation and cleaning',
-            'reverse_geocoding': 'Optional reverse geocoding support'
+            'reverse_geocoding': 'Optional reverse geocoding support',
+            'spatial_index': 'Optional in-process STRtree snapshot answering bbox/radius/KNN queries without the database',
+            'background_jobs': 'Long clustering, exports and batch geocoding run as jobs in a separate worker process pool',
+            'columnar_export': 'Arrow IPC (GeoArrow) and FlatGeobuf output streamed in record batches',
+            'async_serving': 'Optional ASGI entry point (asgi.py) serving I/O-bound endpoints with asyncpg'
         },
         'database_schema': {
             'ruches': 'Hives with PostGIS Point geometry',
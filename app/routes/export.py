@@ -0,0 +1,68 @@
+"""
+Bulk export endpoints producing columnar binary payloads.
+"""
+from flask import Blueprint, jsonify, request, current_app
+from app.utils.columnar import (
+    ARROW_MIMETYPE, COLUMNAR_FORMATS, FLATGEOBUF_MIMETYPE, MEASUREMENT_LAYER, arrow_ipc_stream,
+    columnar_response, write_flatgeobuf
+)
+from app.utils.jobs import job_kind, write_result_chunks
+from app.utils.query_params import measurement_criteria
+
+bp = Blueprint('export', __name__, url_prefix='/api/export')
+
+
+@bp.route('/measurements', methods=['GET'])
+def export_measurements():
+    """
+    Export measurements as an Arrow IPC stream or FlatGeobuf file.
+
+    Query Parameters:
+        - format: arrow (default) or fgb
+        - ruche_id: Filter by ruche (hive) ID
+        - start: Only measurements recorded at or after this ISO 8601 timestamp
+        - end: Only measurements recorded before this ISO 8601 timestamp
+
+    Returns:
+        Columnar binary payload, one row per measurement, located at its hive
+    """
+    try:
+        fmt = request.args.get('format', 'arrow').lower()
+        if fmt not in COLUMNAR_FORMATS:
+            return jsonify({'error': f'format must be one of: {", ".join(COLUMNAR_FORMATS)}'}), 400
+
+        try:
+            criteria = measurement_criteria(request.args)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        return columnar_response(fmt, MEASUREMENT_LAYER, criteria)
+
+    except ImportError as e:
+        return jsonify({'error': f'Output format not available: {str(e)}'}), 501
+    except Exception as e:
+        current_app.logger.error(f"Error exporting measurements: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+
+def parse_export_job(params):
+    """Parameters of an 'export_measurements' job: format, ruche_id, start and end."""
+    names = ('format', 'ruche_id', 'start', 'end')
+    args = {name: str(params[name]) for name in names if params.get(name) is not None}
+    args['format'] = args.get('format', 'arrow').lower()
+    if args['format'] not in COLUMNAR_FORMATS:
+        raise ValueError(f'format must be one of: {", ".join(COLUMNAR_FORMATS)}')
+    measurement_criteria(args)
+    return args
+
+
+@job_kind('export_measurements', parse=parse_export_job, to_file=True)
+def export_job(params, path):
+    """Write the /export/measurements payload to the job's result file, batch by batch."""
+    criteria = measurement_criteria(params)
+    batch_size = current_app.config.get('EXPORT_BATCH_SIZE', 10000)
+    if params['format'] == 'arrow':
+        write_result_chunks(path, arrow_ipc_stream(MEASUREMENT_LAYER, criteria, batch_size))
+        return ARROW_MIMETYPE
+    write_flatgeobuf(MEASUREMENT_LAYER, path, criteria, batch_size)
+    return FLATGEOBUF_MIMETYPE
@@ -2,56 +2,82 @@
 GeoJSON API endpoints for ruches and ruchers.
 """
 import json
+import time
 import numpy as np
-from sklearn.cluster import KMeans
-from geopy.geocoders import Nominatim
 
 from flask import Blueprint, jsonify, request, current_app
 from sqlalchemy import func
+from sqlalchemy.orm import undefer
 from geoalchemy2 import functions as geo_func
-from geoalchemy2.functions import ST_AsGeoJSON, ST_DWithin, ST_Distance
 from app import db
 from app.models import Ruche, Rucher
 from app.utils.geojson import to_geojson
-from app.utils.spatial import find_within_radius, cluster_points, get_point_coordinates
+from app.utils.spatial import nearby_statement, knn_statement, cluster_points
+from app.utils.query_params import (
+    NEARBY_COLUMNS, KNN_COLUMNS, collection_criteria, knn_params, knn_results,
+    nearby_feature, nearby_params, parse_lat_lon
+)
+from app.utils.spatial_index import get_spatial_index
+from app.utils.metrics import timed
+from app.utils.wkb import point_coordinates
+from app.utils.bulk import (
+    invalidate_caches, missing_rucher_errors, rucher_row, ruche_row, upsert_ruchers, upsert_ruches,
+    validate_batch
+)
+from app.utils.density import density_params, density_payload
+from app.utils.interpolation import interpolation_params, interpolation_payload
+from app.utils.simplify import simplified_column
+from app.utils.singleflight import coalesce
+from app.utils.jobs import job_kind, job_response, submit_job
+from app.utils.db_stats import estimated_row_counts
+from app.utils.overlaps import overlap_params, refresh_overlaps, rucher_overlaps
+from app.utils.rucher_stats import empty_stats, rucher_stats
+from app.utils.geodesic import (
+    DISTANCE_METHODS, geodesic_backend, geodesic_distance, iter_distance_matrix
+)
+from app.utils.columnar import COLUMNAR_FORMATS, RUCHE_LAYER, RUCHER_LAYER, columnar_response
+from app.utils.cache import TTLCache
 
 bp = Blueprint('geo', __name__, url_prefix='/api/geo')
 
+# Planner estimate of the hive count, for cluster_job_needed (JOBS_CLUSTER_ESTIMATE_TTL)
+_hive_estimate = TTLCache(ttl=60)
+
 # ========================================
 # HELPER FUNCTIONS from flask_postgis_api.py
 # ========================================
 def validate_coordinates(lat, lon):
     """Validate latitude and longitude"""
     try:
-        lat = float(lat)
-        lon = float(lon)
-        
-        if not (-90 <= lat <= 90):
-            return False, "Latitude must be between -90 and 90"
-        if not (-180 <= lon <= 180):
-            return False, "Longitude must be between -180 and 180"
-        
-        return True, (lat, lon)
-    except (ValueError, TypeError):
-        return False, "Invalid coordinate format"
+        return True, parse_lat_lon(lat, lon)
+    except ValueError as e:
+        return False, str(e)
+
 
+def json_bytes_response(payload, status=200):
+    """Wrap an already serialized JSON payload in a response."""
+    return current_app.response_class(payload, status=status, mimetype='application/json')
 
+
+@timed('clustering')
 def get_clusters(n_clusters=3):
     """Get K-means clusters of hives"""
+    from sklearn.cluster import KMeans
+    
     ruches = Ruche.query. all()
     
     if len(ruches) < n_clusters:
         return None, f"Need at least {n_clusters} hives to cluster"
     
-    # Extract coordinates
-    coords = []
-    for ruche in ruches:
-        geom_json = db.session.query(ST_AsGeoJSON(ruche.geom)).scalar()
-        if geom_json:
-            geom = json.loads(geom_json)
-            coords.append(geom['coordinates'])
+    # Extract coordinates of all hives in one vectorized pass, rounded like
+    # ST_AsGeoJSON (9 decimals)
+    coords = np.round(point_coordinates([ruche.geom for ruche in ruches]), 9)
+    located = ~np.isnan(coords[:, 0])
+    ruches = [ruche for ruche, ok in zip(ruches, located) if ok]
+    coords = coords[located]
     
-    coords = np.array(coords)
+    if len(ruches) < n_clusters:
+        return None, f"Need at least {n_clusters} hives to cluster"
     
     # K-means clustering
     kmeans = KMeans(n_clusters=n_clusters, random_state=42)
@@ -59,8 +85,7 @@ def get_clusters(n_clusters=3):
     
     # Build response
     clusters = {}
-    for idx, (ruche, label) in enumerate(zip(ruches, labels)):
-        label = int(label)
+    for ruche, label, point in zip(ruches, labels.tolist(), coords.tolist()):
         if label not in clusters:
             clusters[label] = {
                 'cluster_id': label,
@@ -69,18 +94,92 @@ def get_clusters(n_clusters=3):
                 'features': []
             }
         
-        geom_json = db.session. query(ST_AsGeoJSON(ruche.geom)).scalar()
-        if geom_json:
-            geom = json. loads(geom_json)
-            clusters[label]['features'].append({
-                'id': ruche.id,
-                'name': ruche.name,
-                'coordinates': geom['coordinates']
-            })
+        clusters[label]['features'].append({
+            'id': ruche.id,
+            'name': ruche.name,
+            'coordinates': point
+        })
     
     return list(clusters.values()), None
 
 
+def clusters_payload(n_clusters):
+    """
+    Serialized /clusters response.
+    
+    Raises:
+        ValueError: If there are fewer located hives than clusters
+    """
+    cluster_data, error = get_clusters(n_clusters)
+    if error:
+        raise ValueError(error)
+    return current_app.json.dumps({
+        'clusters': cluster_data,
+        'total_clusters': len(cluster_data),
+        'n_clusters_requested': n_clusters
+    }).encode()
+
+
+def clustered_ruches_payload(criteria):
+    """Serialized hive FeatureCollection with its DBSCAN clustering (/ruches?cluster=true)."""
+    ruches = Ruche.query.filter(*criteria).all()
+    geojson = to_geojson(ruches)
+    
+    coords = point_coordinates([ruche.geom for ruche in ruches])
+    points = [tuple(point) for point in coords[~np.isnan(coords[:, 0])].tolist()]
+    
+    if points:
+        eps = current_app.config.get('CLUSTERING_EPS', 1000)
+        min_samples = current_app.config.get('CLUSTERING_MIN_SAMPLES', 2)
+        geojson['clustering'] = cluster_points(points, eps=eps, min_samples=min_samples)
+    return current_app.json.dumps(geojson).encode()
+
+
+def cluster_job_needed(criteria=()):
+    """Whether clustering covers more than JOBS_CLUSTER_THRESHOLD hives, and should run as a job."""
+    threshold = current_app.config.get('JOBS_CLUSTER_THRESHOLD', 0)
+    if threshold <= 0:
+        return False
+    
+    # The estimate of all hives bounds the filtered count, which is only counted when it could exceed
+    _hive_estimate.ttl = current_app.config.get('JOBS_CLUSTER_ESTIMATE_TTL', 60)
+    estimate = _hive_estimate.get_or_set('ruches', lambda: estimated_row_counts(db.session, [Ruche])['ruches'])
+    if estimate <= threshold:
+        return False
+    return not criteria or Ruche.query.filter(*criteria).count() > threshold
+
+
+def parse_clusters_job(params):
+    """Parameters of a 'clusters' job: n_clusters (default 3)."""
+    n_clusters = params.get('n_clusters', 3)
+    if isinstance(n_clusters, bool) or not isinstance(n_clusters, int) or n_clusters < 1:
+        raise ValueError('n_clusters must be an integer >= 1')
+    return {'n_clusters': n_clusters}
+
+
+@job_kind('clusters', parse=parse_clusters_job)
+def clusters_job(params):
+    """K-means clusters of every hive, as returned by /clusters."""
+    return clusters_payload(params['n_clusters']), 'application/json'
+
+
+CLUSTER_JOB_FILTERS = ('active', 'rucher_id', 'bbox', 'radius', 'lat', 'lon')
+
+
+def parse_ruches_cluster_job(params):
+    """Parameters of a 'ruches_cluster' job: the /ruches filters, as strings."""
+    args = {name: str(params[name]) for name in CLUSTER_JOB_FILTERS if params.get(name) is not None}
+    collection_criteria(Ruche, args, ('active', 'rucher_id'))
+    return args
+
+
+@job_kind('ruches_cluster', parse=parse_ruches_cluster_job)
+def ruches_cluster_job(params):
+    """Hives with their DBSCAN clustering, as returned by /ruches?cluster=true."""
+    criteria = collection_criteria(Ruche, params, ('active', 'rucher_id'))['criteria']
+    return clustered_ruches_payload(criteria), 'application/json'
+
+
 @bp.route('/ruches', methods=['GET'])
 def get_all_ruches():
     """
@@ -93,59 +192,45 @@ def get_all_ruches():
         - radius: Filter by radius in meters (requires lat and lon)
         - lat: Latitude for radius search
         - lon: Longitude for radius search
+        - bbox: Filter by bounding box (min_lon,min_lat,max_lon,max_lat)
+        - format: geojson (default), arrow (Arrow IPC stream) or fgb (FlatGeobuf)
     
     Returns:
-        GeoJSON FeatureCollection
+        GeoJSON FeatureCollection, or a columnar binary payload
     """
     try:
-        # Start with base query
-        query = Ruche.query
-        
-        # Apply filters
-        active = request.args.get('active')
-        if active is not None:
-            query = query.filter(Ruche.active == (active.lower() == 'true'))
-        
-        rucher_id = request.args.get('rucher_id')
-        if rucher_id:
-            try:
-                query = query.filter(Ruche.rucher_id == int(rucher_id))
-            except (ValueError, TypeError):
-                return jsonify({'error': 'Invalid rucher_id parameter'}), 400
-        
-        # Radius search
-        radius = request.args.get('radius')
-        lat = request.args.get('lat')
-        lon = request.args.get('lon')
-        
-        if radius and lat and lon:
-            try:
-                center_point = f'POINT({float(lon)} {float(lat)})'
-                ruches = find_within_radius(Ruche, center_point, float(radius))
-            except (ValueError, TypeError):
-                return jsonify({'error': 'Invalid radius parameters'}), 400
-        else:
-            ruches = query.all()
-        
-        # Generate GeoJSON
-        geojson = to_geojson(ruches)
-        
-        # Optional clustering
-        if request.args.get('cluster', '').lower() == 'true':
-            points = []
-            for ruche in ruches:
-                coords = get_point_coordinates(ruche.geom)
-                if coords:
-                    points.append(coords)
-            
-            if points:
-                eps = current_app.config.get('CLUSTERING_EPS', 1000)
-                min_samples = current_app.config.get('CLUSTERING_MIN_SAMPLES', 2)
-                cluster_info = cluster_points(points, eps=eps, min_samples=min_samples)
-                geojson['clustering'] = cluster_info
+        try:
+            parsed = collection_criteria(Ruche, request.args, ('active', 'rucher_id'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
-        return jsonify(geojson), 200
+        fmt = request.args.get('format', 'geojson').lower()
+        if fmt in COLUMNAR_FORMATS:
+            return columnar_response(fmt, RUCHE_LAYER, parsed['criteria'])
         
+        clustering = request.args.get('cluster', '').lower() == 'true'
+        
+        # Serve from the in-process spatial index when it is available
+        index = get_spatial_index()
+        if index is not None and not clustering:
+            return json_bytes_response(index.collection_payload('ruches', parsed))
+        
+        if not clustering:
+            ruches = Ruche.query.filter(*parsed['criteria']).all()
+            return jsonify(to_geojson(ruches)), 200
+        
+        # Too many hives to cluster within the request: 202 with the job to poll
+        if cluster_job_needed(parsed['criteria']):
+            job = submit_job(db.session, 'ruches_cluster', parse_ruches_cluster_job(request.args))
+            return job_response(job, 202)
+        
+        # Identical concurrent requests share one clustering run
+        key = ('ruches', tuple(sorted(request.args.items(multi=True))),
+               current_app.config.get('CLUSTERING_EPS', 1000), current_app.config.get('CLUSTERING_MIN_SAMPLES', 2))
+        return json_bytes_response(coalesce(key, lambda: clustered_ruches_payload(parsed['criteria'])))
+        
+    except ImportError as e:
+        return jsonify({'error': f'Output format not available: {str(e)}'}), 501
     except Exception as e:
         current_app.logger.error(f"Error fetching ruches: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
@@ -189,29 +274,60 @@ def get_all_ruchers():
         - radius: Filter by radius in meters (requires lat and lon)
         - lat: Latitude for radius search
         - lon: Longitude for radius search
+        - bbox: Filter by bounding box (min_lon,min_lat,max_lon,max_lat)
+        - format: geojson (default), arrow (Arrow IPC stream) or fgb (FlatGeobuf)
+        - include: 'stats' to add hive aggregates to each apiary (GeoJSON only)
+        - zoom: Map zoom level; geometries are simplified below screen resolution
+        - simplify: Simplification tolerance in degrees, or 'false' (alternative to zoom)
     
     Returns:
-        GeoJSON FeatureCollection
+        GeoJSON FeatureCollection, or a columnar binary payload
     """
     try:
-        # Radius search
-        radius = request.args.get('radius')
-        lat = request.args.get('lat')
-        lon = request.args.get('lon')
-        
-        if radius and lat and lon:
-            try:
-                center_point = f'POINT({float(lon)} {float(lat)})'
-                ruchers = find_within_radius(Rucher, center_point, float(radius))
-            except (ValueError, TypeError):
-                return jsonify({'error': 'Invalid radius parameters'}), 400
-        else:
-            ruchers = Rucher.query.all()
-        
-        geojson = to_geojson(ruchers)
+        try:
+            parsed = collection_criteria(Rucher, request.args)
+            geometry_column = simplified_column(request.args)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        include_stats = 'stats' in request.args.get('include', '').lower().split(',')
+        
+        fmt = request.args.get('format', 'geojson').lower()
+        if fmt in COLUMNAR_FORMATS:
+            if include_stats:
+                return jsonify({'error': 'include=stats is only available with format=geojson'}), 400
+            layer = RUCHER_LAYER
+            if geometry_column:
+                layer = {**RUCHER_LAYER, 'geometry': getattr(Rucher, geometry_column)}
+            return columnar_response(fmt, layer, parsed['criteria'])
+        
+        # Serve from the in-process spatial index when it is available;
+        # radius searches need a point-only layer there. The index holds
+        # full-resolution geometries only.
+        index = get_spatial_index()
+        if index is not None and not include_stats and not geometry_column:
+            payload = index.collection_payload('ruchers', parsed)
+            if payload is not None:
+                return json_bytes_response(payload)
+        
+        query = Rucher.query.filter(*parsed['criteria'])
+        if geometry_column:
+            # Load the precomputed simplified geometry instead of geom
+            query = query.options(undefer(getattr(Rucher, geometry_column)))
+        ruchers = query.all()
+        
+        geojson = to_geojson(ruchers, geometry_column or 'geom')
+        
+        if include_stats:
+            # One aggregate query for every apiary, not one per apiary
+            stats = rucher_stats(db.session, None if not parsed['criteria'] else [r.id for r in ruchers])
+            for feature in geojson['features']:
+                feature['properties']['stats'] = stats.get(feature['properties']['id'], empty_stats())
         
         return jsonify(geojson), 200
         
+    except ImportError as e:
+        return jsonify({'error': f'Output format not available: {str(e)}'}), 501
     except Exception as e:
         current_app.logger.error(f"Error fetching ruchers: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
@@ -225,16 +341,26 @@ def get_rucher(rucher_id):
     Args:
         rucher_id: ID of the rucher
     
+    Query Parameters:
+        - zoom: Map zoom level; the geometry is simplified below screen resolution
+        - simplify: Simplification tolerance in degrees, or 'false' (alternative to zoom)
+    
     Returns:
         GeoJSON Feature
     """
     try:
-        rucher = db.session.get(Rucher, rucher_id)
+        try:
+            geometry_column = simplified_column(request.args)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        options = [undefer(getattr(Rucher, geometry_column))] if geometry_column else []
+        rucher = db.session.get(Rucher, rucher_id, options=options)
         
         if not rucher:
             return jsonify({'error': 'Rucher not found'}), 404
         
-        geojson = to_geojson(rucher)
+        geojson = to_geojson(rucher, geometry_column or 'geom')
         
         if geojson is None:
             return jsonify({'error': 'Invalid geometry'}), 500
@@ -245,53 +371,324 @@ def get_rucher(rucher_id):
         current_app.logger.error(f"Error fetching rucher {rucher_id}: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
 
+@bp.route('/ruchers/<int:rucher_id>/stats', methods=['GET'])
+def get_rucher_stats(rucher_id):
+    """
+    Get hive aggregates of a single apiary (rucher).
+    
+    Args:
+        rucher_id: ID of the rucher
+    
+    Returns:
+        JSON with hive_count, active_count, centroid and extent of the
+        hives, and the average of each hive's latest weight
+    """
+    try:
+        if db.session.get(Rucher, rucher_id) is None:
+            return jsonify({'error': 'Rucher not found'}), 404
+        
+        stats = rucher_stats(db.session, [rucher_id]).get(rucher_id, empty_stats())
+        
+        return jsonify({'rucher_id': rucher_id, **stats}), 200
+        
+    except Exception as e:
+        current_app.logger.error(f"Error fetching stats of rucher {rucher_id}: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+
+@bp.route('/ruchers/overlaps', methods=['GET'])
+def rucher_overlaps_route():
+    """
+    Get pairs of apiaries whose forage areas overlap.
+    
+    Query Parameters:
+        - radius: Forage radius in meters around each apiary (default RUCHER_OVERLAP_RADIUS)
+        - rucher_id: Only the pairs involving this apiary
+        - min_area: Only overlaps larger than this area in square meters
+    
+    Returns:
+        JSON with the pairs (ids and names of both apiaries, geodesic
+        distance and intersection area in m²), largest overlap first
+    """
+    try:
+        try:
+            params = overlap_params(request.args, current_app.config)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        if params['rucher_id'] is not None and db.session.get(Rucher, params['rucher_id']) is None:
+            return jsonify({'error': 'Rucher not found'}), 404
+        
+        pairs, source = rucher_overlaps(db.session, params['radius'], params['rucher_id'], params['min_area'])
+        
+        return jsonify({
+            'query': params,
+            'source': source,
+            'count': len(pairs),
+            'overlaps': pairs
+        }), 200
+        
+    except Exception as e:
+        current_app.logger.error(f"Error computing rucher overlaps: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+
+def _bulk_upsert(parse_properties, point_only, upsert, layer):
+    """
+    Validate a FeatureCollection and upsert it in one statement.
+    
+    Returns:
+        Flask response: 400 listing every invalid feature (nothing written),
+        or the inserted/updated counts and ids
+    """
+    try:
+        try:
+            rows, errors = validate_batch(
+                request.get_json(silent=True),
+                current_app.config.get('BULK_MAX_FEATURES', 5000),
+                parse_properties,
+                point_only
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        if not errors and layer == 'ruches':
+            errors = missing_rucher_errors(db.session, rows)
+        if errors:
+            return jsonify({'error': 'Invalid features', 'features': errors}), 400
+        
+        result = upsert(db.session, rows)
+        if layer == 'ruchers' and current_app.config.get('RUCHER_OVERLAPS_PRECOMPUTED', False):
+            # Only the pairs of the apiaries written, in the same transaction
+            refresh_overlaps(db.session, result['ids'])
+        db.session.commit()
+        
+        # Once per batch, not per row; the job worker refreshes the stats view
+        invalidate_caches()
+        
+        return jsonify(result), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Error in bulk upsert of {layer}: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+
+@bp.route('/ruches/bulk', methods=['POST'])
+def bulk_upsert_ruches():
+    """
+    Insert or update many hives from a GeoJSON FeatureCollection.
+    
+    JSON Body:
+        GeoJSON FeatureCollection of Point features. A feature with an id
+        (Feature.id or properties.id) replaces that hive; one without is
+        inserted. Properties: name (required), rucher_id, active, queen_info
+    
+    Returns:
+        JSON with inserted and updated counts and the ids written; 400 with
+        the index and error of every invalid feature, in which case nothing
+        is written
+    """
+    return _bulk_upsert(ruche_row, True, upsert_ruches, 'ruches')
+
+
+@bp.route('/ruchers/bulk', methods=['POST'])
+def bulk_upsert_ruchers():
+    """
+    Insert or update many apiaries from a GeoJSON FeatureCollection.
+    
+    JSON Body:
+        GeoJSON FeatureCollection (any geometry type). A feature with an id
+        (Feature.id or properties.id) replaces that apiary; one without is
+        inserted. Properties: name (required), description
+    
+    Returns:
+        JSON with inserted and updated counts and the ids written; 400 with
+        the index and error of every invalid feature, in which case nothing
+        is written
+    """
+    return _bulk_upsert(rucher_row, False, upsert_ruchers, 'ruchers')
+
 # ========================================
 # NEW ROUTES from flask_postgis_api.py
 # ========================================
 
 @bp.route('/ruches/nearby', methods=['GET'])
 def nearby_ruches():
-    """Get hives within radius (in meters)"""
+    """
+    Get hives within radius (in meters).
+    
+    Query Parameters:
+        - lat: Latitude of the center point
+        - lon: Longitude of the center point
+        - radius: Radius in meters (default 1000)
+        - order: 'distance' to return the nearest hives first
+        - limit: Maximum number of hives, at most NEARBY_MAX_LIMIT
+          (default: no limit)
+    
+    Returns:
+        GeoJSON FeatureCollection with distance_meters on each feature
+    """
     try:
-        lat = request.args.get('lat', type=float)
-        lon = request.args.get('lon', type=float)
-        radius = request.args.get('radius', default=1000, type=int)
-        
-        if lat is None or lon is None: 
-            return jsonify({'error':  'lat and lon parameters required'}), 400
+        try:
+            params = nearby_params(request.args, current_app.config.get('NEARBY_MAX_LIMIT', 5000))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
-        valid, result = validate_coordinates(lat, lon)
-        if not valid: 
-            return jsonify({'error': result}), 400
+        index = get_spatial_index()
+        if index is not None:
+            return json_bytes_response(index.nearby_payload(params))
         
-        # Query ruches within radius
-        point = f'SRID=4326;POINT({lon} {lat})'
-        nearby_query = db.session.query(
+        # Query only the columns the serializer needs
+        statement = nearby_statement(
             Ruche,
-            ST_Distance(Ruche.geom, point, use_geography=True).label('distance')
-        ).filter(
-            ST_DWithin(Ruche.geom, point, radius, use_geography=True)
+            NEARBY_COLUMNS,
+            params['lon'],
+            params['lat'],
+            params['radius_meters'],
+            order_by_distance=params['order'] == 'distance',
+            limit=params['limit']
         )
         
-        nearby = nearby_query.all()
-
-        features = []
-        for ruche, distance in nearby:
-            feature = to_geojson(ruche)
-            if feature:
-                feature['properties']['distance_meters'] = float(distance)
-                features.append(feature)
-
+        features = [nearby_feature(row) for row in db.session.execute(statement)]
+        
+        if params['order'] == 'distance':
+            # The index orders by spherical distance; the reported distance is
+            # spheroidal, so settle any near-ties on the reported value.
+            features.sort(key=lambda feature: feature['properties']['distance_meters'])
+        
         return jsonify({
             'type':  'FeatureCollection',
-            'query': {'lat': lat, 'lon': lon, 'radius_meters': radius},
+            'query': params,
             'features': features
         }), 200
-    except Exception as e: 
+    except Exception as e:
         current_app.logger.error(f"Error in nearby query: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
 
+@bp.route('/ruches/density', methods=['GET'])
+def ruches_density():
+    """
+    Get hive counts aggregated into hexagonal or square grid cells.
+    
+    Query Parameters:
+        - bbox: Area to aggregate (min_lon,min_lat,max_lon,max_lat), required
+        - cell_size: Cell size in Web Mercator meters (hexagon edge or square side)
+        - shape: hexagon (default) or square
+        - active: Filter by hive active status (true/false)
+        - measurements: Add per-cell averages of the hives' latest measurements (true/false)
+        - format: geojson (default) or mvt (Mapbox Vector Tile, layer 'density')
+    
+    Returns:
+        GeoJSON FeatureCollection of the non-empty cells with their count, or an MVT layer
+    """
+    try:
+        try:
+            params = density_params(request.args, current_app.config)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        ttl = current_app.config.get('DENSITY_CACHE_TTL', 60)
+        payload = density_payload(db.session, params, ttl)
+        
+        if params['format'] == 'mvt':
+            response = current_app.response_class(payload, mimetype='application/vnd.mapbox-vector-tile')
+        else:
+            response = json_bytes_response(payload)
+        response.headers['Cache-Control'] = f'public, max-age={int(ttl)}'
+        return response
+        
+    except Exception as e:
+        current_app.logger.error(f"Error aggregating hive density: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+
+@bp.route('/interpolate', methods=['GET'])
+def interpolate():
+    """
+    Get an inverse-distance-weighted grid of the hives' latest temperature or humidity.
+    
+    Query Parameters:
+        - var: temperature (default) or humidity
+        - bbox: Area to interpolate (min_lon,min_lat,max_lon,max_lat), required
+        - resolution: Cell size in degrees (default: INTERPOLATION_DEFAULT_CELLS across the bbox)
+        - format: raster (default, float32 cells) or geojson (isobands)
+        - levels: Comma-separated band breakpoints for geojson (default: 10 equal bands)
+    
+    Returns:
+        Row-major little-endian float32 cells from the north-west corner, NaN
+        where no hive is within INTERPOLATION_MAX_DISTANCE, with the grid in
+        X-Raster-* headers; or a GeoJSON FeatureCollection of isobands
+    """
+    try:
+        try:
+            params = interpolation_params(request.args, current_app.config)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        payload, hive_count = interpolation_payload(db.session, params, current_app.config)
+        
+        if params['format'] == 'raster':
+            response = current_app.response_class(payload, mimetype='application/octet-stream')
+            response.headers['X-Raster-Width'] = str(params['width'])
+            response.headers['X-Raster-Height'] = str(params['height'])
+            response.headers['X-Raster-Bounds'] = ','.join(f'{value:.10g}' for value in params['bounds'])
+            response.headers['X-Raster-Dtype'] = 'float32'
+        else:
+            response = json_bytes_response(payload)
+        response.headers['X-Hive-Count'] = str(hive_count)
+        return response
+        
+    except Exception as e:
+        current_app.logger.error(f"Error interpolating hive readings: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+
+@bp.route('/ruches/knn', methods=['POST'])
+def knn_ruches():
+    """
+    Get the k nearest hives to each of many points in a single query.
+    
+    JSON Body:
+        - points: List of {"lat": ..., "lon": ...} objects
+        - k: Number of neighbours per point (default 5)
+        - active: Optional filter on hive active status (true/false)
+    
+    Returns:
+        JSON with one FeatureCollection per input point, ordered by distance
+    """
+    try:
+        try:
+            params = knn_params(
+                request.get_json(silent=True),
+                current_app.config.get('KNN_MAX_POINTS', 1000),
+                current_app.config.get('KNN_MAX_K', 100)
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        index = get_spatial_index()
+        if index is not None:
+            return json_bytes_response(index.knn_payload(params))
+        
+        statement = knn_statement(
+            Ruche,
+            KNN_COLUMNS,
+            params['longitudes'],
+            params['latitudes'],
+            params['k'],
+            params['criteria']
+        )
+        
+        results = knn_results(params['latitudes'], params['longitudes'], db.session.execute(statement))
+        
+        return jsonify({'k': params['k'], 'results': results}), 200
+    except Exception as e:
+        current_app.logger.error(f"Error in KNN query: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+
 @bp.route('/clusters', methods=['GET'])
 def clusters():
     """Get clustered hives using K-means"""
@@ -301,16 +698,17 @@ def clusters():
         if n_clusters < 1:
             return jsonify({'error':  'n_clusters must be >= 1'}), 400
         
-        cluster_data, error = get_clusters(n_clusters)
+        # Too many hives to cluster within the request: 202 with the job to poll
+        if cluster_job_needed():
+            return job_response(submit_job(db.session, 'clusters', {'n_clusters': n_clusters}), 202)
         
-        if error:
-            return jsonify({'error': error}), 400
+        # Identical concurrent requests share one K-means fit
+        try:
+            payload = coalesce(('clusters', n_clusters), lambda: clusters_payload(n_clusters))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
-        return jsonify({
-            'clusters': cluster_data,
-            'total_clusters': len(cluster_data),
-            'n_clusters_requested': n_clusters
-        }), 200
+        return json_bytes_response(payload)
     except Exception as e:
         current_app.logger.error(f"Error in clustering: {str(e)}")
         return jsonify({'error': str(e)}), 500
@@ -334,16 +732,12 @@ def distance():
         if not valid1 or not valid2:
             return jsonify({'error': 'Invalid coordinates'}), 400
         
-        point1 = f'SRID=4326;POINT({lon1} {lat1})'
-        point2 = f'SRID=4326;POINT({lon2} {lat2})'
-        
-        distance_m = db.session.query(
-            ST_Distance(point1, point2, use_geography=True)
-        ).scalar()
+        # Same WGS84 geodesic as PostGIS geography, computed locally
+        distance_m = float(geodesic_distance(lon1, lat1, lon2, lat2))
         
         return jsonify({
-            'distance_meters': float(distance_m),
-            'distance_km': float(distance_m) / 1000,
+            'distance_meters': distance_m,
+            'distance_km': distance_m / 1000,
             'coordinates': {
                 'point1': [lon1, lat1],
                 'point2': [lon2, lat2]
@@ -354,6 +748,83 @@ def distance():
         return jsonify({'error':  str(e)}), 500
 
 
+def _parse_point_array(points, name):
+    """
+    Convert a list of {"lat": ..., "lon": ...} objects to an (N, 2) lon/lat array.
+    
+    Returns:
+        tuple: (array, None) or (None, error message)
+    """
+    if not isinstance(points, list) or not points:
+        return None, f'{name} must be a non-empty list'
+    
+    try:
+        array = np.array([(point['lon'], point['lat']) for point in points], dtype=np.float64)
+    except (KeyError, TypeError, ValueError):
+        return None, f'{name} must be a list of objects with numeric lat and lon'
+    
+    invalid = ~((np.abs(array[:, 0]) <= 180) & (np.abs(array[:, 1]) <= 90))
+    if invalid.any():
+        return None, f'{name}[{int(np.flatnonzero(invalid)[0])}]: coordinates out of range'
+    
+    return array, None
+
+
+@bp.route('/distance/matrix', methods=['POST'])
+def distance_matrix_route():
+    """
+    Calculate the distance matrix between many origins and destinations.
+    
+    JSON Body:
+        - origins: List of {"lat": ..., "lon": ...} objects (N)
+        - destinations: List of {"lat": ..., "lon": ...} objects (M)
+        - method: 'geodesic' (WGS84, default) or 'haversine' (sphere, faster)
+    
+    Returns:
+        JSON with an N x M matrix of distances in meters, streamed by row blocks
+    """
+    try:
+        data = request.get_json(silent=True)
+        
+        if not data:
+            return jsonify({'error': 'JSON body required'}), 400
+        
+        origins, error = _parse_point_array(data.get('origins'), 'origins')
+        if error:
+            return jsonify({'error': error}), 400
+        
+        destinations, error = _parse_point_array(data.get('destinations'), 'destinations')
+        if error:
+            return jsonify({'error': error}), 400
+        
+        method = data.get('method', 'geodesic')
+        if method not in DISTANCE_METHODS:
+            return jsonify({'error': f'method must be one of: {", ".join(DISTANCE_METHODS)}'}), 400
+        
+        max_elements = current_app.config.get('DISTANCE_MATRIX_MAX_ELEMENTS', 1000000)
+        if len(origins) * len(destinations) > max_elements:
+            return jsonify({'error': f'Matrix larger than {max_elements} cells'}), 400
+        
+        chunk_elements = current_app.config.get('DISTANCE_MATRIX_CHUNK_ELEMENTS', 100000)
+        header = {
+            'method': method if method == 'haversine' else f'geodesic ({geodesic_backend()})',
+            'units': 'meters',
+            'shape': [len(origins), len(destinations)]
+        }
+        
+        def generate():
+            yield json.dumps(header)[:-1] + ', "matrix": ['
+            for start, block in iter_distance_matrix(origins, destinations, method, chunk_elements):
+                rows = json.dumps(np.round(block, 3).tolist())[1:-1]
+                yield (', ' if start else '') + rows
+            yield ']}'
+        
+        return current_app.response_class(generate(), mimetype='application/json')
+    except Exception as e:
+        current_app.logger.error(f"Error calculating distance matrix: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+
 @bp.route('/reverse-geocode', methods=['GET'])
 def reverse_geocode():
     """Reverse geocode coordinates to address"""
@@ -369,6 +840,8 @@ def reverse_geocode():
             return jsonify({'error': 'Invalid coordinates'}), 400
         
         try:
+            from geopy.geocoders import Nominatim
+            
             geolocator = Nominatim(user_agent="beetrackapi")
             location = geolocator.reverse(f"{lat}, {lon}")
             
@@ -391,6 +864,44 @@ def reverse_geocode():
         return jsonify({'error': str(e)}), 500
 
 
+def parse_reverse_geocode_job(params):
+    """Parameters of a 'reverse_geocode' job: points, a list of [lat, lon]."""
+    if not current_app.config.get('ENABLE_GEOCODING', False):
+        raise ValueError('Reverse geocoding is disabled (ENABLE_GEOCODING)')
+    
+    points = params.get('points')
+    max_points = current_app.config.get('JOBS_GEOCODE_MAX_POINTS', 1000)
+    if not isinstance(points, list) or not points:
+        raise ValueError('points must be a non-empty list of [lat, lon]')
+    if len(points) > max_points:
+        raise ValueError(f'At most {max_points} points per job')
+    
+    parsed = []
+    for i, point in enumerate(points):
+        if not isinstance(point, (list, tuple)) or len(point) != 2:
+            raise ValueError(f'points[{i}] must be [lat, lon]')
+        try:
+            parsed.append(list(parse_lat_lon(*point)))
+        except ValueError as e:
+            raise ValueError(f'points[{i}]: {str(e)}')
+    return {'points': parsed}
+
+
+@job_kind('reverse_geocode', parse=parse_reverse_geocode_job)
+def reverse_geocode_job(params):
+    """Addresses of many points, JOBS_GEOCODE_DELAY seconds apart (geocoder rate limits)."""
+    from app.utils.geocoding import reverse_geocode as geocode
+    
+    delay = current_app.config.get('JOBS_GEOCODE_DELAY', 1.0)
+    results = []
+    for i, (lat, lon) in enumerate(params['points']):
+        if i and delay > 0:
+            time.sleep(delay)
+        location = geocode(lat, lon)
+        results.append({'lat': lat, 'lon': lon, 'address': location['address'] if location else None})
+    return current_app.json.dumps({'results': results}).encode(), 'application/json'
+
+
 @bp.route('/validate-coords', methods=['POST'])
 def validate_coords():
     """Validate coordinates"""
@@ -1,46 +1,106 @@
 """
 Health check and status endpoints.
 """
-from flask import Blueprint, jsonify, current_app
+from flask import Blueprint, g, jsonify, request, current_app
 from datetime import datetime, timezone
 from sqlalchemy import text
 from app import db
 from app.models import Ruche, Rucher, Measurement, Alert
+from app.utils.cache import TTLCache
+from app.utils.spatial_index import spatial_index
+from app.utils.db_pool import pool_status, pool_statuses
+from app.utils.db_stats import estimated_row_counts, exact_row_counts
+from app.utils.health_probe import readiness
+from app.utils.replicas import replica_keys, replica_router
 
 
 bp = Blueprint('health', __name__, url_prefix='/api')
 
+STATISTICS_MODELS = (Ruche, Rucher, Measurement, Alert)
 
+# Server versions do not change while the process runs; row counts are
+# kept for STATUS_STATISTICS_TTL seconds
+_server_versions = TTLCache(ttl=None)
+_statistics = TTLCache(ttl=30)
+
+
+def server_versions():
+    """
+    Get the PostGIS and PostgreSQL version strings, cached per process.
+    
+    Returns:
+        tuple: (postgis_version, postgresql_version), 'Unknown' if unavailable
+    """
+    versions = _server_versions.get('versions')
+    if versions is not None:
+        return versions
+    
+    try:
+        # Get PostGIS version
+        postgis_version = db.session.execute(text('SELECT PostGIS_Version()')).scalar()
+    except Exception:
+        db.session.rollback()
+        postgis_version = 'Unknown'
+    
+    try:
+        # Get PostgreSQL version
+        pg_version = db.session.execute(text('SELECT version()')).scalar()
+    except Exception:
+        db.session.rollback()
+        pg_version = 'Unknown'
+    
+    versions = (postgis_version, pg_version)
+    if 'Unknown' not in versions:
+        # Failures are retried on the next call
+        _server_versions.set('versions', versions)
+    return versions
+
+
+def invalidate_statistics():
+    """Drop the cached row counts, e.g. after a bulk write."""
+    _statistics.invalidate()
+
+
+@bp.route('/health/live', methods=['GET'])
+def liveness():
+    """
+    Liveness probe: the process is up and serving requests.
+    
+    Never touches the database, so a database outage does not get
+    healthy processes restarted.
+    
+    Returns:
+        JSON with status 'alive'
+    """
+    return jsonify({
+        'status': 'alive',
+        'timestamp': datetime.now(timezone.utc).isoformat()
+    }), 200
+
+
+@bp.route('/health/ready', methods=['GET'])
 @bp.route('/health', methods=['GET'])
 def health_check():
     """
-    Health check endpoint.
+    Readiness probe (also served at /health).
+    
+    Reports the last background database probe (connectivity, replication
+    lag) and the current pool saturation. Answered from memory: it never
+    runs a query or waits for a connection.
     
     Returns:
-        JSON with health status
+        JSON with health status; 503 when not ready
     """
-    try:
-        # Check database connection
-        db.session.execute(text('SELECT 1'))
-        db_status = 'healthy'
-        db_message = 'Database connection successful'
-    except Exception as e:
-        db_status = 'unhealthy'
-        db_message = f'Database connection failed: {str(e)}'
+    result = readiness()
     
     health_status = {
-        'status': 'healthy' if db_status == 'healthy' else 'unhealthy',
+        'status': 'healthy' if result['ready'] else 'unhealthy',
         'timestamp': datetime.now(timezone.utc).isoformat(),
         'api_version': current_app.config.get('API_VERSION', '1.0.0'),
-        'checks': {
-            'database': {
-                'status': db_status,
-                'message': db_message
-            }
-        }
+        'checks': result['checks']
     }
     
-    status_code = 200 if health_status['status'] == 'healthy' else 503
+    status_code = 200 if result['ready'] else 503
     
     return jsonify(health_status), status_code
 
@@ -50,32 +110,32 @@ def status():
     """
     API status endpoint with additional information.
     
+    Row counts are planner estimates unless exact=true is given; both are
+    cached for STATUS_STATISTICS_TTL seconds.
+    
+    Query Parameters:
+        - exact: Count rows exactly with COUNT(*) (true/false)
+    
     Returns:
         JSON with API status and configuration
     """
-    try:
-        # Get PostGIS version
-        result = db.session.execute(text('SELECT PostGIS_Version()'))
-        postgis_version = result.scalar()
-    except Exception:
-        postgis_version = 'Unknown'
+    postgis_version, pg_version = server_versions()
+    
+    exact = request.args.get('exact', '').lower() == 'true'
+    method = 'exact' if exact else 'estimated'
+    _statistics.ttl = current_app.config.get('STATUS_STATISTICS_TTL', 30)
     
     try:
-        # Get PostgreSQL version
-        result = db.session.execute(text('SELECT version()'))
-        pg_version = result.scalar()
-    except Exception:
-        pg_version = 'Unknown'
-
-    try:
-        statistics = {
-            'ruches': Ruche.query.count(),
-            'ruchers': Rucher.query.count(),
-            'measurements': Measurement.query.count(),
-            'alerts': Alert.query.count()
+        count_rows = exact_row_counts if exact else estimated_row_counts
+        statistics = _statistics.get_or_set(method, lambda: count_rows(db.session, STATISTICS_MODELS))
+        statistics_info = {
+            'method': method,
+            'age_seconds': round(_statistics.age(method) or 0.0, 3)
         }
     except Exception:
+        db.session.rollback()
         statistics = 'Could not retrieve statistics'
+        statistics_info = {'method': method}
     
     status_info = {
         'api_title': current_app.config.get('API_TITLE', 'BeeTrack GeoJSON API'),
@@ -83,14 +143,25 @@ def status():
         'timestamp': datetime.now(timezone.utc).isoformat(),
         'database': {
             'postgis_version': postgis_version,
-            'postgresql_version': pg_version
+            'postgresql_version': pg_version,
+            'pool': pool_status(db.engine)
         },
         'statistics': statistics,
+        'statistics_info': statistics_info,
         'features': {
             'geocoding_enabled': current_app.config.get('ENABLE_GEOCODING', False),
             'clustering_enabled': True,
-            'spatial_queries': True
+            'spatial_queries': True,
+            'spatial_index_enabled': current_app.config.get('SPATIAL_INDEX_ENABLED', False)
         }
     }
     
+    if current_app.config.get('SPATIAL_INDEX_ENABLED', False):
+        status_info['spatial_index'] = spatial_index.stats()
+    
+    if replica_keys(db.engines):
+        status_info['database']['read_from'] = g.get('db_replica') or 'primary'
+        status_info['database']['replicas'] = replica_router.snapshot()
+        status_info['database']['pools'] = pool_statuses(db.engines)
+    
     return jsonify(status_info), 200
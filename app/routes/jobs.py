@@ -0,0 +1,89 @@
+"""
+Background job endpoints: submit, poll and fetch results.
+"""
+import os
+from flask import Blueprint, jsonify, request, current_app, send_file
+from app import db
+from app.utils.jobs import get_job as load_job, job_response, parse_job_request, result_file_path, submit_job
+
+bp = Blueprint('jobs', __name__, url_prefix='/api/jobs')
+
+
+@bp.route('', methods=['POST'])
+def create_job():
+    """
+    Submit a background job.
+
+    Body:
+        {"kind": "clusters", "params": {"n_clusters": 8}}
+
+    Returns:
+        202 with the job and its status URL (Location header); an identical
+        pending job is returned instead of queuing another
+    """
+    try:
+        try:
+            kind, params = parse_job_request(request.get_json(silent=True))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        return job_response(submit_job(db.session, kind, params), 202)
+
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Error submitting job: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+
+@bp.route('/<int:job_id>', methods=['GET'])
+def get_job(job_id):
+    """
+    Get the status of a job.
+
+    Returns:
+        JSON with the job; result_url once it succeeded
+    """
+    try:
+        job = load_job(db.session, job_id)
+        if job is None:
+            return jsonify({'error': 'Job not found'}), 404
+
+        return job_response(job)
+
+    except Exception as e:
+        current_app.logger.error(f"Error fetching job {job_id}: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+
+@bp.route('/<int:job_id>/result', methods=['GET'])
+def get_job_result(job_id):
+    """
+    Get the result of a succeeded job.
+
+    Returns:
+        The result payload with its MIME type; 409 while the job is queued or
+        running, or if it failed; 410 if its result file is gone
+    """
+    try:
+        job = load_job(db.session, job_id, with_result=True)
+        if job is None:
+            return jsonify({'error': 'Job not found'}), 404
+
+        if job.status != 'succeeded':
+            return jsonify({
+                'error': job.error if job.status == 'failed' else 'Job has not finished',
+                'status': job.status
+            }), 409
+
+        if job.result_path:
+            # Streamed from the file the worker wrote (JOBS_RESULT_DIR is shared)
+            path = result_file_path(job.result_path)
+            if not os.path.exists(path):
+                return jsonify({'error': 'Job result is no longer available'}), 410
+            return send_file(path, mimetype=job.result_type)
+
+        return current_app.response_class(job.result, mimetype=job.result_type)
+
+    except Exception as e:
+        current_app.logger.error(f"Error fetching job {job_id} result: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
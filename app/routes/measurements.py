@@ -0,0 +1,82 @@
+"""
+Sensor measurement ingestion endpoints.
+"""
+from datetime import datetime, timezone
+from flask import Blueprint, jsonify, request, current_app
+from app import db
+from app.utils.anomaly import process_batch
+from app.utils.geofence import extract_fixes, geofence_engine
+from app.utils.measurements import (
+    anomaly_alerts, geofence_alerts, insert_alerts, insert_measurements, missing_ruche_errors,
+    parse_measurement_batch
+)
+
+bp = Blueprint('measurements', __name__, url_prefix='/api/measurements')
+
+
+@bp.route('', methods=['POST'])
+def ingest_measurements():
+    """
+    Ingest a batch of sensor measurements.
+
+    GPS fixes in raw.gps are checked against the geofence of each watched
+    hive in one vectorized pass; displaced hives raise an Alert. Hives with
+    an anomaly rule have their time series statistics updated, and outliers
+    or drifts raise an Alert.
+
+    JSON Body:
+        {"measurements": [{"ruche_id", "recorded_at", "weight", "temperature",
+        "humidity", "signal", "raw"}, ...]}; only ruche_id is required
+
+    Returns:
+        JSON with the number of measurements inserted and the geofence and
+        anomaly alerts raised; 400 with the index and error of every invalid
+        measurement, in which case nothing is written
+    """
+    try:
+        try:
+            rows, errors = parse_measurement_batch(
+                request.get_json(silent=True),
+                current_app.config.get('MEASUREMENTS_MAX_BATCH', 10000)
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        if not errors:
+            errors = missing_ruche_errors(db.session, rows)
+        if errors:
+            return jsonify({'error': 'Invalid measurements', 'measurements': errors}), 400
+
+        insert_measurements(db.session, rows)
+
+        now = datetime.now(timezone.utc)
+        alerts = []
+        breaches = []
+        if current_app.config.get('GEOFENCE_ENABLED', True):
+            longitudes, latitudes = extract_fixes([row['raw'] for row in rows])
+            breaches = geofence_engine.check(
+                db.session, current_app.config, [row['ruche_id'] for row in rows], longitudes, latitudes,
+                now=now.timestamp()
+            )
+            alerts += geofence_alerts(breaches, rows, now)
+        if current_app.config.get('ANOMALY_ENABLED', True):
+            # State checkpoint is written in this transaction
+            alerts += anomaly_alerts(process_batch(db.session, rows, current_app.config), rows, now)
+        insert_alerts(db.session, alerts)
+
+        db.session.commit()
+        # Only alerts that were written start the cooldown
+        geofence_engine.record_alerts(breaches, now.timestamp())
+
+        return jsonify({
+            'inserted': len(rows),
+            'alerts': [
+                {'rule_id': alert['rule_id'], 'ruche_id': alert['ruche_id'], **alert['payload']}
+                for alert in alerts
+            ]
+        }), 201
+
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Error ingesting measurements: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
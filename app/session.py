@@ -0,0 +1,25 @@
+"""
+Session class of db.session, routing read-only requests to a replica.
+
+Kept out of app.utils, which imports db itself: the class is needed before
+db is created.
+"""
+from flask import g, has_request_context
+from flask_sqlalchemy.session import Session
+
+
+class RoutingSession(Session):
+    """
+    Session sending the statements of a read-only request to its replica.
+
+    app.utils.replicas picks the replica bind key for the request and stores
+    it in g.db_replica. Requests without one, work outside requests and
+    flushes use the bind the models declare (the primary).
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and has_request_context():
+            key = g.get('db_replica')
+            if key is not None:
+                return self._db.engines[key]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
@@ -0,0 +1,493 @@
+"""
+Incremental anomaly detection over hive time series.
+
+Hives with an active 'anomaly' AlertRule are monitored per metric with a
+small additive seasonal model, updated in O(1) per measurement:
+
+- level: EWMA of the deseasonalized value (ANOMALY_ALPHA), and variance,
+  the EWMA of the squared residuals
+- season: 24 hour-of-day offsets from the level (ANOMALY_SEASON_ALPHA)
+- trend: EWMA of the level change per hour (ANOMALY_TREND_ALPHA), with
+  trend_baseline and trend_variance, its slow EWMA mean and variance
+  (ANOMALY_SLOW_ALPHA)
+
+Each measurement is scored against the state. An outlier is a residual of
+more than z_threshold standard deviations from level + season. A drift
+(gradual weight loss from robbing, say) is a trend more than
+drift_threshold standard deviations away from the series' usual trend, so
+slow seasonal changes such as a nectar flow are not flagged. Residuals are
+winsorized at z_threshold before updating the level, and deviations at
+ROBUST_BOUND before updating the variances, so an anomaly does not inflate
+the variances it is measured against.
+
+The state of a batch lives in NumPy arrays, one row per (hive, metric),
+and is updated for all hives at once. Measurements of the same hive in a
+batch are applied in order, one round per measurement. After each batch
+the rows are written back to anomaly_states, in the ingestion transaction
+and under row locks, so workers share one state and restarts resume from
+the checkpoint.
+"""
+import math
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import DateTime, Float, Integer, LargeBinary, Text, bindparam, text
+from sqlalchemy.dialects.postgresql import ARRAY
+
+RULE_TYPE = 'anomaly'
+# Measurement columns that can be monitored
+MEASUREMENT_METRICS = ('weight', 'temperature', 'humidity', 'signal')
+SEASON_BUCKETS = 24
+SEASON_SECONDS = 3600
+# Deviations beyond this many standard deviations update the variances as
+# if they were this large (Huber), so anomalies do not mask themselves
+ROBUST_BOUND = 3.0
+
+RULES_SQL = text("""
+    SELECT DISTINCT ON (ruche_id) id, ruche_id, params
+    FROM alert_rules
+    WHERE active AND rule_type = :rule_type AND ruche_id = ANY(:ids)
+    ORDER BY ruche_id, id
+""").bindparams(bindparam('ids', type_=ARRAY(Integer)))
+
+STATES_SQL = text("""
+    SELECT ruche_id, metric, count, level, variance, trend, trend_baseline, trend_variance,
+           season, last_recorded_at, last_alert_at
+    FROM anomaly_states
+    WHERE ruche_id = ANY(:ids)
+    ORDER BY ruche_id, metric
+    FOR UPDATE
+""").bindparams(bindparam('ids', type_=ARRAY(Integer)))
+
+SAVE_SQL = text("""
+    INSERT INTO anomaly_states (ruche_id, metric, count, level, variance, trend, trend_baseline,
+                                trend_variance, season, last_recorded_at, last_alert_at, updated_at)
+    SELECT s.*, now() AT TIME ZONE 'utc'
+    FROM unnest(:ruche_ids, :metrics, :counts, :level, :variance, :trend, :trend_baseline,
+                :trend_variance, :season, :last_recorded_at, :last_alert_at) AS s
+    ON CONFLICT (ruche_id, metric) DO UPDATE SET
+        count = EXCLUDED.count,
+        level = EXCLUDED.level,
+        variance = EXCLUDED.variance,
+        trend = EXCLUDED.trend,
+        trend_baseline = EXCLUDED.trend_baseline,
+        trend_variance = EXCLUDED.trend_variance,
+        season = EXCLUDED.season,
+        last_recorded_at = EXCLUDED.last_recorded_at,
+        last_alert_at = EXCLUDED.last_alert_at,
+        updated_at = EXCLUDED.updated_at
+""").bindparams(
+    bindparam('ruche_ids', type_=ARRAY(Integer)),
+    bindparam('metrics', type_=ARRAY(Text)),
+    bindparam('counts', type_=ARRAY(Integer)),
+    *(bindparam(name, type_=ARRAY(Float))
+      for name in ('level', 'variance', 'trend', 'trend_baseline', 'trend_variance')),
+    bindparam('season', type_=ARRAY(LargeBinary)),
+    bindparam('last_recorded_at', type_=ARRAY(DateTime)),
+    bindparam('last_alert_at', type_=ARRAY(DateTime)),
+)
+
+
+def model_params(config) -> Dict:
+    """Smoothing and warm-up settings of the model."""
+    return {
+        'alpha': config.get('ANOMALY_ALPHA', 0.1),
+        'trend_alpha': config.get('ANOMALY_TREND_ALPHA', 0.04),
+        'slow_alpha': config.get('ANOMALY_SLOW_ALPHA', 0.005),
+        'season_alpha': config.get('ANOMALY_SEASON_ALPHA', 0.05),
+        'min_samples': config.get('ANOMALY_MIN_SAMPLES', 48),
+    }
+
+
+def _epoch(value: Optional[datetime]) -> float:
+    """Epoch seconds of a (naive UTC or aware) datetime, NaN for None."""
+    if value is None:
+        return math.nan
+    return value.replace(tzinfo=value.tzinfo or timezone.utc).timestamp()
+
+
+def _datetime(value: float) -> Optional[datetime]:
+    """Naive UTC datetime of epoch seconds, None for NaN."""
+    if math.isnan(value):
+        return None
+    return datetime.fromtimestamp(value, timezone.utc).replace(tzinfo=None)
+
+
+class SeriesState:
+    """
+    Model state of many (hive, metric) series as parallel arrays.
+
+    Rows are sorted by key (see series_key). Thresholds and rule ids are
+    per row so that rules can override them.
+    """
+
+    def __init__(self, n: int, n_metrics: int):
+        self.n_metrics = n_metrics
+        self.keys = np.zeros(n, dtype=np.int64)
+        self.rule_ids = np.zeros(n, dtype=np.int64)
+        self.count = np.zeros(n, dtype=np.int64)
+        self.level = np.zeros(n, dtype=np.float64)
+        self.variance = np.zeros(n, dtype=np.float64)
+        self.trend = np.zeros(n, dtype=np.float64)
+        self.trend_baseline = np.zeros(n, dtype=np.float64)
+        self.trend_variance = np.zeros(n, dtype=np.float64)
+        self.season = np.zeros((n, SEASON_BUCKETS), dtype=np.float64)
+        self.last_at = np.full(n, -np.inf, dtype=np.float64)
+        self.last_alert = np.full(n, np.nan, dtype=np.float64)
+        self.z_threshold = np.zeros(n, dtype=np.float64)
+        self.drift_threshold = np.zeros(n, dtype=np.float64)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def ruche_ids(self) -> np.ndarray:
+        return self.keys // self.n_metrics
+
+    def metric_indices(self) -> np.ndarray:
+        return self.keys % self.n_metrics
+
+    def locate(self, keys: np.ndarray):
+        """Positions of series keys, and which of them are in the state."""
+        if not len(self.keys):
+            return np.zeros(len(keys), dtype=np.intp), np.zeros(len(keys), dtype=bool)
+        positions = np.minimum(np.searchsorted(self.keys, keys), len(self.keys) - 1)
+        return positions, self.keys[positions] == keys
+
+
+def series_key(ruche_ids, metric_indices, n_metrics: int) -> np.ndarray:
+    """Integer key of (hive, metric) series, ordered by hive then metric."""
+    return np.asarray(ruche_ids, dtype=np.int64) * n_metrics + np.asarray(metric_indices, dtype=np.int64)
+
+
+def update(state: SeriesState, positions: np.ndarray, times: np.ndarray, values: np.ndarray,
+           params: Dict) -> Dict[str, np.ndarray]:
+    """
+    Score observations, then fold them into the state, in time order per series.
+
+    Args:
+        state: State to update in place
+        positions: State row of each observation
+        times: Epoch seconds of each observation
+        values: Observed values
+        params: Result of model_params
+
+    Returns:
+        dict of arrays aligned with the observations: z (residual in standard
+        deviations), drift (trend minus its baseline, in standard deviations),
+        expected (level + season) and scored (past warm-up)
+    """
+    n = len(positions)
+    z = np.zeros(n)
+    drift = np.zeros(n)
+    expected = np.full(n, np.nan)
+    scored = np.zeros(n, dtype=bool)
+    if not n:
+        return {'z': z, 'drift': drift, 'expected': expected, 'scored': scored}
+
+    alpha, trend_alpha = params['alpha'], params['trend_alpha']
+    slow_alpha, season_alpha = params['slow_alpha'], params['season_alpha']
+
+    # Rank of each observation within its series, in time order
+    order = np.lexsort((times, positions))
+    sorted_positions = positions[order]
+    starts = np.r_[True, sorted_positions[1:] != sorted_positions[:-1]]
+    group_start = np.maximum.accumulate(np.where(starts, np.arange(n), 0))
+    rank = np.empty(n, dtype=np.int64)
+    rank[order] = np.arange(n) - group_start
+
+    by_rank = np.argsort(rank, kind='stable')
+    bounds = np.searchsorted(rank[by_rank], np.arange(int(rank.max()) + 2))
+    for r in range(len(bounds) - 1):
+        obs = by_rank[bounds[r]:bounds[r + 1]]
+        # Out-of-order measurements do not rewind the state
+        obs = obs[times[obs] > state.last_at[positions[obs]]]
+        i = positions[obs]
+
+        first = state.count[i] == 0
+        j = i[first]
+        state.level[j] = values[obs[first]]
+        state.variance[j] = 0.0
+        state.trend[j] = 0.0
+        state.trend_baseline[j] = 0.0
+        state.trend_variance[j] = 0.0
+        state.season[j] = 0.0
+
+        o, k = obs[~first], i[~first]
+        bucket = np.floor(times[o] / SEASON_SECONDS).astype(np.int64) % SEASON_BUCKETS
+        s, level, count = state.season[k, bucket], state.level[k], state.count[k]
+        std = np.sqrt(state.variance[k])
+        residual = values[o] - (level + s)
+        warm = count >= params['min_samples']
+
+        # Winsorize once warm, so an outlier barely moves the model
+        bound = np.where(warm & (std > 0), state.z_threshold[k] * std, np.inf)
+        clipped = np.clip(residual, -bound, bound)
+        new_level = level + alpha * clipped
+
+        # Level change per hour, smoothed, against the series' own baseline
+        hours = np.maximum((times[o] - state.last_at[k]) / SEASON_SECONDS, 1 / 60)
+        trend = state.trend[k] + trend_alpha * ((new_level - level) / hours - state.trend[k])
+        deviation = trend - state.trend_baseline[k]
+        # trend_variance starts at 0: correct the EWMA bias of early samples
+        with np.errstate(divide='ignore', invalid='ignore'):
+            trend_std = np.sqrt(state.trend_variance[k] / (1 - (1 - slow_alpha) ** (count - 1)))
+        trend_std = np.nan_to_num(trend_std)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            z[o] = np.where(std > 0, residual / std, 0.0)
+            drift[o] = np.where(trend_std > 0, deviation / trend_std, 0.0)
+        expected[o] = level + s
+        scored[o] = warm
+
+        bound = np.where(warm & (std > 0), ROBUST_BOUND * std, np.inf)
+        state.variance[k] = (1 - alpha) * state.variance[k] + alpha * np.minimum(clipped ** 2, bound ** 2)
+        bound = np.where(warm & (trend_std > 0), ROBUST_BOUND * trend_std, np.inf)
+        deviation = np.clip(deviation, -bound, bound)
+
+        state.level[k] = new_level
+        state.season[k, bucket] = s + season_alpha * (level + s + clipped - new_level - s)
+        state.trend[k] = trend
+        state.trend_baseline[k] += slow_alpha * deviation
+        state.trend_variance[k] = (1 - slow_alpha) * state.trend_variance[k] + slow_alpha * deviation ** 2
+
+        state.count[i] += 1
+        state.last_at[i] = times[obs]
+
+    return {'z': z, 'drift': drift, 'expected': expected, 'scored': scored}
+
+
+def metrics(config) -> Tuple[str, ...]:
+    """Measurement columns monitored (ANOMALY_METRICS), unknown names dropped."""
+    configured = config.get('ANOMALY_METRICS', ('weight', 'temperature', 'humidity'))
+    return tuple(metric.strip() for metric in configured if metric.strip() in MEASUREMENT_METRICS)
+
+
+def _rule_metrics(params, monitored: Tuple[str, ...]) -> List[int]:
+    wanted = params.get('metrics') if isinstance(params, dict) else None
+    if not isinstance(wanted, list):
+        return list(range(len(monitored)))
+    return [i for i, metric in enumerate(monitored) if metric in wanted]
+
+
+def _rule_threshold(params, name: str, default: float) -> float:
+    value = params.get(name, default) if isinstance(params, dict) else default
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return default
+    return value if math.isfinite(value) and value > 0 else default
+
+
+def build_state(rules, checkpoints, config) -> SeriesState:
+    """
+    State of the series of the given rules, resumed from their checkpoints.
+
+    Args:
+        rules: RULES_SQL rows (id, ruche_id, params)
+        checkpoints: STATES_SQL rows
+        config: Application config (ANOMALY_* settings)
+
+    Returns:
+        SeriesState with one row per monitored (hive, metric)
+    """
+    monitored = metrics(config)
+    n_metrics = len(monitored)
+    series = []
+    for rule in rules:
+        for metric_index in _rule_metrics(rule.params, monitored):
+            series.append((series_key(rule.ruche_id, metric_index, n_metrics).item(), rule))
+    series.sort(key=lambda item: item[0])
+
+    state = SeriesState(len(series), n_metrics)
+    for row, (key, rule) in enumerate(series):
+        state.keys[row] = key
+        state.rule_ids[row] = rule.id
+        state.z_threshold[row] = _rule_threshold(rule.params, 'z_threshold', config.get('ANOMALY_Z_THRESHOLD', 6.0))
+        state.drift_threshold[row] = _rule_threshold(
+            rule.params, 'drift_threshold', config.get('ANOMALY_DRIFT_THRESHOLD', 6.0)
+        )
+
+    index = {metric: i for i, metric in enumerate(monitored)}
+    for checkpoint in checkpoints:
+        if checkpoint.metric not in index:
+            continue
+        key = series_key(checkpoint.ruche_id, index[checkpoint.metric], n_metrics)
+        positions, found = state.locate(np.atleast_1d(key))
+        if not found[0]:
+            continue
+        row = positions[0]
+        state.count[row] = checkpoint.count
+        state.level[row] = checkpoint.level
+        state.variance[row] = checkpoint.variance
+        state.trend[row] = checkpoint.trend
+        state.trend_baseline[row] = checkpoint.trend_baseline
+        state.trend_variance[row] = checkpoint.trend_variance
+        state.season[row] = np.frombuffer(checkpoint.season, dtype='<f8', count=SEASON_BUCKETS)
+        state.last_at[row] = _epoch(checkpoint.last_recorded_at)
+        state.last_alert[row] = _epoch(checkpoint.last_alert_at)
+    return state
+
+
+def observations(state: SeriesState, rows: List[Dict], monitored: Tuple[str, ...]):
+    """
+    Observations of the monitored series in a batch of measurement rows.
+
+    Returns:
+        tuple: (positions, times, values, row_indices) arrays
+    """
+    ruche_ids = np.fromiter((row['ruche_id'] for row in rows), dtype=np.int64, count=len(rows))
+    times = np.fromiter((_epoch(row['recorded_at']) for row in rows), dtype=np.float64, count=len(rows))
+
+    parts = []
+    for metric_index, metric in enumerate(monitored):
+        values = np.fromiter(
+            (math.nan if row.get(metric) is None else row[metric] for row in rows), dtype=np.float64, count=len(rows)
+        )
+        positions, found = state.locate(series_key(ruche_ids, metric_index, state.n_metrics))
+        selected = np.flatnonzero(found & ~np.isnan(values))
+        parts.append((positions[selected], times[selected], values[selected], selected))
+
+    return tuple(np.concatenate(arrays) for arrays in zip(*parts))
+
+
+def detect(state: SeriesState, rows: List[Dict], config, now: Optional[float] = None,
+           alert: bool = True) -> List[Dict]:
+    """
+    Fold a batch into the state and report anomalous series.
+
+    At most one anomaly per series and batch (the most severe), and one per
+    ANOMALY_ALERT_COOLDOWN seconds.
+
+    Args:
+        state: State of the batch's series, updated in place
+        rows: Measurement rows (ruche_id, recorded_at and metric values)
+        config: Application config
+        now: Epoch seconds of the check (default: current time)
+        alert: Whether to report anomalies (False: only update the state)
+
+    Returns:
+        list: rule_id, ruche_id, row (index into rows), metric, kind
+        ('outlier' or 'drift'), value, expected, z and drift per anomaly
+    """
+    if not len(state) or not rows:
+        return []
+    monitored = metrics(config)
+    positions, times, values, row_indices = observations(state, rows, monitored)
+    result = update(state, positions, times, values, model_params(config))
+    if not alert:
+        return []
+
+    outlier = np.abs(result['z']) / state.z_threshold[positions]
+    drifting = np.abs(result['drift']) / state.drift_threshold[positions]
+    severity = np.where(result['scored'], np.maximum(outlier, drifting), 0.0)
+    flagged = np.flatnonzero(severity > 1)
+    if not len(flagged):
+        return []
+
+    # Most severe observation of each series
+    order = flagged[np.lexsort((-severity[flagged], positions[flagged]))]
+    order = order[np.r_[True, positions[order][1:] != positions[order][:-1]]]
+
+    now = time.time() if now is None else now
+    where = positions[order]
+    due = ~(now - state.last_alert[where] < config.get('ANOMALY_ALERT_COOLDOWN', 21600))
+    order = order[due]
+    state.last_alert[positions[order]] = now
+
+    metric_indices = state.metric_indices()
+    ruche_ids = state.ruche_ids()
+    return [
+        {
+            'rule_id': int(state.rule_ids[p]),
+            'ruche_id': int(ruche_ids[p]),
+            'row': int(row_indices[o]),
+            'metric': monitored[metric_indices[p]],
+            'kind': 'outlier' if outlier[o] >= drifting[o] else 'drift',
+            'value': float(values[o]),
+            'expected': float(result['expected'][o]),
+            'z': float(result['z'][o]),
+            'drift': float(result['drift'][o])
+        }
+        for o, p in zip(order.tolist(), positions[order].tolist())
+    ]
+
+
+def load_state(session, ruche_ids: Sequence[int], config) -> SeriesState:
+    """Lock and load the checkpointed state of the hives' monitored series."""
+    ids = sorted(set(ruche_ids))
+    rules = session.execute(RULES_SQL, {'rule_type': RULE_TYPE, 'ids': ids}).all() if ids else []
+    if not rules:
+        return SeriesState(0, len(metrics(config)))
+    checkpoints = session.execute(STATES_SQL, {'ids': [rule.ruche_id for rule in rules]}).all()
+    return build_state(rules, checkpoints, config)
+
+
+def save_state(session, state: SeriesState, monitored: Tuple[str, ...]):
+    """Checkpoint every series of the state that has seen a measurement. Does not commit."""
+    rows = np.flatnonzero(state.count > 0)
+    if not len(rows):
+        return
+    session.execute(SAVE_SQL, {
+        'ruche_ids': state.ruche_ids()[rows].tolist(),
+        'metrics': [monitored[i] for i in state.metric_indices()[rows].tolist()],
+        'counts': state.count[rows].tolist(),
+        'level': state.level[rows].tolist(),
+        'variance': state.variance[rows].tolist(),
+        'trend': state.trend[rows].tolist(),
+        'trend_baseline': state.trend_baseline[rows].tolist(),
+        'trend_variance': state.trend_variance[rows].tolist(),
+        'season': [state.season[row].astype('<f8').tobytes() for row in rows.tolist()],
+        'last_recorded_at': [_datetime(value) for value in state.last_at[rows].tolist()],
+        'last_alert_at': [_datetime(value) for value in state.last_alert[rows].tolist()],
+    })
+
+
+def process_batch(session, rows: List[Dict], config, alert: bool = True) -> List[Dict]:
+    """
+    Run anomaly detection on an ingested batch and checkpoint the state.
+
+    Args:
+        session: SQLAlchemy session, in the ingestion transaction
+        rows: Measurement rows
+        config: Application config
+        alert: Whether to report anomalies (False when replaying history)
+
+    Returns:
+        list: Anomalies as returned by detect
+    """
+    state = load_state(session, [row['ruche_id'] for row in rows], config)
+    if not len(state):
+        return []
+    anomalies = detect(state, rows, config, alert=alert)
+    save_state(session, state, metrics(config))
+    return anomalies
+
+
+REPLAY_SQL = """
+    SELECT m.ruche_id, m.recorded_at, {columns}
+    FROM measurements m
+    WHERE m.ruche_id IN (SELECT ruche_id FROM alert_rules WHERE active AND rule_type = :rule_type)
+    ORDER BY m.recorded_at, m.id
+"""
+
+
+def replay_history(session, config, chunk_size: int = 50000) -> int:
+    """
+    Rebuild the checkpoints from the stored measurements, without alerts.
+
+    Only needed once, for hives that had measurements before their anomaly
+    rule existed; ingestion keeps the checkpoints current afterwards.
+
+    Returns:
+        int: Number of measurements replayed
+    """
+    session.execute(text('DELETE FROM anomaly_states'))
+    statement = text(REPLAY_SQL.format(columns=', '.join(f'm.{metric}' for metric in metrics(config))))
+    result = session.execute(statement.execution_options(yield_per=chunk_size), {'rule_type': RULE_TYPE})
+    replayed = 0
+    for chunk in result.mappings().partitions(chunk_size):
+        process_batch(session, [dict(row) for row in chunk], config, alert=False)
+        replayed += len(chunk)
+    return replayed
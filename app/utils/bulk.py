@@ -0,0 +1,301 @@
+"""
+Bulk upsert of hives and apiaries from GeoJSON FeatureCollections.
+
+A batch is validated as a whole before anything is written: geometries are
+parsed with one vectorized shapely.from_geojson call and their coordinates
+checked against validate_coordinates' ranges with NumPy. Valid batches are
+written with a single INSERT ... SELECT FROM unnest(...) ON CONFLICT (id)
+statement, so the number of statements does not grow with the batch.
+"""
+import json
+from typing import Dict, List, Tuple
+
+import numpy as np
+import shapely
+from sqlalchemy import Boolean, Integer, Text, bindparam, text
+from sqlalchemy.dialects.postgresql import ARRAY
+
+from app.utils.spatial import validate_coordinate_arrays
+
+UPSERT_RUCHES_SQL = text("""
+    INSERT INTO ruches (id, name, rucher_id, queen_info, active, geom, created_at)
+    SELECT COALESCE(f.id, nextval(pg_get_serial_sequence('ruches', 'id'))),
+           f.name, f.rucher_id, f.queen_info::json, f.active,
+           ST_SetSRID(ST_GeomFromGeoJSON(f.geometry), 4326), now() AT TIME ZONE 'utc'
+    FROM unnest(:ids, :names, :rucher_ids, :queen_infos, :actives, :geometries)
+         AS f(id, name, rucher_id, queen_info, active, geometry)
+    ON CONFLICT (id) DO UPDATE SET
+        name = EXCLUDED.name,
+        rucher_id = EXCLUDED.rucher_id,
+        queen_info = EXCLUDED.queen_info,
+        active = EXCLUDED.active,
+        geom = EXCLUDED.geom
+    RETURNING id, (xmax = 0) AS inserted
+""").bindparams(
+    bindparam('ids', type_=ARRAY(Integer)),
+    bindparam('names', type_=ARRAY(Text)),
+    bindparam('rucher_ids', type_=ARRAY(Integer)),
+    bindparam('queen_infos', type_=ARRAY(Text)),
+    bindparam('actives', type_=ARRAY(Boolean)),
+    bindparam('geometries', type_=ARRAY(Text)),
+)
+
+UPSERT_RUCHERS_SQL = text("""
+    INSERT INTO ruchers (id, name, description, geom, created_at)
+    SELECT COALESCE(f.id, nextval(pg_get_serial_sequence('ruchers', 'id'))),
+           f.name, f.description,
+           ST_SetSRID(ST_GeomFromGeoJSON(f.geometry), 4326), now() AT TIME ZONE 'utc'
+    FROM unnest(:ids, :names, :descriptions, :geometries) AS f(id, name, description, geometry)
+    ON CONFLICT (id) DO UPDATE SET
+        name = EXCLUDED.name,
+        description = EXCLUDED.description,
+        geom = EXCLUDED.geom
+    RETURNING id, (xmax = 0) AS inserted
+""").bindparams(
+    bindparam('ids', type_=ARRAY(Integer)),
+    bindparam('names', type_=ARRAY(Text)),
+    bindparam('descriptions', type_=ARRAY(Text)),
+    bindparam('geometries', type_=ARRAY(Text)),
+)
+
+EXISTING_RUCHERS_SQL = text('SELECT id FROM ruchers WHERE id = ANY(:ids)').bindparams(
+    bindparam('ids', type_=ARRAY(Integer))
+)
+
+# Explicit ids may be above the sequence; move it past them
+SYNC_SEQUENCE_SQL = """
+    SELECT setval(pg_get_serial_sequence('{table}', 'id'),
+                  GREATEST((SELECT max(id) FROM {table}), nextval(pg_get_serial_sequence('{table}', 'id'))))
+"""
+
+
+def _optional_int(value, name):
+    if value is None:
+        return None
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise ValueError(f'{name} must be an integer')
+    return value
+
+
+def _feature_id(feature):
+    """The feature's id, from the Feature itself or its properties."""
+    properties = feature.get('properties') or {}
+    return _optional_int(feature.get('id', properties.get('id')), 'id')
+
+
+def validate_geometries(geometries: List, point_only: bool) -> Dict[int, str]:
+    """
+    Validate many GeoJSON geometries in one pass.
+
+    Args:
+        geometries: GeoJSON geometry objects
+        point_only: Whether only Point geometries are accepted
+
+    Returns:
+        dict: Index of each invalid geometry to its error message
+    """
+    errors = {}
+    encoded = []
+    for i, geometry in enumerate(geometries):
+        if not isinstance(geometry, dict) or 'type' not in geometry or 'coordinates' not in geometry:
+            errors[i] = 'geometry must be a GeoJSON geometry object'
+            encoded.append(None)
+        else:
+            encoded.append(json.dumps(geometry))
+
+    shapes = shapely.from_geojson(np.array(encoded, dtype=object), on_invalid='ignore')
+    for i in np.flatnonzero(shapely.is_missing(shapes)).tolist():
+        errors.setdefault(i, 'geometry could not be parsed')
+
+    if point_only:
+        not_points = (shapely.get_type_id(shapes) != 0) & ~shapely.is_missing(shapes)
+        for i in np.flatnonzero(not_points).tolist():
+            errors[i] = 'geometry must be a Point'
+
+    empty = shapely.is_empty(shapes)
+    for i in np.flatnonzero(empty).tolist():
+        errors.setdefault(i, 'geometry is empty')
+
+    coordinates, owners = shapely.get_coordinates(shapes, return_index=True)
+    invalid = ~validate_coordinate_arrays(coordinates[:, 0], coordinates[:, 1])
+    for i in np.unique(owners[invalid]).tolist():
+        errors.setdefault(i, 'coordinates out of range')
+
+    return errors
+
+
+def parse_feature_collection(data, max_features: int, parse_properties) -> Tuple[List[Dict], List[Dict]]:
+    """
+    Parse and validate a FeatureCollection for a bulk upsert.
+
+    Args:
+        data: Decoded JSON body
+        max_features: Maximum number of features accepted
+        parse_properties: Function (feature, properties) -> row dict, raising
+            ValueError for invalid properties
+
+    Returns:
+        tuple: (rows, errors); errors lists {'index', 'error'} per invalid feature
+
+    Raises:
+        ValueError: If the body is not a FeatureCollection within limits
+    """
+    if not isinstance(data, dict) or data.get('type') != 'FeatureCollection':
+        raise ValueError('Body must be a GeoJSON FeatureCollection')
+    features = data.get('features')
+    if not isinstance(features, list) or not features:
+        raise ValueError('features must be a non-empty list')
+    if len(features) > max_features:
+        raise ValueError(f'At most {max_features} features per request')
+
+    rows, errors = [], {}
+    for i, feature in enumerate(features):
+        if not isinstance(feature, dict) or feature.get('type') != 'Feature':
+            errors[i] = 'must be a GeoJSON Feature'
+            rows.append(None)
+            continue
+        try:
+            properties = feature.get('properties') or {}
+            if not isinstance(properties, dict):
+                raise ValueError('properties must be an object')
+            row = parse_properties(feature, properties)
+            row['id'] = _feature_id(feature)
+        except ValueError as e:
+            errors[i] = str(e)
+            row = None
+        rows.append(row)
+
+    return rows, errors
+
+
+def _name(properties):
+    name = properties.get('name')
+    if not isinstance(name, str) or not name.strip():
+        raise ValueError('properties.name is required')
+    if len(name) > 255:
+        raise ValueError('properties.name must be at most 255 characters')
+    return name
+
+
+def ruche_row(feature, properties) -> Dict:
+    """Row values of a hive Feature."""
+    name = _name(properties)
+    active = properties.get('active', True)
+    if not isinstance(active, bool):
+        raise ValueError('properties.active must be true or false')
+    queen_info = properties.get('queen_info')
+    if queen_info is not None and not isinstance(queen_info, dict):
+        raise ValueError('properties.queen_info must be an object')
+    return {
+        'name': name,
+        'rucher_id': _optional_int(properties.get('rucher_id'), 'properties.rucher_id'),
+        'queen_info': json.dumps(queen_info) if queen_info is not None else None,
+        'active': active,
+        'geometry': feature.get('geometry'),
+    }
+
+
+def rucher_row(feature, properties) -> Dict:
+    """Row values of an apiary Feature."""
+    name = _name(properties)
+    description = properties.get('description')
+    if description is not None and not isinstance(description, str):
+        raise ValueError('properties.description must be a string')
+    return {'name': name, 'description': description, 'geometry': feature.get('geometry')}
+
+
+def validate_batch(data, max_features: int, parse_properties, point_only: bool) -> Tuple[List[Dict], List[Dict]]:
+    """
+    Parse a FeatureCollection and validate every feature, geometry included.
+
+    Returns:
+        tuple: (rows, errors); rows are only meaningful when errors is empty
+
+    Raises:
+        ValueError: If the body is not a FeatureCollection within limits
+    """
+    rows, errors = parse_feature_collection(data, max_features, parse_properties)
+    geometries = [row['geometry'] if row is not None else None for row in rows]
+    for i, message in validate_geometries(geometries, point_only).items():
+        if rows[i] is not None:
+            errors.setdefault(i, message)
+
+    ids = [row['id'] for row in rows if row is not None and row['id'] is not None]
+    if len(ids) != len(set(ids)):
+        seen = set()
+        for i, row in enumerate(rows):
+            if row is not None and row['id'] is not None:
+                if row['id'] in seen:
+                    errors.setdefault(i, f"duplicate id {row['id']} in batch")
+                seen.add(row['id'])
+
+    return rows, [{'index': i, 'error': errors[i]} for i in sorted(errors)]
+
+
+def missing_rucher_errors(session, rows: List[Dict]) -> List[Dict]:
+    """Errors for hives referencing apiaries that do not exist (one query)."""
+    wanted = {row['rucher_id'] for row in rows if row['rucher_id'] is not None}
+    if not wanted:
+        return []
+    existing = set(session.execute(EXISTING_RUCHERS_SQL, {'ids': sorted(wanted)}).scalars())
+    return [
+        {'index': i, 'error': f"rucher {row['rucher_id']} does not exist"}
+        for i, row in enumerate(rows)
+        if row['rucher_id'] is not None and row['rucher_id'] not in existing
+    ]
+
+
+def _upsert(session, statement, table, rows, columns) -> Dict:
+    params = {'ids': [row['id'] for row in rows]}
+    for param, column in columns.items():
+        params[param] = [row[column] for row in rows]
+    params['geometries'] = [json.dumps(row['geometry']) for row in rows]
+
+    result = session.execute(statement, params).all()
+    if any(row['id'] is not None for row in rows):
+        session.execute(text(SYNC_SEQUENCE_SQL.format(table=table)))
+
+    return {
+        'inserted': sum(1 for row in result if row.inserted),
+        'updated': sum(1 for row in result if not row.inserted),
+        'ids': [row.id for row in result],
+    }
+
+
+def upsert_ruches(session, rows: List[Dict]) -> Dict:
+    """
+    Insert or update hives in one statement. Does not commit.
+
+    Returns:
+        dict: inserted and updated counts and the ids written
+    """
+    return _upsert(session, UPSERT_RUCHES_SQL, 'ruches', rows, {
+        'names': 'name', 'rucher_ids': 'rucher_id', 'queen_infos': 'queen_info', 'actives': 'active'
+    })
+
+
+def upsert_ruchers(session, rows: List[Dict]) -> Dict:
+    """
+    Insert or update apiaries in one statement. Does not commit.
+
+    Returns:
+        dict: inserted and updated counts and the ids written
+    """
+    return _upsert(session, UPSERT_RUCHERS_SQL, 'ruchers', rows, {
+        'names': 'name', 'descriptions': 'description'
+    })
+
+
+def invalidate_caches():
+    """Invalidate the per-process caches derived from ruches and ruchers."""
+    from app.routes.health import invalidate_statistics
+    from app.utils.density import invalidate_density_cache
+    from app.utils.geofence import invalidate_geofences
+    from app.utils.interpolation import invalidate_interpolation_cache
+    from app.utils.spatial_index import spatial_index
+
+    spatial_index.invalidate()
+    invalidate_statistics()
+    invalidate_density_cache()
+    invalidate_geofences()
+    invalidate_interpolation_cache()
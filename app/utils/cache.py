@@ -0,0 +1,87 @@
+"""
+Small in-process caches.
+
+Caches are per process: each gunicorn worker keeps its own copy.
+"""
+import threading
+import time
+from typing import Any, Callable, Hashable, Optional, Tuple
+
+
+class TTLCache:
+    """
+    Thread-safe mapping whose entries expire after a fixed time-to-live.
+
+    Values are computed outside the lock, so concurrent misses on the same
+    key may compute it more than once; the last result wins.
+    """
+
+    def __init__(self, ttl: Optional[float], maxsize: Optional[int] = None):
+        """
+        Args:
+            ttl: Seconds an entry stays valid (None: never expires)
+            maxsize: Maximum number of entries; the oldest is evicted first
+        """
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def _lookup(self, key: Hashable) -> Optional[Tuple[Any, float]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if self.ttl is not None and time.monotonic() - entry[1] >= self.ttl:
+                del self._entries[key]
+                return None
+            return entry
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value, or default if missing or expired."""
+        entry = self._lookup(key)
+        return default if entry is None else entry[0]
+
+    def age(self, key: Hashable) -> Optional[float]:
+        """Seconds since the entry was stored, or None if missing or expired."""
+        entry = self._lookup(key)
+        return None if entry is None else time.monotonic() - entry[1]
+
+    def set(self, key: Hashable, value: Any):
+        """Store a value."""
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (value, time.monotonic())
+            if self.maxsize is not None:
+                while len(self._entries) > self.maxsize:
+                    del self._entries[next(iter(self._entries))]
+
+    def get_or_set(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        """
+        Return the cached value, computing and storing it on a miss.
+
+        Args:
+            key: Cache key
+            factory: Called without arguments to compute a missing value
+
+        Returns:
+            The cached or newly computed value
+        """
+        entry = self._lookup(key)
+        if entry is not None:
+            return entry[0]
+        value = factory()
+        self.set(key, value)
+        return value
+
+    def invalidate(self, key: Hashable = None):
+        """Drop one entry, or every entry when no key is given."""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
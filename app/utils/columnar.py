@@ -0,0 +1,373 @@
+"""
+Columnar binary export utilities (Arrow IPC with GeoArrow geometry, FlatGeobuf).
+
+Rows are fetched from a server-side cursor in partitions and converted to
+Arrow record batches column by column, so no model instances or per-row
+dicts are built on the way out.
+"""
+import io
+from typing import Dict, Iterator, Sequence
+
+from flask import Response, current_app, stream_with_context
+from sqlalchemy import Text, cast, func, select
+
+from app import db
+from app.models import Measurement, Ruche, Rucher
+
+ARROW_MIMETYPE = 'application/vnd.apache.arrow.stream'
+FLATGEOBUF_MIMETYPE = 'application/flatgeobuf'
+COLUMNAR_FORMATS = ('arrow', 'fgb')
+
+GEOARROW_METADATA = b'{"crs": "EPSG:4326"}'
+
+# Layer definitions: (column name, SQL expression, Arrow type name)
+RUCHE_LAYER = {
+    'name': 'ruches',
+    'model': Ruche,
+    'columns': [
+        ('id', Ruche.id, 'int32'),
+        ('name', Ruche.name, 'string'),
+        ('rucher_id', Ruche.rucher_id, 'int32'),
+        ('queen_info', cast(Ruche.queen_info, Text), 'string'),
+        ('created_at', Ruche.created_at, 'timestamp'),
+        ('active', Ruche.active, 'bool'),
+    ],
+    'geometry': Ruche.geom,
+    'geometry_type': 'Point',
+    'join': None,
+}
+
+RUCHER_LAYER = {
+    'name': 'ruchers',
+    'model': Rucher,
+    'columns': [
+        ('id', Rucher.id, 'int32'),
+        ('name', Rucher.name, 'string'),
+        ('description', Rucher.description, 'string'),
+        ('created_at', Rucher.created_at, 'timestamp'),
+    ],
+    'geometry': Rucher.geom,
+    'geometry_type': 'Unknown',
+    'join': None,
+}
+
+MEASUREMENT_LAYER = {
+    'name': 'measurements',
+    'model': Measurement,
+    'columns': [
+        ('id', Measurement.id, 'int32'),
+        ('ruche_id', Measurement.ruche_id, 'int32'),
+        ('recorded_at', Measurement.recorded_at, 'timestamp'),
+        ('weight', Measurement.weight, 'float64'),
+        ('temperature', Measurement.temperature, 'float64'),
+        ('humidity', Measurement.humidity, 'float64'),
+        ('signal', Measurement.signal, 'float64'),
+        ('raw', cast(Measurement.raw, Text), 'string'),
+    ],
+    # Measurements are located at the hive that recorded them
+    'geometry': Ruche.geom,
+    'geometry_type': 'Point',
+    'join': Ruche,
+}
+
+
+def _arrow_type(pa, type_name):
+    """Map a column type name to an Arrow data type."""
+    return {
+        'int32': pa.int32(),
+        'float64': pa.float64(),
+        'string': pa.string(),
+        'bool': pa.bool_(),
+        'timestamp': pa.timestamp('us'),
+        'binary': pa.binary(),
+    }[type_name]
+
+
+def _geometry_encoding(layer: Dict, fmt: str) -> str:
+    """
+    Choose the geometry encoding for a layer and output format.
+
+    Point layers use the native GeoArrow point (struct of x/y) encoding in
+    Arrow output; everything else, and every FlatGeobuf export, uses WKB.
+    """
+    if fmt == 'arrow' and layer['geometry_type'] == 'Point':
+        return 'point'
+    return 'wkb'
+
+
+def _build_schema(pa, layer: Dict, encoding: str):
+    """Build the Arrow schema for a layer."""
+    fields = [pa.field(name, _arrow_type(pa, type_name)) for name, _, type_name in layer['columns']]
+
+    if encoding == 'point':
+        fields.append(pa.field(
+            'geometry',
+            pa.struct([('x', pa.float64()), ('y', pa.float64())]),
+            metadata={
+                b'ARROW:extension:name': b'geoarrow.point',
+                b'ARROW:extension:metadata': GEOARROW_METADATA
+            }
+        ))
+    else:
+        fields.append(pa.field(
+            'geometry',
+            pa.binary(),
+            metadata={
+                b'ARROW:extension:name': b'geoarrow.wkb',
+                b'ARROW:extension:metadata': GEOARROW_METADATA
+            }
+        ))
+
+    return pa.schema(fields)
+
+
+def build_statement(layer: Dict, encoding: str, criteria: Sequence = ()):
+    """
+    Build the SELECT statement for a layer export.
+
+    Args:
+        layer: Layer definition (e.g. RUCHE_LAYER)
+        encoding: Geometry encoding ('point' or 'wkb')
+        criteria: SQL filter expressions
+
+    Returns:
+        Select: SQLAlchemy select statement
+    """
+    expressions = [expression for _, expression, _ in layer['columns']]
+
+    if encoding == 'point':
+        expressions += [func.ST_X(layer['geometry']), func.ST_Y(layer['geometry'])]
+    else:
+        expressions.append(func.ST_AsBinary(layer['geometry']))
+
+    statement = select(*expressions)
+    if layer['join'] is not None:
+        statement = statement.join_from(layer['model'], layer['join'])
+
+    for criterion in criteria:
+        statement = statement.where(criterion)
+
+    return statement
+
+
+def prepare_export(pa, layer: Dict, fmt: str, criteria: Sequence = ()):
+    """
+    Resolve the geometry encoding, Arrow schema and statement of an export.
+
+    Args:
+        pa: The pyarrow module
+        layer: Layer definition (e.g. RUCHE_LAYER)
+        fmt: Output format ('arrow' or 'fgb')
+        criteria: SQL filter expressions
+
+    Returns:
+        tuple: (encoding, schema, statement)
+    """
+    encoding = _geometry_encoding(layer, fmt)
+    return encoding, _build_schema(pa, layer, encoding), build_statement(layer, encoding, criteria)
+
+
+def record_batch(pa, schema, rows: Sequence, encoding: str):
+    """
+    Convert a partition of rows from build_statement into an Arrow record batch.
+
+    Args:
+        pa: The pyarrow module
+        schema: Arrow schema matching the statement columns
+        rows: Result rows
+        encoding: Geometry encoding ('point' or 'wkb')
+
+    Returns:
+        pyarrow.RecordBatch
+    """
+    n_columns = len(schema) - 1
+    geometry_type = schema.field(n_columns).type
+    columns = list(zip(*rows))
+    arrays = [pa.array(columns[i], type=schema.field(i).type) for i in range(n_columns)]
+
+    if encoding == 'point':
+        arrays.append(pa.StructArray.from_arrays(
+            [pa.array(columns[n_columns], pa.float64()), pa.array(columns[n_columns + 1], pa.float64())],
+            fields=list(geometry_type)
+        ))
+    else:
+        arrays.append(pa.array(columns[n_columns], pa.binary()))
+
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def iter_record_batches(pa, schema, statement, encoding: str, batch_size: int) -> Iterator:
+    """
+    Execute a statement with a server-side cursor and yield Arrow record batches.
+
+    Args:
+        pa: The pyarrow module
+        schema: Arrow schema matching the statement columns
+        statement: Statement built by build_statement
+        encoding: Geometry encoding ('point' or 'wkb')
+        batch_size: Number of rows per record batch
+
+    Yields:
+        pyarrow.RecordBatch
+    """
+    result = db.session.execute(statement.execution_options(yield_per=batch_size))
+
+    for rows in result.partitions():
+        yield record_batch(pa, schema, rows, encoding)
+
+
+class _ChunkSink:
+    """Write-only file object collecting Arrow IPC output between batches."""
+
+    closed = False
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+class ArrowStreamEncoder:
+    """
+    Incremental Arrow IPC stream encoder.
+
+    Each call returns the bytes produced so far, so batches can be sent as
+    soon as they are encoded, from a sync or an async generator.
+    """
+
+    def __init__(self, pa, schema):
+        self._sink = _ChunkSink()
+        self._writer = pa.ipc.new_stream(self._sink, schema)
+
+    def write(self, batch) -> bytes:
+        """Encode a record batch and return the pending stream bytes."""
+        self._writer.write_batch(batch)
+        return self._sink.drain()
+
+    def close(self) -> bytes:
+        """Terminate the stream and return the remaining bytes."""
+        self._writer.close()
+        return self._sink.drain()
+
+
+def arrow_ipc_stream(layer: Dict, criteria: Sequence = (), batch_size: int = 10000) -> Iterator[bytes]:
+    """
+    Produce an Arrow IPC stream for a layer, one record batch at a time.
+
+    pyarrow is imported before the generator is returned so that a missing
+    dependency surfaces as an ImportError to the caller, not mid-stream.
+
+    Args:
+        layer: Layer definition (e.g. RUCHE_LAYER)
+        criteria: SQL filter expressions
+        batch_size: Number of rows per record batch
+
+    Returns:
+        generator: Chunks of the Arrow IPC stream
+    """
+    import pyarrow as pa
+
+    encoding, schema, statement = prepare_export(pa, layer, 'arrow', criteria)
+
+    def generate():
+        encoder = ArrowStreamEncoder(pa, schema)
+        for batch in iter_record_batches(pa, schema, statement, encoding, batch_size):
+            yield encoder.write(batch)
+        yield encoder.close()
+
+    return generate()
+
+
+def write_flatgeobuf(layer: Dict, destination, criteria: Sequence = (), batch_size: int = 10000):
+    """
+    Write a FlatGeobuf file for a layer.
+
+    Record batches are handed to GDAL (through pyogrio) as an Arrow stream.
+
+    Args:
+        layer: Layer definition (e.g. RUCHE_LAYER)
+        destination: File path or writable binary file object
+        criteria: SQL filter expressions
+        batch_size: Number of rows per record batch
+    """
+    import pyarrow as pa
+    import pyogrio
+
+    encoding, schema, statement = prepare_export(pa, layer, 'fgb', criteria)
+    reader = pa.RecordBatchReader.from_batches(
+        schema,
+        iter_record_batches(pa, schema, statement, encoding, batch_size)
+    )
+
+    pyogrio.write_arrow(
+        reader,
+        destination,
+        driver='FlatGeobuf',
+        layer=layer['name'],
+        geometry_name='geometry',
+        geometry_type=layer['geometry_type'],
+        crs='EPSG:4326'
+    )
+
+
+def flatgeobuf_bytes(layer: Dict, criteria: Sequence = (), batch_size: int = 10000) -> bytes:
+    """
+    Produce a FlatGeobuf file for a layer.
+
+    FlatGeobuf needs the feature count in its header, so the file itself is
+    assembled in memory before being returned.
+
+    Args:
+        layer: Layer definition (e.g. RUCHE_LAYER)
+        criteria: SQL filter expressions
+        batch_size: Number of rows per record batch
+
+    Returns:
+        bytes: FlatGeobuf file content
+    """
+    buffer = io.BytesIO()
+    write_flatgeobuf(layer, buffer, criteria, batch_size)
+    return buffer.getvalue()
+
+
+def columnar_response(fmt: str, layer: Dict, criteria: Sequence = ()) -> Response:
+    """
+    Build a Flask response for a columnar export.
+
+    Args:
+        fmt: Output format ('arrow' or 'fgb')
+        layer: Layer definition (e.g. RUCHE_LAYER)
+        criteria: SQL filter expressions
+
+    Returns:
+        Response: Streamed Arrow IPC or FlatGeobuf response
+
+    Raises:
+        ImportError: If pyarrow (or pyogrio for FlatGeobuf) is not installed
+    """
+    batch_size = current_app.config.get('EXPORT_BATCH_SIZE', 10000)
+
+    if fmt == 'arrow':
+        stream = arrow_ipc_stream(layer, criteria, batch_size)
+        return Response(
+            stream_with_context(stream),
+            mimetype=ARROW_MIMETYPE,
+            headers={'Content-Disposition': f'attachment; filename={layer["name"]}.arrow'}
+        )
+
+    payload = flatgeobuf_bytes(layer, criteria, batch_size)
+    return Response(
+        payload,
+        mimetype=FLATGEOBUF_MIMETYPE,
+        headers={'Content-Disposition': f'attachment; filename={layer["name"]}.fgb'}
+    )
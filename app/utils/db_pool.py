@@ -0,0 +1,165 @@
+"""
+Connection pool instrumentation and per-route statement timeouts.
+"""
+import threading
+import time
+from typing import Dict
+
+from flask import has_request_context, current_app, request
+from sqlalchemy import event, exc, text
+from sqlalchemy.pool import QueuePool
+
+
+class PoolMetrics:
+    """Counters for connection checkouts from one pool."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def record(self, seconds: float, timed_out: bool = False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_seconds_total += seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            attempts = self.checkouts + self.timeouts
+            return {
+                'checkouts': self.checkouts,
+                'checkout_timeouts': self.timeouts,
+                'checkout_wait_ms_total': round(self.wait_seconds_total * 1000, 3),
+                'checkout_wait_ms_avg': round(self.wait_seconds_total * 1000 / attempts, 3) if attempts else 0.0,
+                'checkout_wait_ms_max': round(self.wait_seconds_max * 1000, 3)
+            }
+
+
+class InstrumentedQueuePool(QueuePool):
+    """
+    QueuePool that records how long each checkout waited for a connection.
+
+    Each pool keeps its own PoolMetrics, so the primary and every replica
+    bind are measured separately.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            self.metrics.record(time.perf_counter() - start, timed_out=True)
+            raise
+        self.metrics.record(time.perf_counter() - start)
+        return connection
+
+
+def bind_label(key) -> str:
+    """Label of a Flask-SQLAlchemy bind key ('primary' for the default bind)."""
+    return 'primary' if key is None else str(key)
+
+
+def pool_status(engine, bind=None) -> Dict:
+    """
+    Describe the current state of an engine's connection pool.
+
+    Counts are per process: each gunicorn worker has its own pool.
+
+    Args:
+        engine: SQLAlchemy engine
+        bind: Bind key of the engine (None for the primary)
+
+    Returns:
+        dict: Bind, pool class, size, connections in use and checkout wait times
+    """
+    pool = engine.pool
+    status = {'bind': bind_label(bind), 'class': type(pool).__name__}
+
+    if isinstance(pool, QueuePool):
+        status.update({
+            'size': pool.size(),
+            'checked_out': pool.checkedout(),
+            'checked_in': pool.checkedin(),
+            'overflow': max(pool.overflow(), 0),
+            'max_overflow': pool._max_overflow
+        })
+
+    metrics = getattr(pool, 'metrics', None)
+    if metrics is not None:
+        status.update(metrics.snapshot())
+    return status
+
+
+def pool_statuses(engines) -> Dict[str, Dict]:
+    """
+    pool_status of every engine, keyed by bind label.
+
+    Args:
+        engines: Mapping of bind key to engine (db.engines)
+
+    Returns:
+        dict: 'primary' and each replica bind to its pool status
+    """
+    return {bind_label(key): pool_status(engine, key) for key, engine in engines.items()}
+
+
+def statement_timeout_for(config, endpoint=None):
+    """
+    Statement timeout (ms) to apply per transaction for an endpoint, or None.
+
+    Args:
+        config: Application config mapping
+        endpoint: Endpoint name (e.g. 'geo.nearby_ruches'), if any
+
+    Returns:
+        int or None
+    """
+    if endpoint in config.get('DB_ROUTE_STATEMENT_TIMEOUTS', {}):
+        return config['DB_ROUTE_STATEMENT_TIMEOUTS'][endpoint]
+    if config.get('DB_PGBOUNCER', False):
+        # No startup options through PgBouncer; apply the default per transaction
+        return config.get('DB_STATEMENT_TIMEOUT_MS') or None
+    return None
+
+
+def _statement_timeout_ms(app):
+    """Statement timeout to apply to the current transaction, or None."""
+    return statement_timeout_for(app.config, request.endpoint if has_request_context() else None)
+
+
+def _apply_statement_timeout(session, transaction, connection):
+    """Session 'after_begin' hook setting the transaction's statement timeout."""
+    if connection.dialect.name != 'postgresql':
+        return
+    timeout = _statement_timeout_ms(current_app)
+    if timeout:
+        connection.execute(text(f'SET LOCAL statement_timeout = {int(timeout)}'))
+
+
+def init_db_pool(app, db):
+    """
+    Instrument the connection pool and install statement timeout handling.
+
+    Must be called before db.init_app so the pool class takes effect.
+
+    Args:
+        app: Flask application
+        db: Flask-SQLAlchemy extension
+    """
+    options = dict(app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    if 'pool_size' in options and 'poolclass' not in options:
+        options['poolclass'] = InstrumentedQueuePool
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+
+    if not event.contains(db.session, 'after_begin', _apply_statement_timeout):
+        event.listen(db.session, 'after_begin', _apply_statement_timeout)
@@ -0,0 +1,78 @@
+"""
+Cheap table statistics from the PostgreSQL catalog.
+"""
+from typing import Dict, Sequence
+
+from sqlalchemy import String, bindparam, func, select, text
+from sqlalchemy.dialects.postgresql import ARRAY
+
+ESTIMATED_COUNTS_SQL = text("""
+    SELECT c.relname,
+           CASE WHEN c.relkind = 'p' THEN (
+               -- Partitioned tables keep their statistics on the partitions
+               SELECT sum(greatest(p.reltuples, 0))::bigint
+               FROM pg_partition_tree(c.oid) t
+               JOIN pg_class p ON p.oid = t.relid
+               WHERE t.isleaf
+           ) ELSE c.reltuples::bigint END AS reltuples,
+           s.n_live_tup
+    FROM pg_class c
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    LEFT JOIN pg_stat_user_tables s ON s.relid = c.oid
+    WHERE n.nspname = current_schema()
+      AND c.relkind IN ('r', 'p')
+      AND c.relname = ANY(:names)
+""").bindparams(bindparam('names', type_=ARRAY(String)))
+
+
+def estimated_row_counts(session, models: Sequence) -> Dict[str, int]:
+    """
+    Estimate row counts without scanning the tables.
+
+    Uses the planner estimate (pg_class.reltuples, maintained by VACUUM and
+    ANALYZE), or the cumulative statistics' live tuple count for tables not
+    analyzed yet. Tables with neither fall back to an exact COUNT(*), which
+    only happens while they are new and small. Non-PostgreSQL databases
+    always get exact counts.
+
+    Args:
+        session: SQLAlchemy session
+        models: Model classes to count
+
+    Returns:
+        dict: Table name to estimated row count
+    """
+    if session.get_bind().dialect.name != 'postgresql':
+        return exact_row_counts(session, models)
+
+    names = [model.__tablename__ for model in models]
+    counts = {}
+    for row in session.execute(ESTIMATED_COUNTS_SQL, {'names': names}):
+        if row.reltuples is not None and row.reltuples > 0:
+            counts[row.relname] = int(row.reltuples)
+        elif row.n_live_tup is not None:
+            # Never analyzed (reltuples is -1, or 0 before PostgreSQL 14)
+            counts[row.relname] = int(row.n_live_tup)
+        elif row.reltuples == 0:
+            counts[row.relname] = 0
+
+    missing = [model for model in models if model.__tablename__ not in counts]
+    counts.update(exact_row_counts(session, missing))
+    return {name: counts[name] for name in names}
+
+
+def exact_row_counts(session, models: Sequence) -> Dict[str, int]:
+    """
+    Count rows exactly with COUNT(*) (a full scan on large tables).
+
+    Args:
+        session: SQLAlchemy session
+        models: Model classes to count
+
+    Returns:
+        dict: Table name to row count
+    """
+    return {
+        model.__tablename__: session.execute(select(func.count()).select_from(model)).scalar()
+        for model in models
+    }
@@ -0,0 +1,246 @@
+"""
+Hexagonal / square grid aggregation of hives for low-zoom density maps.
+
+Hives are binned in SQL with ST_HexagonGrid or ST_SquareGrid in Web
+Mercator (EPSG:3857), so cells look regular on a map and cell_size is in
+Mercator meters. Grids are anchored at the projection origin, not at the
+requested bbox, so a cell is the same whatever the viewport: the bbox is
+snapped outward to the grid, which makes nearby viewports share one cached
+result per cell size.
+
+Only cells containing hives are returned, as a compact GeoJSON
+FeatureCollection built by PostgreSQL or as a Mapbox Vector Tile layer.
+"""
+import math
+from typing import Dict, Tuple
+
+from sqlalchemy import text
+
+from app.utils.cache import TTLCache
+from app.utils.spatial import parse_bbox
+
+EARTH_RADIUS = 6378137.0
+# Web Mercator is undefined at the poles
+MAX_MERCATOR_LAT = 85.05112878
+
+SHAPES = {'hexagon': 'ST_HexagonGrid', 'square': 'ST_SquareGrid'}
+FORMATS = ('geojson', 'mvt')
+MVT_LAYER = 'density'
+MVT_EXTENT = 4096
+
+# Latest measurement per hive, averaged per cell with measurements=true
+LATEST_JOIN = """
+    LEFT JOIN LATERAL (
+        SELECT m.weight, m.temperature, m.humidity
+        FROM measurements m
+        WHERE m.ruche_id = h.id
+        ORDER BY m.recorded_at DESC
+        LIMIT 1
+    ) latest ON true
+"""
+LATEST_COLUMNS = ', latest.weight, latest.temperature, latest.humidity'
+LATEST_AGGREGATES = """,
+           avg(h.weight) AS avg_weight,
+           avg(h.temperature) AS avg_temperature,
+           avg(h.humidity) AS avg_humidity"""
+LATEST_PROPERTIES = """,
+        'avg_weight', round(avg_weight::numeric, 2),
+        'avg_temperature', round(avg_temperature::numeric, 2),
+        'avg_humidity', round(avg_humidity::numeric, 2)"""
+LATEST_MVT_COLUMNS = ', avg_weight, avg_temperature, avg_humidity'
+
+CELLS_SQL = """
+    WITH bounds AS (
+        SELECT ST_MakeEnvelope(:xmin, :ymin, :xmax, :ymax, 3857) AS geom
+    ),
+    hives AS (
+        SELECT ST_Transform(h.geom, 3857) AS geom{latest_columns}
+        FROM ruches h{latest_join}
+        WHERE h.geom && ST_Transform((SELECT geom FROM bounds), 4326){active_filter}
+    ),
+    cells AS (
+        SELECT c.i, c.j, c.geom, count(*) AS hive_count{latest_aggregates}
+        FROM bounds b
+        CROSS JOIN LATERAL {grid}(:size, b.geom) AS c
+        JOIN hives h ON ST_Intersects(c.geom, h.geom)
+        GROUP BY c.i, c.j, c.geom
+    )
+"""
+
+GEOJSON_SQL = CELLS_SQL + """
+    SELECT json_build_object(
+        'type', 'FeatureCollection',
+        'features', COALESCE(json_agg(json_build_object(
+            'type', 'Feature',
+            'geometry', ST_AsGeoJSON(ST_Transform(geom, 4326), 6)::json,
+            'properties', json_build_object('i', i, 'j', j, 'count', hive_count{latest_properties})
+        )), '[]'::json)
+    )::text
+    FROM cells
+"""
+
+MVT_SQL = CELLS_SQL + """
+    SELECT ST_AsMVT(tile, '{layer}', {extent}, 'geom')
+    FROM (
+        SELECT ST_AsMVTGeom(geom, (SELECT geom FROM bounds)::box2d, {extent}, 64, true) AS geom,
+               i, j, hive_count AS count{latest_mvt_columns}
+        FROM cells
+    ) AS tile
+"""
+
+# Keyed by everything that shapes the result; invalidated on hive writes
+_density_cache = TTLCache(ttl=60, maxsize=256)
+
+
+def to_mercator(lon: float, lat: float) -> Tuple[float, float]:
+    """Project WGS84 longitude/latitude to Web Mercator meters."""
+    lat = max(-MAX_MERCATOR_LAT, min(MAX_MERCATOR_LAT, lat))
+    x = EARTH_RADIUS * math.radians(lon)
+    y = EARTH_RADIUS * math.log(math.tan(math.pi / 4 + math.radians(lat) / 2))
+    return x, y
+
+
+def cell_area(shape: str, size: float) -> float:
+    """Area of one cell in square Mercator meters (size is the hexagon edge or square side)."""
+    return 1.5 * math.sqrt(3) * size ** 2 if shape == 'hexagon' else size ** 2
+
+
+def snap_bounds(bbox, size: float) -> Tuple[float, float, float, float]:
+    """
+    Mercator bounds of a bbox, widened to multiples of twice the cell size.
+
+    Cells are anchored at the origin, so widening only adds whole cells at
+    the edges and lets slightly different viewports share a cache entry.
+    """
+    xmin, ymin = to_mercator(bbox[0], bbox[1])
+    xmax, ymax = to_mercator(bbox[2], bbox[3])
+    step = 2 * size
+    return (
+        math.floor(xmin / step) * step, math.floor(ymin / step) * step,
+        math.ceil(xmax / step) * step, math.ceil(ymax / step) * step
+    )
+
+
+def density_params(args, config) -> Dict:
+    """
+    Parse and validate the density query parameters.
+
+    Args:
+        args: Request query parameters
+        config: Application config (DENSITY_* limits)
+
+    Returns:
+        dict: bounds (Mercator), size, shape, format, active and measurements
+
+    Raises:
+        ValueError: If a parameter is missing or invalid, or the grid is too fine
+    """
+    bbox = args.get('bbox')
+    if not bbox:
+        raise ValueError('bbox parameter required (min_lon,min_lat,max_lon,max_lat)')
+    try:
+        bbox = parse_bbox(bbox)
+    except ValueError as e:
+        raise ValueError(f'Invalid bbox: {str(e)}')
+
+    try:
+        size = float(args.get('cell_size', config.get('DENSITY_DEFAULT_CELL_SIZE', 10000)))
+    except ValueError:
+        raise ValueError('cell_size must be a number of meters')
+    min_size = config.get('DENSITY_MIN_CELL_SIZE', 100)
+    if not math.isfinite(size) or size < min_size:
+        raise ValueError(f'cell_size must be at least {min_size} meters')
+
+    shape = args.get('shape', 'hexagon').lower()
+    if shape not in SHAPES:
+        raise ValueError(f'shape must be one of: {", ".join(SHAPES)}')
+
+    fmt = args.get('format', 'geojson').lower()
+    if fmt not in FORMATS:
+        raise ValueError(f'format must be one of: {", ".join(FORMATS)}')
+
+    active = args.get('active')
+    if active is not None:
+        active = active.lower() == 'true'
+
+    # Vector tiles are clipped to the exact requested bounds
+    if fmt == 'mvt':
+        xmin, ymin = to_mercator(bbox[0], bbox[1])
+        xmax, ymax = to_mercator(bbox[2], bbox[3])
+        bounds = (xmin, ymin, xmax, ymax)
+    else:
+        bounds = snap_bounds(bbox, size)
+
+    max_cells = config.get('DENSITY_MAX_CELLS', 50000)
+    cells = (bounds[2] - bounds[0]) * (bounds[3] - bounds[1]) / cell_area(shape, size)
+    if cells > max_cells:
+        raise ValueError(f'bbox and cell_size give about {int(cells)} cells; at most {max_cells} are allowed')
+
+    return {
+        'bounds': bounds,
+        'size': size,
+        'shape': shape,
+        'format': fmt,
+        'active': active,
+        'measurements': args.get('measurements', '').lower() == 'true'
+    }
+
+
+def density_statement(params: Dict):
+    """
+    Build the aggregation query for validated density parameters.
+
+    Returns:
+        TextClause returning one value: GeoJSON text or MVT bytes
+    """
+    measurements = params['measurements']
+    parts = {
+        'grid': SHAPES[params['shape']],
+        'latest_columns': LATEST_COLUMNS if measurements else '',
+        'latest_join': LATEST_JOIN if measurements else '',
+        'latest_aggregates': LATEST_AGGREGATES if measurements else '',
+        'active_filter': '' if params['active'] is None else ' AND h.active = :active',
+    }
+    if params['format'] == 'mvt':
+        sql = MVT_SQL.format(
+            layer=MVT_LAYER, extent=MVT_EXTENT,
+            latest_mvt_columns=LATEST_MVT_COLUMNS if measurements else '', **parts
+        )
+    else:
+        sql = GEOJSON_SQL.format(latest_properties=LATEST_PROPERTIES if measurements else '', **parts)
+
+    xmin, ymin, xmax, ymax = params['bounds']
+    values = {'xmin': xmin, 'ymin': ymin, 'xmax': xmax, 'ymax': ymax, 'size': params['size']}
+    if params['active'] is not None:
+        values['active'] = params['active']
+    return text(sql).bindparams(**values)
+
+
+def density_payload(session, params: Dict, ttl: float):
+    """
+    Aggregated cells for the parameters, cached per cell size and bounds.
+
+    Args:
+        session: SQLAlchemy session
+        params: Result of density_params
+        ttl: Cache lifetime in seconds
+
+    Returns:
+        str (GeoJSON) or bytes (MVT)
+    """
+    _density_cache.ttl = ttl
+    key = (params['shape'], params['size'], params['bounds'], params['format'],
+           params['active'], params['measurements'])
+
+    def compute():
+        value = session.execute(density_statement(params)).scalar()
+        if params['format'] == 'mvt':
+            return bytes(value or b'')
+        return value
+
+    return _density_cache.get_or_set(key, compute)
+
+
+def invalidate_density_cache():
+    """Drop every cached density grid."""
+    _density_cache.invalidate()
@@ -0,0 +1,256 @@
+"""
+Vectorized geodesic distance computations on the WGS84 ellipsoid.
+
+All functions take longitudes/latitudes in degrees, broadcast NumPy-style,
+and return distances in meters without touching the database. When pyproj
+is installed its Karney implementation is used for ellipsoidal distances;
+otherwise a NumPy Vincenty implementation is used.
+"""
+from functools import lru_cache
+from typing import Iterator, Tuple
+
+import numpy as np
+
+# WGS84 ellipsoid
+WGS84_A = 6378137.0
+WGS84_F = 1 / 298.257223563
+WGS84_B = WGS84_A * (1 - WGS84_F)
+
+# Mean Earth radius (IUGG), used by the spherical approximations
+EARTH_RADIUS_M = 6371008.8
+
+
+def haversine(lon1, lat1, lon2, lat2) -> np.ndarray:
+    """
+    Great-circle distance on a sphere of mean Earth radius.
+
+    Within about 0.5% of the ellipsoidal distance; use it for candidate
+    filtering, not for reported distances.
+
+    Args:
+        lon1, lat1: First point(s) in degrees
+        lon2, lat2: Second point(s) in degrees
+
+    Returns:
+        np.ndarray: Distances in meters
+    """
+    lon1, lat1, lon2, lat2 = (np.radians(np.asarray(v, dtype=np.float64)) for v in (lon1, lat1, lon2, lat2))
+
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def vincenty(lon1, lat1, lon2, lat2, max_iterations: int = 200, tolerance: float = 1e-12) -> np.ndarray:
+    """
+    Ellipsoidal (WGS84) distance with Vincenty's inverse formula, vectorized.
+
+    Agrees with PostGIS geography distances (Karney's algorithm) to well
+    under a millimeter. Nearly antipodal pairs, for which the iteration does
+    not converge, are computed with geographiclib instead.
+
+    Args:
+        lon1, lat1: First point(s) in degrees
+        lon2, lat2: Second point(s) in degrees
+        max_iterations: Iteration cap for the lambda recurrence
+        tolerance: Convergence threshold on lambda (radians)
+
+    Returns:
+        np.ndarray: Distances in meters
+    """
+    lon1, lat1, lon2, lat2 = np.broadcast_arrays(
+        *(np.asarray(v, dtype=np.float64) for v in (lon1, lat1, lon2, lat2))
+    )
+
+    f = WGS84_F
+    L = np.radians(lon2 - lon1)
+    L = (L + np.pi) % (2 * np.pi) - np.pi
+
+    U1 = np.arctan((1 - f) * np.tan(np.radians(lat1)))
+    U2 = np.arctan((1 - f) * np.tan(np.radians(lat2)))
+    sin_u1, cos_u1 = np.sin(U1), np.cos(U1)
+    sin_u2, cos_u2 = np.sin(U2), np.cos(U2)
+
+    lam = L
+    converged = np.zeros(L.shape, dtype=bool)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        for _ in range(max_iterations):
+            sin_lam, cos_lam = np.sin(lam), np.cos(lam)
+            sin_sigma = np.hypot(cos_u2 * sin_lam, cos_u1 * sin_u2 - sin_u1 * cos_u2 * cos_lam)
+            cos_sigma = sin_u1 * sin_u2 + cos_u1 * cos_u2 * cos_lam
+            sigma = np.arctan2(sin_sigma, cos_sigma)
+
+            sin_alpha = np.where(sin_sigma == 0, 0.0, cos_u1 * cos_u2 * sin_lam / sin_sigma)
+            cos2_alpha = 1 - sin_alpha ** 2
+            # Equatorial lines have cos2_alpha == 0
+            cos_2sigma_m = np.where(cos2_alpha == 0, 0.0, cos_sigma - 2 * sin_u1 * sin_u2 / cos2_alpha)
+
+            C = f / 16 * cos2_alpha * (4 + f * (4 - 3 * cos2_alpha))
+            lam_next = L + (1 - C) * f * sin_alpha * (
+                sigma + C * sin_sigma * (cos_2sigma_m + C * cos_sigma * (-1 + 2 * cos_2sigma_m ** 2))
+            )
+
+            converged = np.abs(lam_next - lam) <= tolerance
+            lam = lam_next
+            if converged.all():
+                break
+
+        u2 = cos2_alpha * (WGS84_A ** 2 - WGS84_B ** 2) / WGS84_B ** 2
+        A = 1 + u2 / 16384 * (4096 + u2 * (-768 + u2 * (320 - 175 * u2)))
+        B = u2 / 1024 * (256 + u2 * (-128 + u2 * (74 - 47 * u2)))
+        delta_sigma = B * sin_sigma * (cos_2sigma_m + B / 4 * (
+            cos_sigma * (-1 + 2 * cos_2sigma_m ** 2)
+            - B / 6 * cos_2sigma_m * (-3 + 4 * sin_sigma ** 2) * (-3 + 4 * cos_2sigma_m ** 2)
+        ))
+        distances = WGS84_B * A * (sigma - delta_sigma)
+
+    failed = ~converged | ~np.isfinite(distances)
+    if failed.any():
+        from geographiclib.geodesic import Geodesic
+
+        distances = np.array(distances, dtype=np.float64, copy=True)
+        # Flat indices, so scalar (0-d) inputs work too
+        for index in np.flatnonzero(failed):
+            distances.flat[index] = Geodesic.WGS84.Inverse(
+                lat1.flat[index], lon1.flat[index], lat2.flat[index], lon2.flat[index], Geodesic.DISTANCE
+            )['s12']
+
+    return distances
+
+
+@lru_cache(maxsize=1)
+def _pyproj_geod():
+    """Return a WGS84 pyproj.Geod, or None if pyproj is not installed."""
+    try:
+        from pyproj import Geod
+    except ImportError:
+        return None
+    return Geod(ellps='WGS84')
+
+
+def geodesic_backend() -> str:
+    """Name of the algorithm used by geodesic_distance ('karney' or 'vincenty')."""
+    return 'karney' if _pyproj_geod() is not None else 'vincenty'
+
+
+def geodesic_distance(lon1, lat1, lon2, lat2) -> np.ndarray:
+    """
+    Ellipsoidal (WGS84) distance between points, matching PostGIS geography.
+
+    Args:
+        lon1, lat1: First point(s) in degrees
+        lon2, lat2: Second point(s) in degrees
+
+    Returns:
+        np.ndarray: Distances in meters
+    """
+    geod = _pyproj_geod()
+    if geod is None:
+        return vincenty(lon1, lat1, lon2, lat2)
+
+    lon1, lat1, lon2, lat2 = np.broadcast_arrays(
+        *(np.asarray(v, dtype=np.float64) for v in (lon1, lat1, lon2, lat2))
+    )
+    if lon1.size == 1:
+        # pyproj takes its scalar fast path for single values
+        _, _, distances = geod.inv(float(lon1.flat[0]), float(lat1.flat[0]), float(lon2.flat[0]), float(lat2.flat[0]))
+    else:
+        _, _, distances = geod.inv(lon1.ravel(), lat1.ravel(), lon2.ravel(), lat2.ravel())
+    return np.asarray(distances, dtype=np.float64).reshape(lon1.shape)
+
+
+DISTANCE_METHODS = {
+    'geodesic': geodesic_distance,
+    'haversine': haversine,
+}
+
+
+def iter_distance_matrix(origins: np.ndarray, destinations: np.ndarray, method: str = 'geodesic',
+                         chunk_elements: int = 1_000_000) -> Iterator[Tuple[int, np.ndarray]]:
+    """
+    Compute an origins x destinations distance matrix in row blocks.
+
+    Each block covers as many origin rows as fit in chunk_elements cells, so
+    the temporaries stay bounded however large the full matrix is.
+
+    Args:
+        origins: (N, 2) array of lon/lat in degrees
+        destinations: (M, 2) array of lon/lat in degrees
+        method: 'geodesic' (WGS84) or 'haversine' (sphere)
+        chunk_elements: Maximum number of cells computed at once
+
+    Yields:
+        tuple: (first origin row, (rows, M) block of distances in meters)
+    """
+    compute = DISTANCE_METHODS[method]
+    origins = np.asarray(origins, dtype=np.float64).reshape(-1, 2)
+    destinations = np.asarray(destinations, dtype=np.float64).reshape(-1, 2)
+    rows_per_block = max(1, chunk_elements // max(1, len(destinations)))
+
+    for start in range(0, len(origins), rows_per_block):
+        block = origins[start:start + rows_per_block]
+        yield start, compute(
+            block[:, 0:1], block[:, 1:2], destinations[:, 0][np.newaxis, :], destinations[:, 1][np.newaxis, :]
+        )
+
+
+def distance_matrix(origins: np.ndarray, destinations: np.ndarray, method: str = 'geodesic',
+                    chunk_elements: int = 1_000_000) -> np.ndarray:
+    """
+    Compute the full origins x destinations distance matrix.
+
+    Args:
+        origins: (N, 2) array of lon/lat in degrees
+        destinations: (M, 2) array of lon/lat in degrees
+        method: 'geodesic' (WGS84) or 'haversine' (sphere)
+        chunk_elements: Maximum number of cells computed at once
+
+    Returns:
+        np.ndarray: (N, M) distances in meters
+    """
+    origins = np.asarray(origins, dtype=np.float64).reshape(-1, 2)
+    destinations = np.asarray(destinations, dtype=np.float64).reshape(-1, 2)
+    matrix = np.empty((len(origins), len(destinations)), dtype=np.float64)
+
+    for start, block in iter_distance_matrix(origins, destinations, method, chunk_elements):
+        matrix[start:start + len(block)] = block
+
+    return matrix
+
+
+def radius_bounds(longitude: float, latitude: float, radius_meters: float):
+    """
+    Longitude/latitude boxes that contain every point within a radius.
+
+    The boxes are padded by 1% to cover the difference between the sphere
+    used here and the ellipsoid. A circle crossing the antimeridian yields
+    two boxes; one touching a pole spans all longitudes.
+
+    Args:
+        longitude: Center longitude in degrees
+        latitude: Center latitude in degrees
+        radius_meters: Radius in meters
+
+    Returns:
+        list: (min_lon, min_lat, max_lon, max_lat) tuples
+    """
+    angular = radius_meters * 1.01 / EARTH_RADIUS_M
+    if angular >= np.pi:
+        return [(-180.0, -90.0, 180.0, 90.0)]
+
+    d_lat = np.degrees(angular)
+    min_lat = latitude - d_lat
+    max_lat = latitude + d_lat
+
+    if min_lat <= -90 or max_lat >= 90:
+        return [(-180.0, max(min_lat, -90.0), 180.0, min(max_lat, 90.0))]
+
+    d_lon = np.degrees(np.arcsin(min(1.0, np.sin(angular) / np.cos(np.radians(latitude)))))
+    min_lon = longitude - d_lon
+    max_lon = longitude + d_lon
+
+    if min_lon < -180:
+        return [(-180.0, min_lat, max_lon, max_lat), (min_lon + 360, min_lat, 180.0, max_lat)]
+    if max_lon > 180:
+        return [(min_lon, min_lat, 180.0, max_lat), (-180.0, min_lat, max_lon - 360, max_lat)]
+    return [(min_lon, min_lat, max_lon, max_lat)]
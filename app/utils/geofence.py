@@ -0,0 +1,294 @@
+"""
+Geofence detection of displaced hives from GPS fixes.
+
+Hives with an active 'geofence' AlertRule (params: {"radius": meters}) are
+watched. Their registered location (Ruche.geom), allowed radius, rule and
+last alert time are held per process in compact NumPy arrays sorted by
+hive id. An ingested batch of fixes is then checked in one pass: hive ids
+are located with searchsorted, displacements computed with the vectorized
+haversine, and one alert raised per displaced hive, at most once per
+GEOFENCE_ALERT_COOLDOWN seconds.
+
+The state is reloaded after GEOFENCE_STATE_TTL seconds, or sooner when
+hives are written in bulk (invalidate_geofences).
+"""
+import math
+import threading
+import time
+from datetime import timezone
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import text
+
+from app.utils.geodesic import haversine
+from app.utils.spatial import validate_coordinate_arrays
+
+RULE_TYPE = 'geofence'
+
+STATE_SQL = text("""
+    SELECT r.id AS ruche_id, ST_X(r.geom) AS lon, ST_Y(r.geom) AS lat,
+           ar.id AS rule_id, ar.params,
+           (SELECT max(a.triggered_at) FROM alerts a WHERE a.rule_id = ar.id) AS last_alert
+    FROM alert_rules ar
+    JOIN ruches r ON r.id = ar.ruche_id
+    WHERE ar.active AND ar.rule_type = :rule_type
+""")
+
+
+def _rule_radius(params, default_radius: float) -> float:
+    radius = params.get('radius', default_radius) if isinstance(params, dict) else default_radius
+    try:
+        radius = float(radius)
+    except (TypeError, ValueError):
+        return default_radius
+    return radius if math.isfinite(radius) and radius > 0 else default_radius
+
+
+def _gps_fix(raw) -> Tuple[float, float]:
+    """(lon, lat) of a raw sensor payload, NaN when it carries no usable fix."""
+    if not isinstance(raw, dict):
+        return math.nan, math.nan
+    gps = raw.get('gps')
+    if not isinstance(gps, dict):
+        return math.nan, math.nan
+    lon = gps.get('lon', gps.get('longitude'))
+    lat = gps.get('lat', gps.get('latitude'))
+    if isinstance(lon, bool) or isinstance(lat, bool) or not isinstance(lon, (int, float)) \
+            or not isinstance(lat, (int, float)):
+        return math.nan, math.nan
+    return float(lon), float(lat)
+
+
+def extract_fixes(raws: Sequence) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    GPS fixes of many raw payloads as coordinate arrays.
+
+    A fix is read from raw['gps'] ({"lat", "lon"} or {"latitude",
+    "longitude"}). Payloads without one, or with coordinates out of range,
+    give NaN.
+
+    Args:
+        raws: Measurement.raw values
+
+    Returns:
+        tuple: (longitudes, latitudes) float64 arrays aligned with raws
+    """
+    fixes = np.fromiter(
+        (_gps_fix(raw) for raw in raws), dtype=np.dtype((np.float64, 2)), count=len(raws)
+    ).reshape(-1, 2)
+    longitudes, latitudes = fixes[:, 0], fixes[:, 1]
+
+    known = ~np.isnan(longitudes) & ~np.isnan(latitudes)
+    invalid = known.copy()
+    invalid[known] = ~validate_coordinate_arrays(longitudes[known], latitudes[known])
+    longitudes[invalid] = np.nan
+    latitudes[invalid] = np.nan
+    return longitudes, latitudes
+
+
+class GeofenceState:
+    """
+    Watched hives as parallel arrays, sorted by hive id.
+
+    Attributes:
+        ids: Hive ids (int64)
+        lon, lat: Registered location (float64)
+        radius: Allowed displacement in meters (float64)
+        rule_ids: Geofence rule of each hive (int64)
+        last_alert: Epoch seconds of the last alert, NaN if none (float64)
+    """
+
+    def __init__(self, ids, lon, lat, radius, rule_ids, last_alert):
+        order = np.argsort(np.asarray(ids, dtype=np.int64), kind='stable')
+        self.ids = np.asarray(ids, dtype=np.int64)[order]
+        self.lon = np.asarray(lon, dtype=np.float64)[order]
+        self.lat = np.asarray(lat, dtype=np.float64)[order]
+        self.radius = np.asarray(radius, dtype=np.float64)[order]
+        self.rule_ids = np.asarray(rule_ids, dtype=np.int64)[order]
+        self.last_alert = np.asarray(last_alert, dtype=np.float64)[order]
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def from_rows(cls, rows, default_radius: float) -> 'GeofenceState':
+        """
+        Build the state from STATE_SQL rows.
+
+        A hive with several geofence rules is watched with the tightest one.
+        """
+        best = {}
+        for row in rows:
+            radius = _rule_radius(row.params, default_radius)
+            last_alert = math.nan
+            if row.last_alert is not None:
+                # triggered_at is stored as naive UTC
+                last_alert = row.last_alert.replace(tzinfo=row.last_alert.tzinfo or timezone.utc).timestamp()
+            current = best.get(row.ruche_id)
+            if current is None or radius < current[2]:
+                best[row.ruche_id] = (row.lon, row.lat, radius, row.rule_id, last_alert)
+
+        columns = zip(*best.values()) if best else ([],) * 5
+        return cls(list(best), *columns)
+
+    def locate(self, ruche_ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Positions of hive ids in the state.
+
+        Returns:
+            tuple: (positions, watched) where watched marks ids present
+        """
+        if not len(self.ids):
+            return np.zeros(len(ruche_ids), dtype=np.intp), np.zeros(len(ruche_ids), dtype=bool)
+        positions = np.minimum(np.searchsorted(self.ids, ruche_ids), len(self.ids) - 1)
+        return positions, self.ids[positions] == ruche_ids
+
+
+class GeofenceEngine:
+    """
+    Process-wide geofence state with lazy reload.
+    """
+
+    def __init__(self):
+        self.state: Optional[GeofenceState] = None
+        self.loaded_at = None
+        self._generation = 0
+        self._loaded_generation = None
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        """Reload the state on next use (hives moved or rules changed)."""
+        self._generation += 1
+
+    def load(self, session, default_radius: float) -> GeofenceState:
+        """Read the watched hives from the database."""
+        rows = session.execute(STATE_SQL, {'rule_type': RULE_TYPE}).all()
+        state = GeofenceState.from_rows(rows, default_radius)
+
+        # Keep alert times this process raised since the database was read
+        previous = self.state
+        if previous is not None and len(previous) and len(state):
+            positions, known = previous.locate(state.ids)
+            state.last_alert[known] = np.fmax(state.last_alert[known], previous.last_alert[positions[known]])
+        return state
+
+    def current(self, session, config) -> GeofenceState:
+        """The state, reloaded if invalidated or older than GEOFENCE_STATE_TTL."""
+        ttl = config.get('GEOFENCE_STATE_TTL', 60)
+        with self._lock:
+            stale = (
+                self.state is None
+                or self._loaded_generation != self._generation
+                or time.monotonic() - self.loaded_at >= ttl
+            )
+            if stale:
+                generation = self._generation
+                self.state = self.load(session, config.get('GEOFENCE_DEFAULT_RADIUS', 200))
+                self.loaded_at = time.monotonic()
+                self._loaded_generation = generation
+            return self.state
+
+    def check(self, session, config, ruche_ids: Sequence[int], longitudes: np.ndarray,
+              latitudes: np.ndarray, now: Optional[float] = None) -> List[Dict]:
+        """
+        Find the watched hives displaced beyond their radius in a batch of fixes.
+
+        Args:
+            session: SQLAlchemy session (to load the state)
+            config: Application config (GEOFENCE_* settings)
+            ruche_ids: Hive of each fix
+            longitudes, latitudes: Fix coordinates, NaN where there is no fix
+            now: Epoch seconds of the check (default: current time)
+
+        Returns:
+            list: One breach per displaced hive outside its alert cooldown (the
+            cooldown starts with record_alerts, not here), at
+            its largest displacement in the batch: rule_id, ruche_id, index
+            (of the fix), displacement and radius in meters, lon and lat
+        """
+        state = self.current(session, config)
+        with self._lock:
+            return evaluate(state, ruche_ids, longitudes, latitudes,
+                            config.get('GEOFENCE_ALERT_COOLDOWN', 3600), now)
+
+    def record_alerts(self, breaches: Sequence[Dict], now: float):
+        """
+        Start the alert cooldown of the hives of breaches.
+
+        Call it once the alerts are committed: a failed write must not silence
+        the hive, so check leaves the state untouched.
+
+        Args:
+            breaches: Breaches returned by check
+            now: Epoch seconds passed to check
+        """
+        if not breaches:
+            return
+        with self._lock:
+            state = self.state
+            if state is None or not len(state):
+                return
+            positions, known = state.locate(np.array([b['ruche_id'] for b in breaches], dtype=np.int64))
+            where = positions[known]
+            state.last_alert[where] = np.fmax(state.last_alert[where], now)
+
+
+def evaluate(state: GeofenceState, ruche_ids: Sequence[int], longitudes: np.ndarray, latitudes: np.ndarray,
+             cooldown: float, now: Optional[float] = None) -> List[Dict]:
+    """
+    Vectorized geofence check of a batch of fixes against a state.
+
+    Does not update state.last_alert; see GeofenceEngine.check and
+    GeofenceEngine.record_alerts.
+    """
+    ruche_ids = np.asarray(ruche_ids, dtype=np.int64)
+    longitudes = np.asarray(longitudes, dtype=np.float64)
+    latitudes = np.asarray(latitudes, dtype=np.float64)
+    if not len(state) or not len(ruche_ids):
+        return []
+
+    positions, watched = state.locate(ruche_ids)
+    candidates = np.flatnonzero(watched & ~np.isnan(longitudes) & ~np.isnan(latitudes))
+    if not len(candidates):
+        return []
+
+    where = positions[candidates]
+    displacement = haversine(state.lon[where], state.lat[where], longitudes[candidates], latitudes[candidates])
+    outside = displacement > state.radius[where]
+    if not outside.any():
+        return []
+
+    candidates, where, displacement = candidates[outside], where[outside], displacement[outside]
+
+    # Largest displacement of each hive: sort by hive, then displacement descending
+    order = np.lexsort((-displacement, where))
+    candidates, where, displacement = candidates[order], where[order], displacement[order]
+    first = np.r_[True, where[1:] != where[:-1]]
+    candidates, where, displacement = candidates[first], where[first], displacement[first]
+
+    # NaN (never alerted) compares False, so those hives are always due
+    now = time.time() if now is None else now
+    due = ~(now - state.last_alert[where] < cooldown)
+    candidates, where, displacement = candidates[due], where[due], displacement[due]
+
+    return [
+        {
+            'rule_id': int(state.rule_ids[w]),
+            'ruche_id': int(state.ids[w]),
+            'index': int(i),
+            'displacement': float(d),
+            'radius': float(state.radius[w]),
+            'lon': float(longitudes[i]),
+            'lat': float(latitudes[i])
+        }
+        for i, w, d in zip(candidates.tolist(), where.tolist(), displacement.tolist())
+    ]
+
+
+geofence_engine = GeofenceEngine()
+
+
+def invalidate_geofences():
+    """Reload the geofence state on next use."""
+    geofence_engine.invalidate()
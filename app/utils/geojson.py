@@ -1,54 +1,89 @@
 """
 GeoJSON serialization utilities.
 """
-from geoalchemy2.shape import to_shape
-from shapely.geometry import mapping
+from app.utils.metrics import timed
+from app.utils.wkb import geojson_geometries
 
 
-def to_geojson_feature(model_instance):
+def to_geojson_feature(model_instance, geometry_attribute='geom'):
     """
     Convert a single model instance with geometry to a GeoJSON Feature.
     
     Args:
         model_instance: SQLAlchemy model instance with geom attribute
+        geometry_attribute: Geometry attribute to serialize (e.g. a
+            simplified geometry column)
         
     Returns:
         dict: GeoJSON Feature
     """
-    if not hasattr(model_instance, 'geom') or model_instance.geom is None:
+    geometry = getattr(model_instance, geometry_attribute, None)
+    if geometry is None:
         return None
     
-    # Convert WKB geometry to Shapely geometry
-    shape = to_shape(model_instance.geom)
+    return _feature(model_instance, geojson_geometries([geometry])[0])
+
+
+def _feature(model_instance, geometry):
+    """Build the Feature of a model instance from its decoded geometry."""
+    # Remove None geometry type to avoid issues
+    if geometry is None:
+        return None
     
-    # Create GeoJSON feature
-    feature = {
+    return {
         'type': 'Feature',
-        'geometry': mapping(shape),
+        'geometry': geometry,
         'properties': model_instance.to_dict()
     }
+
+
+def to_geojson_point_feature(longitude, latitude, properties):
+    """
+    Build a GeoJSON Point Feature from plain column values.
     
-    # Remove None geometry type to avoid issues
-    if feature['geometry'] is None:
-        return None
+    Used by queries that select coordinates directly (ST_X/ST_Y) instead of
+    loading full model instances.
     
-    return feature
+    Args:
+        longitude: Point longitude
+        latitude: Point latitude
+        properties: Feature properties
+        
+    Returns:
+        dict: GeoJSON Feature
+    """
+    return {
+        'type': 'Feature',
+        'geometry': {
+            'type': 'Point',
+            'coordinates': (longitude, latitude)
+        },
+        'properties': properties
+    }
 
 
-def to_geojson_collection(model_instances):
+def to_geojson_collection(model_instances, geometry_attribute='geom'):
     """
     Convert multiple model instances to a GeoJSON FeatureCollection.
     
     Args:
         model_instances: List of SQLAlchemy model instances with geom attribute
+        geometry_attribute: Geometry attribute to serialize
         
     Returns:
         dict: GeoJSON FeatureCollection
     """
+    # Decode all geometries in one vectorized pass instead of per row
+    instances = [
+        instance for instance in model_instances
+        if getattr(instance, geometry_attribute, None) is not None
+    ]
+    geometries = geojson_geometries([getattr(instance, geometry_attribute) for instance in instances])
+    
     features = []
     
-    for instance in model_instances:
-        feature = to_geojson_feature(instance)
+    for instance, geometry in zip(instances, geometries):
+        feature = _feature(instance, geometry)
         if feature is not None:
             features.append(feature)
     
@@ -58,17 +93,19 @@ def to_geojson_collection(model_instances):
     }
 
 
-def to_geojson(model_instance_or_list):
+@timed('serialization')
+def to_geojson(model_instance_or_list, geometry_attribute='geom'):
     """
     Convert model instance(s) to GeoJSON.
     
     Args:
         model_instance_or_list: Single model instance or list of instances
+        geometry_attribute: Geometry attribute to serialize
         
     Returns:
         dict: GeoJSON Feature or FeatureCollection
     """
     if isinstance(model_instance_or_list, list):
-        return to_geojson_collection(model_instance_or_list)
+        return to_geojson_collection(model_instance_or_list, geometry_attribute)
     else:
-        return to_geojson_feature(model_instance_or_list)
+        return to_geojson_feature(model_instance_or_list, geometry_attribute)
@@ -0,0 +1,180 @@
+"""
+Background database probe backing the readiness endpoint.
+
+A thread per process checks the database every HEALTH_PROBE_INTERVAL
+seconds (round trip and replication lag) and stores the result, so
+readiness requests only read memory: they are O(1) and never wait on a
+slow or unreachable database. A result older than HEALTH_PROBE_MAX_AGE
+counts as a failure, which covers a probe stuck on a hung connection.
+"""
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+from flask import current_app
+from sqlalchemy import text
+
+from app import db
+from app.utils.db_pool import pool_status
+
+# Seconds the server is behind its primary; 0 on a primary, and on a
+# standby that has replayed everything it received
+REPLICATION_LAG_SQL = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+""")
+
+
+def check_database(timeout_ms: int) -> Dict:
+    """
+    Run one database probe. Must be called inside an application context.
+
+    Args:
+        timeout_ms: Statement timeout for the probe queries
+
+    Returns:
+        dict: ok, latency_ms, replication_lag_seconds (None if unknown),
+        error and checked_at (epoch seconds)
+    """
+    start = time.perf_counter()
+    result = {'ok': False, 'latency_ms': None, 'replication_lag_seconds': None, 'error': None}
+
+    try:
+        if db.engine.dialect.name == 'postgresql':
+            db.session.execute(text(f'SET LOCAL statement_timeout = {int(timeout_ms)}'))
+        db.session.execute(text('SELECT 1'))
+        result['latency_ms'] = round((time.perf_counter() - start) * 1000, 3)
+        result['ok'] = True
+
+        if db.engine.dialect.name == 'postgresql':
+            result['replication_lag_seconds'] = float(db.session.execute(REPLICATION_LAG_SQL).scalar())
+    except Exception as e:
+        result['error'] = str(e).splitlines()[0] if str(e) else type(e).__name__
+    finally:
+        db.session.rollback()
+        db.session.remove()
+
+    result['checked_at'] = time.time()
+    return result
+
+
+def evaluate_readiness(probe: Optional[Dict], pool: Dict, config, now: float = None) -> Dict:
+    """
+    Decide readiness from the last probe result and the current pool state.
+
+    Args:
+        probe: Last result of check_database, or None if none yet
+        pool: Current pool_status of the engine
+        config: Application config (readiness thresholds)
+        now: Current epoch time (defaults to time.time())
+
+    Returns:
+        dict: ready (bool) and the individual checks with their status
+    """
+    now = time.time() if now is None else now
+    max_age = config.get('HEALTH_PROBE_MAX_AGE', 30)
+    max_saturation = config.get('READINESS_MAX_POOL_SATURATION', 1.0)
+    max_lag = config.get('READINESS_MAX_REPLICATION_LAG', 30)
+    checks = {}
+
+    if probe is None:
+        checks['database'] = {'status': 'unhealthy', 'message': 'No probe result yet'}
+    else:
+        age = now - probe['checked_at']
+        database = {
+            'status': 'healthy',
+            'latency_ms': probe['latency_ms'],
+            'age_seconds': round(age, 3)
+        }
+        if not probe['ok']:
+            database.update(status='unhealthy', message=f"Database connection failed: {probe['error']}")
+        elif age > max_age:
+            database.update(status='unhealthy', message=f'Probe result older than {max_age}s')
+        else:
+            database['message'] = 'Database connection successful'
+        checks['database'] = database
+
+        lag = probe.get('replication_lag_seconds')
+        if lag is not None:
+            checks['replication'] = {
+                'status': 'healthy' if lag <= max_lag else 'unhealthy',
+                'lag_seconds': round(lag, 3),
+                'max_lag_seconds': max_lag
+            }
+
+    capacity = pool.get('size', 0) + pool.get('max_overflow', 0)
+    if capacity > 0:
+        saturation = pool['checked_out'] / capacity
+        checks['pool'] = {
+            'status': 'healthy' if saturation < max_saturation else 'unhealthy',
+            'saturation': round(saturation, 3),
+            'checked_out': pool['checked_out'],
+            'capacity': capacity
+        }
+
+    return {
+        'ready': all(check['status'] == 'healthy' for check in checks.values()),
+        'checks': checks
+    }
+
+
+class DatabaseProbe:
+    """
+    Process-wide holder of the latest probe result with background refresh.
+
+    Like the spatial index, the thread is started lazily on first use in
+    each process, so it is safe with gunicorn's pre-fork model.
+    """
+
+    def __init__(self):
+        self.result: Optional[Dict] = None
+        self._start_lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def start(self, app):
+        """Start the background probe thread for this process if needed."""
+        if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+            return
+
+        with self._start_lock:
+            if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+                return
+            if self._pid != os.getpid():
+                # Results inherited from the parent process say nothing about this one
+                self.result = None
+            self._pid = os.getpid()
+            self._thread = threading.Thread(
+                target=self._run, args=(app,), name='health-probe', daemon=True
+            )
+            self._thread.start()
+
+    def _run(self, app):
+        interval = app.config.get('HEALTH_PROBE_INTERVAL', 5)
+        timeout_ms = app.config.get('HEALTH_PROBE_TIMEOUT_MS', 2000)
+        while True:
+            with app.app_context():
+                self.result = check_database(timeout_ms)
+            time.sleep(interval)
+
+
+database_probe = DatabaseProbe()
+
+
+def readiness() -> Dict:
+    """
+    Readiness of this process, from memory only.
+
+    The first call in a process starts the background probe; until its
+    first result arrives the process reports not ready.
+
+    Returns:
+        dict: ready (bool) and the individual checks
+    """
+    app = current_app._get_current_object()
+    database_probe.start(app)
+    return evaluate_readiness(database_probe.result, pool_status(db.engine), app.config)
@@ -0,0 +1,345 @@
+"""
+Inverse-distance-weighted (IDW) interpolation of hive readings on a grid.
+
+The latest temperature or humidity of every hive around the requested bbox
+is interpolated on a regular longitude/latitude grid. Hives and grid cells
+are placed on the unit sphere, so the k nearest hives of each cell are found
+with a scipy cKDTree on chord distance, which orders points like great-circle
+distance does. Cells are processed a block of rows at a time
+(INTERPOLATION_CHUNK_CELLS), so the neighbour arrays stay bounded whatever
+the grid size.
+
+The grid is returned as a float32 raster or as GeoJSON isobands (one
+MultiPolygon per value band). Results are cached per data version: the
+newest measurement id and the hive count and newest hive id, read in the
+request's transaction. A new reading or an added or removed hive therefore
+gives a fresh grid at once; edits to existing rows show up when the entry
+expires (INTERPOLATION_CACHE_TTL), or at once in the worker that made them.
+Each worker keeps at most INTERPOLATION_CACHE_SIZE grids.
+"""
+import json
+import math
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import shapely
+from sqlalchemy import func, text
+
+from app.utils.cache import TTLCache
+from app.utils.geodesic import EARTH_RADIUS_M
+from app.utils.spatial import parse_bbox
+
+VARIABLES = ('temperature', 'humidity')
+FORMATS = ('raster', 'geojson')
+
+# Latest non-null reading of each hive in the (widened) bbox
+LATEST_SQL = """
+    SELECT ST_X(r.geom) AS lon, ST_Y(r.geom) AS lat, latest.value
+    FROM ruches r
+    CROSS JOIN LATERAL (
+        SELECT m.{var} AS value
+        FROM measurements m
+        WHERE m.ruche_id = r.id AND m.{var} IS NOT NULL
+        ORDER BY m.recorded_at DESC
+        LIMIT 1
+    ) latest
+    WHERE r.geom && ST_MakeEnvelope(:xmin, :ymin, :xmax, :ymax, 4326)
+"""
+
+# Keyed by data version and everything that shapes the grid; a raster can
+# take INTERPOLATION_MAX_CELLS * 4 bytes, so only a few are kept per worker
+_interpolation_cache = TTLCache(ttl=300, maxsize=8)
+
+
+def interpolation_params(args, config) -> Dict:
+    """
+    Parse and validate the interpolation query parameters.
+
+    Args:
+        args: Request query parameters
+        config: Application config (INTERPOLATION_* settings)
+
+    Returns:
+        dict: var, bounds (snapped to the grid), resolution (degrees), width,
+        height, format and levels (None: equal bands)
+
+    Raises:
+        ValueError: If a parameter is missing or invalid, or the grid is too large
+    """
+    var = args.get('var', 'temperature').lower()
+    if var not in VARIABLES:
+        raise ValueError(f'var must be one of: {", ".join(VARIABLES)}')
+
+    bbox = args.get('bbox')
+    if not bbox:
+        raise ValueError('bbox parameter required (min_lon,min_lat,max_lon,max_lat)')
+    try:
+        bbox = parse_bbox(bbox)
+    except ValueError as e:
+        raise ValueError(f'Invalid bbox: {str(e)}')
+
+    span = max(bbox[2] - bbox[0], bbox[3] - bbox[1])
+    resolution = args.get('resolution')
+    if resolution is None:
+        resolution = span / config.get('INTERPOLATION_DEFAULT_CELLS', 256) if span > 0 else 0.01
+    else:
+        try:
+            resolution = float(resolution)
+        except ValueError:
+            raise ValueError('resolution must be a cell size in degrees')
+        if not math.isfinite(resolution) or resolution <= 0:
+            raise ValueError('resolution must be a positive cell size in degrees')
+
+    fmt = args.get('format', 'raster').lower()
+    if fmt not in FORMATS:
+        raise ValueError(f'format must be one of: {", ".join(FORMATS)}')
+
+    bounds = snap_bounds(bbox, resolution)
+    width = int(round((bounds[2] - bounds[0]) / resolution))
+    height = int(round((bounds[3] - bounds[1]) / resolution))
+    # Isobands cost far more per cell than the raster
+    if fmt == 'geojson':
+        max_cells = config.get('INTERPOLATION_MAX_CONTOUR_CELLS', 250000)
+    else:
+        max_cells = config.get('INTERPOLATION_MAX_CELLS', 1000000)
+    if width * height > max_cells:
+        raise ValueError(f'bbox and resolution give {width * height} cells; at most {max_cells} are allowed')
+
+    levels = args.get('levels')
+    if levels is not None:
+        try:
+            levels = tuple(sorted(float(level) for level in levels.split(',')))
+        except ValueError:
+            raise ValueError('levels must be comma-separated numbers')
+        if not all(math.isfinite(level) for level in levels):
+            raise ValueError('levels must be finite numbers')
+
+    return {
+        'var': var,
+        'bounds': bounds,
+        'resolution': resolution,
+        'width': width,
+        'height': height,
+        'format': fmt,
+        'levels': levels
+    }
+
+
+def snap_bounds(bbox, resolution: float) -> Tuple[float, float, float, float]:
+    """
+    Widen a bbox to whole cells of a grid anchored at (0, 0).
+
+    Nearby viewports at the same resolution then share cells and cache entries.
+    """
+    return (
+        math.floor(bbox[0] / resolution) * resolution, math.floor(bbox[1] / resolution) * resolution,
+        math.ceil(bbox[2] / resolution) * resolution, math.ceil(bbox[3] / resolution) * resolution
+    )
+
+
+def unit_vectors(lons: np.ndarray, lats: np.ndarray) -> np.ndarray:
+    """(n, 3) points on the unit sphere for longitude/latitude arrays."""
+    lon, lat = np.radians(lons), np.radians(lats)
+    cos_lat = np.cos(lat)
+    return np.column_stack((cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)))
+
+
+def idw_grid(lons: np.ndarray, lats: np.ndarray, values: np.ndarray, bounds: Sequence[float],
+             width: int, height: int, k: int = 8, power: float = 2.0, max_distance: float = 50000.0,
+             chunk_cells: int = 65536) -> np.ndarray:
+    """
+    Interpolate point values on a grid with inverse distance weighting.
+
+    Each cell takes the weighted mean of its k nearest points within
+    max_distance, with weights 1 / distance ** power. Cells with no point
+    within max_distance are NaN.
+
+    Args:
+        lons, lats, values: Sample points and their values
+        bounds: Grid bounds (min_lon, min_lat, max_lon, max_lat)
+        width, height: Grid size in cells
+        k: Number of neighbours per cell
+        power: Distance exponent
+        max_distance: Search radius in meters
+        chunk_cells: Cells interpolated per block
+
+    Returns:
+        ndarray: (height, width) float32 grid, first row to the north
+    """
+    grid = np.full((height, width), np.nan, dtype=np.float32)
+    values = np.asarray(values, dtype=np.float64)
+    if not len(values) or not width or not height:
+        return grid
+
+    # Imported here: scipy is only needed by this endpoint
+    from scipy.spatial import cKDTree
+
+    tree = cKDTree(unit_vectors(np.asarray(lons, dtype=np.float64), np.asarray(lats, dtype=np.float64)))
+    k = min(k, len(values))
+    max_chord = 2 * math.sin(min(max_distance / (2 * EARTH_RADIUS_M), math.pi / 2))
+
+    xmin, _, _, ymax = bounds
+    x_step = (bounds[2] - bounds[0]) / width
+    y_step = (bounds[3] - bounds[1]) / height
+    cell_lons = xmin + (np.arange(width) + 0.5) * x_step
+    rows_per_chunk = max(1, chunk_cells // width)
+
+    for top in range(0, height, rows_per_chunk):
+        rows = np.arange(top, min(top + rows_per_chunk, height))
+        cell_lats = ymax - (rows + 0.5) * y_step
+        lon_grid, lat_grid = np.meshgrid(cell_lons, cell_lats)
+        chord, index = tree.query(unit_vectors(lon_grid.ravel(), lat_grid.ravel()), k=k,
+                                  distance_upper_bound=max_chord)
+        chord, index = chord.reshape(len(chord), -1), index.reshape(len(index), -1)
+
+        found = np.isfinite(chord)
+        # Arc length in meters, floored so a cell on a hive takes its value
+        distance = np.maximum(2 * EARTH_RADIUS_M * np.arcsin(np.minimum(np.where(found, chord, 0) / 2, 1)), 1e-3)
+        weights = np.where(found, distance ** -power, 0.0)
+        total = weights.sum(axis=1)
+        weighted = (weights * values[np.where(found, index, 0)]).sum(axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            grid[rows] = np.where(total > 0, weighted / total, np.nan).reshape(len(rows), width)
+
+    return grid
+
+
+def band_edges(grid: np.ndarray, levels: Optional[Sequence[float]], bands: int = 10) -> List[float]:
+    """
+    Breakpoints between isobands: the given levels, or equal bands over the grid's range.
+    """
+    if levels is not None:
+        return list(levels)
+    known = grid[~np.isnan(grid)]
+    if not len(known) or known.min() == known.max():
+        return []
+    return np.linspace(float(known.min()), float(known.max()), bands + 1)[1:-1].tolist()
+
+
+def isobands(grid: np.ndarray, bounds: Sequence[float], edges: Sequence[float]) -> List[Dict]:
+    """
+    Filled contours of a grid as GeoJSON Features, one per non-empty band.
+
+    Runs of same-band cells along each row become one box, and the boxes of
+    a band are merged with one shapely union.
+
+    Args:
+        grid: (height, width) grid, first row to the north, NaN where unknown
+        bounds: Grid bounds (min_lon, min_lat, max_lon, max_lat)
+        edges: Ascending breakpoints; band i is [edges[i - 1], edges[i])
+
+    Returns:
+        list: Features with a (Multi)Polygon geometry and min/max properties
+        (null for the open-ended first and last bands)
+    """
+    height, width = grid.shape
+    if not grid.size:
+        return []
+    band = np.where(np.isnan(grid), -1, np.searchsorted(np.asarray(edges, dtype=np.float64), grid, side='right'))
+
+    starts = np.ones((height, width), dtype=bool)
+    starts[:, 1:] = band[:, 1:] != band[:, :-1]
+    first = np.flatnonzero(starts.ravel())
+    last = np.r_[first[1:], band.size] - 1
+    run_band = band.ravel()[first]
+    first, last, run_band = first[run_band >= 0], last[run_band >= 0], run_band[run_band >= 0]
+
+    x_step = (bounds[2] - bounds[0]) / width
+    y_step = (bounds[3] - bounds[1]) / height
+    row = first // width
+    boxes = shapely.box(
+        bounds[0] + (first % width) * x_step, bounds[3] - (row + 1) * y_step,
+        bounds[0] + (last % width + 1) * x_step, bounds[3] - row * y_step
+    )
+
+    features = []
+    bounded = [None, *edges, None]
+    for value in np.unique(run_band).tolist():
+        # Drop the vertices left along merged box edges
+        geometry = shapely.simplify(shapely.union_all(boxes[run_band == value]), min(x_step, y_step) * 1e-6)
+        features.append({
+            'type': 'Feature',
+            'geometry': json.loads(shapely.to_geojson(geometry)),
+            'properties': {'band': value, 'min': bounded[value], 'max': bounded[value + 1]}
+        })
+    return features
+
+
+def data_version(session):
+    """
+    Fingerprint of the readings the grids are built from.
+
+    Read in the session's transaction, so it sees the latest committed
+    writes (unlike the asynchronously flushed pg_stat counters). Index-only
+    lookups on both primary keys, plus a count of the (small) ruches table.
+    Updates to existing rows do not change it.
+    """
+    from app.models import Measurement, Ruche
+
+    return (
+        session.query(func.max(Measurement.id)).scalar(),
+        tuple(session.query(func.count(Ruche.id), func.max(Ruche.id)).one())
+    )
+
+
+def latest_readings(session, var: str, bounds: Sequence[float], max_distance: float):
+    """
+    Latest reading of every hive within max_distance of the bounds.
+
+    Returns:
+        tuple: (lons, lats, values) float64 arrays
+    """
+    # Degrees of latitude per meter; longitude margin grows towards the poles
+    margin_lat = math.degrees(max_distance / EARTH_RADIUS_M)
+    cos_lat = max(math.cos(math.radians(max(abs(bounds[1]), abs(bounds[3])))), 1e-6)
+    margin_lon = min(margin_lat / cos_lat, 360.0)
+    statement = text(LATEST_SQL.format(var=var)).bindparams(
+        xmin=max(bounds[0] - margin_lon, -180.0), ymin=max(bounds[1] - margin_lat, -90.0),
+        xmax=min(bounds[2] + margin_lon, 180.0), ymax=min(bounds[3] + margin_lat, 90.0)
+    )
+    rows = session.execute(statement).all()
+    readings = np.array([(row.lon, row.lat, row.value) for row in rows], dtype=np.float64).reshape(-1, 3)
+    return readings[:, 0], readings[:, 1], readings[:, 2]
+
+
+def interpolation_payload(session, params: Dict, config) -> Tuple[object, int]:
+    """
+    Interpolated grid for the parameters, cached per data version.
+
+    Args:
+        session: SQLAlchemy session
+        params: Result of interpolation_params
+        config: Application config (INTERPOLATION_* settings)
+
+    Returns:
+        tuple: (payload, hive_count); payload is float32 raster bytes or a
+        GeoJSON FeatureCollection string
+    """
+    _interpolation_cache.ttl = config.get('INTERPOLATION_CACHE_TTL', 300)
+    _interpolation_cache.maxsize = config.get('INTERPOLATION_CACHE_SIZE', 8)
+    max_distance = config.get('INTERPOLATION_MAX_DISTANCE', 50000)
+    key = (data_version(session), params['var'], params['bounds'], params['resolution'],
+           params['format'], params['levels'])
+
+    def compute():
+        lons, lats, values = latest_readings(session, params['var'], params['bounds'], max_distance)
+        grid = idw_grid(
+            lons, lats, values, params['bounds'], params['width'], params['height'],
+            k=config.get('INTERPOLATION_NEIGHBOURS', 8), power=config.get('INTERPOLATION_POWER', 2.0),
+            max_distance=max_distance, chunk_cells=config.get('INTERPOLATION_CHUNK_CELLS', 65536)
+        )
+        if params['format'] == 'raster':
+            return grid.astype('<f4').tobytes(), len(values)
+        features = isobands(grid, params['bounds'], band_edges(grid, params['levels']))
+        return json.dumps({
+            'type': 'FeatureCollection',
+            'bbox': list(params['bounds']),
+            'features': features
+        }), len(values)
+
+    return _interpolation_cache.get_or_set(key, compute)
+
+
+def invalidate_interpolation_cache():
+    """Drop every cached grid."""
+    _interpolation_cache.invalidate()
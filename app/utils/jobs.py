@@ -0,0 +1,510 @@
+"""
+Background jobs: long computations run outside the web workers.
+
+Clustering every hive, large exports and batch geocoding can outlast the
+gunicorn timeout and hold a sync worker while they run. Instead, they are
+submitted as jobs (POST /api/jobs, or automatically above
+JOBS_CLUSTER_THRESHOLD hives), polled, and their result fetched once done.
+
+Jobs are rows of the jobs table. The job worker (`flask run-jobs`, the
+worker process of the Procfile) claims queued jobs with FOR UPDATE SKIP
+LOCKED, so several workers can share the queue, and runs them in a local
+pool of JOBS_PROCESSES processes, each with its own application and
+connection pool. While a job runs, the worker refreshes its heartbeat; a
+job whose heartbeat is older than JOBS_STALE_AFTER seconds (its worker
+died) is queued again, or failed after JOBS_MAX_ATTEMPTS claims. Finished
+jobs are deleted JOBS_RESULT_TTL seconds after they end.
+
+Modules register their job kinds with @job_kind; a kind's function takes the
+submitted parameters and returns the result bytes and their MIME type, which
+are stored in the job row. Kinds with large results (exports) are registered
+with to_file=True instead: they write the result to the file path they are
+given, under JOBS_RESULT_DIR, and return its MIME type; the row only keeps
+the file name. Results above JOBS_RESULT_MAX_BYTES fail the job.
+"""
+import hashlib
+import json
+import os
+import secrets
+import signal
+import socket
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Iterable, List, Mapping, Optional, Tuple
+
+from flask import current_app, jsonify, url_for
+from sqlalchemy import DateTime, bindparam, delete, select, text, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import undefer
+
+from app import db
+from app.models import Job
+from app.utils.rucher_stats import StatsViewRefresher
+
+FINISHED_STATUSES = ('succeeded', 'failed')
+
+# Oldest queued jobs first; rows locked by another worker's claim are skipped
+CLAIM_SQL = """
+    UPDATE jobs
+    SET status = 'running', attempts = attempts + 1, worker = :worker,
+        started_at = :now, heartbeat_at = :now
+    WHERE id IN (
+        SELECT id FROM jobs
+        WHERE status = 'queued'
+        ORDER BY id
+        LIMIT :limit
+        {lock}
+    )
+    RETURNING id
+"""
+
+_kinds: Dict[str, Dict] = {}
+
+# Set in the pool processes
+_process_app = None
+# Engines of the runner, inherited by the pool processes through fork
+_inherited_engines = []
+
+
+def job_kind(name: str, parse: Optional[Callable[[Mapping], Dict]] = None, to_file: bool = False):
+    """
+    Decorator registering fn(params) -> (bytes, mime type) as a job kind.
+
+    Args:
+        name: Kind name clients submit
+        parse: Validates and normalizes submitted parameters, raising
+            ValueError; runs in the web worker
+        to_file: Register fn(params, path) -> mime type instead, writing
+            the result to path
+    """
+    def decorator(fn):
+        _kinds[name] = {'run': fn, 'parse': parse, 'to_file': to_file}
+        return fn
+    return decorator
+
+
+def job_kinds() -> List[str]:
+    """Names of the registered job kinds."""
+    return sorted(_kinds)
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def job_key(kind: str, params: Mapping) -> str:
+    """Hash identifying a kind and its parameters."""
+    return hashlib.sha256(json.dumps([kind, params], sort_keys=True).encode()).hexdigest()
+
+
+def result_file_path(name: str) -> str:
+    """Path of a result file in JOBS_RESULT_DIR."""
+    return os.path.join(current_app.config['JOBS_RESULT_DIR'], name)
+
+
+def remove_result_file(name: Optional[str]):
+    """Delete a result file, if any."""
+    if name:
+        try:
+            os.remove(result_file_path(name))
+        except FileNotFoundError:
+            pass
+
+
+def check_result_size(size: int):
+    """Raise ValueError if a result is larger than JOBS_RESULT_MAX_BYTES (0: no limit)."""
+    max_bytes = current_app.config.get('JOBS_RESULT_MAX_BYTES', 0)
+    if max_bytes and size > max_bytes:
+        raise ValueError(f'Result exceeds JOBS_RESULT_MAX_BYTES ({max_bytes} bytes)')
+
+
+def write_result_chunks(path: str, chunks: Iterable[bytes]):
+    """
+    Write a streamed result to a file, chunk by chunk.
+
+    Stops with ValueError as soon as the result exceeds JOBS_RESULT_MAX_BYTES.
+
+    Args:
+        path: Path given to a to_file job kind
+        chunks: Result bytes, e.g. an Arrow IPC stream
+    """
+    size = 0
+    with open(path, 'wb') as f:
+        for chunk in chunks:
+            size += len(chunk)
+            check_result_size(size)
+            f.write(chunk)
+
+
+def parse_job_request(data) -> Tuple[str, Dict]:
+    """
+    Validate a POST /api/jobs body.
+
+    Args:
+        data: Parsed JSON body: {"kind": ..., "params": {...}}
+
+    Returns:
+        tuple: (kind, normalized params)
+
+    Raises:
+        ValueError: If the kind is unknown or its parameters are invalid
+    """
+    if not isinstance(data, dict):
+        raise ValueError('Body must be a JSON object with kind and params')
+    kind = data.get('kind')
+    if kind not in _kinds:
+        raise ValueError(f'kind must be one of: {", ".join(job_kinds())}')
+    params = data.get('params') or {}
+    if not isinstance(params, dict):
+        raise ValueError('params must be an object')
+    parse = _kinds[kind]['parse']
+    return kind, parse(params) if parse is not None else params
+
+
+def submit_job(session, kind: str, params: Dict) -> Job:
+    """
+    Queue a job, or return the pending job with the same kind and parameters.
+
+    Args:
+        session: SQLAlchemy session
+        kind: Registered job kind
+        params: Parameters, as returned by the kind's parse function
+
+    Returns:
+        Job: The queued or already pending job (committed)
+    """
+    key = job_key(kind, params)
+    pending = select(Job).where(Job.key == key, Job.status.in_(('queued', 'running')))
+    # A replica may not have the pending job yet
+    primary = {'bind': db.engine}
+
+    job = session.execute(pending, bind_arguments=primary).scalar_one_or_none()
+    if job is not None:
+        return job
+
+    job = Job(kind=kind, params=params, key=key, status='queued', attempts=0)
+    session.add(job)
+    try:
+        session.commit()
+    except IntegrityError:
+        # Submitted concurrently by another request
+        session.rollback()
+        job = session.execute(pending, bind_arguments=primary).scalar_one_or_none()
+        if job is None:
+            raise
+    return job
+
+
+def get_job(session, job_id: int, with_result: bool = False) -> Optional[Job]:
+    """
+    Load a job from the primary, so it is found and current right after it changed.
+
+    Args:
+        session: SQLAlchemy session
+        job_id: Job id
+        with_result: Also load the result payload
+
+    Returns:
+        Job or None
+    """
+    statement = select(Job).where(Job.id == job_id)
+    if with_result:
+        statement = statement.options(undefer(Job.result))
+    return session.execute(statement, bind_arguments={'bind': db.engine}).scalar_one_or_none()
+
+
+def job_response(job: Job, status: int = 200):
+    """
+    JSON response describing a job, with its status and result URLs.
+
+    Args:
+        job: Job
+        status: HTTP status (202 when the job was just submitted)
+
+    Returns:
+        tuple: Flask response tuple
+    """
+    data = job.to_dict()
+    data['status_url'] = url_for('jobs.get_job', job_id=job.id)
+    if job.status == 'succeeded':
+        data['result_url'] = url_for('jobs.get_job_result', job_id=job.id)
+    headers = {'Location': data['status_url']} if status == 202 else {}
+    return jsonify({'job': data}), status, headers
+
+
+def claim_jobs(session, worker: str, limit: int) -> List[int]:
+    """
+    Mark up to limit queued jobs as running by this worker.
+
+    Returns:
+        list: Ids of the claimed jobs (committed)
+    """
+    lock = 'FOR UPDATE SKIP LOCKED' if session.get_bind().dialect.name == 'postgresql' else ''
+    statement = text(CLAIM_SQL.format(lock=lock)).bindparams(bindparam('now', type_=DateTime))
+    ids = session.execute(statement, {'worker': worker, 'now': utcnow(), 'limit': limit}).scalars().all()
+    session.commit()
+    return sorted(ids)
+
+
+def finish_job(session, job_id: int, worker: str, status: str, result: bytes = None,
+               result_type: str = None, error: str = None, result_path: str = None) -> bool:
+    """
+    Record the outcome of a job, unless it was taken over by another worker meanwhile.
+
+    Returns:
+        bool: Whether the job was updated
+    """
+    updated = session.execute(
+        update(Job)
+        .where(Job.id == job_id, Job.worker == worker, Job.status == 'running')
+        .values(status=status, result=result, result_type=result_type, error=error, result_path=result_path,
+                finished_at=utcnow())
+    ).rowcount
+    session.commit()
+    return updated > 0
+
+
+def run_job(session, job_id: int, worker: str) -> Optional[str]:
+    """
+    Run a claimed job and store its result or error.
+
+    Args:
+        session: SQLAlchemy session
+        job_id: Id of a job claimed by worker
+        worker: Claiming worker
+
+    Returns:
+        str or None: Final status, or None if the job is no longer this worker's
+    """
+    job = session.get(Job, job_id)
+    if job is None or job.status != 'running' or job.worker != worker:
+        session.rollback()
+        return None
+    kind, params = job.kind, job.params
+    session.rollback()
+
+    result = result_path = None
+    try:
+        if kind not in _kinds:
+            raise ValueError(f'Unknown job kind: {kind}')
+        if _kinds[kind]['to_file']:
+            # Unique per attempt: a requeued job never writes over a lost worker's file
+            result_path = f'{job_id}-{secrets.token_hex(8)}'
+            path = result_file_path(result_path)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            result_type = _kinds[kind]['run'](params, path)
+            check_result_size(os.path.getsize(path))
+        else:
+            result, result_type = _kinds[kind]['run'](params)
+            check_result_size(len(result))
+    except Exception as e:
+        session.rollback()
+        remove_result_file(result_path)
+        current_app.logger.error(f"Job {job_id} ({kind}) failed: {str(e)}")
+        finish_job(session, job_id, worker, 'failed', error=str(e) or repr(e))
+        return 'failed'
+
+    session.rollback()
+    if not finish_job(session, job_id, worker, 'succeeded', result=result, result_type=result_type,
+                      result_path=result_path):
+        remove_result_file(result_path)
+        return None
+    return 'succeeded'
+
+
+def heartbeat(session, job_ids: List[int], worker: str):
+    """Refresh the heartbeat of this worker's running jobs."""
+    if job_ids:
+        session.execute(
+            update(Job).where(Job.id.in_(job_ids), Job.worker == worker).values(heartbeat_at=utcnow())
+        )
+        session.commit()
+
+
+def requeue_stale_jobs(session, stale_after: float, max_attempts: int) -> int:
+    """
+    Queue again the running jobs whose worker stopped sending heartbeats.
+
+    Jobs already claimed max_attempts times are failed instead.
+
+    Returns:
+        int: Number of stale jobs
+    """
+    now = utcnow()
+    stale = (Job.status == 'running', Job.heartbeat_at < now - timedelta(seconds=stale_after))
+    failed = session.execute(
+        update(Job).where(*stale, Job.attempts >= max_attempts)
+        .values(status='failed', error='Worker lost', finished_at=now)
+    ).rowcount
+    requeued = session.execute(update(Job).where(*stale).values(status='queued', worker=None)).rowcount
+    session.commit()
+    return failed + requeued
+
+
+def purge_finished_jobs(session, ttl: float) -> int:
+    """Delete the jobs that finished more than ttl seconds ago, and their result files."""
+    result_paths = session.execute(
+        delete(Job)
+        .where(Job.status.in_(FINISHED_STATUSES), Job.finished_at < utcnow() - timedelta(seconds=ttl))
+        .returning(Job.result_path)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+    session.commit()
+    for result_path in result_paths:
+        remove_result_file(result_path)
+    return len(result_paths)
+
+
+def _init_process(config_object):
+    """Pool process initializer: a fresh application and connection pool."""
+    global _process_app
+    from app import create_app
+
+    # Ctrl-C reaches the whole process group; the runner decides when to stop
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # The runner's connections belong to the runner
+    for engine in _inherited_engines:
+        engine.dispose(close=False)
+    _process_app = create_app(config_object)
+
+
+def _execute(job_id: int, worker: str) -> Optional[str]:
+    """Run a job in a pool process."""
+    with _process_app.app_context():
+        try:
+            return run_job(db.session, job_id, worker)
+        finally:
+            db.session.remove()
+
+
+class JobRunner:
+    """
+    Claims queued jobs and runs them in a local process pool.
+
+    With JOBS_PROCESSES set to 0, jobs run one at a time in the runner
+    process itself (development and tests); heartbeats then stop while a
+    job runs, so keep JOBS_STALE_AFTER above the longest job.
+    """
+
+    def __init__(self, app, config_object=None):
+        """
+        Args:
+            app: Flask application
+            config_object: Configuration of the pool processes' applications
+                (default: the one create_app picks from FLASK_ENV)
+        """
+        self.app = app
+        self.config_object = config_object
+        config = app.config
+        self.processes = config.get('JOBS_PROCESSES', 2)
+        self.poll_interval = config.get('JOBS_POLL_INTERVAL', 1.0)
+        self.stale_after = config.get('JOBS_STALE_AFTER', 300.0)
+        self.max_attempts = config.get('JOBS_MAX_ATTEMPTS', 2)
+        self.result_ttl = config.get('JOBS_RESULT_TTL', 86400.0)
+        self.worker = f'{socket.gethostname()}:{os.getpid()}'
+        self.stopping = threading.Event()
+        self._pool = None
+        self._running = {}
+        self._maintained_at = None
+        self._stats_view = StatsViewRefresher()
+
+    def stop(self, *args):
+        """Stop claiming jobs; running ones are finished first."""
+        self.stopping.set()
+
+    def _start_pool(self):
+        global _inherited_engines
+        _inherited_engines = list(db.engines.values())
+        self._pool = ProcessPoolExecutor(
+            self.processes, initializer=_init_process, initargs=(self.config_object,)
+        )
+
+    def _collect(self):
+        """Forget finished futures; fail the jobs whose process crashed."""
+        broken = False
+        for future, job_id in list(self._running.items()):
+            if not future.done():
+                continue
+            del self._running[future]
+            try:
+                future.result()
+            except Exception as e:
+                current_app.logger.error(f"Job {job_id} crashed its process: {str(e)}")
+                finish_job(db.session, job_id, self.worker, 'failed', error=f'Job process crashed: {str(e)}')
+                broken = broken or isinstance(e, BrokenProcessPool)
+        if broken and not self.stopping.is_set():
+            self._pool.shutdown(wait=False)
+            self._start_pool()
+
+    def _maintain(self):
+        """Heartbeats, stale job recovery, purge and stats view refresh, every poll interval at most."""
+        now = utcnow()
+        if self._maintained_at is not None and (now - self._maintained_at).total_seconds() < self.poll_interval:
+            return
+        self._maintained_at = now
+        heartbeat(db.session, list(self._running.values()), self.worker)
+        stale = requeue_stale_jobs(db.session, self.stale_after, self.max_attempts)
+        if stale:
+            current_app.logger.warning(f"{stale} jobs of lost workers requeued or failed")
+        purge_finished_jobs(db.session, self.result_ttl)
+        # Debounced by RUCHER_STATS_REFRESH_INTERVAL, instead of in every write request
+        self._stats_view.maybe_refresh(db.session)
+
+    def _claim(self) -> int:
+        if self._pool is None:
+            job_ids = claim_jobs(db.session, self.worker, 1)
+            for job_id in job_ids:
+                run_job(db.session, job_id, self.worker)
+            return len(job_ids)
+
+        free = self.processes - len(self._running)
+        if free <= 0:
+            return 0
+        job_ids = claim_jobs(db.session, self.worker, free)
+        for job_id in job_ids:
+            self._running[self._pool.submit(_execute, job_id, self.worker)] = job_id
+        return len(job_ids)
+
+    def run(self, until_idle: bool = False):
+        """
+        Run jobs until stop() is called.
+
+        Args:
+            until_idle: Also return once the queue is empty and no job is running
+        """
+        with self.app.app_context():
+            if self.processes > 0:
+                self._start_pool()
+            current_app.logger.info(f"Job worker {self.worker} started with {self.processes} processes")
+            try:
+                while not self.stopping.is_set():
+                    self._collect()
+                    self._maintain()
+                    claimed = self._claim()
+                    if claimed:
+                        continue
+                    if until_idle and not self._running:
+                        break
+                    self.stopping.wait(self.poll_interval)
+            finally:
+                if self._pool is not None:
+                    # Running jobs are finished and recorded before exiting
+                    self._pool.shutdown(wait=True)
+                    self._collect()
+                db.session.remove()
+
+
+def run_worker(app, until_idle: bool = False):
+    """
+    Run the job worker until SIGTERM or SIGINT (flask run-jobs).
+
+    Args:
+        app: Flask application
+        until_idle: Return once the queue is empty
+    """
+    runner = JobRunner(app)
+    signal.signal(signal.SIGTERM, runner.stop)
+    signal.signal(signal.SIGINT, runner.stop)
+    runner.run(until_idle=until_idle)
@@ -0,0 +1,166 @@
+"""
+Validation and batch insert of ingested sensor measurements.
+"""
+import math
+from datetime import datetime, timezone
+from typing import Dict, List, Tuple
+
+from sqlalchemy import Integer, bindparam, insert, text
+from sqlalchemy.dialects.postgresql import ARRAY
+
+from app.models import Alert, Measurement
+
+NUMERIC_FIELDS = ('weight', 'temperature', 'humidity', 'signal')
+
+EXISTING_RUCHES_SQL = text('SELECT id FROM ruches WHERE id = ANY(:ids)').bindparams(
+    bindparam('ids', type_=ARRAY(Integer))
+)
+
+
+def _measurement_row(item) -> Dict:
+    if not isinstance(item, dict):
+        raise ValueError('must be an object')
+
+    ruche_id = item.get('ruche_id')
+    if isinstance(ruche_id, bool) or not isinstance(ruche_id, int):
+        raise ValueError('ruche_id must be an integer')
+
+    recorded_at = item.get('recorded_at')
+    if recorded_at is None:
+        recorded_at = datetime.now(timezone.utc)
+    else:
+        if not isinstance(recorded_at, str):
+            raise ValueError('recorded_at must be an ISO 8601 timestamp')
+        try:
+            recorded_at = datetime.fromisoformat(recorded_at)
+        except ValueError:
+            raise ValueError('recorded_at must be an ISO 8601 timestamp')
+        # Stored as UTC; naive timestamps are taken as UTC already
+        if recorded_at.tzinfo is not None:
+            recorded_at = recorded_at.astimezone(timezone.utc)
+
+    row = {'ruche_id': ruche_id, 'recorded_at': recorded_at}
+    for field in NUMERIC_FIELDS:
+        value = item.get(field)
+        if value is not None and (isinstance(value, bool) or not isinstance(value, (int, float))
+                                  or not math.isfinite(value)):
+            raise ValueError(f'{field} must be a number')
+        row[field] = value
+
+    raw = item.get('raw')
+    if raw is not None and not isinstance(raw, dict):
+        raise ValueError('raw must be an object')
+    row['raw'] = raw
+    return row
+
+
+def parse_measurement_batch(data, max_items: int) -> Tuple[List[Dict], List[Dict]]:
+    """
+    Parse and validate a batch of measurements.
+
+    Args:
+        data: Decoded JSON body, {"measurements": [...]} or a list
+        max_items: Maximum number of measurements accepted
+
+    Returns:
+        tuple: (rows, errors); errors lists {'index', 'error'} per invalid item
+
+    Raises:
+        ValueError: If the body is not a batch within limits
+    """
+    items = data.get('measurements') if isinstance(data, dict) else data
+    if not isinstance(items, list) or not items:
+        raise ValueError('measurements must be a non-empty list')
+    if len(items) > max_items:
+        raise ValueError(f'At most {max_items} measurements per request')
+
+    rows, errors = [], []
+    for i, item in enumerate(items):
+        try:
+            rows.append(_measurement_row(item))
+        except ValueError as e:
+            errors.append({'index': i, 'error': str(e)})
+    return rows, errors
+
+
+def missing_ruche_errors(session, rows: List[Dict]) -> List[Dict]:
+    """Errors for measurements of hives that do not exist (one query)."""
+    wanted = sorted({row['ruche_id'] for row in rows})
+    existing = set(session.execute(EXISTING_RUCHES_SQL, {'ids': wanted}).scalars())
+    return [
+        {'index': i, 'error': f"ruche {row['ruche_id']} does not exist"}
+        for i, row in enumerate(rows)
+        if row['ruche_id'] not in existing
+    ]
+
+
+def insert_measurements(session, rows: List[Dict]):
+    """Insert measurements as one multi-row INSERT. Does not commit."""
+    session.execute(insert(Measurement), rows)
+
+
+def geofence_alerts(breaches: List[Dict], rows: List[Dict], now: datetime) -> List[Dict]:
+    """
+    Alert rows of geofence breaches.
+
+    Args:
+        breaches: Result of GeofenceEngine.check
+        rows: The measurement rows the breaches index into
+        now: Trigger time
+
+    Returns:
+        list: Alert column values
+    """
+    return [
+        {
+            'rule_id': breach['rule_id'],
+            'ruche_id': breach['ruche_id'],
+            'triggered_at': now,
+            'payload': {
+                'type': 'geofence',
+                'displacement': round(breach['displacement'], 1),
+                'radius': breach['radius'],
+                'location': [breach['lon'], breach['lat']],
+                'recorded_at': rows[breach['index']]['recorded_at'].isoformat()
+            }
+        }
+        for breach in breaches
+    ]
+
+
+def anomaly_alerts(anomalies: List[Dict], rows: List[Dict], now: datetime) -> List[Dict]:
+    """
+    Alert rows of time series anomalies.
+
+    Args:
+        anomalies: Result of app.utils.anomaly.process_batch
+        rows: The measurement rows the anomalies index into
+        now: Trigger time
+
+    Returns:
+        list: Alert column values
+    """
+    return [
+        {
+            'rule_id': anomaly['rule_id'],
+            'ruche_id': anomaly['ruche_id'],
+            'triggered_at': now,
+            'payload': {
+                'type': 'anomaly',
+                'kind': anomaly['kind'],
+                'metric': anomaly['metric'],
+                'value': anomaly['value'],
+                'expected': round(anomaly['expected'], 3),
+                'z': round(anomaly['z'], 2),
+                'drift': round(anomaly['drift'], 2),
+                'recorded_at': rows[anomaly['row']]['recorded_at'].isoformat()
+            }
+        }
+        for anomaly in anomalies
+    ]
+
+
+def insert_alerts(session, alerts: List[Dict]):
+    """Insert alert rows as one multi-row INSERT. Does not commit."""
+    if alerts:
+        session.execute(insert(Alert), alerts)
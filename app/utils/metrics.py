@@ -0,0 +1,217 @@
+"""
+Prometheus metrics: request latency and size per route, SQL timing per
+request, and time spent serializing and clustering.
+
+Works with several gunicorn workers when PROMETHEUS_MULTIPROC_DIR is set
+(see gunicorn.conf.py): each worker writes its samples to that directory and
+/metrics aggregates them. prometheus_client is optional; without it the
+timing helpers are no-ops and /metrics returns 501.
+"""
+import functools
+import os
+import time
+
+from flask import Blueprint, Response, g, has_request_context, jsonify, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+try:
+    from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, generate_latest
+    from prometheus_client import multiprocess
+except ImportError:  # pragma: no cover - optional dependency
+    Histogram = None
+
+bp = Blueprint('metrics', __name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216, 67108864)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 500)
+
+if Histogram is not None:
+    REQUEST_LATENCY = Histogram(
+        'http_request_duration_seconds', 'Request latency',
+        ['blueprint', 'endpoint', 'method', 'status'], buckets=LATENCY_BUCKETS
+    )
+    RESPONSE_SIZE = Histogram(
+        'http_response_size_bytes', 'Response body size',
+        ['blueprint', 'endpoint'], buckets=SIZE_BUCKETS
+    )
+    DB_QUERIES = Histogram(
+        'db_queries_per_request', 'SQL statements executed per request',
+        ['endpoint'], buckets=QUERY_COUNT_BUCKETS
+    )
+    DB_REQUEST_TIME = Histogram(
+        'db_time_per_request_seconds', 'Time spent in SQL statements per request',
+        ['endpoint'], buckets=LATENCY_BUCKETS
+    )
+    DB_QUERY_LATENCY = Histogram(
+        'db_query_duration_seconds', 'Duration of individual SQL statements',
+        ['endpoint'], buckets=LATENCY_BUCKETS
+    )
+    DB_ERRORS = Counter('db_query_errors', 'SQL statements that raised', ['endpoint'])
+    FUNCTION_LATENCY = Histogram(
+        'function_duration_seconds', 'Time spent in instrumented functions (serialization, clustering)',
+        ['kind', 'function'], buckets=LATENCY_BUCKETS
+    )
+
+
+def metrics_available() -> bool:
+    """Whether prometheus_client is installed."""
+    return Histogram is not None
+
+
+def timed(kind: str, name: str = None):
+    """
+    Decorator recording a function's duration in function_duration_seconds.
+
+    Args:
+        kind: Category label ('serialization', 'clustering')
+        name: Function label (defaults to the function name)
+    """
+    def decorator(fn):
+        if not metrics_available():
+            return fn
+
+        histogram = FUNCTION_LATENCY.labels(kind, name or fn.__name__)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - start)
+
+        return wrapper
+
+    return decorator
+
+
+def _endpoint_label():
+    if not has_request_context():
+        return 'background'
+    return request.endpoint or 'unmatched'
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_start'].pop()
+    DB_QUERY_LATENCY.labels(_endpoint_label()).observe(elapsed)
+    if has_request_context() and 'db_queries' in g:
+        g.db_queries += 1
+        g.db_seconds += elapsed
+
+
+def _handle_error(context):
+    starts = context.connection.info.get('query_start') if context.connection is not None else None
+    if starts:
+        starts.pop()
+    DB_ERRORS.labels(_endpoint_label()).inc()
+
+
+def _before_request():
+    g.request_start = time.perf_counter()
+    g.db_queries = 0
+    g.db_seconds = 0.0
+
+
+class _CountingIterable:
+    """Response body iterable counting the bytes it yields."""
+
+    def __init__(self, body):
+        self.body = body
+        self.bytes = 0
+
+    def __iter__(self):
+        for chunk in self.body:
+            self.bytes += len(chunk.encode() if isinstance(chunk, str) else chunk)
+            yield chunk
+
+    def close(self):
+        if hasattr(self.body, 'close'):
+            self.body.close()
+
+
+def _after_request(response):
+    if 'request_start' not in g or request.endpoint == 'metrics.metrics':
+        return response
+
+    endpoint = request.endpoint or 'unmatched'
+    blueprint = request.blueprint or ''
+    start = g.request_start
+    latency = REQUEST_LATENCY.labels(blueprint, endpoint, request.method, str(response.status_code))
+    size = RESPONSE_SIZE.labels(blueprint, endpoint)
+    DB_QUERIES.labels(endpoint).observe(g.db_queries)
+    DB_REQUEST_TIME.labels(endpoint).observe(g.db_seconds)
+
+    if not response.is_streamed:
+        latency.observe(time.perf_counter() - start)
+        size.observe(response.calculate_content_length() or 0)
+        return response
+
+    # A streamed body is produced after this hook returns: record when the
+    # server closes the response. File responses know their length upfront
+    # and keep their body untouched (wsgi.file_wrapper).
+    if response.content_length is None:
+        body = response.response = _CountingIterable(response.response)
+    else:
+        body = None
+
+    def _record():
+        latency.observe(time.perf_counter() - start)
+        size.observe(body.bytes if body is not None else response.content_length)
+
+    response.call_on_close(_record)
+    return response
+
+
+@bp.route('/metrics', methods=['GET'])
+def metrics():
+    """
+    Prometheus metrics in the text exposition format.
+
+    Returns:
+        Metrics of every worker when PROMETHEUS_MULTIPROC_DIR is set,
+        otherwise of the worker that answers
+    """
+    if not metrics_available():
+        return jsonify({'error': 'prometheus_client is not installed'}), 501
+
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        payload = generate_latest(registry)
+    else:
+        payload = generate_latest()
+
+    return Response(payload, mimetype=CONTENT_TYPE_LATEST)
+
+
+def init_metrics(app):
+    """
+    Install request and SQL instrumentation and register /metrics.
+
+    SQL events are listened to on the Engine class, so every engine of the
+    process (including the one created lazily by Flask-SQLAlchemy) is timed.
+
+    Args:
+        app: Flask application
+    """
+    if not app.config.get('METRICS_ENABLED', True):
+        return
+
+    app.register_blueprint(bp)
+    if not metrics_available():
+        app.logger.warning('prometheus_client is not installed; /metrics is disabled')
+        return
+
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(Engine, 'handle_error', _handle_error)
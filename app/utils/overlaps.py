@@ -0,0 +1,201 @@
+"""
+Forage overlap between apiaries.
+
+Two apiaries compete for forage when their forage areas, the apiary
+geometry buffered by the foraging radius (about 3 km for honey bees),
+intersect. Pairs are found with a self-join of ruchers on ST_DWithin over
+geography(geom), which the idx_ruchers_geom_geography GiST index serves,
+so each apiary is only compared with its neighbours instead of with every
+other apiary.
+
+With RUCHER_OVERLAPS_PRECOMPUTED the pairs at RUCHER_OVERLAP_RADIUS are
+kept in the rucher_overlaps table. Adding or moving apiaries only
+recomputes the pairs of those apiaries (refresh_overlaps with their ids);
+deleted apiaries drop their pairs through the foreign key cascade.
+"""
+import math
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from flask import current_app
+from sqlalchemy import Integer, bindparam, text
+from sqlalchemy.dialects.postgresql import ARRAY
+
+# Pairs of apiaries c and o whose forage areas intersect, as (a < b)
+PAIRS_SQL = """
+    SELECT LEAST(c.id, o.id) AS rucher_a_id,
+           GREATEST(c.id, o.id) AS rucher_b_id,
+           ST_Distance(geography(c.geom), geography(o.geom)) AS distance,
+           ST_Area(ST_Intersection(
+               ST_Buffer(geography(c.geom), :radius),
+               ST_Buffer(geography(o.geom), :radius)
+           )) AS overlap_area
+    FROM ruchers c
+    JOIN ruchers o ON o.id <> c.id
+        AND ST_DWithin(geography(c.geom), geography(o.geom), 2 * :radius)
+    WHERE {filter}
+"""
+# Every pair once
+ALL_PAIRS_FILTER = 'c.id < o.id'
+# Pairs involving the given apiaries, once even when both sides are given
+IDS_PAIRS_FILTER = 'c.id = ANY(:ids) AND NOT (o.id = ANY(:ids) AND o.id < c.id)'
+
+NAMED_SQL = """
+    SELECT p.rucher_a_id, a.name AS rucher_a_name,
+           p.rucher_b_id, b.name AS rucher_b_name,
+           p.distance, p.overlap_area
+    FROM ({pairs}) p
+    JOIN ruchers a ON a.id = p.rucher_a_id
+    JOIN ruchers b ON b.id = p.rucher_b_id
+    WHERE p.overlap_area > :min_area
+    ORDER BY p.overlap_area DESC, p.rucher_a_id, p.rucher_b_id
+"""
+
+PRECOMPUTED_SQL = """
+    SELECT p.rucher_a_id, a.name AS rucher_a_name,
+           p.rucher_b_id, b.name AS rucher_b_name,
+           p.distance, p.overlap_area
+    FROM rucher_overlaps p
+    JOIN ruchers a ON a.id = p.rucher_a_id
+    JOIN ruchers b ON b.id = p.rucher_b_id
+    WHERE p.radius = :radius AND p.overlap_area > :min_area {filter}
+    ORDER BY p.overlap_area DESC, p.rucher_a_id, p.rucher_b_id
+"""
+
+DELETE_ALL_SQL = text('DELETE FROM rucher_overlaps')
+DELETE_IDS_SQL = text(
+    'DELETE FROM rucher_overlaps WHERE rucher_a_id = ANY(:ids) OR rucher_b_id = ANY(:ids)'
+).bindparams(bindparam('ids', type_=ARRAY(Integer)))
+
+INSERT_SQL = """
+    INSERT INTO rucher_overlaps (rucher_a_id, rucher_b_id, radius, distance, overlap_area, computed_at)
+    SELECT p.rucher_a_id, p.rucher_b_id, :radius, p.distance, p.overlap_area, now() AT TIME ZONE 'utc'
+    FROM ({pairs}) p
+    WHERE p.overlap_area > 0
+"""
+INSERT_ALL_SQL = text(INSERT_SQL.format(pairs=PAIRS_SQL.format(filter=ALL_PAIRS_FILTER)))
+INSERT_IDS_SQL = text(INSERT_SQL.format(pairs=PAIRS_SQL.format(filter=IDS_PAIRS_FILTER))).bindparams(
+    bindparam('ids', type_=ARRAY(Integer))
+)
+
+
+def overlap_params(args, config) -> Dict:
+    """
+    Parse and validate the overlap query parameters.
+
+    Args:
+        args: Request query parameters
+        config: Application config (RUCHER_OVERLAP_* settings)
+
+    Returns:
+        dict: radius (meters), rucher_id (or None) and min_area (m²)
+
+    Raises:
+        ValueError: If a parameter is invalid
+    """
+    try:
+        radius = float(args.get('radius', config.get('RUCHER_OVERLAP_RADIUS', 3000)))
+    except ValueError:
+        raise ValueError('radius must be a number of meters')
+    max_radius = config.get('RUCHER_OVERLAP_MAX_RADIUS', 20000)
+    if not math.isfinite(radius) or radius <= 0 or radius > max_radius:
+        raise ValueError(f'radius must be between 0 and {max_radius} meters')
+
+    rucher_id = args.get('rucher_id')
+    if rucher_id is not None:
+        try:
+            rucher_id = int(rucher_id)
+        except ValueError:
+            raise ValueError('rucher_id must be an integer')
+
+    try:
+        min_area = float(args.get('min_area', 0))
+    except ValueError:
+        raise ValueError('min_area must be a number of square meters')
+    if not math.isfinite(min_area) or min_area < 0:
+        raise ValueError('min_area must be zero or positive')
+
+    return {'radius': radius, 'rucher_id': rucher_id, 'min_area': min_area}
+
+
+def _pair_from_row(row) -> Dict:
+    return {
+        'rucher_a': {'id': row.rucher_a_id, 'name': row.rucher_a_name},
+        'rucher_b': {'id': row.rucher_b_id, 'name': row.rucher_b_name},
+        'distance': float(row.distance),
+        'overlap_area': float(row.overlap_area)
+    }
+
+
+def live_statement(radius: float, rucher_id: Optional[int], min_area: float):
+    """Overlap pairs computed from the ruchers table."""
+    if rucher_id is None:
+        return text(NAMED_SQL.format(pairs=PAIRS_SQL.format(filter=ALL_PAIRS_FILTER))).bindparams(
+            radius=radius, min_area=min_area
+        )
+    return text(NAMED_SQL.format(pairs=PAIRS_SQL.format(filter=IDS_PAIRS_FILTER))).bindparams(
+        bindparam('ids', value=[rucher_id], type_=ARRAY(Integer)), radius=radius, min_area=min_area
+    )
+
+
+def precomputed_statement(radius: float, rucher_id: Optional[int], min_area: float):
+    """Overlap pairs read from the rucher_overlaps table."""
+    if rucher_id is None:
+        return text(PRECOMPUTED_SQL.format(filter='')).bindparams(radius=radius, min_area=min_area)
+    return text(PRECOMPUTED_SQL.format(filter='AND (p.rucher_a_id = :id OR p.rucher_b_id = :id)')).bindparams(
+        radius=radius, min_area=min_area, id=rucher_id
+    )
+
+
+def rucher_overlaps(session, radius: float, rucher_id: Optional[int] = None,
+                    min_area: float = 0.0) -> Tuple[List[Dict], str]:
+    """
+    Pairs of apiaries whose forage areas overlap, largest overlap first.
+
+    The precomputed table is used when RUCHER_OVERLAPS_PRECOMPUTED is set
+    and radius is RUCHER_OVERLAP_RADIUS; otherwise pairs are computed live.
+
+    Args:
+        session: SQLAlchemy session
+        radius: Forage radius in meters
+        rucher_id: Only the pairs involving this apiary (None: all pairs)
+        min_area: Only overlaps larger than this area in m²
+
+    Returns:
+        tuple: (pairs, source) where source is 'precomputed' or 'live'
+    """
+    config = current_app.config
+    if config.get('RUCHER_OVERLAPS_PRECOMPUTED', False) and radius == config.get('RUCHER_OVERLAP_RADIUS', 3000):
+        try:
+            with session.begin_nested():
+                rows = session.execute(precomputed_statement(radius, rucher_id, min_area)).all()
+            return [_pair_from_row(row) for row in rows], 'precomputed'
+        except Exception as e:
+            current_app.logger.warning(f"Precomputed overlaps unavailable, using live query: {str(e)}")
+
+    rows = session.execute(live_statement(radius, rucher_id, min_area)).all()
+    return [_pair_from_row(row) for row in rows], 'live'
+
+
+def refresh_overlaps(session, rucher_ids: Optional[Sequence[int]] = None) -> int:
+    """
+    Recompute precomputed overlaps at RUCHER_OVERLAP_RADIUS. Does not commit.
+
+    Args:
+        session: SQLAlchemy session
+        rucher_ids: Apiaries added or moved; only their pairs are recomputed
+            (None: rebuild the whole table)
+
+    Returns:
+        int: Number of pairs written
+    """
+    radius = float(current_app.config.get('RUCHER_OVERLAP_RADIUS', 3000))
+    if rucher_ids is None:
+        session.execute(DELETE_ALL_SQL)
+        return session.execute(INSERT_ALL_SQL, {'radius': radius}).rowcount
+
+    ids = sorted(set(rucher_ids))
+    if not ids:
+        return 0
+    # Pairs kept at a former radius are stale too and never read back
+    session.execute(DELETE_IDS_SQL, {'ids': ids})
+    return session.execute(INSERT_IDS_SQL, {'radius': radius, 'ids': ids}).rowcount
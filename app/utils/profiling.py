@@ -0,0 +1,178 @@
+"""
+Opt-in per-request profiling and slow-query logging.
+
+Profiling (PROFILING_ENABLED) profiles a request when its PROFILING_HEADER
+header matches PROFILING_TOKEN or it is picked by PROFILING_SAMPLE_RATE,
+and writes the profile to PROFILING_DIR. The file name is returned in the
+X-Profile-Id response header. Without a token the header is ignored, so
+clients cannot trigger profiles.
+
+Slow-query logging (SLOW_QUERY_THRESHOLD_MS > 0) logs every SQL statement
+slower than the threshold with its EXPLAIN plan.
+
+Nothing is registered when both are off, so the disabled cost is zero.
+"""
+import cProfile
+import hmac
+import logging
+import os
+import random
+import time
+import uuid
+
+from flask import current_app, g, has_app_context, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+# Slow-query settings of the process, set by init_profiling
+_slow_query = {'threshold': None, 'explain': True}
+
+
+def _should_profile(config) -> bool:
+    header = request.headers.get(config.get('PROFILING_HEADER', 'X-Profile'))
+    token = config.get('PROFILING_TOKEN')
+    if header is not None and token:
+        return hmac.compare_digest(header.encode(), token.encode())
+    return random.random() < config.get('PROFILING_SAMPLE_RATE', 0.0)
+
+
+def _start_profile():
+    config = current_app.config
+    if not _should_profile(config):
+        return
+
+    if config.get('PROFILING_ENGINE', 'cprofile') == 'pyinstrument':
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            current_app.logger.warning('pyinstrument is not installed; using cProfile')
+        else:
+            g.profiler = Profiler()
+            g.profiler.start()
+            return
+
+    g.profiler = cProfile.Profile()
+    g.profiler.enable()
+
+
+def _prune(directory: str, max_files: int):
+    """Delete the oldest profiles beyond max_files."""
+    entries = sorted(os.scandir(directory), key=lambda entry: entry.stat().st_mtime)
+    for entry in entries[:max(0, len(entries) - max_files)]:
+        try:
+            os.remove(entry.path)
+        except OSError:
+            pass
+
+
+def _stop_profile(response):
+    profiler = g.pop('profiler', None)
+    if profiler is None:
+        return response
+
+    config = current_app.config
+    directory = config.get('PROFILING_DIR', '/tmp/beetrack-profiles')
+    os.makedirs(directory, exist_ok=True)
+    name = '{}-{}-{}-{}'.format(
+        time.strftime('%Y%m%dT%H%M%S'), request.endpoint or 'unmatched', os.getpid(), uuid.uuid4().hex[:8]
+    )
+
+    try:
+        if isinstance(profiler, cProfile.Profile):
+            profiler.disable()
+            name += '.prof'
+            profiler.dump_stats(os.path.join(directory, name))
+        else:
+            profiler.stop()
+            name += '.html'
+            with open(os.path.join(directory, name), 'w') as f:
+                f.write(profiler.output_html())
+        _prune(directory, config.get('PROFILING_MAX_FILES', 500))
+    except OSError as e:
+        current_app.logger.error(f"Could not write profile {name}: {str(e)}")
+        return response
+
+    response.headers['X-Profile-Id'] = name
+    return response
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('slow_query_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed_ms = (time.perf_counter() - conn.info['slow_query_start'].pop()) * 1000
+    if elapsed_ms < _slow_query['threshold']:
+        return
+
+    plan = None
+    if _slow_query['explain'] and not executemany and conn.dialect.name == 'postgresql' \
+            and statement.lstrip().split(None, 1)[0].upper() in ('SELECT', 'WITH'):
+        plan = _explain(conn, statement, parameters)
+
+    endpoint = request.endpoint if has_request_context() else None
+    log = current_app.logger if has_app_context() else logger
+    log.warning(
+        f"Slow query ({elapsed_ms:.1f} ms, endpoint {endpoint}): {statement}\n"
+        f"Parameters: {str(parameters)[:1000]}"
+        + (f"\nPlan:\n{plan}" if plan else '')
+    )
+
+
+def _explain(conn, statement, parameters):
+    """
+    EXPLAIN a statement with a separate cursor on the same connection.
+
+    Plain EXPLAIN plans without executing, and the raw cursor bypasses the
+    SQLAlchemy events, so this cannot recurse. A savepoint keeps a failed
+    EXPLAIN from aborting the request's transaction.
+    """
+    try:
+        cursor = conn.connection.cursor()
+        try:
+            cursor.execute('SAVEPOINT slow_query_explain')
+            try:
+                cursor.execute('EXPLAIN ' + statement, parameters)
+                plan = '\n'.join(row[0] for row in cursor.fetchall())
+            except Exception:
+                cursor.execute('ROLLBACK TO SAVEPOINT slow_query_explain')
+                raise
+            cursor.execute('RELEASE SAVEPOINT slow_query_explain')
+            return plan
+        finally:
+            cursor.close()
+    except Exception as e:
+        return f'(EXPLAIN failed: {str(e).strip()})'
+
+
+def _handle_error(context):
+    starts = context.connection.info.get('slow_query_start') if context.connection is not None else None
+    if starts:
+        starts.pop()
+
+
+def init_profiling(app):
+    """
+    Register the profiling hooks and slow-query listeners that are enabled.
+
+    Args:
+        app: Flask application
+    """
+    if app.config.get('PROFILING_ENABLED', False):
+        if not app.config.get('PROFILING_TOKEN'):
+            app.logger.warning(
+                'PROFILING_TOKEN is not set: the profiling header is ignored, only sampled requests are profiled'
+            )
+        app.before_request(_start_profile)
+        app.after_request(_stop_profile)
+
+    threshold = app.config.get('SLOW_QUERY_THRESHOLD_MS', 0)
+    if threshold:
+        _slow_query['threshold'] = threshold
+        _slow_query['explain'] = app.config.get('SLOW_QUERY_EXPLAIN', True)
+        if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+            event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+            event.listen(Engine, 'handle_error', _handle_error)
@@ -0,0 +1,298 @@
+"""
+Request parameter parsing shared by the Flask routes and the async app.
+
+Parsers take any mapping with a ``get`` method (Flask ``request.args``,
+Starlette ``QueryParams`` or a decoded JSON body), return plain values or
+SQL criteria and raise ValueError with a client-facing message on bad input.
+"""
+from datetime import datetime
+from typing import Dict, List, Mapping, Optional, Tuple
+
+from app.models import Measurement, Ruche
+from app.utils.geojson import to_geojson_point_feature
+from app.utils.spatial import bbox_filter, parse_bbox, radius_filter
+
+# Columns selected by the nearby and KNN queries
+NEARBY_COLUMNS = [Ruche.id, Ruche.name, Ruche.rucher_id, Ruche.queen_info, Ruche.created_at, Ruche.active]
+KNN_COLUMNS = [Ruche.id, Ruche.name, Ruche.rucher_id, Ruche.active]
+
+
+def parse_lat_lon(lat, lon) -> Tuple[float, float]:
+    """
+    Validate a latitude/longitude pair.
+
+    Args:
+        lat: Latitude (any value float() accepts)
+        lon: Longitude (any value float() accepts)
+
+    Returns:
+        tuple: (lat, lon) as floats
+
+    Raises:
+        ValueError: If the values are not numbers or out of range
+    """
+    try:
+        lat = float(lat)
+        lon = float(lon)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid coordinate format")
+
+    if not (-90 <= lat <= 90):
+        raise ValueError("Latitude must be between -90 and 90")
+    if not (-180 <= lon <= 180):
+        raise ValueError("Longitude must be between -180 and 180")
+
+    return lat, lon
+
+
+def _optional_number(args: Mapping, name: str, cast, default=None):
+    """Read an optional numeric parameter, falling back to the default when unparsable."""
+    value = args.get(name)
+    if value is None:
+        return default
+    try:
+        return cast(value)
+    except (ValueError, TypeError):
+        return default
+
+
+def collection_criteria(model_class, args: Mapping, filter_names: Tuple[str, ...] = ()) -> Dict:
+    """
+    Parse the filters of a collection endpoint (/ruches, /ruchers).
+
+    Args:
+        model_class: Ruche or Rucher
+        args: Query parameters
+        filter_names: Attribute filters accepted ('active', 'rucher_id')
+
+    Returns:
+        dict: 'criteria' (SQL expressions), 'filters' (attribute values),
+        'bbox' (tuple or None) and 'circle' ((lon, lat, radius) or None)
+
+    Raises:
+        ValueError: If a parameter is invalid
+    """
+    criteria = []
+    filters = {}
+
+    active = args.get('active') if 'active' in filter_names else None
+    if active is not None:
+        filters['active'] = active.lower() == 'true'
+        criteria.append(model_class.active == filters['active'])
+
+    rucher_id = args.get('rucher_id') if 'rucher_id' in filter_names else None
+    if rucher_id:
+        try:
+            filters['rucher_id'] = int(rucher_id)
+        except (ValueError, TypeError):
+            raise ValueError('Invalid rucher_id parameter')
+        criteria.append(model_class.rucher_id == filters['rucher_id'])
+
+    bbox = args.get('bbox')
+    if bbox:
+        try:
+            bbox = parse_bbox(bbox)
+        except ValueError as e:
+            raise ValueError(f'Invalid bbox parameter: {str(e)}')
+        criteria.append(bbox_filter(model_class, bbox))
+    else:
+        bbox = None
+
+    radius = args.get('radius')
+    lat = args.get('lat')
+    lon = args.get('lon')
+
+    circle = None
+    if radius and lat and lon:
+        try:
+            circle = (float(lon), float(lat), float(radius))
+        except (ValueError, TypeError):
+            raise ValueError('Invalid radius parameters')
+        criteria.append(radius_filter(model_class, f'POINT({circle[0]} {circle[1]})', circle[2]))
+
+    return {'criteria': criteria, 'filters': filters, 'bbox': bbox, 'circle': circle}
+
+
+def nearby_params(args: Mapping, max_limit: int) -> Dict:
+    """
+    Parse the parameters of the nearby search.
+
+    Args:
+        args: Query parameters
+        max_limit: Largest accepted limit
+
+    Returns:
+        dict: lat, lon, radius_meters, order and limit (None when not given:
+        every hive within the radius is returned, never a silent subset)
+
+    Raises:
+        ValueError: If a parameter is missing or invalid
+    """
+    lat = _optional_number(args, 'lat', float)
+    lon = _optional_number(args, 'lon', float)
+    radius = _optional_number(args, 'radius', int, default=1000)
+
+    if lat is None or lon is None:
+        raise ValueError('lat and lon parameters required')
+
+    lat, lon = parse_lat_lon(lat, lon)
+
+    order = args.get('order')
+    if order not in (None, 'distance'):
+        raise ValueError("order must be 'distance'")
+
+    limit = args.get('limit')
+    if limit is not None:
+        try:
+            limit = int(limit)
+        except (ValueError, TypeError):
+            limit = None
+        if limit is None or not 1 <= limit <= max_limit:
+            raise ValueError(f'limit must be between 1 and {max_limit}')
+
+    return {'lat': lat, 'lon': lon, 'radius_meters': radius, 'order': order, 'limit': limit}
+
+
+def knn_params(data: Optional[Mapping], max_points: int, max_k: int) -> Dict:
+    """
+    Parse the JSON body of the batch nearest-neighbour search.
+
+    Args:
+        data: Decoded JSON body
+        max_points: Largest accepted number of query points
+        max_k: Largest accepted k
+
+    Returns:
+        dict: latitudes, longitudes, k, active (bool or None) and criteria
+
+    Raises:
+        ValueError: If the body is missing or invalid
+    """
+    if not data:
+        raise ValueError('JSON body required')
+
+    points = data.get('points')
+    if not isinstance(points, list) or not points:
+        raise ValueError('points must be a non-empty list')
+
+    if len(points) > max_points:
+        raise ValueError(f'At most {max_points} points per request')
+
+    try:
+        k = int(data.get('k', 5))
+    except (ValueError, TypeError):
+        raise ValueError('Invalid k parameter')
+
+    if not 1 <= k <= max_k:
+        raise ValueError(f'k must be between 1 and {max_k}')
+
+    latitudes = []
+    longitudes = []
+    for index, point in enumerate(points):
+        if not isinstance(point, dict):
+            raise ValueError(f'Point {index} must be an object with lat and lon')
+        try:
+            lat, lon = parse_lat_lon(point.get('lat'), point.get('lon'))
+        except ValueError as e:
+            raise ValueError(f'Point {index}: {str(e)}')
+        latitudes.append(lat)
+        longitudes.append(lon)
+
+    criteria = []
+    active = data.get('active')
+    if active is not None:
+        active = str(active).lower() == 'true'
+        criteria.append(Ruche.active == active)
+
+    return {'latitudes': latitudes, 'longitudes': longitudes, 'k': k, 'active': active, 'criteria': criteria}
+
+
+def measurement_criteria(args: Mapping) -> List:
+    """
+    Parse the filters of the measurement export.
+
+    Args:
+        args: Query parameters (ruche_id, start, end)
+
+    Returns:
+        list: SQL filter expressions
+
+    Raises:
+        ValueError: If a parameter is invalid
+    """
+    criteria = []
+
+    ruche_id = args.get('ruche_id')
+    if ruche_id:
+        try:
+            criteria.append(Measurement.ruche_id == int(ruche_id))
+        except (ValueError, TypeError):
+            raise ValueError('Invalid ruche_id parameter')
+
+    try:
+        start = args.get('start')
+        if start:
+            criteria.append(Measurement.recorded_at >= datetime.fromisoformat(start))
+
+        end = args.get('end')
+        if end:
+            criteria.append(Measurement.recorded_at < datetime.fromisoformat(end))
+    except ValueError:
+        raise ValueError('start and end must be ISO 8601 timestamps')
+
+    return criteria
+
+
+def nearby_feature(row) -> Dict:
+    """GeoJSON Feature for a row of nearby_statement(NEARBY_COLUMNS)."""
+    return to_geojson_point_feature(
+        row.longitude,
+        row.latitude,
+        {
+            'id': row.id,
+            'name': row.name,
+            'rucher_id': row.rucher_id,
+            'queen_info': row.queen_info,
+            'created_at': row.created_at.isoformat() if row.created_at else None,
+            'active': row.active,
+            'distance_meters': float(row.distance)
+        }
+    )
+
+
+def knn_results(latitudes: List[float], longitudes: List[float], rows) -> List[Dict]:
+    """
+    Group rows of knn_statement(KNN_COLUMNS) into one FeatureCollection per point.
+
+    Args:
+        latitudes: Query point latitudes
+        longitudes: Query point longitudes
+        rows: Result rows, carrying the 1-based point_index
+
+    Returns:
+        list: FeatureCollections in query point order
+    """
+    results = [
+        {
+            'index': index,
+            'query': {'lat': lat, 'lon': lon},
+            'type': 'FeatureCollection',
+            'features': []
+        }
+        for index, (lat, lon) in enumerate(zip(latitudes, longitudes))
+    ]
+
+    for row in rows:
+        results[row.point_index - 1]['features'].append(to_geojson_point_feature(
+            row.longitude,
+            row.latitude,
+            {
+                'id': row.id,
+                'name': row.name,
+                'rucher_id': row.rucher_id,
+                'active': row.active,
+                'distance_meters': float(row.distance)
+            }
+        ))
+
+    return results
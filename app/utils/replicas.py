@@ -0,0 +1,224 @@
+"""
+Read-replica routing.
+
+With DATABASE_REPLICA_URLS set, each replica is a Flask-SQLAlchemy bind
+(replica_0, replica_1, ...). A read-only request (GET, HEAD, OPTIONS and
+the endpoints in READ_ONLY_ENDPOINTS) picks one replica round-robin, and
+RoutingSession sends all its statements there. Other requests, flushes and
+work outside requests use the primary.
+
+A replica is skipped while it is unreachable or more than
+DATABASE_REPLICA_MAX_LAG seconds behind. Its lag and replay position are
+checked at most every DATABASE_REPLICA_CHECK_INTERVAL seconds. When no
+replica qualifies, the request reads from the primary.
+
+Read-your-writes: a successful write sets a cookie holding the primary's
+WAL position (LSN). The client's later reads only go to a replica known to
+have replayed past it, and to the primary otherwise.
+"""
+import itertools
+import threading
+import time
+from typing import Dict, Optional
+
+from flask import current_app, g, request
+from sqlalchemy import text
+
+REPLICA_PREFIX = 'replica_'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+# Non-GET endpoints that only read
+READ_ONLY_ENDPOINTS = ('geo.knn_ruches', 'geo.distance_matrix_route', 'geo.validate_coords')
+
+# Seconds behind the primary (0 when everything received is replayed) and
+# the replayed WAL position; NULL position when the server is not a standby
+REPLICA_STATUS_SQL = text("""
+    SELECT CASE
+               WHEN NOT pg_is_in_recovery() THEN 0
+               WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+               ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+           END AS lag,
+           pg_last_wal_replay_lsn()::text AS replay_lsn
+""")
+
+WRITE_LSN_SQL = text('SELECT pg_current_wal_lsn()::text')
+
+
+def parse_lsn(value) -> Optional[int]:
+    """Integer position of a PostgreSQL LSN such as '16/B374D848', None if invalid."""
+    try:
+        high, low = value.split('/')
+        return (int(high, 16) << 32) + int(low, 16)
+    except (AttributeError, ValueError):
+        return None
+
+
+def replica_keys(engines) -> list:
+    """Bind keys of the configured replicas, in order."""
+    return sorted(key for key in engines if isinstance(key, str) and key.startswith(REPLICA_PREFIX))
+
+
+def eligible(status: Optional[Dict], max_lag: float, min_lsn: Optional[int] = None) -> bool:
+    """
+    Whether a replica may serve a read.
+
+    Args:
+        status: Last result of ReplicaRouter.check, or None if unknown
+        max_lag: Maximum lag in seconds
+        min_lsn: WAL position the client must see (its last write), if any
+
+    Returns:
+        bool
+    """
+    if status is None or not status['ok'] or status['lag'] > max_lag:
+        return False
+    if min_lsn is None:
+        return True
+    # Without a replay position (not a standby), the write cannot be known to be there
+    return status['replay_lsn'] is not None and status['replay_lsn'] >= min_lsn
+
+
+class ReplicaRouter:
+    """
+    Round-robin choice among replicas, with their cached status.
+
+    Statuses are per process. A stale status is rechecked by the request
+    that notices it; concurrent requests keep using the previous one.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counter = itertools.count()
+        self._statuses: Dict[str, Dict] = {}
+        self._checking = set()
+
+    def check(self, key: str, engine, timeout_ms: int) -> Dict:
+        """
+        Measure a replica's lag and replay position.
+
+        Returns:
+            dict: ok, lag (seconds), replay_lsn (int or None) and checked_at
+        """
+        status = {'ok': False, 'lag': None, 'replay_lsn': None, 'checked_at': time.monotonic()}
+        try:
+            with engine.connect() as connection:
+                if engine.dialect.name == 'postgresql':
+                    connection.execute(text(f'SET LOCAL statement_timeout = {int(timeout_ms)}'))
+                    row = connection.execute(REPLICA_STATUS_SQL).one()
+                    status.update(ok=True, lag=float(row.lag), replay_lsn=parse_lsn(row.replay_lsn))
+                else:
+                    connection.execute(text('SELECT 1'))
+                    status.update(ok=True, lag=0.0)
+        except Exception as e:
+            current_app.logger.warning(f"Replica {key} unavailable: {str(e).splitlines()[0] if str(e) else e!r}")
+        return status
+
+    def status(self, key: str, engine, config) -> Optional[Dict]:
+        """A replica's status, rechecked when older than DATABASE_REPLICA_CHECK_INTERVAL."""
+        interval = config.get('DATABASE_REPLICA_CHECK_INTERVAL', 5)
+        with self._lock:
+            status = self._statuses.get(key)
+            fresh = status is not None and time.monotonic() - status['checked_at'] < interval
+            if fresh or key in self._checking:
+                return status
+            self._checking.add(key)
+
+        try:
+            status = self.check(key, engine, config.get('DATABASE_REPLICA_CHECK_TIMEOUT_MS', 1000))
+            with self._lock:
+                self._statuses[key] = status
+        finally:
+            with self._lock:
+                self._checking.discard(key)
+        return status
+
+    def choose(self, engines, config, min_lsn: Optional[int] = None) -> Optional[str]:
+        """
+        Pick the replica for a read, round-robin over the eligible ones.
+
+        Args:
+            engines: Engines by bind key (db.engines)
+            config: Application config (DATABASE_REPLICA_* settings)
+            min_lsn: WAL position the client must see, if any
+
+        Returns:
+            str or None: Replica bind key, or None to read from the primary
+        """
+        keys = replica_keys(engines)
+        if not keys:
+            return None
+        max_lag = config.get('DATABASE_REPLICA_MAX_LAG', 10)
+        start = next(self._counter)
+        for offset in range(len(keys)):
+            key = keys[(start + offset) % len(keys)]
+            if eligible(self.status(key, engines[key], config), max_lag, min_lsn):
+                return key
+        return None
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """Last known status of each replica."""
+        now = time.monotonic()
+        with self._lock:
+            return {
+                key: {
+                    'ok': status['ok'],
+                    'lag_seconds': status['lag'],
+                    'age_seconds': round(now - status['checked_at'], 3)
+                }
+                for key, status in sorted(self._statuses.items())
+            }
+
+    def reset(self):
+        """Forget every status (tests)."""
+        with self._lock:
+            self._statuses.clear()
+
+
+replica_router = ReplicaRouter()
+
+
+def is_read_only_request() -> bool:
+    return request.method in SAFE_METHODS or request.endpoint in READ_ONLY_ENDPOINTS
+
+
+def _route_request():
+    g.db_replica = None
+    if not is_read_only_request():
+        return
+    config = current_app.config
+    min_lsn = parse_lsn(request.cookies.get(config.get('DATABASE_REPLICA_COOKIE', 'db_lsn')))
+    g.db_replica = replica_router.choose(current_app.extensions['sqlalchemy'].engines, config, min_lsn)
+
+
+def _remember_write(response):
+    """Give the client the primary's WAL position after a successful write."""
+    if is_read_only_request() or response.status_code >= 400:
+        return response
+    engine = current_app.extensions['sqlalchemy'].engines[None]
+    if engine.dialect.name != 'postgresql':
+        return response
+    try:
+        with engine.connect() as connection:
+            lsn = connection.execute(WRITE_LSN_SQL).scalar()
+    except Exception as e:
+        current_app.logger.warning(f"Could not read the primary WAL position: {str(e)}")
+        return response
+
+    config = current_app.config
+    response.set_cookie(
+        config.get('DATABASE_REPLICA_COOKIE', 'db_lsn'), lsn,
+        max_age=config.get('DATABASE_REPLICA_COOKIE_MAX_AGE', 300), httponly=True, samesite='Lax'
+    )
+    return response
+
+
+def init_replicas(app):
+    """
+    Route read-only requests to the replicas, if any are configured.
+
+    Args:
+        app: Flask application
+    """
+    if not replica_keys(app.config.get('SQLALCHEMY_BINDS') or {}):
+        return
+    app.before_request(_route_request)
+    app.after_request(_remember_write)
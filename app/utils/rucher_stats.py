@@ -0,0 +1,202 @@
+"""
+Per-apiary aggregates computed in one query.
+
+Hive count, active hive count, centroid and extent of the hives, and the
+average of each hive's latest weight are computed for any number of apiaries
+with a single GROUP BY over ruches and a LATERAL lookup of the latest
+measurement per hive, instead of walking Rucher.ruches apiary by apiary.
+
+With RUCHER_STATS_MATERIALIZED the same query backs the materialized view
+rucher_stats. It is refreshed outside the requests, by the job worker
+(`flask run-jobs`), every RUCHER_STATS_REFRESH_INTERVAL seconds at most and
+only once hives or measurements changed; `flask refresh-stats` refreshes it
+on demand (e.g. from cron when no worker runs). Served statistics therefore
+lag the writes by up to that interval plus the duration of a refresh.
+"""
+import time
+from typing import Dict, Optional, Sequence
+
+from flask import current_app
+from sqlalchemy import Integer, bindparam, text
+from sqlalchemy.dialects.postgresql import ARRAY
+
+VIEW_NAME = 'rucher_stats'
+
+STATS_SELECT = """
+    SELECT h.rucher_id,
+           count(*) AS hive_count,
+           count(*) FILTER (WHERE h.active) AS active_count,
+           ST_X(ST_Centroid(ST_Collect(h.geom))) AS centroid_lon,
+           ST_Y(ST_Centroid(ST_Collect(h.geom))) AS centroid_lat,
+           ST_XMin(ST_Extent(h.geom)) AS min_lon,
+           ST_YMin(ST_Extent(h.geom)) AS min_lat,
+           ST_XMax(ST_Extent(h.geom)) AS max_lon,
+           ST_YMax(ST_Extent(h.geom)) AS max_lat,
+           avg(latest.weight) AS latest_avg_weight,
+           max(latest.recorded_at) AS latest_weight_at
+    FROM ruches h
+    LEFT JOIN LATERAL (
+        -- Latest weighed measurement of the hive (idx_measurements_ruche_recorded)
+        SELECT m.weight, m.recorded_at
+        FROM measurements m
+        WHERE m.ruche_id = h.id AND m.weight IS NOT NULL
+        ORDER BY m.recorded_at DESC
+        LIMIT 1
+    ) latest ON true
+    WHERE h.rucher_id IS NOT NULL {filter}
+    GROUP BY h.rucher_id
+"""
+
+LIVE_STATS_SQL = text(STATS_SELECT.format(filter='AND h.rucher_id = ANY(:ids)')).bindparams(
+    bindparam('ids', type_=ARRAY(Integer))
+)
+ALL_LIVE_STATS_SQL = text(STATS_SELECT.format(filter=''))
+
+VIEW_STATS_SQL = text(f'SELECT * FROM {VIEW_NAME} WHERE rucher_id = ANY(:ids)').bindparams(
+    bindparam('ids', type_=ARRAY(Integer))
+)
+ALL_VIEW_STATS_SQL = text(f'SELECT * FROM {VIEW_NAME}')
+
+CREATE_VIEW_SQL = [
+    text(f'CREATE MATERIALIZED VIEW IF NOT EXISTS {VIEW_NAME} AS {STATS_SELECT.format(filter="")}'),
+    # Required by REFRESH ... CONCURRENTLY
+    text(f'CREATE UNIQUE INDEX IF NOT EXISTS idx_{VIEW_NAME}_rucher_id ON {VIEW_NAME} (rucher_id)'),
+]
+REFRESH_VIEW_SQL = text(f'REFRESH MATERIALIZED VIEW CONCURRENTLY {VIEW_NAME}')
+
+# Changes on every committed write to the tables the view reads
+DATA_VERSION_SQL = text("""
+    SELECT coalesce(sum(n_tup_ins + n_tup_upd + n_tup_del), 0)
+    FROM pg_stat_user_tables
+    WHERE relname IN ('ruches', 'measurements')
+""")
+
+
+def empty_stats() -> Dict:
+    """Statistics of an apiary without hives."""
+    return {
+        'hive_count': 0,
+        'active_count': 0,
+        'centroid': None,
+        'extent': None,
+        'latest_avg_weight': None,
+        'latest_weight_at': None
+    }
+
+
+def _stats_from_row(row) -> Dict:
+    return {
+        'hive_count': row.hive_count,
+        'active_count': row.active_count,
+        'centroid': [row.centroid_lon, row.centroid_lat],
+        'extent': [row.min_lon, row.min_lat, row.max_lon, row.max_lat],
+        'latest_avg_weight': float(row.latest_avg_weight) if row.latest_avg_weight is not None else None,
+        'latest_weight_at': row.latest_weight_at.isoformat() if row.latest_weight_at else None
+    }
+
+
+def rucher_stats(session, rucher_ids: Optional[Sequence[int]] = None) -> Dict[int, Dict]:
+    """
+    Aggregate statistics of many apiaries in one query.
+
+    Reads the materialized view when RUCHER_STATS_MATERIALIZED is set (and
+    the view exists), the live tables otherwise.
+
+    Args:
+        session: SQLAlchemy session
+        rucher_ids: Apiaries to describe (None: all of them)
+
+    Returns:
+        dict: Apiary id to its statistics (see empty_stats); apiaries
+        without hives are absent
+    """
+    params = {} if rucher_ids is None else {'ids': list(rucher_ids)}
+    if rucher_ids is not None and not params['ids']:
+        return {}
+
+    rows = None
+    if current_app.config.get('RUCHER_STATS_MATERIALIZED', False):
+        try:
+            with session.begin_nested():
+                rows = session.execute(
+                    ALL_VIEW_STATS_SQL if rucher_ids is None else VIEW_STATS_SQL, params
+                ).all()
+        except Exception as e:
+            current_app.logger.warning(f"Rucher stats view unavailable, using live query: {str(e)}")
+
+    if rows is None:
+        rows = session.execute(ALL_LIVE_STATS_SQL if rucher_ids is None else LIVE_STATS_SQL, params).all()
+
+    return {row.rucher_id: _stats_from_row(row) for row in rows}
+
+
+def create_stats_view(session):
+    """Create the rucher_stats materialized view and its unique index."""
+    for statement in CREATE_VIEW_SQL:
+        session.execute(statement)
+
+
+def refresh_stats_view(session) -> bool:
+    """
+    Refresh the materialized view if it is enabled.
+
+    Concurrent refresh keeps the view readable meanwhile. Failures are
+    logged; the live query remains available.
+
+    Returns:
+        bool: Whether the view was refreshed
+    """
+    if not current_app.config.get('RUCHER_STATS_MATERIALIZED', False):
+        return False
+    try:
+        session.execute(REFRESH_VIEW_SQL)
+        session.commit()
+        return True
+    except Exception as e:
+        session.rollback()
+        current_app.logger.error(f"Could not refresh {VIEW_NAME}: {str(e)}")
+        return False
+
+
+class StatsViewRefresher:
+    """
+    Debounced refresh of the materialized view, driven by the job worker.
+    """
+
+    def __init__(self):
+        self.version = None
+        self.checked_at = None
+
+    def maybe_refresh(self, session) -> bool:
+        """
+        Refresh the view if the interval elapsed and its tables changed since the last refresh.
+
+        Args:
+            session: SQLAlchemy session
+
+        Returns:
+            bool: Whether the view was refreshed
+        """
+        config = current_app.config
+        if not config.get('RUCHER_STATS_MATERIALIZED', False):
+            return False
+        now = time.monotonic()
+        if self.checked_at is not None and now - self.checked_at < config.get('RUCHER_STATS_REFRESH_INTERVAL', 60):
+            return False
+        self.checked_at = now
+
+        try:
+            version = session.execute(DATA_VERSION_SQL).scalar()
+        except Exception as e:
+            current_app.logger.error(f"Could not read the {VIEW_NAME} data version: {str(e)}")
+            version = None
+        # Ends the snapshot, so the next read sees new counters
+        session.rollback()
+        if version is not None and version == self.version:
+            return False
+
+        # Writes committed during the refresh change the version again
+        refreshed = refresh_stats_view(session)
+        if refreshed:
+            self.version = version
+        return refreshed
@@ -0,0 +1,62 @@
+"""
+Zoom-dependent geometry resolution for apiaries.
+
+Rucher keeps generated columns (geom_z4, geom_z8, geom_z12) with geom
+simplified by ST_SimplifyPreserveTopology to one tile pixel at the highest
+zoom of each band. Map clients pass the zoom they display (or a tolerance)
+and get the coarsest geometry that still looks exact on screen; detailed
+polygons shrink accordingly, in the payload and in serialization time.
+"""
+import math
+from typing import Mapping, Optional
+
+from app.models.rucher import SIMPLIFIED_ZOOMS, pixel_degrees
+
+MAX_ZOOM = 30
+
+
+def simplified_column(args: Mapping) -> Optional[str]:
+    """
+    Name of the Rucher geometry column to serve for a request.
+
+    Args:
+        args: Request query parameters; zoom (web map zoom level) or
+            simplify (tolerance in degrees, or 'false' for full resolution)
+
+    Returns:
+        str: 'geom_z4', 'geom_z8' or 'geom_z12', or None for the
+        full-resolution geom
+
+    Raises:
+        ValueError: If zoom or simplify is invalid, or both are given
+    """
+    zoom, simplify = args.get('zoom'), args.get('simplify')
+    if zoom is not None and simplify is not None:
+        raise ValueError('Use either zoom or simplify, not both')
+
+    if zoom is not None:
+        try:
+            zoom = int(zoom)
+        except ValueError:
+            raise ValueError('zoom must be an integer')
+        if not 0 <= zoom <= MAX_ZOOM:
+            raise ValueError(f'zoom must be between 0 and {MAX_ZOOM}')
+        # First band whose highest zoom covers the requested one
+        for band in SIMPLIFIED_ZOOMS:
+            if zoom <= band:
+                return f'geom_z{band}'
+        return None
+
+    if simplify is None or simplify.lower() == 'false':
+        return None
+    try:
+        tolerance = float(simplify)
+    except ValueError:
+        raise ValueError("simplify must be a tolerance in degrees or 'false'")
+    if not math.isfinite(tolerance) or tolerance < 0:
+        raise ValueError('simplify must be zero or positive')
+    # Coarsest band that is not simplified more than requested
+    for band in SIMPLIFIED_ZOOMS:
+        if pixel_degrees(band) <= tolerance:
+            return f'geom_z{band}'
+    return None
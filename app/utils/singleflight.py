@@ -0,0 +1,203 @@
+"""
+Single-flight coalescing of expensive computations.
+
+Concurrent calls with the same key share one computation. Within a worker,
+the first caller runs it and the others wait for its result (or exception).
+Across gunicorn workers, the running caller also holds an exclusive file lock
+per key under SINGLEFLIGHT_LOCK_DIR and writes its result next to the lock.
+A worker that finds the lock held waits for it, then reuses that result if it
+was written after the wait began; otherwise (the holder failed) it computes
+the value itself.
+
+Results are not cached: a call arriving after a computation finished starts
+a new one. Results must be bytes so they can be shared between workers.
+"""
+import hashlib
+import os
+import struct
+import threading
+import time
+from typing import Callable, Hashable, Optional
+
+from flask import current_app
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not on Windows: in-process coalescing only
+    fcntl = None
+
+# Result files start with the time they were written
+HEADER = struct.Struct('<d')
+LOCK_POLL_INTERVAL = 0.01  # seconds, doubled up to LOCK_POLL_MAX
+LOCK_POLL_MAX = 0.2
+
+
+class _Call:
+    """A computation in progress in this worker."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+def key_digest(key: Hashable) -> str:
+    """File name stem for a key."""
+    return hashlib.sha256(repr(key).encode()).hexdigest()[:32]
+
+
+def _acquire(handle, timeout: float) -> Optional[bool]:
+    """
+    Lock a file exclusively.
+
+    Returns:
+        False if the lock was free, True if another process held it, None if
+        it was still held after timeout seconds
+    """
+    try:
+        fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return False
+    except BlockingIOError:
+        pass
+
+    deadline = time.monotonic() + timeout
+    delay = LOCK_POLL_INTERVAL
+    while time.monotonic() < deadline:
+        time.sleep(delay)
+        delay = min(delay * 2, LOCK_POLL_MAX)
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except BlockingIOError:
+            continue
+    return None
+
+
+def read_result(path: str, since: float) -> Optional[bytes]:
+    """The result stored at path if it was written after since (time.time())."""
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except OSError:
+        return None
+    if len(data) < HEADER.size or HEADER.unpack_from(data)[0] < since:
+        return None
+    return data[HEADER.size:]
+
+
+def write_result(path: str, value: bytes):
+    """Store a result atomically, so readers never see a partial file."""
+    tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(time.time()))
+        f.write(value)
+    os.replace(tmp_path, path)
+
+
+def file_flight(key: Hashable, fn: Callable[[], bytes], lock_dir: str, timeout: float) -> bytes:
+    """
+    Run fn once across the processes sharing lock_dir.
+
+    Args:
+        key: Computation key
+        fn: Computes the value
+        lock_dir: Directory of the lock and result files (local to the host)
+        timeout: Seconds to wait for another process before computing anyway
+
+    Returns:
+        bytes: The value, computed here or by the process holding the lock
+    """
+    os.makedirs(lock_dir, exist_ok=True)
+    stem = os.path.join(lock_dir, key_digest(key))
+    arrived = time.time()
+
+    with open(f'{stem}.lock', 'ab') as handle:
+        waited = _acquire(handle, timeout)
+        if waited is None:
+            current_app.logger.warning(f"Single-flight lock for {key!r} still held after {timeout}s")
+            return fn()
+        try:
+            if waited:
+                value = read_result(f'{stem}.result', arrived)
+                if value is not None:
+                    return value
+            value = fn()
+            write_result(f'{stem}.result', value)
+            return value
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key: Hashable, fn: Callable[[], bytes], lock_dir: Optional[str] = None,
+           timeout: float = 60.0) -> bytes:
+        """
+        Return fn(), sharing one call among concurrent callers with the same key.
+
+        Args:
+            key: Computation key (its repr names the lock file)
+            fn: Computes the value
+            lock_dir: Also coalesce across processes through this directory
+            timeout: Seconds to wait for another caller before computing anyway
+
+        Returns:
+            bytes: The value
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            running = call is not None
+            if not running:
+                call = self._calls[key] = _Call()
+
+        if running:
+            if not call.done.wait(timeout):
+                current_app.logger.warning(f"Single-flight call for {key!r} still running after {timeout}s")
+                return fn()
+            if call.error is not None:
+                raise call.error
+            if call.result is None:  # interrupted without an exception to share
+                return fn()
+            return call.result
+
+        try:
+            if lock_dir and fcntl is not None:
+                call.result = file_flight(key, fn, lock_dir, timeout)
+            else:
+                call.result = fn()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+
+single_flight = SingleFlight()
+
+
+def coalesce(key: Hashable, fn: Callable[[], bytes]) -> bytes:
+    """
+    single_flight.do with the application's SINGLEFLIGHT_* settings.
+
+    Args:
+        key: Computation key; include every parameter the value depends on
+        fn: Computes the value
+
+    Returns:
+        bytes: The value
+    """
+    config = current_app.config
+    if not config.get('SINGLEFLIGHT_ENABLED', True):
+        return fn()
+    return single_flight.do(
+        key, fn, lock_dir=config.get('SINGLEFLIGHT_LOCK_DIR') or None,
+        timeout=config.get('SINGLEFLIGHT_TIMEOUT', 60)
+    )
@@ -3,10 +3,11 @@ Spatial operations and utilities for geographic data.
 """
 from typing import List, Tuple, Optional
 import numpy as np
-from shapely.geometry import Point
-from sqlalchemy import func
-from sklearn.cluster import DBSCAN
+from sqlalchemy import ARRAY, Float, bindparam, func, select, true
 from app import db
+from app.utils.geodesic import geodesic_distance
+from app.utils.metrics import timed
+from app.utils.wkb import point_coordinates
 
 
 def validate_coordinates(longitude: float, latitude: float) -> bool:
@@ -23,6 +24,23 @@ def validate_coordinates(longitude: float, latitude: float) -> bool:
     return -180 <= longitude <= 180 and -90 <= latitude <= 90
 
 
+def validate_coordinate_arrays(longitudes, latitudes) -> np.ndarray:
+    """
+    Validate many coordinates at once with the rules of validate_coordinates.
+    
+    Args:
+        longitudes: Array of longitudes
+        latitudes: Array of latitudes
+        
+    Returns:
+        np.ndarray: Boolean mask, True where the coordinates are valid
+    """
+    longitudes = np.asarray(longitudes, dtype=np.float64)
+    latitudes = np.asarray(latitudes, dtype=np.float64)
+    # NaN compares False, so non-numeric values are rejected as well
+    return (np.abs(longitudes) <= 180) & (np.abs(latitudes) <= 90)
+
+
 def clean_coordinates(longitude: float, latitude: float) -> Optional[Tuple[float, float]]:
     """
     Clean and validate coordinates.
@@ -49,6 +67,9 @@ def calculate_distance(point1_geom, point2_geom) -> float:
     """
     Calculate distance between two PostGIS geometries in meters.
     
+    Points are measured locally on the WGS84 ellipsoid (the same geodesic
+    PostGIS uses for geography); other geometry types go to the database.
+    
     Args:
         point1_geom: First PostGIS geometry
         point2_geom: Second PostGIS geometry
@@ -56,6 +77,11 @@ def calculate_distance(point1_geom, point2_geom) -> float:
     Returns:
         float: Distance in meters
     """
+    point1 = get_point_coordinates(point1_geom)
+    point2 = get_point_coordinates(point2_geom)
+    if point1 is not None and point2 is not None:
+        return float(geodesic_distance(point1[0], point1[1], point2[0], point2[1]))
+    
     # Use PostGIS ST_Distance with geography for accurate results
     distance = db.session.query(
         func.ST_Distance(
@@ -80,25 +106,171 @@ def find_within_radius(model_class, center_point, radius_meters: float):
     Returns:
         list: Query results within radius
     """
+    results = model_class.query.filter(
+        radius_filter(model_class, center_point, radius_meters)
+    ).all()
+    
+    return results
+
+
+def radius_filter(model_class, center_point, radius_meters: float):
+    """
+    Build the ST_DWithin filter expression used by radius searches.
+    
+    Args:
+        model_class: SQLAlchemy model class with geom attribute
+        center_point: Center point as WKT string or Point object
+        radius_meters: Radius in meters
+        
+    Returns:
+        SQL expression usable in a WHERE clause
+    """
     # Create a point from center if it's a string
     if isinstance(center_point, str):
         center_geom = func.ST_GeomFromText(center_point, 4326)
     else:
         center_geom = center_point
     
-    # Query using ST_DWithin with geography
-    results = model_class.query.filter(
-        func.ST_DWithin(
-            func.ST_Transform(model_class.geom, 4326),
-            func.ST_Transform(center_geom, 4326),
-            radius_meters,
-            True  # Use spheroid
-        )
-    ).all()
+    # ST_DWithin with geography
+    return func.ST_DWithin(
+        func.ST_Transform(model_class.geom, 4326),
+        func.ST_Transform(center_geom, 4326),
+        radius_meters,
+        True  # Use spheroid
+    )
+
+
+def parse_bbox(value: str) -> Tuple[float, float, float, float]:
+    """
+    Parse a 'min_lon,min_lat,max_lon,max_lat' bounding box parameter.
     
-    return results
+    Args:
+        value: Comma-separated bounding box
+        
+    Returns:
+        tuple: (min_lon, min_lat, max_lon, max_lat)
+        
+    Raises:
+        ValueError: If the value is malformed or the coordinates are invalid
+    """
+    parts = [float(part) for part in value.split(',')]
+    if len(parts) != 4:
+        raise ValueError('bbox must have 4 values: min_lon,min_lat,max_lon,max_lat')
+    
+    min_lon, min_lat, max_lon, max_lat = parts
+    if not (validate_coordinates(min_lon, min_lat) and validate_coordinates(max_lon, max_lat)):
+        raise ValueError('bbox coordinates out of range')
+    if min_lon > max_lon or min_lat > max_lat:
+        raise ValueError('bbox minimum must not exceed maximum')
+    
+    return min_lon, min_lat, max_lon, max_lat
 
 
+def bbox_filter(model_class, bbox: Tuple[float, float, float, float]):
+    """
+    Build the filter expression selecting geometries that intersect a bbox.
+    
+    Args:
+        model_class: SQLAlchemy model class with geom attribute
+        bbox: (min_lon, min_lat, max_lon, max_lat)
+        
+    Returns:
+        SQL expression usable in a WHERE clause
+    """
+    return func.ST_Intersects(model_class.geom, func.ST_MakeEnvelope(*bbox, 4326))
+
+
+def nearby_statement(model_class, columns, longitude: float, latitude: float,
+                     radius_meters: float, order_by_distance: bool = False,
+                     limit: Optional[int] = None):
+    """
+    Build a radius query that selects only the given columns.
+    
+    The geodesic distance is evaluated once, in the select list; the radius
+    filter (ST_DWithin) and the optional ordering (``<->``) both run on
+    geography(geom) so they can use the geography GiST index.
+    
+    Args:
+        model_class: SQLAlchemy model class with geom attribute
+        columns: Model columns to return
+        longitude: Center longitude
+        latitude: Center latitude
+        radius_meters: Radius in meters
+        order_by_distance: Order results nearest first using KNN ordering
+        limit: Maximum number of rows (None for no limit)
+        
+    Returns:
+        Select: Rows of (*columns, longitude, latitude, distance)
+    """
+    center = func.geography(func.ST_SetSRID(func.ST_MakePoint(longitude, latitude), 4326))
+    geography = func.geography(model_class.geom)
+    
+    statement = select(
+        *columns,
+        func.ST_X(model_class.geom).label('longitude'),
+        func.ST_Y(model_class.geom).label('latitude'),
+        func.ST_Distance(geography, center).label('distance')
+    ).where(
+        func.ST_DWithin(geography, center, radius_meters)
+    )
+    
+    if order_by_distance:
+        statement = statement.order_by(geography.op('<->')(center))
+    
+    if limit is not None:
+        statement = statement.limit(limit)
+    
+    return statement
+
+
+def knn_statement(model_class, columns, longitudes: List[float], latitudes: List[float],
+                  k: int, criteria=()):
+    """
+    Build a single query returning the k nearest rows to each of many points.
+    
+    The query points are unnested from two array parameters and each one is
+    LATERAL-joined to an index-assisted KNN (``<->``) scan, so the whole batch
+    costs one round trip.
+    
+    Args:
+        model_class: SQLAlchemy model class with geom attribute
+        columns: Model columns to return for each neighbour
+        longitudes: Longitudes of the query points
+        latitudes: Latitudes of the query points
+        k: Number of neighbours per query point
+        criteria: Extra filter expressions applied to the model
+        
+    Returns:
+        Select: Rows of (point_index, *columns, longitude, latitude, distance),
+        ordered by point index then distance; point_index starts at 1
+    """
+    points = func.unnest(
+        bindparam('longitudes', longitudes, type_=ARRAY(Float)),
+        bindparam('latitudes', latitudes, type_=ARRAY(Float))
+    ).table_valued('lon', 'lat', with_ordinality='point_index').render_derived(name='query_points')
+    
+    center = func.geography(func.ST_SetSRID(func.ST_MakePoint(points.c.lon, points.c.lat), 4326))
+    geography = func.geography(model_class.geom)
+    
+    nearest = select(
+        *columns,
+        func.ST_X(model_class.geom).label('longitude'),
+        func.ST_Y(model_class.geom).label('latitude'),
+        func.ST_Distance(geography, center).label('distance')
+    ).where(
+        *criteria
+    ).order_by(
+        geography.op('<->')(center)
+    ).limit(k).lateral('nearest')
+    
+    return select(
+        points.c.point_index, nearest
+    ).select_from(points).join(
+        nearest, true()
+    ).order_by(points.c.point_index, nearest.c.distance)
+
+
+@timed('clustering')
 def cluster_points(points: List[Tuple[float, float]], eps: float = 1000, min_samples: int = 2):
     """
     Cluster geographic points using DBSCAN algorithm.
@@ -118,6 +290,9 @@ def cluster_points(points: List[Tuple[float, float]], eps: float = 1000, min_sam
             'clusters': {}
         }
     
+    # Imported here: sklearn takes most of the application's import time
+    from sklearn.cluster import DBSCAN
+    
     # Convert to numpy array
     coords = np.array(points)
     
@@ -163,10 +338,9 @@ def get_point_coordinates(geom) -> Optional[Tuple[float, float]]:
         tuple: (longitude, latitude) or None
     """
     try:
-        from geoalchemy2.shape import to_shape
-        shape = to_shape(geom)
-        if shape.geom_type == 'Point':
-            return (shape.x, shape.y)
-        return None
+        longitude, latitude = point_coordinates([geom])[0].tolist()
     except Exception:
         return None
+    if np.isnan(longitude):
+        return None
+    return (longitude, latitude)
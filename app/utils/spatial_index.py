@@ -0,0 +1,508 @@
+"""
+In-process spatial index snapshots for read-heavy geo queries.
+
+A snapshot holds, for one layer (ruches or ruchers), the ids, a shapely
+STRtree over the geometries, compact NumPy coordinate/attribute arrays and
+the pre-serialized GeoJSON Feature of every row. Bbox, radius and KNN
+queries are then answered in-process; distances use the same WGS84
+geodesic as PostGIS geography, so results match the database path.
+
+Snapshots are rebuilt in a background thread whenever the data version of
+the underlying tables changes. The feature is opt-in (SPATIAL_INDEX_ENABLED).
+"""
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import shapely
+from flask import current_app
+from sqlalchemy import func, text
+
+from app import db
+from app.models import Ruche, Rucher
+from app.utils.geodesic import EARTH_RADIUS_M, geodesic_distance, radius_bounds
+from app.utils.geojson import to_geojson_feature
+from app.utils.query_params import KNN_COLUMNS, NEARBY_COLUMNS
+
+# Rough GEOS allocation per point geometry plus its STRtree entry, used
+# for the memory estimate (GEOS memory is invisible to Python).
+GEOS_POINT_BYTES = 120
+
+DATA_VERSION_SQL = text("""
+    SELECT relname, n_tup_ins, n_tup_upd, n_tup_del
+    FROM pg_stat_user_tables
+    WHERE relname IN ('ruches', 'ruchers')
+    ORDER BY relname
+""")
+
+
+class LayerSnapshot:
+    """
+    Immutable in-memory copy of one geometry layer.
+
+    Attributes:
+        ids: Row ids (int64), sorted ascending
+        geometries: Shapely geometries, aligned with ids
+        coordinates: (n, 2) float64 lon/lat array, only for point-only layers
+        attributes: Filterable columns as NumPy arrays, aligned with ids
+        blobs: Pre-serialized GeoJSON Feature for each row (UTF-8 bytes)
+        views: Named alternative blobs holding a subset of the properties,
+            matching the columns the database path selects for that query
+        points_only: Whether every geometry is a Point
+    """
+
+    def __init__(self, ids: Sequence[int], wkbs: Sequence[bytes], blobs: List[bytes],
+                 attributes: Dict[str, np.ndarray], views: Optional[Dict[str, List[bytes]]] = None):
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.geometries = shapely.from_wkb(np.asarray(wkbs, dtype=object)) if len(wkbs) else np.empty(0, dtype=object)
+        self.points_only = bool(np.all(shapely.get_type_id(self.geometries) == 0))
+        self.coordinates = shapely.get_coordinates(self.geometries) if self.points_only else None
+        self.attributes = attributes
+        self.blobs = blobs
+        self.views = views or {}
+        self.tree = shapely.STRtree(self.geometries)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def memory_usage(self) -> Dict[str, int]:
+        """
+        Report the memory held by the snapshot.
+
+        Returns:
+            dict: Byte counts per component and an estimated total
+        """
+        arrays = self.ids.nbytes + sum(array.nbytes for array in self.attributes.values())
+        if self.coordinates is not None:
+            arrays += self.coordinates.nbytes
+        blobs = sum(len(blob) for blob in self.blobs)
+        # Views share the full blob of rows whose properties they keep whole
+        blobs += sum(
+            len(blob) for view in self.views.values()
+            for blob, full in zip(view, self.blobs) if blob is not full
+        )
+        geometries = len(self) * GEOS_POINT_BYTES if self.points_only else int(
+            shapely.get_num_coordinates(self.geometries).sum() * 16 + len(self) * GEOS_POINT_BYTES
+        )
+        return {
+            'rows': len(self),
+            'arrays_bytes': int(arrays),
+            'blobs_bytes': int(blobs),
+            'geometries_bytes_estimated': geometries,
+            'total_bytes_estimated': int(arrays + blobs + geometries)
+        }
+
+    def filter_mask(self, filters: Optional[Dict] = None) -> np.ndarray:
+        """
+        Boolean mask of rows whose attributes equal the given values.
+
+        Args:
+            filters: Mapping of attribute name to required value
+
+        Returns:
+            np.ndarray: Boolean mask aligned with ids
+        """
+        mask = np.ones(len(self), dtype=bool)
+        for name, value in (filters or {}).items():
+            mask &= self.attributes[name] == value
+        return mask
+
+    def bbox(self, min_lon: float, min_lat: float, max_lon: float, max_lat: float) -> np.ndarray:
+        """
+        Rows whose geometry intersects a lon/lat box (ST_Intersects semantics).
+
+        Returns:
+            np.ndarray: Sorted row indices
+        """
+        return np.sort(self.tree.query(shapely.box(min_lon, min_lat, max_lon, max_lat), predicate='intersects'))
+
+    def within(self, longitude: float, latitude: float,
+               radius_meters: float) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Rows within a geodesic radius of a point (ST_DWithin on geography).
+
+        Returns:
+            tuple: (sorted row indices, distances in meters), or None if the
+            layer holds non-point geometries
+        """
+        if not self.points_only:
+            return None
+
+        candidates = np.unique(np.concatenate([
+            self.tree.query(shapely.box(*bounds)) for bounds in radius_bounds(longitude, latitude, radius_meters)
+        ]).astype(np.int64))
+
+        distances = geodesic_distance(
+            longitude, latitude, self.coordinates[candidates, 0], self.coordinates[candidates, 1]
+        )
+        inside = distances <= radius_meters
+        return candidates[inside], distances[inside]
+
+    def nearest(self, longitude: float, latitude: float, k: int,
+                mask: Optional[np.ndarray] = None) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """
+        The k rows geodesically nearest to a point.
+
+        The search radius starts at the distance of the planar nearest
+        neighbour and grows until it holds k rows, so the result is exact.
+
+        Args:
+            longitude: Query longitude
+            latitude: Query latitude
+            k: Number of neighbours
+            mask: Optional boolean mask restricting eligible rows
+
+        Returns:
+            tuple: (row indices, distances in meters) nearest first, or None
+            if the layer holds non-point geometries
+        """
+        if not self.points_only:
+            return None
+
+        eligible = len(self) if mask is None else int(mask.sum())
+        if eligible == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+
+        nearest_planar = self.tree.query_nearest(shapely.Point(longitude, latitude))[0]
+        radius = max(float(geodesic_distance(
+            longitude, latitude, *self.coordinates[nearest_planar]
+        )), 1.0)
+
+        while True:
+            indices, distances = self.within(longitude, latitude, radius)
+            if mask is not None:
+                keep = mask[indices]
+                indices, distances = indices[keep], distances[keep]
+            if len(indices) >= min(k, eligible) or radius >= np.pi * EARTH_RADIUS_M:
+                break
+            radius *= 4
+
+        order = np.argsort(distances, kind='stable')[:k]
+        return indices[order], distances[order]
+
+    def collection_bytes(self, indices: np.ndarray, distances: Optional[np.ndarray] = None,
+                         extra: Optional[Dict] = None, view: Optional[str] = None) -> bytes:
+        """
+        Assemble a GeoJSON FeatureCollection from pre-serialized features.
+
+        Args:
+            indices: Row indices to include, in output order
+            distances: Optional distances added as distance_meters properties
+            extra: Optional extra top-level members (e.g. the echoed query)
+            view: Serve the features of this view instead of the full ones
+
+        Returns:
+            bytes: UTF-8 encoded FeatureCollection
+        """
+        blobs = self.views[view] if view else self.blobs
+        if distances is None:
+            features = [blobs[i] for i in indices]
+        else:
+            features = [
+                _with_property(blobs[i], 'distance_meters', float(distance))
+                for i, distance in zip(indices, distances)
+            ]
+
+        head = b'{"type":"FeatureCollection",'
+        for key, value in (extra or {}).items():
+            head += json.dumps(key).encode() + b':' + json.dumps(value).encode() + b','
+        return head + b'"features":[' + b','.join(features) + b']}'
+
+
+def _with_property(blob: bytes, name: str, value) -> bytes:
+    """
+    Append a property to a serialized feature.
+
+    Blobs are serialized with 'properties' as the last member of the feature
+    and always contain at least an id, so they end with '}}'.
+    """
+    return blob[:-2] + b',' + json.dumps(name).encode() + b':' + json.dumps(value).encode() + b'}}'
+
+
+def _feature_bytes(geometry: Dict, properties: Dict) -> bytes:
+    """Serialize a feature with 'properties' as its last member, see _with_property."""
+    return json.dumps(
+        {'type': 'Feature', 'geometry': geometry, 'properties': properties},
+        separators=(',', ':'),
+        default=str
+    ).encode()
+
+
+def _build_layer(model_class, attribute_columns: Dict,
+                 view_properties: Optional[Dict[str, List[str]]] = None) -> LayerSnapshot:
+    """
+    Load one layer from the database into a snapshot.
+
+    Args:
+        model_class: Ruche or Rucher
+        attribute_columns: Mapping of attribute name to (column name, dtype, null value)
+        view_properties: Mapping of view name to the properties it keeps
+
+    Returns:
+        LayerSnapshot
+    """
+    ids, wkbs, blobs = [], [], []
+    attributes = {name: [] for name in attribute_columns}
+    view_properties = view_properties or {}
+    views = {name: [] for name in view_properties}
+
+    query = db.session.query(model_class).order_by(model_class.id).execution_options(yield_per=5000)
+    for instance in query:
+        feature = to_geojson_feature(instance)
+        if feature is None:
+            continue
+
+        ids.append(instance.id)
+        wkbs.append(bytes(instance.geom.data))
+        properties = feature['properties']
+        blob = _feature_bytes(feature['geometry'], properties)
+        blobs.append(blob)
+        for name, keys in view_properties.items():
+            if list(properties) == keys:
+                views[name].append(blob)
+            else:
+                views[name].append(_feature_bytes(feature['geometry'], {key: properties[key] for key in keys}))
+        for name, (column, _, null_value) in attribute_columns.items():
+            value = getattr(instance, column)
+            attributes[name].append(null_value if value is None else value)
+
+    return LayerSnapshot(
+        ids,
+        wkbs,
+        blobs,
+        {
+            name: np.asarray(attributes[name], dtype=dtype)
+            for name, (_, dtype, _) in attribute_columns.items()
+        },
+        views
+    )
+
+
+def data_version():
+    """
+    Cheap fingerprint of the ruches/ruchers tables.
+
+    Uses the PostgreSQL statistics collector counters, which change on every
+    committed insert, update or delete; falls back to row counts and max ids
+    on other databases.
+
+    Returns:
+        tuple: Opaque, comparable version value
+    """
+    try:
+        return tuple(tuple(row) for row in db.session.execute(DATA_VERSION_SQL))
+    except Exception:
+        db.session.rollback()
+        return tuple(
+            tuple(db.session.query(func.count(model.id), func.max(model.id)).one())
+            for model in (Ruche, Rucher)
+        )
+
+
+class SpatialIndex:
+    """
+    Process-wide holder of the current snapshots with background refresh.
+
+    The thread is started lazily on first use in each process, so it is safe
+    with gunicorn's pre-fork model.
+    """
+
+    RUCHE_ATTRIBUTES = {
+        'active': ('active', bool, False),
+        'rucher_id': ('rucher_id', np.int64, -1),
+    }
+    # Properties of the nearby and KNN features, as selected by the database path
+    RUCHE_VIEWS = {
+        'nearby': [column.key for column in NEARBY_COLUMNS],
+        'knn': [column.key for column in KNN_COLUMNS],
+    }
+
+    def __init__(self):
+        self.ruches: Optional[LayerSnapshot] = None
+        self.ruchers: Optional[LayerSnapshot] = None
+        self.version = None
+        self.built_at = None
+        self.build_seconds = None
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    @property
+    def ready(self) -> bool:
+        return self.ruches is not None and self.ruchers is not None
+
+    def refresh(self, force: bool = False) -> bool:
+        """
+        Rebuild the snapshots if the data version changed.
+
+        Must be called inside an application context.
+
+        Args:
+            force: Rebuild even if the version is unchanged
+
+        Returns:
+            bool: True if the snapshots were rebuilt
+        """
+        with self._lock:
+            version = (data_version(), self._generation)
+            if not force and version == self.version:
+                return False
+
+            start = time.perf_counter()
+            ruches = _build_layer(Ruche, self.RUCHE_ATTRIBUTES, self.RUCHE_VIEWS)
+            ruchers = _build_layer(Rucher, {})
+            db.session.remove()
+
+            # Swap both layers at once; readers keep whatever they already hold
+            self.ruches, self.ruchers = ruches, ruchers
+            self.version = version
+            self.built_at = time.time()
+            self.build_seconds = time.perf_counter() - start
+            return True
+
+    def invalidate(self):
+        """Mark the snapshots stale and wake the refresh thread."""
+        self._generation += 1
+        self._wakeup.set()
+
+    def start(self, app):
+        """Start the background refresh thread for this process if needed."""
+        if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+            return
+
+        with self._start_lock:
+            if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(
+                target=self._run, args=(app,), name='spatial-index-refresh', daemon=True
+            )
+            self._thread.start()
+
+    def _run(self, app):
+        interval = app.config.get('SPATIAL_INDEX_REFRESH_INTERVAL', 30)
+        while True:
+            with app.app_context():
+                try:
+                    if self.refresh():
+                        app.logger.info(
+                            f"Spatial index rebuilt: {len(self.ruches)} ruches, "
+                            f"{len(self.ruchers)} ruchers in {self.build_seconds:.2f}s"
+                        )
+                except Exception as e:
+                    app.logger.error(f"Spatial index refresh failed: {str(e)}")
+                finally:
+                    db.session.remove()
+            self._wakeup.wait(interval)
+            self._wakeup.clear()
+
+    def stats(self) -> Dict:
+        """
+        Describe the index state and memory use.
+
+        Returns:
+            dict: Readiness, build time and per-layer memory usage
+        """
+        return {
+            'ready': self.ready,
+            'built_at': self.built_at,
+            'build_seconds': self.build_seconds,
+            'layers': {
+                'ruches': self.ruches.memory_usage() if self.ruches is not None else None,
+                'ruchers': self.ruchers.memory_usage() if self.ruchers is not None else None
+            }
+        }
+
+    def collection_payload(self, layer: str, parsed: Dict) -> Optional[bytes]:
+        """
+        Serialized FeatureCollection for a collection query (/ruches, /ruchers).
+
+        Args:
+            layer: 'ruches' or 'ruchers'
+            parsed: Filters as returned by query_params.collection_criteria
+
+        Returns:
+            bytes, or None if the query cannot be answered from the index
+            (radius search on a layer that is not point-only)
+        """
+        snapshot = self.ruches if layer == 'ruches' else self.ruchers
+        bbox, circle = parsed['bbox'], parsed['circle']
+        if circle and not snapshot.points_only:
+            return None
+
+        mask = snapshot.filter_mask(parsed['filters'])
+        if bbox:
+            mask &= np.isin(np.arange(len(snapshot)), snapshot.bbox(*bbox))
+        indices = np.flatnonzero(mask)
+        if circle:
+            within, _ = snapshot.within(*circle)
+            indices = within[mask[within]]
+        return snapshot.collection_bytes(indices)
+
+    def nearby_payload(self, params: Dict) -> bytes:
+        """
+        Serialized FeatureCollection for the nearby search.
+
+        Args:
+            params: Parameters as returned by query_params.nearby_params
+
+        Returns:
+            bytes: FeatureCollection with distance_meters and the query echoed
+        """
+        indices, distances = self.ruches.within(params['lon'], params['lat'], params['radius_meters'])
+        if params['order'] == 'distance':
+            by_distance = np.argsort(distances, kind='stable')
+            indices, distances = indices[by_distance], distances[by_distance]
+        limit = params['limit']
+        return self.ruches.collection_bytes(
+            indices[:limit], distances[:limit], extra={'query': params}, view='nearby'
+        )
+
+    def knn_payload(self, params: Dict) -> bytes:
+        """
+        Serialized batch nearest-neighbour response.
+
+        Args:
+            params: Parameters as returned by query_params.knn_params
+
+        Returns:
+            bytes: JSON with one FeatureCollection per query point
+        """
+        snapshot = self.ruches
+        active = params['active']
+        mask = snapshot.filter_mask({'active': active} if active is not None else None)
+        groups = []
+        for i, (lat, lon) in enumerate(zip(params['latitudes'], params['longitudes'])):
+            indices, distances = snapshot.nearest(lon, lat, params['k'], mask)
+            groups.append(
+                b'{"index":' + str(i).encode() + b',"query":' + json.dumps({'lat': lat, 'lon': lon}).encode()
+                + b',' + snapshot.collection_bytes(indices, distances, view='knn')[1:]
+            )
+        return b'{"k":' + str(params['k']).encode() + b',"results":[' + b','.join(groups) + b']}'
+
+
+spatial_index = SpatialIndex()
+
+
+def get_spatial_index() -> Optional[SpatialIndex]:
+    """
+    Return the spatial index if it is enabled and built, else None.
+
+    Callers fall back to the PostGIS path on None. The first call in a
+    process starts the background build.
+
+    Returns:
+        SpatialIndex or None
+    """
+    app = current_app._get_current_object()
+    if not app.config.get('SPATIAL_INDEX_ENABLED', False):
+        return None
+
+    spatial_index.start(app)
+    return spatial_index if spatial_index.ready else None
@@ -0,0 +1,90 @@
+"""
+Worker warm-up: pay the one-off costs of a fresh process before it serves.
+
+Heavy libraries are imported lazily so boots and CLI commands stay fast;
+warm_up imports them up front in server workers instead, opens the
+connection pool and fills the per-process caches, so the first requests
+do not absorb that latency. gunicorn.conf.py calls it from post_worker_init.
+"""
+import importlib
+import time
+
+from sqlalchemy import text
+
+from app import db
+
+# Modules imported on first use by the request handlers
+HEAVY_MODULES = (
+    'sklearn.cluster',
+    'scipy.spatial',
+    'geopy.geocoders',
+    'pyproj',
+    'pyarrow',
+)
+
+
+def _import_modules():
+    imported = []
+    for name in HEAVY_MODULES:
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            continue
+        imported.append(name)
+    return imported
+
+
+def _open_connections(n):
+    """Check out n pooled connections at once so all of them get opened."""
+    connections = []
+    try:
+        for _ in range(n):
+            connection = db.engine.connect()
+            connections.append(connection)
+            connection.execute(text('SELECT 1'))
+    finally:
+        for connection in connections:
+            connection.close()
+    return len(connections)
+
+
+def warm_up(app):
+    """
+    Prime a freshly started worker.
+
+    Safe after a fork: connections inherited from a preloading parent are
+    discarded (without closing the parent's sockets) before new ones open.
+    Failures are logged and never prevent the worker from serving.
+
+    Args:
+        app: Flask application
+
+    Returns:
+        dict: What was warmed and how long it took
+    """
+    from app.routes.health import server_versions
+    from app.utils.geodesic import geodesic_backend
+    from app.utils.health_probe import database_probe
+    from app.utils.spatial_index import spatial_index
+
+    start = time.perf_counter()
+    summary = {'modules': _import_modules(), 'geodesic_backend': geodesic_backend()}
+
+    with app.app_context():
+        try:
+            db.engine.dispose(close=False)
+            summary['connections'] = _open_connections(app.config.get('WARMUP_CONNECTIONS', 1))
+            server_versions()
+        except Exception as e:
+            app.logger.warning(f"Warm-up could not reach the database: {str(e)}")
+            summary['connections'] = 0
+        finally:
+            db.session.remove()
+
+        database_probe.start(app)
+        if app.config.get('SPATIAL_INDEX_ENABLED', False):
+            spatial_index.start(app)
+
+    summary['seconds'] = round(time.perf_counter() - start, 3)
+    app.logger.info(f"Worker warmed up in {summary['seconds']} s")
+    return summary
@@ -0,0 +1,6 @@
+"""
+ASGI entry point for async deployment (uvicorn / gunicorn with uvicorn workers).
+"""
+from app.aio import create_asgi_app
+
+app = create_asgi_app()
@@ -0,0 +1,125 @@
+"""
+Benchmark of incremental anomaly detection over a synthetic year.
+
+Simulates hourly weight readings of N hives for a number of days, without a
+database. Readings have a yearly nectar-flow cycle, a daily forager cycle
+and sensor noise. A share of hives swarm (a sudden drop of a few kg) and
+another share are robbed (a loss of about 1.5 kg/day over ten days). Each
+hour is one batch, folded into the array-backed state with
+app.utils.anomaly.update, as ingestion does.
+
+Reports throughput, the size of a checkpoint, detection of the injected
+events and false alarms on the other hives.
+
+Usage:
+    python benchmarks/bench_anomaly.py --hives 10000 --days 365
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.anomaly import SEASON_BUCKETS, SeriesState, model_params, update  # noqa: E402
+from config import Config  # noqa: E402
+
+HOUR = 3600.0
+# Hours after its start within which an event counts as detected
+WINDOWS = {1: 48, 2: 240}
+
+
+def make_hives(n, days, rng, event_ratio):
+    """Per-hive parameters and injected events (start hour, kind)."""
+    hours = days * 24
+    hives = {
+        'base': rng.uniform(30, 50, n),
+        'yearly': rng.uniform(5, 15, n),
+        'daily': rng.uniform(0.3, 1.0, n),
+        'noise': rng.uniform(0.05, 0.2, n),
+        'phase': rng.uniform(0, 2 * np.pi, n),
+    }
+    kind = np.zeros(n, dtype=np.int8)  # 0 normal, 1 swarm, 2 robbing
+    events = rng.random(n)
+    kind[events < event_ratio] = 1
+    kind[(events >= event_ratio) & (events < 2 * event_ratio)] = 2
+    start = rng.integers(30 * 24, max(hours - 11 * 24, 30 * 24 + 1), n)
+    return hives, kind, start
+
+
+def readings(hives, kind, start, hour, rng):
+    """Weights of every hive at one hour."""
+    t = hour / 24.0
+    weight = (
+        hives['base']
+        + hives['yearly'] * np.sin(2 * np.pi * t / 365 + hives['phase'])
+        + hives['daily'] * np.sin(2 * np.pi * (hour % 24) / 24)
+        + rng.normal(0, hives['noise'])
+    )
+    elapsed = hour - start
+    weight -= np.where((kind == 1) & (elapsed >= 0), 3.0, 0.0)
+    weight -= np.where((kind == 2) & (elapsed >= 0), np.minimum(elapsed, 240) / 24 * 1.5, 0.0)
+    return weight
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--hives', type=int, default=10000, help='Number of hives')
+    parser.add_argument('--days', type=int, default=365, help='Days of hourly readings')
+    parser.add_argument('--events', type=float, default=0.01, help='Share of hives swarming, and of hives robbed')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    n, hours = args.hives, args.days * 24
+    hives, kind, start = make_hives(n, args.days, rng, args.events)
+
+    config = {key: getattr(Config, key) for key in dir(Config) if key.startswith('ANOMALY_')}
+    params = model_params(config)
+    state = SeriesState(n, 1)
+    state.keys[:] = np.arange(n)
+    state.z_threshold[:] = config['ANOMALY_Z_THRESHOLD']
+    state.drift_threshold[:] = config['ANOMALY_DRIFT_THRESHOLD']
+    positions = np.arange(n)
+
+    window = np.array([0, WINDOWS[1], WINDOWS[2]])[kind]
+    detected_at = np.full(n, -1, dtype=np.int64)
+    flags = np.zeros(n, dtype=np.int64)
+    elapsed = 0.0
+    for hour in range(hours):
+        values = readings(hives, kind, start, hour, rng)
+        begin = time.perf_counter()
+        result = update(state, positions, np.full(n, hour * HOUR), values, params)
+        elapsed += time.perf_counter() - begin
+
+        flagged = result['scored'] & (
+            (np.abs(result['z']) > state.z_threshold) | (np.abs(result['drift']) > state.drift_threshold)
+        )
+        flags += flagged
+        in_window = (kind > 0) & (hour >= start) & (hour < start + window)
+        detected_at[flagged & in_window & (detected_at < 0)] = hour
+
+    total = n * hours
+    checkpoint = state.season.nbytes + 7 * 8 * n
+    print(f'hives: {n}, hours: {hours}, measurements: {total:,}')
+    print(f'update: {elapsed:.2f} s, {elapsed / total * 1e9:.0f} ns per measurement, '
+          f'{elapsed / hours * 1000:.2f} ms per hourly batch')
+    print(f'checkpoint: {checkpoint / 1e6:.1f} MB ({checkpoint // n} bytes per hive), '
+          f'{SEASON_BUCKETS} seasonal buckets')
+
+    for label, code in (('swarm', 1), ('robbing', 2)):
+        hit = (kind == code) & (detected_at >= 0)
+        delay = (detected_at[hit] - start[hit]).mean() if hit.any() else float('nan')
+        print(f'{label}: {hit.sum()}/{(kind == code).sum()} detected within {WINDOWS[code]} h, '
+              f'mean delay {delay:.1f} h')
+
+    normal = kind == 0
+    false_hives = (flags[normal] > 0).sum()
+    print(f'false alarms: {flags[normal].sum()} flagged readings on {false_hives}/{normal.sum()} normal hives '
+          f'({flags[normal].sum() / normal.sum() / args.days * 365:.2f} per hive-year)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,305 @@
+"""
+Benchmark suite for the geo API and its hot functions.
+
+Times every /api/geo/* route (through the Flask test client, so no network
+or server is involved) plus to_geojson, cluster_points and get_clusters, and
+writes the results as JSON. Passing a previous result file with --compare
+reports the change per case and exits with status 1 when a case's median got
+slower than --tolerance, so runs can be checked for regressions.
+
+Usage:
+    DATABASE_URL=postgresql://... python benchmarks/generate_data.py --ruchers 500 --hives 20
+    DATABASE_URL=postgresql://... python benchmarks/bench_geo.py --output before.json
+    # ... change the code ...
+    DATABASE_URL=postgresql://... python benchmarks/bench_geo.py --output after.json --compare before.json
+
+Reverse geocoding calls the public Nominatim service and is only included
+with --geocode. The bulk upsert cases write: they re-send existing hives and
+apiaries unchanged (updates, no inserts), and run after the read routes
+because each write invalidates the caches those use; --no-bulk leaves them
+out.
+"""
+import argparse
+import json
+import os
+import platform
+import re
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import func, select  # noqa: E402
+from app import create_app, db  # noqa: E402
+from app.models import Ruche, Rucher  # noqa: E402
+
+# Query points are spread over the area generated by generate_data.py
+CENTER_LON = -73.97
+CENTER_LAT = 40.75
+SPREAD_DEGREES = 0.5
+
+
+def percentile(sorted_samples, q):
+    return sorted_samples[min(len(sorted_samples) - 1, int(len(sorted_samples) * q))]
+
+
+def measure(fn, repeat, warmup=1):
+    """
+    Time fn and summarize the latencies in milliseconds.
+
+    Returns:
+        dict: n, min, p50, p95, mean and max
+    """
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        'n': repeat,
+        'min': round(samples[0], 3),
+        'p50': round(statistics.median(samples), 3),
+        'p95': round(percentile(samples, 0.95), 3),
+        'mean': round(statistics.fmean(samples), 3),
+        'max': round(samples[-1], 3),
+    }
+
+
+def query_points(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return [
+        {'lat': round(CENTER_LAT + (rng.random() - 0.5) * SPREAD_DEGREES, 6),
+         'lon': round(CENTER_LON + (rng.random() - 0.5) * SPREAD_DEGREES, 6)}
+        for _ in range(n)
+    ]
+
+
+def bulk_collections(count=100):
+    """
+    FeatureCollections re-sending the first count hives and apiaries as they are.
+
+    Returns:
+        tuple: (hives, apiaries) request bodies for the bulk upsert routes
+    """
+    hives = db.session.execute(
+        select(Ruche.id, Ruche.name, Ruche.rucher_id, Ruche.active, Ruche.queen_info,
+               func.ST_X(Ruche.geom), func.ST_Y(Ruche.geom))
+        .order_by(Ruche.id).limit(count)
+    ).all()
+    apiaries = db.session.execute(
+        select(Rucher.id, Rucher.name, Rucher.description, func.ST_AsGeoJSON(Rucher.geom))
+        .order_by(Rucher.id).limit(count)
+    ).all()
+    return (
+        {'type': 'FeatureCollection', 'features': [
+            {'type': 'Feature', 'id': hive_id,
+             'geometry': {'type': 'Point', 'coordinates': [x, y]},
+             'properties': {'name': name, 'rucher_id': rucher_id, 'active': active, 'queen_info': queen_info}}
+            for hive_id, name, rucher_id, active, queen_info, x, y in hives
+        ]},
+        {'type': 'FeatureCollection', 'features': [
+            {'type': 'Feature', 'id': apiary_id, 'geometry': json.loads(geometry),
+             'properties': {'name': name, 'description': description}}
+            for apiary_id, name, description, geometry in apiaries
+        ]},
+    )
+
+
+def route_cases(client, ruche_id, rucher_id, include_geocode, bulk=None):
+    """
+    (name, callable) pairs covering every /api/geo route.
+
+    Args:
+        client: Flask test client
+        ruche_id: Existing hive id
+        rucher_id: Existing apiary id
+        include_geocode: Include /reverse-geocode
+        bulk: (hives, apiaries) bodies from bulk_collections, or None to
+            leave out the bulk upsert routes
+    """
+    lat, lon = CENTER_LAT, CENTER_LON
+    half = SPREAD_DEGREES / 4
+    bbox = f'{lon - half},{lat - half},{lon + half},{lat + half}'
+
+    def get(url):
+        def call():
+            response = client.get(url)
+            response.get_data()
+            return response
+        return call
+
+    def post(url, body):
+        def call():
+            response = client.post(url, json=body)
+            response.get_data()
+            return response
+        return call
+
+    cases = [
+        ('GET /ruches', get('/api/geo/ruches')),
+        ('GET /ruches?active=true', get('/api/geo/ruches?active=true')),
+        ('GET /ruches?bbox', get(f'/api/geo/ruches?bbox={bbox}')),
+        ('GET /ruches?radius', get(f'/api/geo/ruches?lat={lat}&lon={lon}&radius=5000')),
+        ('GET /ruches?cluster=true', get('/api/geo/ruches?cluster=true')),
+        ('GET /ruches?format=arrow', get('/api/geo/ruches?format=arrow')),
+        ('GET /ruches/<id>', get(f'/api/geo/ruches/{ruche_id}')),
+        ('GET /ruchers', get('/api/geo/ruchers')),
+        ('GET /ruchers?zoom=8', get('/api/geo/ruchers?zoom=8')),
+        ('GET /ruchers/<id>', get(f'/api/geo/ruchers/{rucher_id}')),
+        ('GET /ruchers/<id>/stats', get(f'/api/geo/ruchers/{rucher_id}/stats')),
+        ('GET /ruchers/overlaps', get('/api/geo/ruchers/overlaps')),
+        ('GET /ruches/nearby', get(f'/api/geo/ruches/nearby?lat={lat}&lon={lon}&radius=5000')),
+        ('GET /ruches/nearby?limit=10',
+         get(f'/api/geo/ruches/nearby?lat={lat}&lon={lon}&radius=5000&order=distance&limit=10')),
+        ('POST /ruches/knn', post('/api/geo/ruches/knn', {'points': query_points(100), 'k': 5})),
+        ('GET /ruches/density', get(f'/api/geo/ruches/density?bbox={bbox}')),
+        ('GET /ruches/density?format=mvt', get(f'/api/geo/ruches/density?bbox={bbox}&format=mvt')),
+        ('GET /interpolate', get(f'/api/geo/interpolate?bbox={bbox}')),
+        ('GET /interpolate?format=geojson', get(f'/api/geo/interpolate?bbox={bbox}&format=geojson')),
+        ('GET /clusters', get('/api/geo/clusters?n_clusters=8')),
+        ('GET /distance', get(f'/api/geo/distance?lat1={lat}&lon1={lon}&lat2={lat + 0.1}&lon2={lon + 0.1}')),
+        ('POST /distance/matrix', post('/api/geo/distance/matrix', {
+            'origins': query_points(100, seed=1), 'destinations': query_points(100, seed=2)
+        })),
+        ('POST /validate-coords', post('/api/geo/validate-coords', {'lat': lat, 'lon': lon})),
+    ]
+    if include_geocode:
+        cases.append(('GET /reverse-geocode', get(f'/api/geo/reverse-geocode?lat={lat}&lon={lon}')))
+    if bulk is not None:
+        hives, apiaries = bulk
+        cases += [
+            ('POST /ruches/bulk', post('/api/geo/ruches/bulk', hives)),
+            ('POST /ruchers/bulk', post('/api/geo/ruchers/bulk', apiaries)),
+        ]
+    return cases
+
+
+def function_cases(app):
+    """(name, callable) pairs for the serialization and clustering functions."""
+    from app.routes.geo import get_clusters
+    from app.utils.geojson import to_geojson
+    from app.utils.spatial import cluster_points
+
+    ruches = Ruche.query.all()
+    rows = db.session.execute(select(func.ST_X(Ruche.geom), func.ST_Y(Ruche.geom))).all()
+    points = [(float(x), float(y)) for x, y in rows]
+    eps = app.config.get('CLUSTERING_EPS', 1000)
+    min_samples = app.config.get('CLUSTERING_MIN_SAMPLES', 2)
+
+    return [
+        ('to_geojson', lambda: to_geojson(ruches)),
+        ('cluster_points', lambda: cluster_points(points, eps=eps, min_samples=min_samples)),
+        ('get_clusters', lambda: get_clusters(8)),
+    ]
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, tolerance):
+    """
+    Print the median change of every case present in both runs.
+
+    Returns:
+        list: Names of the cases slower than the tolerance
+    """
+    regressions = []
+    print(f'\n{"case":<32} {"before":>10} {"after":>10} {"change":>8}')
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        change = (result['p50'] - before['p50']) / before['p50'] if before['p50'] else 0.0
+        flag = ''
+        if change > tolerance:
+            regressions.append(name)
+            flag = '  REGRESSION'
+        print(f'{name:<32} {before["p50"]:>8.2f}ms {result["p50"]:>8.2f}ms {change:>+7.1%}{flag}')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=20, help='Timed iterations per case')
+    parser.add_argument('--only', help='Only run cases whose name matches this regular expression')
+    parser.add_argument('--output', help='Write the results to this JSON file')
+    parser.add_argument('--compare', help='Previous result file to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.10,
+                        help='Allowed median slowdown before a case counts as a regression (0.10 = 10%%)')
+    parser.add_argument('--geocode', action='store_true', help='Include /reverse-geocode (calls Nominatim)')
+    parser.add_argument('--no-bulk', action='store_true',
+                        help='Leave out the bulk upsert routes (they rewrite 100 existing rows unchanged)')
+    args = parser.parse_args()
+
+    app = create_app()
+    client = app.test_client()
+
+    with app.app_context():
+        ruche_id = db.session.execute(select(func.min(Ruche.id))).scalar()
+        rucher_id = db.session.execute(select(func.min(Rucher.id))).scalar()
+        if ruche_id is None or rucher_id is None:
+            parser.error('no data: run benchmarks/generate_data.py first')
+
+        counts = {
+            'ruches': db.session.execute(select(func.count()).select_from(Ruche)).scalar(),
+            'ruchers': db.session.execute(select(func.count()).select_from(Rucher)).scalar(),
+        }
+        print(f'ruches: {counts["ruches"]}, ruchers: {counts["ruchers"]}, repeat: {args.repeat}')
+
+        bulk = None if args.no_bulk else bulk_collections()
+        cases = route_cases(client, ruche_id, rucher_id, args.geocode, bulk) + function_cases(app)
+        pattern = re.compile(args.only) if args.only else None
+
+        results = {}
+        for name, fn in cases:
+            if pattern and not pattern.search(name):
+                continue
+            if name.startswith(('GET ', 'POST ')):
+                status = fn().status_code
+                if status != 200:
+                    print(f'{name:<32} skipped (status {status})')
+                    continue
+            results[name] = measure(fn, args.repeat)
+            print(f'{name:<32} p50={results[name]["p50"]:9.2f} ms  p95={results[name]["p95"]:9.2f} ms')
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'repeat': args.repeat,
+            'rows': counts,
+        },
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f'\nResults written to {args.output}')
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline['results'], args.tolerance)
+        if regressions:
+            print(f'\n{len(regressions)} case(s) slower than {args.tolerance:.0%}: {", ".join(regressions)}')
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
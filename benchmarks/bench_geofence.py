@@ -0,0 +1,67 @@
+"""
+Benchmark of the geofence check on large ingestion batches.
+
+Builds a geofence state of N watched hives and a batch with one GPS fix per
+hive (a small share displaced), without a database, and times:
+
+- extract: reading the fixes out of the raw payloads
+- evaluate: locating hives and computing displacements in one pass
+
+Usage:
+    python benchmarks/bench_geofence.py --sizes 10000 100000
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.geofence import GeofenceState, evaluate, extract_fixes  # noqa: E402
+
+
+def make_batch(n, displaced=0.01, seed=0):
+    """State of n hives and raw payloads with one fix per hive."""
+    rng = np.random.default_rng(seed)
+    ids = rng.permutation(np.arange(1, 3 * n, 3))[:n]
+    lon = -73.97 + rng.normal(0, 0.5, n)
+    lat = 40.75 + rng.normal(0, 0.5, n)
+    state = GeofenceState(ids, lon, lat, np.full(n, 200.0), ids, np.full(n, np.nan))
+
+    moved = rng.random(n) < displaced
+    fix_lat = lat + np.where(moved, 0.05, rng.normal(0, 0.0002, n))
+    raws = [{'weight': 40.0, 'gps': {'lat': float(y), 'lon': float(x)}} for x, y in zip(lon, fix_lat)]
+    return state, ids, raws
+
+
+def median_ms(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000], help='Hives (and fixes) per batch')
+    parser.add_argument('--repeat', type=int, default=5, help='Timed iterations per case')
+    args = parser.parse_args()
+
+    print(f'{"hives":>8} {"extract":>12} {"evaluate":>12} {"alerts":>7}')
+    for n in args.sizes:
+        state, ids, raws = make_batch(n)
+        longitudes, latitudes = extract_fixes(raws)
+        alerts = len(evaluate(state, ids, longitudes, latitudes, cooldown=0))
+
+        extract = median_ms(lambda: extract_fixes(raws), args.repeat)
+        check = median_ms(lambda: evaluate(state, ids, longitudes, latitudes, cooldown=0), args.repeat)
+        print(f'{n:>8} {extract:>9.2f} ms {check:>9.2f} ms {alerts:>7}')
+
+
+if __name__ == '__main__':
+    main()
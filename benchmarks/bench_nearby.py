@@ -0,0 +1,130 @@
+"""
+Latency benchmark for /api/geo/ruches/nearby against a large seeded table.
+
+Compares the previous implementation (full model rows, separate ST_Distance
+and ST_DWithin, unordered and unbounded, per-row to_geojson) with the current
+endpoint (selected columns, distance computed once, KNN ordering, limit).
+
+Usage:
+    DATABASE_URL=postgresql://... python benchmarks/bench_nearby.py --seed 100000
+    DATABASE_URL=postgresql://... python benchmarks/bench_nearby.py --cleanup
+
+Seeded hives are named 'bench-<n>' so they can be removed with --cleanup.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text  # noqa: E402
+from app import create_app, db  # noqa: E402
+
+# Seeded hives are spread over roughly the New York metro area
+CENTER_LON = -73.97
+CENTER_LAT = 40.75
+SPREAD_DEGREES = 0.5
+
+SEED_SQL = text("""
+    INSERT INTO ruches (name, rucher_id, queen_info, created_at, geom, active)
+    SELECT
+        'bench-' || g,
+        NULL,
+        NULL,
+        now(),
+        ST_SetSRID(ST_MakePoint(
+            :lon + (random() - 0.5) * :spread,
+            :lat + (random() - 0.5) * :spread
+        ), 4326),
+        random() > 0.1
+    FROM generate_series(1, :n) AS g
+""")
+
+
+def seed(n):
+    """Insert n synthetic hives and refresh planner statistics."""
+    db.session.execute(SEED_SQL, {'n': n, 'lon': CENTER_LON, 'lat': CENTER_LAT, 'spread': SPREAD_DEGREES})
+    db.session.commit()
+    db.session.execute(text('ANALYZE ruches'))
+    db.session.commit()
+
+
+def cleanup():
+    """Remove all seeded hives."""
+    db.session.execute(text("DELETE FROM ruches WHERE name LIKE 'bench-%'"))
+    db.session.commit()
+
+
+def legacy_nearby(lat, lon, radius):
+    """The nearby query as it was implemented before ordering and limits."""
+    from geoalchemy2.functions import ST_Distance, ST_DWithin
+    from app.models import Ruche
+    from app.utils.geojson import to_geojson
+
+    point = f'SRID=4326;POINT({lon} {lat})'
+    rows = db.session.query(
+        Ruche,
+        ST_Distance(Ruche.geom, point, True).label('distance')
+    ).filter(
+        ST_DWithin(Ruche.geom, point, radius, True)
+    ).all()
+
+    features = []
+    for ruche, distance in rows:
+        feature = to_geojson(ruche)
+        if feature:
+            feature['properties']['distance_meters'] = float(distance)
+            features.append(feature)
+    return features
+
+
+def time_call(fn, repeat):
+    """Run fn repeat times and return latencies in milliseconds."""
+    fn()  # warm-up
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def report(label, samples):
+    samples = sorted(samples)
+    p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+    print(f'{label:<45} p50={statistics.median(samples):8.2f} ms  p95={p95:8.2f} ms')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seed', type=int, default=0, help='Insert this many synthetic hives first')
+    parser.add_argument('--cleanup', action='store_true', help='Delete seeded hives and exit')
+    parser.add_argument('--repeat', type=int, default=20, help='Timed iterations per case')
+    parser.add_argument('--radius', type=int, default=5000, help='Search radius in meters')
+    args = parser.parse_args()
+
+    app = create_app()
+    client = app.test_client()
+
+    with app.app_context():
+        if args.cleanup:
+            cleanup()
+            return
+        if args.seed:
+            seed(args.seed)
+
+        total = db.session.execute(text('SELECT count(*) FROM ruches')).scalar()
+        print(f'ruches rows: {total}, radius: {args.radius} m, repeat: {args.repeat}')
+
+        base = f'/api/geo/ruches/nearby?lat={CENTER_LAT}&lon={CENTER_LON}&radius={args.radius}'
+        report('legacy (unordered, unbounded)',
+               time_call(lambda: legacy_nearby(CENTER_LAT, CENTER_LON, args.radius), args.repeat))
+        for query in ('', '&order=distance', '&order=distance&limit=100', '&order=distance&limit=10'):
+            report(f'endpoint{query or " (default)"}',
+                   time_call(lambda: client.get(base + query), args.repeat))
+
+
+if __name__ == '__main__':
+    main()
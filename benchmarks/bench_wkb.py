@@ -0,0 +1,81 @@
+"""
+Benchmark of vectorized WKB decoding against the per-row to_shape path.
+
+Builds EWKB point elements like the ones PostGIS returns for the ruches
+layer (no database needed) and times, for each size:
+
+- GeoJSON geometries: mapping(to_shape(...)) per row vs geojson_geometries
+- Clustering input: to_shape(...).x/.y per row vs point_coordinates
+
+Usage:
+    python benchmarks/bench_wkb.py --sizes 1000 10000 100000
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+import shapely
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from geoalchemy2.elements import WKBElement  # noqa: E402
+from geoalchemy2.shape import to_shape  # noqa: E402
+from shapely.geometry import mapping  # noqa: E402
+
+from app.utils.wkb import geojson_geometries, point_coordinates  # noqa: E402
+
+
+def make_elements(n, seed=0):
+    """n EWKB points with SRID 4326 around New York."""
+    rng = np.random.default_rng(seed)
+    points = shapely.points(-73.97 + rng.normal(0, 0.2, n), 40.75 + rng.normal(0, 0.2, n))
+    wkbs = shapely.to_wkb(shapely.set_srid(points, 4326), include_srid=True)
+    return [WKBElement(wkb, srid=4326, extended=True) for wkb in wkbs]
+
+
+def per_row_geometries(elements):
+    return [mapping(to_shape(element)) for element in elements]
+
+
+def per_row_coordinates(elements):
+    coordinates = []
+    for element in elements:
+        shape = to_shape(element)
+        coordinates.append((shape.x, shape.y))
+    return coordinates
+
+
+def median_ms(fn, repeat):
+    fn()  # warm-up
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000], help='Rows per run')
+    parser.add_argument('--repeat', type=int, default=5, help='Timed iterations per case')
+    args = parser.parse_args()
+
+    print(f'{"rows":>8} {"case":<12} {"per-row":>12} {"vectorized":>12} {"speedup":>8}')
+    for n in args.sizes:
+        elements = make_elements(n)
+        assert geojson_geometries(elements) == per_row_geometries(elements)
+        for case, per_row, vectorized in (
+            ('geojson', per_row_geometries, geojson_geometries),
+            ('coordinates', per_row_coordinates, point_coordinates),
+        ):
+            before = median_ms(lambda: per_row(elements), args.repeat)
+            after = median_ms(lambda: vectorized(elements), args.repeat)
+            print(f'{n:>8} {case:<12} {before:>9.2f} ms {after:>9.2f} ms {before / after:>7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
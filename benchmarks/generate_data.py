@@ -0,0 +1,267 @@
+"""
+Synthetic data generator for benchmarks.
+
+Creates N apiaries (ruchers), M hives per apiary and K measurements per hive
+and bulk-loads them with COPY, so millions of rows load in seconds.
+
+Apiaries are spread around a few beekeeping regions with a normal
+distribution (dense cores, sparse edges), hives sit within a few dozen
+meters of their apiary, and measurements form hourly time series with daily
+temperature cycles and a slow weight trend. The same --seed always produces
+the same data.
+
+Usage:
+    DATABASE_URL=postgresql://... python benchmarks/generate_data.py \\
+        --ruchers 1000 --hives 20 --measurements 168
+    DATABASE_URL=postgresql://... python benchmarks/generate_data.py --cleanup
+
+Generated rows are named 'synth-...' so they can be removed with --cleanup.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text  # noqa: E402
+from app import create_app, db  # noqa: E402
+
+# (name, lon, lat, standard deviation in km) of the regions apiaries are spread over
+REGIONS = [
+    ('New York City', -73.97, 40.75, 12),
+    ('Long Island', -72.90, 40.85, 25),
+    ('Hudson Valley', -73.95, 41.70, 30),
+    ('Northern New Jersey', -74.45, 40.95, 20),
+    ('Connecticut', -72.70, 41.60, 35),
+    ('Finger Lakes', -76.90, 42.65, 40),
+]
+
+KM_PER_DEGREE = 111.32
+# Hives stand around their apiary within this standard deviation
+HIVE_SPREAD_METERS = 25
+MEASUREMENT_INTERVAL = timedelta(hours=1)
+NAME_PREFIX = 'synth-'
+BATCH_ROWS = 100000
+BREEDS = ['Italian', 'Carniolan', 'Buckfast', 'Caucasian', 'Russian']
+
+
+class RowStream:
+    """
+    File-like object feeding CSV lines from a generator to COPY.
+
+    Keeps memory bounded however many rows are generated.
+    """
+
+    def __init__(self, lines):
+        self._lines = iter(lines)
+        self._buffer = ''
+
+    def read(self, size=-1):
+        while size < 0 or len(self._buffer) < size:
+            try:
+                self._buffer += next(self._lines)
+            except StopIteration:
+                break
+        if size < 0:
+            size = len(self._buffer)
+        chunk, self._buffer = self._buffer[:size], self._buffer[size:]
+        return chunk
+
+
+def csv_text(value):
+    """Quote a value for COPY ... (FORMAT csv)."""
+    return '"' + value.replace('"', '""') + '"'
+
+
+def reserve_ids(cursor, table, n):
+    """Draw n ids from the table's sequence, so rows can be copied with explicit ids."""
+    cursor.execute(
+        f"SELECT nextval(pg_get_serial_sequence('{table}', 'id')) FROM generate_series(1, %s)", (n,)
+    )
+    return np.array([row[0] for row in cursor.fetchall()], dtype=np.int64)
+
+
+def copy_rows(cursor, table, columns, lines):
+    """COPY CSV lines into table."""
+    cursor.copy_expert(
+        f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", RowStream(lines)
+    )
+
+
+def apiary_locations(rng, n):
+    """Longitude and latitude arrays of n apiaries spread over REGIONS."""
+    weights = np.array([region[3] for region in REGIONS], dtype=np.float64)
+    picked = rng.choice(len(REGIONS), size=n, p=weights / weights.sum())
+    centers = np.array([(region[1], region[2]) for region in REGIONS])[picked]
+    sigma_km = weights[picked]
+
+    lat = centers[:, 1] + rng.normal(0, 1, n) * sigma_km / KM_PER_DEGREE
+    lon = centers[:, 0] + rng.normal(0, 1, n) * sigma_km / (KM_PER_DEGREE * np.cos(np.radians(lat)))
+    return lon, lat, picked
+
+
+def generate(n_ruchers, hives_per_rucher, measurements_per_hive, seed=0, inactive_ratio=0.1):
+    """
+    Generate and COPY the synthetic data set. Must run inside an app context.
+
+    Args:
+        n_ruchers: Number of apiaries
+        hives_per_rucher: Hives per apiary
+        measurements_per_hive: Measurements per hive, hourly up to now
+        seed: Random seed
+        inactive_ratio: Share of hives marked inactive
+
+    Returns:
+        dict: Number of rows inserted per table
+    """
+    rng = np.random.default_rng(seed)
+    now = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0, tzinfo=None)
+    created_at = now.isoformat()
+
+    connection = db.engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+
+        rucher_ids = reserve_ids(cursor, 'ruchers', n_ruchers)
+        rucher_lon, rucher_lat, region = apiary_locations(rng, n_ruchers)
+
+        def rucher_lines():
+            for i, rucher_id in enumerate(rucher_ids):
+                yield (
+                    f'{rucher_id},{csv_text(f"{NAME_PREFIX}rucher-{i}")},'
+                    f'{csv_text(f"Synthetic apiary in {REGIONS[region[i]][0]}")},'
+                    f'SRID=4326;POINT({rucher_lon[i]:.7f} {rucher_lat[i]:.7f}),{created_at}\n'
+                )
+
+        copy_rows(cursor, 'ruchers', ('id', 'name', 'description', 'geom', 'created_at'), rucher_lines())
+
+        n_ruches = n_ruchers * hives_per_rucher
+        ruche_ids = reserve_ids(cursor, 'ruches', n_ruches)
+        parent = np.repeat(np.arange(n_ruchers), hives_per_rucher)
+        offset = rng.normal(0, HIVE_SPREAD_METERS / 1000 / KM_PER_DEGREE, (n_ruches, 2))
+        ruche_lat = rucher_lat[parent] + offset[:, 1]
+        ruche_lon = rucher_lon[parent] + offset[:, 0] / np.cos(np.radians(ruche_lat))
+        active = rng.random(n_ruches) >= inactive_ratio
+        queen_age = rng.integers(0, 5, n_ruches)
+        breed = rng.integers(0, len(BREEDS), n_ruches)
+
+        def ruche_lines():
+            for j, ruche_id in enumerate(ruche_ids):
+                queen = json.dumps({'age': int(queen_age[j]), 'breed': BREEDS[breed[j]]})
+                yield (
+                    f'{ruche_id},{csv_text(f"{NAME_PREFIX}ruche-{parent[j]}-{j % hives_per_rucher}")},'
+                    f'{rucher_ids[parent[j]]},{csv_text(queen)},{created_at},'
+                    f'SRID=4326;POINT({ruche_lon[j]:.7f} {ruche_lat[j]:.7f}),{"t" if active[j] else "f"}\n'
+                )
+
+        copy_rows(
+            cursor, 'ruches',
+            ('id', 'name', 'rucher_id', 'queen_info', 'created_at', 'geom', 'active'), ruche_lines()
+        )
+
+        n_measurements = n_ruches * measurements_per_hive
+        if measurements_per_hive:
+            copy_rows(
+                cursor, 'measurements',
+                ('ruche_id', 'recorded_at', 'weight', 'temperature', 'humidity', 'signal'),
+                measurement_lines(rng, ruche_ids, measurements_per_hive, now)
+            )
+
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        connection.close()
+
+    return {'ruchers': n_ruchers, 'ruches': n_ruches, 'measurements': n_measurements}
+
+
+def measurement_lines(rng, ruche_ids, per_hive, now):
+    """
+    CSV lines of hourly measurements ending at now, generated in batches.
+
+    Temperature follows a daily cycle, weight drifts slowly with noise, and
+    humidity and signal strength vary around per-hive baselines.
+    """
+    steps = np.arange(per_hive)[::-1]
+    hours = np.array([(now - MEASUREMENT_INTERVAL * int(step)).hour for step in steps])
+    stamps = [(now - MEASUREMENT_INTERVAL * int(step)).isoformat() for step in steps]
+    daily = np.sin((hours - 9) / 24 * 2 * np.pi)
+    hives_per_batch = max(1, BATCH_ROWS // per_hive)
+
+    for start in range(0, len(ruche_ids), hives_per_batch):
+        ids = ruche_ids[start:start + hives_per_batch]
+        n = len(ids)
+        base_weight = rng.uniform(25, 60, (n, 1))
+        trend = rng.normal(0, 0.02, (n, 1)) * np.arange(per_hive)
+        weight = base_weight + trend + rng.normal(0, 0.15, (n, per_hive))
+        temperature = rng.uniform(10, 22, (n, 1)) + 7 * daily + rng.normal(0, 0.8, (n, per_hive))
+        humidity = np.clip(rng.uniform(45, 75, (n, 1)) - 10 * daily + rng.normal(0, 3, (n, per_hive)), 0, 100)
+        signal = rng.uniform(-95, -60, (n, 1)) + rng.normal(0, 2, (n, per_hive))
+
+        for h, ruche_id in enumerate(ids):
+            yield ''.join(
+                f'{ruche_id},{stamps[k]},{weight[h, k]:.2f},{temperature[h, k]:.2f},'
+                f'{humidity[h, k]:.1f},{signal[h, k]:.1f}\n'
+                for k in range(per_hive)
+            )
+
+
+def cleanup():
+    """Remove all generated rows. Must run inside an app context."""
+    ruches = f"SELECT id FROM ruches WHERE name LIKE '{NAME_PREFIX}%'"
+    for statement in (
+        f'DELETE FROM alerts WHERE ruche_id IN ({ruches})',
+        f'DELETE FROM alert_rules WHERE ruche_id IN ({ruches})',
+        f'DELETE FROM measurements WHERE ruche_id IN ({ruches})',
+        f"DELETE FROM ruches WHERE name LIKE '{NAME_PREFIX}%'",
+        f"DELETE FROM ruchers WHERE name LIKE '{NAME_PREFIX}%'",
+    ):
+        db.session.execute(text(statement))
+    db.session.commit()
+
+
+def analyze():
+    """Refresh planner statistics after a bulk load."""
+    for table in ('ruchers', 'ruches', 'measurements'):
+        db.session.execute(text(f'ANALYZE {table}'))
+    db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--ruchers', type=int, default=100, help='Number of apiaries (N)')
+    parser.add_argument('--hives', type=int, default=10, help='Hives per apiary (M)')
+    parser.add_argument('--measurements', type=int, default=24, help='Hourly measurements per hive (K)')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed')
+    parser.add_argument('--inactive-ratio', type=float, default=0.1, help='Share of inactive hives')
+    parser.add_argument('--cleanup', action='store_true', help='Delete generated rows and exit')
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        if db.engine.dialect.name != 'postgresql':
+            parser.error('a PostgreSQL DATABASE_URL is required (the generator uses COPY)')
+
+        if args.cleanup:
+            cleanup()
+            print('Generated rows removed')
+            return
+
+        start = time.perf_counter()
+        counts = generate(args.ruchers, args.hives, args.measurements, args.seed, args.inactive_ratio)
+        analyze()
+        elapsed = time.perf_counter() - start
+        total = sum(counts.values())
+        print(', '.join(f'{count} {table}' for table, count in counts.items())
+              + f' inserted in {elapsed:.1f} s ({total / elapsed:,.0f} rows/s)')
+
+
+if __name__ == '__main__':
+    main()
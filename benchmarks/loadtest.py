@@ -0,0 +1,158 @@
+"""
+Concurrent load test comparing the sync (gunicorn) and async (uvicorn) deployments.
+
+Each target is hit with the same request mix at a fixed concurrency for a
+fixed duration; requests/second and p50/p99 latency are reported per
+endpoint and overall.
+
+Usage:
+    gunicorn -w 4 -b :8000 wsgi:app
+    uvicorn asgi:app --workers 4 --port 8001
+    python benchmarks/loadtest.py --sync http://localhost:8000 --async http://localhost:8001 \\
+        --concurrency 64 --duration 30
+
+Seed data first (e.g. benchmarks/bench_nearby.py --seed 100000) so the
+queries do real work. Reverse geocoding calls the public Nominatim service
+and is only included with --geocode.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+import aiohttp
+import numpy as np
+
+# Query points are spread over the area seeded by bench_nearby.py
+CENTER_LON = -73.97
+CENTER_LAT = 40.75
+SPREAD_DEGREES = 0.5
+
+
+def random_point(rng):
+    return (
+        round(CENTER_LAT + (rng.random() - 0.5) * SPREAD_DEGREES, 6),
+        round(CENTER_LON + (rng.random() - 0.5) * SPREAD_DEGREES, 6)
+    )
+
+
+def request_mix(rng, include_geocode):
+    """Yield (label, method, path, json body) for an endless request stream."""
+    while True:
+        lat, lon = random_point(rng)
+        choice = rng.random()
+        if choice < 0.5:
+            yield 'nearby', 'GET', f'/api/geo/ruches/nearby?lat={lat}&lon={lon}&radius=2000&order=distance&limit=100', None
+        elif choice < 0.7:
+            points = [dict(zip(('lat', 'lon'), random_point(rng))) for _ in range(10)]
+            yield 'knn', 'POST', '/api/geo/ruches/knn', {'points': points, 'k': 5}
+        elif choice < 0.9 or not include_geocode:
+            d = 0.02
+            yield 'bbox', 'GET', f'/api/geo/ruches?bbox={lon - d},{lat - d},{lon + d},{lat + d}', None
+        else:
+            yield 'reverse-geocode', 'GET', f'/api/geo/reverse-geocode?lat={lat}&lon={lon}', None
+
+
+async def worker(session, base_url, requests, deadline, samples, errors):
+    for label, method, path, body in requests:
+        if time.perf_counter() >= deadline:
+            return
+        start = time.perf_counter()
+        try:
+            async with session.request(method, base_url + path, json=body) as response:
+                await response.read()
+                ok = response.status < 500
+        except aiohttp.ClientError:
+            ok = False
+        elapsed = time.perf_counter() - start
+        if ok:
+            samples.setdefault(label, []).append(elapsed)
+        else:
+            errors[label] = errors.get(label, 0) + 1
+
+
+async def run_target(base_url, concurrency, duration, include_geocode, seed):
+    """Run the load against one deployment and return per-endpoint samples."""
+    rng = random.Random(seed)
+    requests = request_mix(rng, include_geocode)
+    samples = {}
+    errors = {}
+
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    timeout = aiohttp.ClientTimeout(total=60)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        # Warm up connections and caches
+        async with session.get(base_url + '/api/health') as response:
+            await response.read()
+
+        start = time.perf_counter()
+        deadline = start + duration
+        await asyncio.gather(*(
+            worker(session, base_url, requests, deadline, samples, errors) for _ in range(concurrency)
+        ))
+        elapsed = time.perf_counter() - start
+
+    return summarize(samples, errors, elapsed)
+
+
+def summarize(samples, errors, elapsed):
+    def stats(values, count_errors):
+        values = np.asarray(values) * 1000
+        return {
+            'requests': int(len(values)),
+            'errors': count_errors,
+            'rps': round(len(values) / elapsed, 1),
+            'p50_ms': round(float(np.percentile(values, 50)), 2) if len(values) else None,
+            'p99_ms': round(float(np.percentile(values, 99)), 2) if len(values) else None
+        }
+
+    endpoints = {label: stats(values, errors.get(label, 0)) for label, values in sorted(samples.items())}
+    everything = [value for values in samples.values() for value in values]
+    return {'overall': stats(everything, sum(errors.values())), 'endpoints': endpoints}
+
+
+def print_report(results):
+    header = f"{'target':<8} {'endpoint':<16} {'requests':>9} {'errors':>7} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9}"
+    print(header)
+    print('-' * len(header))
+    for target, result in results.items():
+        rows = [('overall', result['overall'])] + list(result['endpoints'].items())
+        for label, row in rows:
+            print(
+                f"{target:<8} {label:<16} {row['requests']:>9} {row['errors']:>7} {row['rps']:>9} "
+                f"{row['p50_ms'] if row['p50_ms'] is not None else '-':>9} "
+                f"{row['p99_ms'] if row['p99_ms'] is not None else '-':>9}"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sync', dest='sync_url', help='Base URL of the WSGI deployment')
+    parser.add_argument('--async', dest='async_url', help='Base URL of the ASGI deployment')
+    parser.add_argument('--concurrency', type=int, default=64, help='Concurrent connections')
+    parser.add_argument('--duration', type=float, default=30, help='Seconds per target')
+    parser.add_argument('--geocode', action='store_true', help='Include reverse geocoding in the mix')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed for the request mix')
+    parser.add_argument('--json', dest='json_path', help='Also write the results to this file')
+    args = parser.parse_args()
+
+    targets = {name: url.rstrip('/') for name, url in (('sync', args.sync_url), ('async', args.async_url)) if url}
+    if not targets:
+        parser.error('give at least one of --sync and --async')
+
+    results = {}
+    for name, url in targets.items():
+        print(f"Running {args.duration:.0f}s at concurrency {args.concurrency} against {name} ({url})...")
+        results[name] = asyncio.run(run_target(url, args.concurrency, args.duration, args.geocode, args.seed))
+
+    print()
+    print_report(results)
+
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump({'concurrency': args.concurrency, 'duration': args.duration, 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -3,11 +3,77 @@ Configuration module for BeeTrack Flask API.
 Handles environment variables and application settings.
 """
 import os
+import tempfile
 from dotenv import load_dotenv
 
 load_dotenv()
 
 
+def parse_route_timeouts(value: str) -> dict:
+    """
+    Parse per-route statement timeouts from 'endpoint=ms,endpoint=ms'.
+    
+    Endpoints use Flask endpoint names, e.g. 'geo.clusters=10000'.
+    """
+    timeouts = {}
+    for item in filter(None, (part.strip() for part in value.split(','))):
+        endpoint, _, milliseconds = item.partition('=')
+        timeouts[endpoint.strip()] = int(milliseconds)
+    return timeouts
+
+
+def engine_options(database_uri: str) -> dict:
+    """
+    Build SQLALCHEMY_ENGINE_OPTIONS from environment variables.
+    
+    In PgBouncer mode (DB_PGBOUNCER=true) pooling is left to PgBouncer:
+    connections are not pooled locally, no startup options are sent and the
+    statement timeout is applied per transaction instead.
+    
+    Args:
+        database_uri: Database URI the options are for
+        
+    Returns:
+        dict: Engine options (empty for non-PostgreSQL databases)
+    """
+    if not database_uri.startswith('postgres'):
+        return {}
+    
+    if os.getenv('DB_PGBOUNCER', 'False').lower() == 'true':
+        from sqlalchemy.pool import NullPool
+        return {'poolclass': NullPool}
+    
+    options = {
+        'pool_size': int(os.getenv('DB_POOL_SIZE', '5')),
+        'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', '10')),
+        'pool_timeout': float(os.getenv('DB_POOL_TIMEOUT', '10')),  # seconds
+        'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', '1800')),  # seconds
+        'pool_pre_ping': os.getenv('DB_POOL_PRE_PING', 'True').lower() == 'true',
+    }
+    
+    statement_timeout = int(os.getenv('DB_STATEMENT_TIMEOUT_MS', '30000'))
+    if statement_timeout:
+        options['connect_args'] = {'options': f'-c statement_timeout={statement_timeout}'}
+    
+    return options
+
+
+def replica_binds(urls: str) -> dict:
+    """
+    Build SQLALCHEMY_BINDS entries for read replicas.
+    
+    Args:
+        urls: Comma-separated replica database URLs
+        
+    Returns:
+        dict: Bind key ('replica_0', 'replica_1', ...) to engine config
+    """
+    binds = {}
+    for i, url in enumerate(filter(None, (part.strip() for part in urls.split(',')))):
+        binds[f'replica_{i}'] = {'url': url, **engine_options(url)}
+    return binds
+
+
 class Config:
     """Base configuration class."""
     
@@ -18,6 +84,45 @@ class Config:
     SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL', 'postgresql://localhost/beetrack')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     SQLALCHEMY_ECHO = os.getenv('SQLALCHEMY_ECHO', 'False').lower() == 'true'
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI)
+    
+    # Read replicas: read-only requests are spread over them round-robin
+    # (empty: everything uses the primary)
+    SQLALCHEMY_BINDS = replica_binds(os.getenv('DATABASE_REPLICA_URLS', ''))
+    DATABASE_REPLICA_MAX_LAG = float(os.getenv('DATABASE_REPLICA_MAX_LAG', '10'))  # seconds
+    DATABASE_REPLICA_CHECK_INTERVAL = float(os.getenv('DATABASE_REPLICA_CHECK_INTERVAL', '5'))  # seconds
+    DATABASE_REPLICA_CHECK_TIMEOUT_MS = int(os.getenv('DATABASE_REPLICA_CHECK_TIMEOUT_MS', '1000'))
+    DATABASE_REPLICA_COOKIE = os.getenv('DATABASE_REPLICA_COOKIE', 'db_lsn')  # read-your-writes position
+    DATABASE_REPLICA_COOKIE_MAX_AGE = int(os.getenv('DATABASE_REPLICA_COOKIE_MAX_AGE', '300'))  # seconds
+    
+    # Connection pool and query limits
+    DB_PGBOUNCER = os.getenv('DB_PGBOUNCER', 'False').lower() == 'true'
+    DB_STATEMENT_TIMEOUT_MS = int(os.getenv('DB_STATEMENT_TIMEOUT_MS', '30000'))
+    DB_ROUTE_STATEMENT_TIMEOUTS = parse_route_timeouts(os.getenv('DB_ROUTE_STATEMENT_TIMEOUTS', ''))
+    
+    # Prometheus metrics at /metrics (set PROMETHEUS_MULTIPROC_DIR for several workers)
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'True').lower() == 'true'
+    
+    # Per-request profiling (opt-in) and slow-query log
+    PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', 'False').lower() == 'true'
+    PROFILING_HEADER = os.getenv('PROFILING_HEADER', 'X-Profile')
+    PROFILING_TOKEN = os.getenv('PROFILING_TOKEN', '')  # required header value; empty: header ignored
+    PROFILING_SAMPLE_RATE = float(os.getenv('PROFILING_SAMPLE_RATE', '0'))  # fraction of requests
+    PROFILING_ENGINE = os.getenv('PROFILING_ENGINE', 'cprofile')  # cprofile or pyinstrument
+    PROFILING_DIR = os.getenv('PROFILING_DIR', '/tmp/beetrack-profiles')
+    PROFILING_MAX_FILES = int(os.getenv('PROFILING_MAX_FILES', '500'))
+    SLOW_QUERY_THRESHOLD_MS = float(os.getenv('SLOW_QUERY_THRESHOLD_MS', '0'))  # 0 disables
+    SLOW_QUERY_EXPLAIN = os.getenv('SLOW_QUERY_EXPLAIN', 'True').lower() == 'true'
+    
+    # Health probes: background database check behind /api/health/ready
+    HEALTH_PROBE_INTERVAL = float(os.getenv('HEALTH_PROBE_INTERVAL', '5'))  # seconds
+    HEALTH_PROBE_TIMEOUT_MS = int(os.getenv('HEALTH_PROBE_TIMEOUT_MS', '2000'))
+    HEALTH_PROBE_MAX_AGE = float(os.getenv('HEALTH_PROBE_MAX_AGE', '30'))  # seconds
+    READINESS_MAX_POOL_SATURATION = float(os.getenv('READINESS_MAX_POOL_SATURATION', '1.0'))
+    READINESS_MAX_REPLICATION_LAG = float(os.getenv('READINESS_MAX_REPLICATION_LAG', '30'))  # seconds
+    
+    # /api/status row counts are cached this long (seconds)
+    STATUS_STATISTICS_TTL = float(os.getenv('STATUS_STATISTICS_TTL', '30'))
     
     # API configuration
     API_TITLE = os.getenv('API_TITLE', 'BeeTrack GeoJSON API')
@@ -31,6 +136,101 @@ class Config:
     CLUSTERING_EPS = float(os.getenv('CLUSTERING_EPS', '1000'))  # meters
     CLUSTERING_MIN_SAMPLES = int(os.getenv('CLUSTERING_MIN_SAMPLES', '2'))
     
+    # Single-flight: identical concurrent clustering requests share one computation,
+    # across workers through lock files in SINGLEFLIGHT_LOCK_DIR (empty: per worker only)
+    SINGLEFLIGHT_ENABLED = os.getenv('SINGLEFLIGHT_ENABLED', 'True').lower() == 'true'
+    SINGLEFLIGHT_LOCK_DIR = os.getenv(
+        'SINGLEFLIGHT_LOCK_DIR', os.path.join(tempfile.gettempdir(), 'beetrack-singleflight')
+    )
+    SINGLEFLIGHT_TIMEOUT = float(os.getenv('SINGLEFLIGHT_TIMEOUT', '60'))  # seconds before computing anyway
+    
+    # Background jobs, run by `flask run-jobs` (the Procfile worker) in a local process pool
+    JOBS_PROCESSES = int(os.getenv('JOBS_PROCESSES', '2'))  # 0 runs jobs in the worker process itself
+    JOBS_POLL_INTERVAL = float(os.getenv('JOBS_POLL_INTERVAL', '1'))  # seconds
+    JOBS_STALE_AFTER = float(os.getenv('JOBS_STALE_AFTER', '300'))  # seconds without heartbeat: worker lost
+    JOBS_MAX_ATTEMPTS = int(os.getenv('JOBS_MAX_ATTEMPTS', '2'))
+    JOBS_RESULT_TTL = float(os.getenv('JOBS_RESULT_TTL', '86400'))  # seconds finished jobs are kept
+    # Export results are files here, shared by the web and worker services; others stay in the jobs table
+    JOBS_RESULT_DIR = os.getenv('JOBS_RESULT_DIR', os.path.join(tempfile.gettempdir(), 'beetrack-jobs'))
+    JOBS_RESULT_MAX_BYTES = int(os.getenv('JOBS_RESULT_MAX_BYTES', str(1024 ** 3)))  # larger fail; 0: no limit
+    JOBS_CLUSTER_THRESHOLD = int(os.getenv('JOBS_CLUSTER_THRESHOLD', '0'))  # hives; 0: always cluster inline
+    JOBS_CLUSTER_ESTIMATE_TTL = float(os.getenv('JOBS_CLUSTER_ESTIMATE_TTL', '60'))  # seconds hive estimate is cached
+    JOBS_GEOCODE_MAX_POINTS = int(os.getenv('JOBS_GEOCODE_MAX_POINTS', '1000'))
+    JOBS_GEOCODE_DELAY = float(os.getenv('JOBS_GEOCODE_DELAY', '1'))  # seconds between geocoder requests
+    
+    # Nearest-neighbour query limits
+    NEARBY_MAX_LIMIT = int(os.getenv('NEARBY_MAX_LIMIT', '5000'))  # largest explicit limit; none by default
+    KNN_MAX_POINTS = int(os.getenv('KNN_MAX_POINTS', '1000'))
+    KNN_MAX_K = int(os.getenv('KNN_MAX_K', '100'))
+    
+    # Density grid (hexbin/square) aggregation
+    DENSITY_DEFAULT_CELL_SIZE = float(os.getenv('DENSITY_DEFAULT_CELL_SIZE', '10000'))  # Mercator meters
+    DENSITY_MIN_CELL_SIZE = float(os.getenv('DENSITY_MIN_CELL_SIZE', '100'))
+    DENSITY_MAX_CELLS = int(os.getenv('DENSITY_MAX_CELLS', '50000'))
+    DENSITY_CACHE_TTL = float(os.getenv('DENSITY_CACHE_TTL', '60'))  # seconds
+    
+    # IDW interpolation grid of the hives' latest readings
+    INTERPOLATION_DEFAULT_CELLS = int(os.getenv('INTERPOLATION_DEFAULT_CELLS', '256'))  # across the bbox
+    INTERPOLATION_MAX_CELLS = int(os.getenv('INTERPOLATION_MAX_CELLS', '1000000'))  # raster
+    INTERPOLATION_MAX_CONTOUR_CELLS = int(os.getenv('INTERPOLATION_MAX_CONTOUR_CELLS', '250000'))  # geojson
+    INTERPOLATION_NEIGHBOURS = int(os.getenv('INTERPOLATION_NEIGHBOURS', '8'))
+    INTERPOLATION_POWER = float(os.getenv('INTERPOLATION_POWER', '2'))
+    INTERPOLATION_MAX_DISTANCE = float(os.getenv('INTERPOLATION_MAX_DISTANCE', '50000'))  # meters
+    INTERPOLATION_CHUNK_CELLS = int(os.getenv('INTERPOLATION_CHUNK_CELLS', '65536'))  # cells per block
+    INTERPOLATION_CACHE_TTL = float(os.getenv('INTERPOLATION_CACHE_TTL', '300'))  # seconds
+    INTERPOLATION_CACHE_SIZE = int(os.getenv('INTERPOLATION_CACHE_SIZE', '8'))  # grids per worker
+    
+    # Apiary stats: serve from the rucher_stats materialized view, refreshed by the job
+    # worker at most every RUCHER_STATS_REFRESH_INTERVAL seconds once hives or measurements changed
+    RUCHER_STATS_MATERIALIZED = os.getenv('RUCHER_STATS_MATERIALIZED', 'False').lower() == 'true'
+    RUCHER_STATS_REFRESH_INTERVAL = float(os.getenv('RUCHER_STATS_REFRESH_INTERVAL', '60'))  # seconds
+    
+    # Apiary forage overlaps: default radius, and the rucher_overlaps table kept
+    # up to date on apiary writes (read when the requested radius is the default)
+    RUCHER_OVERLAP_RADIUS = float(os.getenv('RUCHER_OVERLAP_RADIUS', '3000'))  # meters
+    RUCHER_OVERLAP_MAX_RADIUS = float(os.getenv('RUCHER_OVERLAP_MAX_RADIUS', '20000'))
+    RUCHER_OVERLAPS_PRECOMPUTED = os.getenv('RUCHER_OVERLAPS_PRECOMPUTED', 'False').lower() == 'true'
+    
+    # Measurement ingestion and geofence (displaced hive) alerts
+    MEASUREMENTS_MAX_BATCH = int(os.getenv('MEASUREMENTS_MAX_BATCH', '10000'))
+    GEOFENCE_ENABLED = os.getenv('GEOFENCE_ENABLED', 'True').lower() == 'true'
+    GEOFENCE_DEFAULT_RADIUS = float(os.getenv('GEOFENCE_DEFAULT_RADIUS', '200'))  # meters, rules without params.radius
+    GEOFENCE_ALERT_COOLDOWN = float(os.getenv('GEOFENCE_ALERT_COOLDOWN', '3600'))  # seconds between alerts per hive
+    GEOFENCE_STATE_TTL = float(os.getenv('GEOFENCE_STATE_TTL', '60'))  # seconds before rules are reloaded
+    
+    # Time series anomaly detection (hives with an 'anomaly' alert rule)
+    ANOMALY_ENABLED = os.getenv('ANOMALY_ENABLED', 'True').lower() == 'true'
+    ANOMALY_METRICS = tuple(os.getenv('ANOMALY_METRICS', 'weight,temperature,humidity').split(','))
+    ANOMALY_ALPHA = float(os.getenv('ANOMALY_ALPHA', '0.1'))  # level and variance, weight per measurement
+    ANOMALY_TREND_ALPHA = float(os.getenv('ANOMALY_TREND_ALPHA', '0.04'))  # level change per hour
+    ANOMALY_SLOW_ALPHA = float(os.getenv('ANOMALY_SLOW_ALPHA', '0.005'))  # usual trend (drift baseline)
+    ANOMALY_SEASON_ALPHA = float(os.getenv('ANOMALY_SEASON_ALPHA', '0.05'))  # hour-of-day profile
+    ANOMALY_MIN_SAMPLES = int(os.getenv('ANOMALY_MIN_SAMPLES', '48'))  # warm-up before alerting
+    ANOMALY_Z_THRESHOLD = float(os.getenv('ANOMALY_Z_THRESHOLD', '6'))  # outlier, in standard deviations
+    ANOMALY_DRIFT_THRESHOLD = float(os.getenv('ANOMALY_DRIFT_THRESHOLD', '6'))  # trend vs usual trend
+    ANOMALY_ALERT_COOLDOWN = float(os.getenv('ANOMALY_ALERT_COOLDOWN', '21600'))  # seconds per hive metric
+    
+    # Bulk upsert limits (features per request)
+    BULK_MAX_FEATURES = int(os.getenv('BULK_MAX_FEATURES', '5000'))
+    
+    # Distance matrix limits
+    DISTANCE_MATRIX_MAX_ELEMENTS = int(os.getenv('DISTANCE_MATRIX_MAX_ELEMENTS', '1000000'))
+    DISTANCE_MATRIX_CHUNK_ELEMENTS = int(os.getenv('DISTANCE_MATRIX_CHUNK_ELEMENTS', '100000'))
+    
+    # In-process spatial index (STRtree snapshot of ruches/ruchers)
+    SPATIAL_INDEX_ENABLED = os.getenv('SPATIAL_INDEX_ENABLED', 'False').lower() == 'true'
+    SPATIAL_INDEX_REFRESH_INTERVAL = float(os.getenv('SPATIAL_INDEX_REFRESH_INTERVAL', '30'))  # seconds
+    
+    # Worker warm-up (gunicorn post_worker_init / ASGI startup)
+    WARMUP_ENABLED = os.getenv('WARMUP_ENABLED', 'True').lower() == 'true'
+    WARMUP_CONNECTIONS = int(os.getenv('WARMUP_CONNECTIONS', '1'))  # pooled connections to open
+    
+    # Async (ASGI) entry point: threads serving routes bridged to the Flask app
+    ASYNC_WSGI_WORKERS = int(os.getenv('ASYNC_WSGI_WORKERS', '10'))
+    
+    # Columnar export configuration
+    EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', '10000'))  # rows per record batch
+    
     # Geocoding configuration (optional)
     ENABLE_GEOCODING = os.getenv('ENABLE_GEOCODING', 'False').lower() == 'true'
     GEOCODING_USER_AGENT = os.getenv('GEOCODING_USER_AGENT', 'BeeTrack-API')
@@ -55,6 +255,9 @@ class TestingConfig(Config):
         'TEST_DATABASE_URL',
         'postgresql://localhost/beetrack_test'
     )
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI)
+    SQLALCHEMY_BINDS = replica_binds(os.getenv('TEST_DATABASE_REPLICA_URLS', ''))
+    WARMUP_ENABLED = False
 
 
 # Configuration dictionary
@@ -0,0 +1,41 @@
+"""
+Gunicorn configuration (loaded automatically from the working directory).
+
+Sets up Prometheus multiprocess mode so /metrics aggregates all workers:
+every worker writes its samples under PROMETHEUS_MULTIPROC_DIR, the
+directory is emptied when the master starts, and the files of exited
+workers are marked dead.
+
+Each worker is warmed up (heavy imports, connection pool, caches) before it
+accepts requests; this works with and without preload_app.
+"""
+import os
+import shutil
+import tempfile
+
+# Must be set before any worker imports prometheus_client
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'beetrack-prometheus'))
+
+
+def on_starting(server):
+    """Clear samples left over from a previous run."""
+    path = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path, exist_ok=True)
+
+
+def post_worker_init(worker):
+    """Warm the worker up once its application is loaded."""
+    app = worker.wsgi
+    if getattr(app, 'config', {}).get('WARMUP_ENABLED', False):
+        from app.utils.warmup import warm_up
+        warm_up(app)
+
+
+def child_exit(server, worker):
+    """Mark the samples of an exited worker as dead."""
+    try:
+        from prometheus_client import multiprocess
+    except ImportError:
+        return
+    multiprocess.mark_process_dead(worker.pid)
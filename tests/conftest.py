@@ -9,6 +9,7 @@ from config import TestingConfig
 class TestConfigNoDb(TestingConfig):
     """Testing configuration without database."""
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    SQLALCHEMY_ENGINE_OPTIONS = {}
     TESTING = True
 
 
@@ -0,0 +1,135 @@
+"""
+Tests for incremental anomaly detection.
+"""
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+
+from app.utils.anomaly import SEASON_BUCKETS, build_state, detect, model_params, update
+
+Rule = namedtuple('Rule', 'id ruche_id params')
+Checkpoint = namedtuple(
+    'Checkpoint',
+    'ruche_id metric count level variance trend trend_baseline trend_variance season '
+    'last_recorded_at last_alert_at'
+)
+
+CONFIG = {
+    'ANOMALY_METRICS': ('weight', 'temperature'),
+    'ANOMALY_MIN_SAMPLES': 48,
+    'ANOMALY_Z_THRESHOLD': 6.0,
+    'ANOMALY_DRIFT_THRESHOLD': 6.0,
+    'ANOMALY_ALERT_COOLDOWN': 21600,
+}
+START = datetime(2024, 5, 1)
+
+
+def hourly_rows(ruche_id, weights, start=START):
+    return [
+        {'ruche_id': ruche_id, 'recorded_at': start + timedelta(hours=h), 'weight': w}
+        for h, w in enumerate(weights)
+    ]
+
+
+def weights(hours, seed=0):
+    # Daily cycle plus sensor noise
+    rng = np.random.default_rng(seed)
+    h = np.arange(hours)
+    return (40 + 0.5 * np.sin(2 * np.pi * h / 24) + rng.normal(0, 0.1, hours)).tolist()
+
+
+def warm_state(hours=24 * 14):
+    state = build_state([Rule(1, 7, {'metrics': ['weight']})], [], CONFIG)
+    detect(state, hourly_rows(7, weights(hours)), CONFIG, alert=False)
+    return state
+
+
+def test_build_state_per_rule_metrics_and_thresholds():
+    state = build_state([
+        Rule(1, 7, {'metrics': ['weight'], 'z_threshold': 4}),
+        Rule(2, 3, {}),
+    ], [], CONFIG)
+
+    assert state.ruche_ids().tolist() == [3, 3, 7]
+    assert state.metric_indices().tolist() == [0, 1, 0]
+    assert state.rule_ids.tolist() == [2, 2, 1]
+    assert state.z_threshold.tolist() == [6.0, 6.0, 4.0]
+
+
+def test_build_state_resumes_checkpoint():
+    season = np.arange(SEASON_BUCKETS, dtype='<f8')
+    checkpoint = Checkpoint(7, 'weight', 100, 41.5, 0.04, 0.01, 0.0, 0.001, season.tobytes(),
+                            datetime(2024, 5, 1, 12), None)
+    state = build_state([Rule(1, 7, {})], [checkpoint], CONFIG)
+
+    assert state.count.tolist() == [100, 0]
+    assert state.level[0] == 41.5
+    assert state.season[0].tolist() == season.tolist()
+    assert state.last_at[0] == datetime(2024, 5, 1, 12, tzinfo=timezone.utc).timestamp()
+    assert np.isnan(state.last_alert[0])
+
+
+def test_normal_series_raises_nothing():
+    state = build_state([Rule(1, 7, {'metrics': ['weight']})], [], CONFIG)
+    assert detect(state, hourly_rows(7, weights(24 * 30)), CONFIG, now=0.0) == []
+    assert state.count[0] == 24 * 30
+    # The seasonal profile learned the daily cycle
+    assert np.ptp(state.season[0]) == pytest.approx(1.0, abs=0.3)
+
+
+def test_outlier_is_flagged():
+    state = warm_state()
+    start = START + timedelta(hours=24 * 14)
+    rows = hourly_rows(7, [40.0, 35.0, 40.0], start=start)
+    anomalies = detect(state, rows, CONFIG, now=0.0)
+
+    assert len(anomalies) == 1
+    anomaly = anomalies[0]
+    assert (anomaly['rule_id'], anomaly['ruche_id'], anomaly['row']) == (1, 7, 1)
+    assert (anomaly['metric'], anomaly['kind']) == ('weight', 'outlier')
+    assert anomaly['z'] < -6
+    assert anomaly['expected'] == pytest.approx(40, abs=1)
+
+
+def test_outlier_does_not_inflate_variance():
+    state = warm_state()
+    variance = state.variance[0]
+    detect(state, hourly_rows(7, [60.0], start=START + timedelta(hours=24 * 14)), CONFIG, alert=False)
+    assert state.variance[0] < 2 * variance
+
+
+def test_steady_loss_is_flagged_as_drift():
+    state = warm_state()
+    base = np.array(weights(24 * 4, seed=1))
+    # Robbing: 1.5 kg per day
+    losing = (base - np.arange(len(base)) * 1.5 / 24).tolist()
+    anomalies = detect(state, hourly_rows(7, losing, start=START + timedelta(hours=24 * 14)), CONFIG, now=0.0)
+
+    assert [a['kind'] for a in anomalies] == ['drift']
+    assert anomalies[0]['drift'] < -6
+
+
+def test_cooldown():
+    state = warm_state()
+    start = START + timedelta(hours=24 * 14)
+    assert len(detect(state, hourly_rows(7, [20.0], start=start), CONFIG, now=1000.0)) == 1
+    later = start + timedelta(hours=1)
+    assert detect(state, hourly_rows(7, [20.0], start=later), CONFIG, now=2000.0) == []
+    assert state.last_alert[0] == 1000.0
+
+
+def test_warm_up_and_out_of_order():
+    params = model_params(CONFIG)
+    state = build_state([Rule(1, 7, {'metrics': ['weight']})], [], CONFIG)
+    positions = np.zeros(3, dtype=np.intp)
+
+    result = update(state, positions, np.array([7200.0, 0.0, 3600.0]), np.array([40.0, 10.0, 41.0]), params)
+    assert not result['scored'].any()
+    assert state.count[0] == 3
+
+    # Older than the last measurement: skipped
+    update(state, positions[:1], np.array([0.0]), np.array([99.0]), params)
+    assert state.count[0] == 3
+    assert state.last_at[0] == 7200.0
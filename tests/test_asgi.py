@@ -0,0 +1,53 @@
+"""
+Tests for the ASGI entry point.
+
+Without PostgreSQL the async handlers validate their input and hand
+everything else to the Flask app, which is what these tests cover.
+"""
+import pytest
+
+pytest.importorskip('starlette')
+pytest.importorskip('a2wsgi')
+
+from starlette.testclient import TestClient  # noqa: E402
+
+from app.aio import create_asgi_app  # noqa: E402
+from app.aio.db import async_database_url  # noqa: E402
+from tests.conftest import TestConfigNoDb  # noqa: E402
+
+
+@pytest.fixture
+def asgi_client():
+    with TestClient(create_asgi_app(TestConfigNoDb)) as client:
+        yield client
+
+
+def test_async_database_url():
+    """PostgreSQL URIs are translated to asyncpg; other databases are not."""
+    assert async_database_url('postgresql://u:p@db:5432/bees') == 'postgresql+asyncpg://u:p@db:5432/bees'
+    assert async_database_url('postgresql+psycopg2://db/bees?sslmode=require') == \
+        'postgresql+asyncpg://db/bees?ssl=require'
+    assert async_database_url('sqlite:///:memory:') is None
+
+
+def test_async_validation(asgi_client):
+    """Async handlers return the same 400 errors as the Flask routes."""
+    response = asgi_client.get('/api/geo/ruches/nearby?lat=100&lon=0')
+    assert response.status_code == 400
+    assert response.json() == {'error': 'Latitude must be between -90 and 90'}
+
+    response = asgi_client.post('/api/geo/ruches/knn', json={'points': [{'lat': 0, 'lon': 0}], 'k': 0})
+    assert response.status_code == 400
+
+    response = asgi_client.get('/api/geo/ruches?bbox=1,2')
+    assert response.status_code == 400
+
+
+def test_falls_back_to_flask(asgi_client):
+    """Routes without an async handler are served by the Flask app."""
+    response = asgi_client.post('/api/geo/validate-coords', json={'lat': 45.0, 'lon': 5.0})
+    assert response.status_code == 200
+    assert response.json()['valid'] is True
+
+    response = asgi_client.get('/api/unknown')
+    assert response.status_code == 404
@@ -0,0 +1,64 @@
+"""
+Tests for the bulk hive/apiary upsert validation.
+"""
+import pytest
+
+from app.utils.bulk import rucher_row, ruche_row, validate_batch
+
+
+def point_feature(lon, lat, **properties):
+    return {
+        'type': 'Feature',
+        'geometry': {'type': 'Point', 'coordinates': [lon, lat]},
+        'properties': {'name': 'Hive', **properties}
+    }
+
+
+def test_validate_batch_reports_every_invalid_feature():
+    """Every invalid feature is reported with its index; valid ones parse."""
+    features = [
+        point_feature(-73.96, 40.78, rucher_id=1, queen_info={'breed': 'Buckfast'}),
+        point_feature(-200, 40.78),
+        point_feature(-73.96, 40.78, active='yes'),
+        {'type': 'Feature', 'geometry': {'type': 'Polygon', 'coordinates': [[[0, 0], [1, 0], [1, 1], [0, 0]]]},
+         'properties': {'name': 'Hive'}},
+        {'type': 'Feature', 'geometry': {'type': 'Point', 'coordinates': [1]}, 'properties': {'name': 'Hive'}},
+        {**point_feature(-73.96, 40.78), 'id': 7},
+        {**point_feature(-73.96, 40.78), 'id': 7},
+        'not a feature',
+    ]
+    rows, errors = validate_batch({'type': 'FeatureCollection', 'features': features}, 100, ruche_row, True)
+
+    assert [error['index'] for error in errors] == [1, 2, 3, 4, 6, 7]
+    assert errors[0]['error'] == 'coordinates out of range'
+    assert errors[2]['error'] == 'geometry must be a Point'
+    assert rows[0] == {
+        'id': None, 'name': 'Hive', 'rucher_id': 1, 'queen_info': '{"breed": "Buckfast"}', 'active': True,
+        'geometry': {'type': 'Point', 'coordinates': [-73.96, 40.78]}
+    }
+    assert rows[5]['id'] == 7
+
+
+def test_validate_batch_accepts_apiary_polygons():
+    polygon = {'type': 'Polygon', 'coordinates': [[[0, 0], [1, 0], [1, 1], [0, 0]]]}
+    data = {'type': 'FeatureCollection', 'features': [
+        {'type': 'Feature', 'geometry': polygon, 'properties': {'name': 'Apiary', 'description': 'North field'}}
+    ]}
+    rows, errors = validate_batch(data, 100, rucher_row, False)
+
+    assert errors == []
+    assert rows[0]['description'] == 'North field'
+
+
+@pytest.mark.parametrize('body', [None, {'type': 'Feature'}, {'type': 'FeatureCollection', 'features': []}])
+def test_bulk_endpoint_rejects_invalid_body(client, body):
+    response = client.post('/api/geo/ruches/bulk', json=body)
+    assert response.status_code == 400
+
+
+def test_bulk_endpoint_writes_nothing_for_invalid_features(client):
+    response = client.post('/api/geo/ruchers/bulk', json={
+        'type': 'FeatureCollection', 'features': [point_feature(10, 100)]
+    })
+    assert response.status_code == 400
+    assert response.get_json()['features'] == [{'index': 0, 'error': 'coordinates out of range'}]
@@ -0,0 +1,193 @@
+"""
+Tests for the columnar (Arrow IPC / FlatGeobuf) exports.
+
+The end-to-end tests run only when POSTGIS_TEST_DATABASE_URL points to a
+disposable PostGIS database.
+"""
+import io
+import os
+import sys
+from datetime import datetime
+
+import pytest
+import shapely
+from sqlalchemy.dialects import postgresql
+
+from app.models import Measurement, Ruche
+from app.utils.columnar import (
+    MEASUREMENT_LAYER, RUCHE_LAYER, RUCHER_LAYER, ArrowStreamEncoder, build_statement, prepare_export, record_batch
+)
+
+pa = pytest.importorskip('pyarrow')
+
+
+def compiled(statement):
+    return str(statement.compile(dialect=postgresql.dialect()))
+
+
+def test_point_layer_uses_geoarrow_point_in_arrow():
+    encoding, schema, statement = prepare_export(pa, RUCHE_LAYER, 'arrow')
+
+    assert encoding == 'point'
+    assert schema.names == ['id', 'name', 'rucher_id', 'queen_info', 'created_at', 'active', 'geometry']
+    assert schema.field('geometry').metadata[b'ARROW:extension:name'] == b'geoarrow.point'
+    assert schema.field('created_at').type == pa.timestamp('us')
+    assert 'ST_X(ruches.geom)' in compiled(statement)
+
+
+@pytest.mark.parametrize('layer, fmt', [(RUCHE_LAYER, 'fgb'), (RUCHER_LAYER, 'arrow'), (RUCHER_LAYER, 'fgb')])
+def test_other_exports_use_wkb(layer, fmt):
+    encoding, schema, statement = prepare_export(pa, layer, fmt)
+
+    assert encoding == 'wkb'
+    assert schema.field('geometry').type == pa.binary()
+    assert schema.field('geometry').metadata[b'ARROW:extension:name'] == b'geoarrow.wkb'
+    assert 'ST_AsBinary' in compiled(statement)
+
+
+def test_measurement_export_joins_hives_and_applies_filters():
+    sql = compiled(build_statement(MEASUREMENT_LAYER, 'point', [Measurement.ruche_id == 3, Ruche.active.is_(True)]))
+
+    assert 'FROM measurements JOIN ruches ON ruches.id = measurements.ruche_id' in sql
+    assert 'measurements.ruche_id = %(ruche_id_1)s' in sql and 'ruches.active IS true' in sql
+
+
+def test_record_batch_decodes_geometries():
+    _, schema, _ = prepare_export(pa, RUCHE_LAYER, 'arrow')
+    created = datetime(2024, 5, 1, 12)
+    rows = [
+        (1, 'Alpha', 10, '{"age": 2}', created, True, -73.96, 40.78),
+        (2, 'Beta', None, None, None, False, 2.35, 48.85),
+    ]
+    batch = record_batch(pa, schema, rows, 'point')
+
+    assert batch.num_rows == 2
+    assert batch.column('geometry').to_pylist() == [{'x': -73.96, 'y': 40.78}, {'x': 2.35, 'y': 48.85}]
+    assert batch.column('rucher_id').to_pylist() == [10, None]
+
+    _, schema, _ = prepare_export(pa, RUCHER_LAYER, 'arrow')
+    polygon = shapely.box(0, 0, 1, 1)
+    batch = record_batch(pa, schema, [(1, 'Apiary', None, created, shapely.to_wkb(polygon))], 'wkb')
+    assert shapely.from_wkb(batch.column('geometry')[0].as_py()).equals(polygon)
+
+
+def test_stream_encoder_emits_every_batch():
+    _, schema, _ = prepare_export(pa, RUCHE_LAYER, 'arrow')
+    encoder = ArrowStreamEncoder(pa, schema)
+    chunks = [
+        encoder.write(record_batch(pa, schema, [(i, f'hive-{i}', 1, None, None, True, float(i), 0.0)], 'point'))
+        for i in range(3)
+    ]
+    chunks.append(encoder.close())
+
+    # Each batch is available as soon as it is encoded
+    assert all(chunks[:3])
+    table = pa.ipc.open_stream(b''.join(chunks)).read_all()
+    assert table.schema.equals(schema)
+    assert table.column('id').to_pylist() == [0, 1, 2]
+    assert len(table.to_batches()) == 3
+
+
+@pytest.mark.parametrize('url', [
+    '/api/geo/ruches?format=arrow',
+    '/api/geo/ruchers?format=fgb',
+    '/api/export/measurements',
+])
+def test_missing_pyarrow_is_501(client, monkeypatch, url):
+    monkeypatch.setitem(sys.modules, 'pyarrow', None)
+    response = client.get(url)
+    assert response.status_code == 501
+    assert 'Output format not available' in response.get_json()['error']
+
+
+def test_missing_pyogrio_is_501(client, monkeypatch):
+    monkeypatch.setitem(sys.modules, 'pyogrio', None)
+    assert client.get('/api/export/measurements?format=fgb').status_code == 501
+
+
+@pytest.mark.parametrize('query, message', [
+    ('format=csv', 'format must be one of: arrow, fgb'),
+    ('start=yesterday', 'start and end must be ISO 8601 timestamps'),
+])
+def test_export_rejects_invalid_parameters(client, query, message):
+    response = client.get(f'/api/export/measurements?{query}')
+    assert response.status_code == 400
+    assert response.get_json()['error'] == message
+
+
+@pytest.fixture
+def postgis_app():
+    url = os.getenv('POSTGIS_TEST_DATABASE_URL')
+    if not url:
+        pytest.skip('POSTGIS_TEST_DATABASE_URL not set')
+
+    from sqlalchemy import text
+    from app import create_app, db
+    from config import TestingConfig
+
+    class PostGISConfig(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = url
+        # Several record batches per export
+        EXPORT_BATCH_SIZE = 4
+
+    app = create_app(PostGISConfig)
+    with app.app_context():
+        db.session.execute(text('CREATE EXTENSION IF NOT EXISTS postgis'))
+        db.session.commit()
+        db.drop_all()
+        db.create_all()
+        db.session.execute(text("""
+            INSERT INTO ruches (id, name, created_at, geom, active)
+            SELECT g, 'hive-' || g, now(), ST_SetSRID(ST_MakePoint(g, g / 2.0), 4326), g % 2 = 0
+            FROM generate_series(1, 10) AS g
+        """))
+        db.session.execute(text("""
+            INSERT INTO ruchers (name, created_at, geom)
+            VALUES ('apiary', now(), ST_GeomFromText('POLYGON((0 0, 1 0, 1 1, 0 1, 0 0))', 4326))
+        """))
+        db.session.execute(text("""
+            INSERT INTO measurements (ruche_id, recorded_at, weight)
+            SELECT 1 + g % 3, TIMESTAMP '2024-05-01' + g * INTERVAL '1 hour', g
+            FROM generate_series(1, 9) AS g
+        """))
+        db.session.commit()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+def read_stream(response):
+    assert response.status_code == 200
+    return pa.ipc.open_stream(response.data)
+
+
+def test_ruches_arrow_export(postgis_app):
+    reader = read_stream(postgis_app.test_client().get('/api/geo/ruches?format=arrow'))
+    batches = list(reader)
+
+    assert [batch.num_rows for batch in batches] == [4, 4, 2]
+    table = pa.Table.from_batches(batches)
+    rows = sorted(zip(table.column('id').to_pylist(), table.column('geometry').to_pylist()))
+    assert rows == [(g, {'x': float(g), 'y': g / 2.0}) for g in range(1, 11)]
+
+    active = read_stream(postgis_app.test_client().get('/api/geo/ruches?format=arrow&active=true')).read_all()
+    assert sorted(active.column('id').to_pylist()) == [2, 4, 6, 8, 10]
+
+
+def test_measurements_arrow_export_filters(postgis_app):
+    client = postgis_app.test_client()
+    table = read_stream(client.get('/api/export/measurements?ruche_id=2&start=2024-05-01T05:00:00')).read_all()
+
+    assert table.column('weight').to_pylist() == [7.0]
+    assert table.column('geometry').to_pylist() == [{'x': 2.0, 'y': 1.0}]
+
+
+def test_ruchers_flatgeobuf_export(postgis_app):
+    pyogrio = pytest.importorskip('pyogrio')
+    response = postgis_app.test_client().get('/api/geo/ruchers?format=fgb')
+    assert response.status_code == 200
+
+    meta, table = pyogrio.read_arrow(io.BytesIO(response.data))
+    assert table.column('name').to_pylist() == ['apiary']
+    geometry = table.column(meta['geometry_name'] or 'wkb_geometry')[0].as_py()
+    assert shapely.from_wkb(geometry).equals(shapely.box(0, 0, 1, 1))
@@ -0,0 +1,53 @@
+"""
+Tests for the hive density grid parameters.
+"""
+import pytest
+
+from app.utils.density import density_params, snap_bounds, to_mercator
+
+CONFIG = {'DENSITY_DEFAULT_CELL_SIZE': 10000, 'DENSITY_MIN_CELL_SIZE': 100, 'DENSITY_MAX_CELLS': 50000}
+
+
+def test_to_mercator():
+    assert to_mercator(0, 0) == pytest.approx((0.0, 0.0), abs=1e-6)
+    x, y = to_mercator(180, 85.05112878)
+    assert x == pytest.approx(20037508.34, abs=0.01)
+    assert y == pytest.approx(20037508.34, abs=1)
+
+
+def test_snapped_bounds_are_shared_by_nearby_viewports():
+    """Viewports panned by less than a cell snap to the same bounds (one cache entry)."""
+    first = snap_bounds((-74.00, 40.70, -73.90, 40.80), 5000)
+    second = snap_bounds((-74.01, 40.71, -73.91, 40.79), 5000)
+    assert first == second
+    assert all(value % 10000 == 0 for value in first)
+
+    x, y = to_mercator(-74.00, 40.70)
+    assert first[0] <= x and first[1] <= y
+
+
+@pytest.mark.parametrize('args, message', [
+    ({}, 'bbox parameter required'),
+    ({'bbox': '1,2,3'}, 'Invalid bbox'),
+    ({'bbox': '-80,38,-70,45', 'cell_size': '10'}, 'at least 100'),
+    ({'bbox': '-80,38,-70,45', 'shape': 'triangle'}, 'shape must be'),
+    ({'bbox': '-80,38,-70,45', 'format': 'png'}, 'format must be'),
+    ({'bbox': '-180,-80,180,80', 'cell_size': '1000'}, 'cells'),
+])
+def test_density_params_rejects_invalid_input(args, message):
+    with pytest.raises(ValueError, match=message):
+        density_params(args, CONFIG)
+
+
+def test_density_params_defaults():
+    params = density_params({'bbox': '-80,38,-70,45'}, CONFIG)
+    assert params['size'] == 10000
+    assert params['shape'] == 'hexagon'
+    assert params['format'] == 'geojson'
+    assert params['active'] is None and params['measurements'] is False
+
+
+def test_density_endpoint_validation(client):
+    response = client.get('/api/geo/ruches/density?cell_size=5000')
+    assert response.status_code == 400
+    assert 'bbox' in response.get_json()['error']
@@ -0,0 +1,114 @@
+"""
+Tests for geofence detection and measurement ingestion validation.
+"""
+import time
+from collections import namedtuple
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from app.utils.geofence import GeofenceEngine, GeofenceState, evaluate, extract_fixes
+from app.utils.measurements import parse_measurement_batch
+
+Row = namedtuple('Row', 'ruche_id lon lat rule_id params last_alert')
+
+
+def make_state():
+    # Hives 10 and 30 watched at (0, 0) and (1, 1) with 100 m / 1000 m
+    return GeofenceState([30, 10], [1.0, 0.0], [1.0, 0.0], [1000.0, 100.0], [3, 1], [np.nan, np.nan])
+
+
+def test_extract_fixes():
+    lons, lats = extract_fixes([
+        {'gps': {'lat': 40.1, 'lon': -73.9}},
+        {'gps': {'latitude': 1, 'longitude': 2}},
+        {'gps': {'lat': 95, 'lon': 0}},
+        {'gps': {'lat': True, 'lon': 0}},
+        {'weight': 42},
+        None,
+    ])
+    assert lons[:2].tolist() == [-73.9, 2.0]
+    assert lats[:2].tolist() == [40.1, 1.0]
+    assert np.isnan(lons[2:]).all() and np.isnan(lats[2:]).all()
+
+
+def test_evaluate_reports_each_displaced_hive_once():
+    state = make_state()
+    ruche_ids = [10, 10, 10, 30, 99, 30]
+    # ~0.01° of latitude is about 1.1 km
+    lons = [0.0, 0.0, 0.0, 1.0, 5.0, np.nan]
+    lats = [0.0005, 0.01, 0.02, 1.005, 5.0, np.nan]
+
+    breaches = evaluate(state, ruche_ids, lons, lats, cooldown=3600, now=1000.0)
+
+    # Hive 10 at its largest displacement; hive 30 stays within 1000 m; 99 is not watched
+    assert [(b['ruche_id'], b['rule_id'], b['index']) for b in breaches] == [(10, 1, 2)]
+    assert breaches[0]['displacement'] == pytest.approx(2224, rel=0.01)
+    # The cooldown starts when the alert is committed
+    assert np.isnan(state.last_alert).all()
+
+
+def make_engine():
+    engine = GeofenceEngine()
+    engine.state = make_state()
+    engine.loaded_at = time.monotonic()
+    engine._loaded_generation = engine._generation
+    return engine
+
+
+def test_check_respects_cooldown_of_recorded_alerts():
+    engine = make_engine()
+    config = {'GEOFENCE_ALERT_COOLDOWN': 3600}
+    fixes = ([10], [0.0], [0.01])
+
+    breaches = engine.check(None, config, *fixes, now=1000.0)
+    assert len(breaches) == 1
+    engine.record_alerts(breaches, 1000.0)
+    assert engine.check(None, config, *fixes, now=2000.0) == []
+    assert len(engine.check(None, config, *fixes, now=5000.0)) == 1
+
+
+def test_alert_is_raised_again_when_its_commit_failed():
+    engine = make_engine()
+    config = {'GEOFENCE_ALERT_COOLDOWN': 3600}
+    fixes = ([10], [0.0], [0.01])
+
+    # The ingestion transaction rolled back: record_alerts was never called
+    assert len(engine.check(None, config, *fixes, now=1000.0)) == 1
+    breaches = engine.check(None, config, *fixes, now=1001.0)
+    assert [b['ruche_id'] for b in breaches] == [10]
+    assert np.isnan(engine.state.last_alert).all()
+
+
+def test_state_uses_tightest_rule():
+    state = GeofenceState.from_rows([
+        Row(5, 1.0, 2.0, 7, {'radius': 500}, None),
+        Row(5, 1.0, 2.0, 8, {'radius': 50}, datetime(1970, 1, 1, 0, 1)),
+        Row(6, 3.0, 4.0, 9, None, None),
+    ], default_radius=200)
+
+    assert state.ids.tolist() == [5, 6]
+    assert state.radius.tolist() == [50.0, 200.0]
+    assert state.rule_ids.tolist() == [8, 9]
+    assert state.last_alert[0] == 60.0 and np.isnan(state.last_alert[1])
+
+
+def test_parse_measurement_batch_reports_invalid_items():
+    rows, errors = parse_measurement_batch({'measurements': [
+        {'ruche_id': 1, 'weight': 41.5, 'recorded_at': '2024-05-01T12:00:00+02:00', 'raw': {'gps': {}}},
+        {'ruche_id': '1'},
+        {'ruche_id': 1, 'temperature': 'hot'},
+        {'ruche_id': 1, 'recorded_at': 'yesterday'},
+    ]}, 100)
+
+    assert [error['index'] for error in errors] == [1, 2, 3]
+    assert rows[0]['recorded_at'].hour == 10
+    with pytest.raises(ValueError):
+        parse_measurement_batch({'measurements': [{'ruche_id': 1}] * 3}, 2)
+
+
+def test_ingest_endpoint_rejects_invalid_body(client):
+    response = client.post('/api/measurements', json={'measurements': [{'weight': 1}]})
+    assert response.status_code == 400
+    assert response.get_json()['measurements'] == [{'index': 0, 'error': 'ruche_id must be an integer'}]
@@ -41,3 +41,48 @@ def test_docs_endpoint(client):
     # Check root path also works
     response = client.get('/')
     assert response.status_code == 200
+
+
+def test_liveness_endpoint(client):
+    """Test that liveness answers without a database."""
+    response = client.get('/api/health/live')
+    assert response.status_code == 200
+    assert json.loads(response.data)['status'] == 'alive'
+
+
+def test_evaluate_readiness():
+    """Test readiness decisions from probe results and pool state."""
+    from app.utils.health_probe import evaluate_readiness
+
+    config = {'HEALTH_PROBE_MAX_AGE': 30, 'READINESS_MAX_POOL_SATURATION': 0.9, 'READINESS_MAX_REPLICATION_LAG': 10}
+    pool = {'size': 5, 'max_overflow': 5, 'checked_out': 2}
+    probe = {'ok': True, 'latency_ms': 1.0, 'replication_lag_seconds': 0.0, 'error': None, 'checked_at': 1000.0}
+
+    assert evaluate_readiness(probe, pool, config, now=1005.0)['ready']
+    assert not evaluate_readiness(None, pool, config, now=1005.0)['ready']
+    assert not evaluate_readiness(probe, pool, config, now=1100.0)['ready']
+    assert not evaluate_readiness(dict(probe, ok=False, error='down'), pool, config, now=1005.0)['ready']
+    assert not evaluate_readiness(dict(probe, replication_lag_seconds=60.0), pool, config, now=1005.0)['ready']
+
+    result = evaluate_readiness(probe, dict(pool, checked_out=10), config, now=1005.0)
+    assert not result['ready']
+    assert result['checks']['pool']['saturation'] == 1.0
+
+
+def test_pool_metrics_are_kept_per_engine():
+    """Test that each bind's pool counts its own checkouts."""
+    from sqlalchemy import create_engine
+    from app.utils.db_pool import InstrumentedQueuePool, pool_status, pool_statuses
+
+    primary = create_engine('sqlite://', poolclass=InstrumentedQueuePool, pool_size=2, max_overflow=0)
+    replica = create_engine('sqlite://', poolclass=InstrumentedQueuePool, pool_size=1, max_overflow=0)
+    with primary.connect(), primary.connect():
+        status = pool_status(primary)
+        assert (status['bind'], status['checked_out'], status['checkouts']) == ('primary', 2, 2)
+    with replica.connect():
+        pass
+
+    statuses = pool_statuses({None: primary, 'replica_0': replica})
+    assert statuses['primary']['checkouts'] == 2
+    assert statuses['replica_0']['bind'] == 'replica_0'
+    assert (statuses['replica_0']['size'], statuses['replica_0']['checkouts']) == (1, 1)
@@ -0,0 +1,127 @@
+"""
+Tests for IDW interpolation and isobands.
+"""
+import numpy as np
+import pytest
+import shapely
+from shapely.geometry import shape
+
+from app.utils.interpolation import band_edges, idw_grid, interpolation_params, isobands, snap_bounds
+
+CONFIG = {
+    'INTERPOLATION_DEFAULT_CELLS': 256,
+    'INTERPOLATION_MAX_CELLS': 1000000,
+    'INTERPOLATION_MAX_CONTOUR_CELLS': 250000
+}
+
+
+@pytest.mark.parametrize('args, message', [
+    ({'bbox': '0,0,1,1', 'var': 'weight'}, 'var must be'),
+    ({}, 'bbox parameter required'),
+    ({'bbox': '0,0,1'}, 'Invalid bbox'),
+    ({'bbox': '0,0,1,1', 'resolution': '-1'}, 'positive'),
+    ({'bbox': '-180,-90,180,90', 'resolution': '0.01'}, 'cells'),
+    ({'bbox': '0,0,10,10', 'resolution': '0.01', 'format': 'geojson'}, 'at most 250000'),
+    ({'bbox': '0,0,1,1', 'format': 'png'}, 'format must be'),
+    ({'bbox': '0,0,1,1', 'levels': '1,a'}, 'levels'),
+])
+def test_interpolation_params_rejects_invalid_input(args, message):
+    with pytest.raises(ValueError, match=message):
+        interpolation_params(args, CONFIG)
+
+
+def test_interpolation_params_defaults():
+    params = interpolation_params({'bbox': '2,48,4,49', 'levels': '20,10'}, CONFIG)
+    assert params['var'] == 'temperature' and params['format'] == 'raster'
+    assert (params['width'], params['height']) == (256, 128)
+    assert params['levels'] == (10.0, 20.0)
+
+
+def test_snapped_bounds_are_shared_by_nearby_viewports():
+    first = snap_bounds((2.01, 48.01, 3.99, 48.99), 0.5)
+    assert first == snap_bounds((2.2, 48.2, 3.6, 48.6), 0.5) == (2.0, 48.0, 4.0, 49.0)
+
+
+def test_idw_grid_weights_by_distance():
+    # Two hives on the equator, 10 and 20 degrees; cells centred on them and halfway
+    grid = idw_grid([10.5, 14.5], [0.5, 0.5], [10.0, 20.0], (10, 0, 15, 1), width=5, height=1,
+                    k=2, max_distance=1e6)
+    assert grid.dtype == np.float32
+    assert grid[0, 0] == pytest.approx(10.0, abs=1e-4)
+    assert grid[0, 4] == pytest.approx(20.0, abs=1e-4)
+    assert grid[0, 2] == pytest.approx(15.0, abs=1e-3)
+    assert 10 < grid[0, 1] < 15 < grid[0, 3] < 20
+
+
+def test_idw_grid_leaves_far_cells_empty():
+    grid = idw_grid([0.05], [0.05], [7.0], (0, 0, 1, 1), width=10, height=10, max_distance=20000)
+    assert grid[9, 0] == pytest.approx(7.0)
+    assert np.isnan(grid[0, 9])
+    assert np.isnan(idw_grid([], [], [], (0, 0, 1, 1), width=2, height=2)).all()
+
+
+def test_idw_grid_chunks_match_single_pass():
+    rng = np.random.default_rng(0)
+    lons, lats, values = rng.uniform(0, 1, 50), rng.uniform(0, 1, 50), rng.uniform(20, 35, 50)
+    whole = idw_grid(lons, lats, values, (0, 0, 1, 1), width=40, height=30)
+    chunked = idw_grid(lons, lats, values, (0, 0, 1, 1), width=40, height=30, chunk_cells=70)
+    np.testing.assert_array_equal(whole, chunked)
+
+
+def test_isobands_cover_known_cells():
+    grid = np.array([
+        [1.0, 1.0, 5.0, 9.0],
+        [1.0, 5.0, 5.0, np.nan],
+    ], dtype=np.float32)
+    features = isobands(grid, (0, 0, 4, 2), [3.0, 7.0])
+
+    assert [f['properties']['band'] for f in features] == [0, 1, 2]
+    assert features[0]['properties'] == {'band': 0, 'min': None, 'max': 3.0}
+    assert features[1]['properties'] == {'band': 1, 'min': 3.0, 'max': 7.0}
+    areas = [shape(f['geometry']).area for f in features]
+    assert areas == pytest.approx([3.0, 3.0, 1.0])
+    assert shapely.get_num_coordinates(shape(features[0]['geometry'])) == 7
+
+
+def test_band_edges():
+    grid = np.array([[0.0, 10.0, np.nan]])
+    assert band_edges(grid, None, bands=5) == pytest.approx([2.0, 4.0, 6.0, 8.0])
+    assert band_edges(grid, (1.0, 2.0)) == [1.0, 2.0]
+    assert band_edges(np.full((2, 2), np.nan), None) == []
+
+
+def test_interpolate_endpoint_validation(client):
+    response = client.get('/api/geo/interpolate?var=temperature')
+    assert response.status_code == 400
+    assert 'bbox' in response.get_json()['error']
+
+
+def test_payload_cache_is_keyed_by_data_version_and_bounded(monkeypatch):
+    from app.utils import interpolation
+    from app.utils.cache import TTLCache
+
+    version = [(10, (3, 3))]
+    calls = []
+    monkeypatch.setattr(interpolation, '_interpolation_cache', TTLCache(ttl=300, maxsize=64))
+    monkeypatch.setattr(interpolation, 'data_version', lambda session: version[0])
+    monkeypatch.setattr(interpolation, 'latest_readings', lambda session, var, bounds, max_distance: (
+        calls.append(bounds) or (np.array([2.5]), np.array([48.5]), np.array([20.0]))
+    ))
+    config = dict(CONFIG, INTERPOLATION_CACHE_SIZE=2)
+
+    def payload(bbox):
+        return interpolation.interpolation_payload(None, interpolation_params({'bbox': bbox}, config), config)
+
+    raster, count = payload('2,48,3,49')
+    assert count == 1 and len(raster) == 256 * 256 * 4
+    payload('2,48,3,49')
+    assert len(calls) == 1
+
+    # A new measurement changes the version
+    version[0] = (11, (3, 3))
+    payload('2,48,3,49')
+    assert len(calls) == 2
+
+    payload('3,48,4,49')
+    payload('4,48,5,49')
+    assert len(interpolation._interpolation_cache) == 2
@@ -0,0 +1,230 @@
+"""
+Tests for the background job queue and runner.
+
+They use a SQLite file holding only the jobs table; the runner claims jobs
+without SKIP LOCKED there, which SQLite's single writer makes unnecessary.
+"""
+import json
+import os
+from datetime import timedelta
+
+import pytest
+
+from app import create_app, db
+from app.models import Job
+from app.utils import jobs
+from app.utils.jobs import (
+    JobRunner, claim_jobs, job_key, parse_job_request, purge_finished_jobs, requeue_stale_jobs,
+    result_file_path, submit_job, utcnow, write_result_chunks
+)
+from tests.conftest import TestConfigNoDb
+
+
+class JobsConfig(TestConfigNoDb):
+    JOBS_PROCESSES = 0
+    JOBS_POLL_INTERVAL = 0.05
+
+
+def echo(params):
+    return json.dumps(params).encode(), 'application/json'
+
+
+def fail(params):
+    raise RuntimeError('out of hives')
+
+
+def pid(params):
+    return str(os.getpid()).encode(), 'text/plain'
+
+
+def chunks(params, path):
+    write_result_chunks(path, (b'x' * 1000 for _ in range(params['n'])))
+    return 'application/octet-stream'
+
+
+@pytest.fixture
+def jobs_app(tmp_path, monkeypatch):
+    # A file, so the runner's pool processes share the database
+    monkeypatch.setattr(JobsConfig, 'SQLALCHEMY_DATABASE_URI', f'sqlite:///{tmp_path / "jobs.db"}')
+    monkeypatch.setattr(JobsConfig, 'JOBS_RESULT_DIR', str(tmp_path / 'results'))
+    for kind in (echo, fail, pid, chunks):
+        monkeypatch.setitem(jobs._kinds, kind.__name__, {'run': kind, 'parse': None, 'to_file': kind is chunks})
+    app = create_app(JobsConfig)
+    with app.app_context():
+        Job.__table__.create(db.engine)
+        yield app
+        db.session.remove()
+
+
+def test_parse_job_request(app):
+    with pytest.raises(ValueError, match='kind must be one of'):
+        parse_job_request({'kind': 'mine_bitcoin'})
+    with pytest.raises(ValueError, match='params must be an object'):
+        parse_job_request({'kind': 'clusters', 'params': [8]})
+    with pytest.raises(ValueError, match='n_clusters'):
+        parse_job_request({'kind': 'clusters', 'params': {'n_clusters': 0}})
+    assert parse_job_request({'kind': 'clusters', 'params': {'n_clusters': 8}}) == ('clusters', {'n_clusters': 8})
+    assert parse_job_request({'kind': 'clusters'}) == ('clusters', {'n_clusters': 3})
+
+
+def test_job_kinds_validate_their_params(app):
+    with pytest.raises(ValueError, match='rucher_id'):
+        parse_job_request({'kind': 'ruches_cluster', 'params': {'rucher_id': 'x'}})
+    assert parse_job_request({'kind': 'ruches_cluster', 'params': {'active': True, 'rucher_id': 3}}) == (
+        'ruches_cluster', {'active': 'True', 'rucher_id': '3'}
+    )
+    with pytest.raises(ValueError, match='format must be'):
+        parse_job_request({'kind': 'export_measurements', 'params': {'format': 'csv'}})
+    assert parse_job_request({'kind': 'export_measurements', 'params': {}})[1] == {'format': 'arrow'}
+    with pytest.raises(ValueError, match='disabled'):
+        parse_job_request({'kind': 'reverse_geocode', 'params': {'points': [[48.8, 2.3]]}})
+
+    app.config['ENABLE_GEOCODING'] = True
+    with pytest.raises(ValueError, match=r'points\[1\]'):
+        parse_job_request({'kind': 'reverse_geocode', 'params': {'points': [[48.8, 2.3], [95, 0]]}})
+
+
+def test_job_key_ignores_param_order():
+    assert job_key('clusters', {'a': 1, 'b': 2}) == job_key('clusters', {'b': 2, 'a': 1})
+    assert job_key('clusters', {'a': 1}) != job_key('echo', {'a': 1})
+
+
+def test_identical_pending_submissions_share_a_job(jobs_app):
+    first = submit_job(db.session, 'echo', {'n': 1})
+    assert submit_job(db.session, 'echo', {'n': 1}).id == first.id
+    assert submit_job(db.session, 'echo', {'n': 2}).id != first.id
+
+    JobRunner(jobs_app).run(until_idle=True)
+    # Finished jobs are not reused
+    assert submit_job(db.session, 'echo', {'n': 1}).id != first.id
+
+
+def test_runner_records_results_and_errors(jobs_app):
+    ok = submit_job(db.session, 'echo', {'n': 1}).id
+    failed = submit_job(db.session, 'fail', {}).id
+
+    JobRunner(jobs_app).run(until_idle=True)
+
+    db.session.expire_all()
+    assert db.session.get(Job, ok).status == 'succeeded'
+    assert db.session.get(Job, ok).result == b'{"n": 1}'
+    assert db.session.get(Job, failed).status == 'failed'
+    assert db.session.get(Job, failed).error == 'out of hives'
+
+
+def test_claims_are_exclusive(jobs_app):
+    ids = [submit_job(db.session, 'echo', {'n': n}).id for n in range(3)]
+    assert claim_jobs(db.session, 'a', 2) == ids[:2]
+    assert claim_jobs(db.session, 'b', 2) == ids[2:]
+    assert claim_jobs(db.session, 'c', 2) == []
+
+
+def test_stale_jobs_are_requeued_then_failed(jobs_app):
+    job_id = submit_job(db.session, 'echo', {}).id
+    claim_jobs(db.session, 'lost-worker', 1)
+    db.session.query(Job).update({'heartbeat_at': utcnow() - timedelta(hours=1)})
+    db.session.commit()
+
+    assert requeue_stale_jobs(db.session, stale_after=60, max_attempts=2) == 1
+    assert db.session.get(Job, job_id).status == 'queued'
+
+    claim_jobs(db.session, 'lost-worker', 1)
+    db.session.query(Job).update({'heartbeat_at': utcnow() - timedelta(hours=1)})
+    db.session.commit()
+    requeue_stale_jobs(db.session, stale_after=60, max_attempts=2)
+    db.session.expire_all()
+    assert db.session.get(Job, job_id).status == 'failed'
+    assert db.session.get(Job, job_id).error == 'Worker lost'
+
+    assert purge_finished_jobs(db.session, ttl=3600) == 0
+    assert purge_finished_jobs(db.session, ttl=-1) == 1
+
+
+def test_jobs_run_in_the_process_pool(jobs_app):
+    jobs_app.config['JOBS_PROCESSES'] = 2
+    ids = [submit_job(db.session, 'pid', {'n': n}).id for n in range(4)]
+
+    JobRunner(jobs_app, JobsConfig).run(until_idle=True)
+
+    db.session.expire_all()
+    results = [db.session.get(Job, job_id) for job_id in ids]
+    assert [job.status for job in results] == ['succeeded'] * 4
+    assert str(os.getpid()).encode() not in {job.result for job in results}
+
+
+def test_job_endpoints(jobs_app):
+    client = jobs_app.test_client()
+    assert client.post('/api/jobs', json={'kind': 'nope'}).status_code == 400
+
+    response = client.post('/api/jobs', json={'kind': 'echo', 'params': {'n': 1}})
+    assert response.status_code == 202
+    job = response.get_json()['job']
+    assert response.headers['Location'] == job['status_url'] == f"/api/jobs/{job['id']}"
+    assert job['status'] == 'queued'
+
+    assert client.get(f"/api/jobs/{job['id']}/result").status_code == 409
+    assert client.get('/api/jobs/999').status_code == 404
+
+    JobRunner(jobs_app).run(until_idle=True)
+
+    job = client.get(f"/api/jobs/{job['id']}").get_json()['job']
+    assert job['status'] == 'succeeded'
+    result = client.get(job['result_url'])
+    assert result.status_code == 200
+    assert result.mimetype == 'application/json'
+    assert result.get_json() == {'n': 1}
+
+
+def test_file_results_are_streamed_and_purged(jobs_app):
+    job_id = submit_job(db.session, 'chunks', {'n': 3}).id
+    JobRunner(jobs_app).run(until_idle=True)
+
+    job = db.session.get(Job, job_id)
+    assert job.status == 'succeeded' and job.result is None
+    path = result_file_path(job.result_path)
+    assert os.path.getsize(path) == 3000
+
+    result = jobs_app.test_client().get(f'/api/jobs/{job_id}/result')
+    assert result.status_code == 200
+    assert result.mimetype == 'application/octet-stream'
+    assert result.data == b'x' * 3000
+    result.close()
+
+    assert purge_finished_jobs(db.session, ttl=-1) == 1
+    assert not os.path.exists(path)
+
+
+def test_results_above_the_size_limit_fail(jobs_app):
+    jobs_app.config['JOBS_RESULT_MAX_BYTES'] = 2500
+    big = submit_job(db.session, 'chunks', {'n': 3}).id
+    small = submit_job(db.session, 'chunks', {'n': 2}).id
+    JobRunner(jobs_app).run(until_idle=True)
+
+    db.session.expire_all()
+    job = db.session.get(Job, big)
+    assert job.status == 'failed'
+    assert job.error == 'Result exceeds JOBS_RESULT_MAX_BYTES (2500 bytes)'
+    assert job.result_path is None
+    assert os.listdir(jobs_app.config['JOBS_RESULT_DIR']) == [db.session.get(Job, small).result_path]
+
+
+def test_missing_result_file_is_gone(jobs_app):
+    job_id = submit_job(db.session, 'chunks', {'n': 1}).id
+    JobRunner(jobs_app).run(until_idle=True)
+    os.remove(result_file_path(db.session.get(Job, job_id).result_path))
+
+    assert jobs_app.test_client().get(f'/api/jobs/{job_id}/result').status_code == 410
+
+
+def test_cluster_threshold_estimate_is_cached(app, monkeypatch):
+    from app.routes import geo
+    from app.utils.cache import TTLCache
+
+    calls = []
+    monkeypatch.setattr(geo, '_hive_estimate', TTLCache(ttl=60))
+    monkeypatch.setattr(geo, 'estimated_row_counts', lambda session, models: calls.append(1) or {'ruches': 5})
+    app.config['JOBS_CLUSTER_THRESHOLD'] = 100
+
+    assert not geo.cluster_job_needed()
+    assert not geo.cluster_job_needed()
+    assert calls == [1]
@@ -0,0 +1,58 @@
+"""
+Tests for the Prometheus metrics endpoint.
+"""
+import pytest
+
+pytest.importorskip('prometheus_client')
+
+
+def test_metrics_endpoint(client):
+    """Test that requests are recorded per endpoint and exposed."""
+    client.get('/api/health/live')
+
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+
+    body = response.data.decode()
+    assert 'http_request_duration_seconds_count{blueprint="health",endpoint="health.liveness"' in body
+    assert 'db_queries_per_request' in body
+
+
+def test_timed_decorator():
+    """Test that timed functions record their duration."""
+    from prometheus_client import REGISTRY
+    from app.utils.spatial import cluster_points
+
+    labels = {'kind': 'clustering', 'function': 'cluster_points'}
+    before = REGISTRY.get_sample_value('function_duration_seconds_count', labels) or 0
+
+    cluster_points([(0.0, 0.0), (0.001, 0.0)])
+
+    assert REGISTRY.get_sample_value('function_duration_seconds_count', labels) == before + 1
+
+
+def test_streamed_response_is_recorded_when_closed(app):
+    """Test that a streamed response's latency and size cover its whole body."""
+    import time
+    from flask import Response
+    from prometheus_client import REGISTRY
+
+    def generate():
+        for _ in range(3):
+            time.sleep(0.05)
+            yield b'x' * 1000
+
+    app.add_url_rule('/stream', 'stream', lambda: Response(generate()))
+    labels = {'blueprint': '', 'endpoint': 'stream'}
+    latency_labels = dict(labels, method='GET', status='200')
+
+    response = app.test_client().get('/stream', buffered=False)
+    assert not REGISTRY.get_sample_value('http_request_duration_seconds_count', latency_labels)
+
+    assert response.get_data() == b'x' * 3000
+    response.close()
+
+    assert REGISTRY.get_sample_value('http_request_duration_seconds_count', latency_labels) == 1
+    assert REGISTRY.get_sample_value('http_request_duration_seconds_sum', latency_labels) >= 0.15
+    assert REGISTRY.get_sample_value('http_response_size_bytes_sum', labels) == 3000
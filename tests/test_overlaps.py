@@ -0,0 +1,42 @@
+"""
+Tests for the apiary forage overlap analysis.
+"""
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.utils.overlaps import INSERT_IDS_SQL, live_statement, overlap_params
+
+CONFIG = {'RUCHER_OVERLAP_RADIUS': 3000, 'RUCHER_OVERLAP_MAX_RADIUS': 20000}
+
+
+def test_overlap_params_defaults():
+    assert overlap_params({}, CONFIG) == {'radius': 3000.0, 'rucher_id': None, 'min_area': 0.0}
+
+
+@pytest.mark.parametrize('args, message', [
+    ({'radius': 'far'}, 'radius must be a number'),
+    ({'radius': '0'}, 'between 0 and 20000'),
+    ({'radius': '50000'}, 'between 0 and 20000'),
+    ({'rucher_id': 'one'}, 'rucher_id must be an integer'),
+    ({'min_area': '-1'}, 'zero or positive'),
+])
+def test_overlap_params_rejects_invalid_input(args, message):
+    with pytest.raises(ValueError, match=message):
+        overlap_params(args, CONFIG)
+
+
+def test_pairs_use_index_assisted_self_join():
+    """Candidates come from ST_DWithin on geography, each pair once."""
+    sql = str(live_statement(3000, None, 0).compile(dialect=postgresql.dialect()))
+    assert 'ST_DWithin(geography(c.geom), geography(o.geom), 2 * %(radius)s)' in sql
+    assert 'c.id < o.id' in sql
+
+    # Incremental refresh: pairs of the written apiaries only
+    sql = str(INSERT_IDS_SQL.compile(dialect=postgresql.dialect()))
+    assert 'c.id = ANY(%(ids)s::INTEGER[])' in sql
+
+
+def test_overlaps_endpoint_validation(client):
+    response = client.get('/api/geo/ruchers/overlaps?radius=-5')
+    assert response.status_code == 400
+    assert 'radius' in response.get_json()['error']
@@ -0,0 +1,61 @@
+"""
+Tests for request profiling and the slow-query log.
+"""
+import logging
+import os
+import pstats
+
+import pytest
+from sqlalchemy import event, text
+from sqlalchemy.engine import Engine
+
+from app import create_app, db
+from app.utils import profiling
+from tests.conftest import TestConfigNoDb
+
+
+@pytest.fixture
+def profiled_app(tmp_path):
+    class ProfilingConfig(TestConfigNoDb):
+        PROFILING_ENABLED = True
+        PROFILING_TOKEN = 'secret'
+        PROFILING_DIR = str(tmp_path)
+        SLOW_QUERY_THRESHOLD_MS = 0.000001
+
+    app = create_app(ProfilingConfig)
+    yield app
+    event.remove(Engine, 'before_cursor_execute', profiling._before_cursor_execute)
+    event.remove(Engine, 'after_cursor_execute', profiling._after_cursor_execute)
+    event.remove(Engine, 'handle_error', profiling._handle_error)
+
+
+def test_profile_on_header(profiled_app, tmp_path):
+    """Test that only requests with the right header are profiled."""
+    client = profiled_app.test_client()
+
+    assert 'X-Profile-Id' not in client.get('/api/health/live').headers
+    assert 'X-Profile-Id' not in client.get('/api/health/live', headers={'X-Profile': 'wrong'}).headers
+
+    response = client.get('/api/health/live', headers={'X-Profile': 'secret'})
+    name = response.headers['X-Profile-Id']
+    assert os.listdir(tmp_path) == [name]
+    assert pstats.Stats(str(tmp_path / name)).total_calls > 0
+
+
+def test_header_is_ignored_without_token(profiled_app, tmp_path):
+    """Test that an empty token does not let clients trigger profiles."""
+    profiled_app.config['PROFILING_TOKEN'] = ''
+    client = profiled_app.test_client()
+
+    assert 'X-Profile-Id' not in client.get('/api/health/live', headers={'X-Profile': ''}).headers
+    assert 'X-Profile-Id' not in client.get('/api/health/live', headers={'X-Profile': '1'}).headers
+    assert os.listdir(tmp_path) == []
+
+
+def test_slow_query_log(profiled_app, caplog):
+    """Test that statements over the threshold are logged."""
+    with profiled_app.app_context(), caplog.at_level(logging.WARNING):
+        db.session.execute(text('SELECT 42'))
+
+    assert any('Slow query' in record.getMessage() and 'SELECT 42' in record.getMessage()
+               for record in caplog.records)
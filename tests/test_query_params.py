@@ -0,0 +1,126 @@
+"""
+Tests for the nearby and KNN request parsing and statements.
+"""
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.models import Ruche
+from app.utils.query_params import KNN_COLUMNS, NEARBY_COLUMNS, knn_params, knn_results, nearby_params
+from app.utils.spatial import knn_statement, nearby_statement
+
+
+def compiled(statement):
+    return str(statement.compile(dialect=postgresql.dialect(), compile_kwargs={'literal_binds': True}))
+
+
+def test_nearby_params_defaults():
+    params = nearby_params({'lat': '40.7', 'lon': '-74'}, max_limit=100)
+    assert params == {'lat': 40.7, 'lon': -74.0, 'radius_meters': 1000, 'order': None, 'limit': None}
+
+
+@pytest.mark.parametrize('args, message', [
+    ({'lat': '40.7'}, 'lat and lon parameters required'),
+    ({'lat': '95', 'lon': '0'}, 'Latitude must be between -90 and 90'),
+    ({'lat': '40.7', 'lon': '-74', 'order': 'name'}, "order must be 'distance'"),
+    ({'lat': '40.7', 'lon': '-74', 'limit': '0'}, 'limit must be between 1 and 100'),
+    ({'lat': '40.7', 'lon': '-74', 'limit': '101'}, 'limit must be between 1 and 100'),
+    ({'lat': '40.7', 'lon': '-74', 'limit': 'ten'}, 'limit must be between 1 and 100'),
+])
+def test_nearby_params_rejects_invalid(args, message):
+    with pytest.raises(ValueError, match=message):
+        nearby_params(args, max_limit=100)
+
+
+def test_nearby_params_order_and_limit():
+    params = nearby_params({'lat': '40.7', 'lon': '-74', 'order': 'distance', 'limit': '20'}, max_limit=100)
+    assert (params['order'], params['limit']) == ('distance', 20)
+
+
+def test_nearby_statement_without_order_has_no_limit():
+    sql = compiled(nearby_statement(Ruche, NEARBY_COLUMNS, -74.0, 40.7, 2000))
+
+    assert 'ST_DWithin(geography(ruches.geom), geography(ST_SetSRID(ST_MakePoint(-74.0, 40.7), 4326)), 2000)' in sql
+    assert 'ST_Distance(geography(ruches.geom)' in sql
+    assert 'ORDER BY' not in sql and 'LIMIT' not in sql
+    assert 'ruches.queen_info' in sql and 'ST_X(ruches.geom)' in sql
+
+
+def test_nearby_statement_orders_by_knn_operator():
+    sql = compiled(nearby_statement(Ruche, NEARBY_COLUMNS, -74.0, 40.7, 2000, order_by_distance=True, limit=20))
+
+    assert 'ORDER BY geography(ruches.geom) <-> geography(ST_SetSRID(ST_MakePoint(-74.0, 40.7), 4326))' in sql
+    assert sql.rstrip().endswith('LIMIT 20')
+
+
+@pytest.mark.parametrize('body, message', [
+    (None, 'JSON body required'),
+    ({'k': 3}, 'points must be a non-empty list'),
+    ({'points': []}, 'points must be a non-empty list'),
+    ({'points': {'lat': 1, 'lon': 2}}, 'points must be a non-empty list'),
+    ({'points': [{'lat': 1, 'lon': 2}] * 4}, 'At most 3 points per request'),
+    ({'points': [{'lat': 1, 'lon': 2}], 'k': 0}, 'k must be between 1 and 10'),
+    ({'points': [{'lat': 1, 'lon': 2}], 'k': 11}, 'k must be between 1 and 10'),
+    ({'points': [{'lat': 1, 'lon': 2}], 'k': 'many'}, 'Invalid k parameter'),
+    ({'points': [{'lat': 1, 'lon': 2}, [1, 2]]}, 'Point 1 must be an object with lat and lon'),
+    ({'points': [{'lat': 91, 'lon': 2}]}, 'Point 0: Latitude must be between -90 and 90'),
+])
+def test_knn_params_rejects_invalid(body, message):
+    with pytest.raises(ValueError, match=message):
+        knn_params(body, max_points=3, max_k=10)
+
+
+def test_knn_params():
+    params = knn_params({'points': [{'lat': 40.7, 'lon': -74}, {'lat': '48.85', 'lon': '2.35'}]}, 3, 10)
+    assert (params['latitudes'], params['longitudes']) == ([40.7, 48.85], [-74.0, 2.35])
+    assert (params['k'], params['active'], params['criteria']) == (5, None, [])
+
+    params = knn_params({'points': [{'lat': 0, 'lon': 0}], 'k': 2, 'active': 'false'}, 3, 10)
+    assert (params['k'], params['active']) == (2, False)
+    assert str(params['criteria'][0].compile(dialect=postgresql.dialect())) == 'ruches.active = false'
+
+
+def test_knn_statement_is_one_lateral_knn_query():
+    statement = knn_statement(Ruche, KNN_COLUMNS, [-74.0, 2.35], [40.7, 48.85], 3, [Ruche.active.is_(True)])
+    sql = str(statement.compile(dialect=postgresql.dialect()))
+
+    assert 'FROM unnest(%(longitudes)s::FLOAT[], %(latitudes)s::FLOAT[]) WITH ORDINALITY' in sql
+    assert 'JOIN LATERAL (SELECT ruches.id AS id, ruches.name AS name' in sql
+    assert 'ruches.active IS true ORDER BY geography(ruches.geom) <-> geography(ST_SetSRID(' \
+           'ST_MakePoint(query_points.lon, query_points.lat)' in sql
+    assert sql.rstrip().endswith('ORDER BY query_points.point_index, nearest.distance')
+    assert 'queen_info' not in sql
+
+    params = statement.compile(dialect=postgresql.dialect()).params
+    assert (params['longitudes'], params['latitudes'], params['param_1']) == ([-74.0, 2.35], [40.7, 48.85], 3)
+
+
+def test_knn_results_groups_rows_by_point():
+    rows = [
+        SimpleNamespace(point_index=1, id=7, name='a', rucher_id=1, active=True,
+                        longitude=-74.0, latitude=40.7, distance=12.5),
+        SimpleNamespace(point_index=1, id=8, name='b', rucher_id=None, active=False,
+                        longitude=-74.1, latitude=40.8, distance=30),
+        SimpleNamespace(point_index=3, id=9, name='c', rucher_id=2, active=True,
+                        longitude=2.3, latitude=48.8, distance=5.0),
+    ]
+    results = knn_results([40.7, 0.0, 48.85], [-74.0, 0.0, 2.35], rows)
+
+    assert [(r['index'], r['query'], r['type']) for r in results] == [
+        (0, {'lat': 40.7, 'lon': -74.0}, 'FeatureCollection'),
+        (1, {'lat': 0.0, 'lon': 0.0}, 'FeatureCollection'),
+        (2, {'lat': 48.85, 'lon': 2.35}, 'FeatureCollection'),
+    ]
+    assert [len(r['features']) for r in results] == [2, 0, 1]
+    assert results[0]['features'][1] == {
+        'type': 'Feature',
+        'geometry': {'type': 'Point', 'coordinates': (-74.1, 40.8)},
+        'properties': {'id': 8, 'name': 'b', 'rucher_id': None, 'active': False, 'distance_meters': 30.0}
+    }
+
+
+def test_knn_endpoint_rejects_invalid_body(client):
+    response = client.post('/api/geo/ruches/knn', json={'points': [{'lat': 0, 'lon': 0}], 'k': 0})
+    assert response.status_code == 400
+    assert response.get_json()['error'].startswith('k must be between 1 and ')
@@ -0,0 +1,154 @@
+"""
+Tests for read-replica routing.
+
+The PostgreSQL tests need a primary (TEST_DATABASE_URL) and a streaming
+replica of it (TEST_DATABASE_REPLICA_URLS); they are skipped otherwise.
+"""
+import os
+import time
+
+import pytest
+from sqlalchemy import text
+
+from app import create_app, db
+from app.utils.replicas import ReplicaRouter, eligible, parse_lsn, replica_router
+from config import TestingConfig
+from tests.conftest import TestConfigNoDb
+
+
+class ReplicaConfig(TestConfigNoDb):
+    SQLALCHEMY_BINDS = {'replica_0': 'sqlite:///:memory:', 'replica_1': 'sqlite:///:memory:'}
+
+
+@pytest.fixture
+def replica_app():
+    replica_router.reset()
+    app = create_app(ReplicaConfig)
+    with app.app_context():
+        yield app
+    replica_router.reset()
+
+
+def status(ok=True, lag=0.0, replay_lsn=None):
+    return {'ok': ok, 'lag': lag, 'replay_lsn': replay_lsn, 'checked_at': time.monotonic()}
+
+
+def test_parse_lsn():
+    assert parse_lsn('0/0') == 0
+    assert parse_lsn('16/B374D848') == (0x16 << 32) + 0xB374D848
+    assert parse_lsn('garbage') is None
+    assert parse_lsn(None) is None
+
+
+def test_eligible():
+    assert eligible(status(), max_lag=10)
+    assert not eligible(None, max_lag=10)
+    assert not eligible(status(ok=False), max_lag=10)
+    assert not eligible(status(lag=30), max_lag=10)
+    # Read-your-writes: only a replica known to have replayed the client's write
+    assert eligible(status(replay_lsn=200), max_lag=10, min_lsn=100)
+    assert not eligible(status(replay_lsn=50), max_lag=10, min_lsn=100)
+    assert not eligible(status(replay_lsn=None), max_lag=10, min_lsn=100)
+
+
+def test_choose_round_robin_skips_lagging_replicas(monkeypatch):
+    router = ReplicaRouter()
+    statuses = {'replica_0': status(), 'replica_1': status(), 'replica_2': status(lag=60)}
+    monkeypatch.setattr(router, 'check', lambda key, engine, timeout_ms: dict(statuses[key]))
+    engines = {None: 'primary', 'replica_0': 'r0', 'replica_1': 'r1', 'replica_2': 'r2'}
+    config = {'DATABASE_REPLICA_MAX_LAG': 10}
+
+    chosen = [router.choose(engines, config) for _ in range(6)]
+    assert set(chosen) == {'replica_0', 'replica_1'}
+    assert chosen[:2] in (['replica_0', 'replica_1'], ['replica_1', 'replica_0'])
+
+    statuses['replica_0'] = status(ok=False)
+    statuses['replica_1'] = status(lag=60)
+    router.reset()
+    assert router.choose(engines, config) is None
+    assert router.choose({None: 'primary'}, config) is None
+
+
+def test_status_is_cached(monkeypatch):
+    router = ReplicaRouter()
+    calls = []
+    monkeypatch.setattr(router, 'check', lambda key, engine, timeout_ms: calls.append(key) or status())
+    config = {'DATABASE_REPLICA_CHECK_INTERVAL': 60}
+    for _ in range(3):
+        router.status('replica_0', None, config)
+    assert calls == ['replica_0']
+    assert router.snapshot()['replica_0']['ok'] is True
+
+
+def test_read_requests_use_a_replica(replica_app):
+    engines = db.engines
+    with replica_app.test_request_context('/api/geo/ruches', method='GET'):
+        replica_app.preprocess_request()
+        assert db.session.get_bind() in (engines['replica_0'], engines['replica_1'])
+        db.session.remove()
+
+    with replica_app.test_request_context('/api/geo/ruches/bulk', method='POST'):
+        replica_app.preprocess_request()
+        assert db.session.get_bind() is engines[None]
+        db.session.remove()
+
+
+def test_client_that_wrote_reads_from_primary(replica_app):
+    # SQLite "replicas" report no replay position, so a write cookie cannot be satisfied
+    with replica_app.test_request_context('/api/geo/ruches', headers={'Cookie': 'db_lsn=0/16B3748'}):
+        replica_app.preprocess_request()
+        assert db.session.get_bind() is db.engines[None]
+        db.session.remove()
+
+
+def test_no_replicas_configured(app):
+    assert 'replica_0' not in db.engines
+    with app.test_request_context('/api/geo/ruches'):
+        app.preprocess_request()
+        assert db.session.get_bind() is db.engines[None]
+
+
+requires_replica = pytest.mark.skipif(
+    not (os.getenv('TEST_DATABASE_URL') and os.getenv('TEST_DATABASE_REPLICA_URLS')),
+    reason='needs TEST_DATABASE_URL and TEST_DATABASE_REPLICA_URLS (a streaming replica)'
+)
+
+
+@pytest.fixture
+def pg_app():
+    replica_router.reset()
+    app = create_app(TestingConfig)
+    with app.app_context():
+        yield app
+    replica_router.reset()
+
+
+def in_recovery():
+    return db.session.execute(text('SELECT pg_is_in_recovery()')).scalar()
+
+
+@requires_replica
+def test_reads_reach_the_replica(pg_app):
+    with pg_app.test_request_context('/api/status'):
+        pg_app.preprocess_request()
+        assert in_recovery()
+        db.session.remove()
+
+    with pg_app.test_request_context('/api/geo/ruches/bulk', method='POST'):
+        pg_app.preprocess_request()
+        assert not in_recovery()
+        db.session.remove()
+
+
+@requires_replica
+def test_write_position_is_honoured(pg_app):
+    with db.engines[None].connect() as connection:
+        position = connection.execute(text('SELECT pg_current_wal_lsn()::text')).scalar()
+    high, low = position.split('/')
+    # A position the replica cannot have replayed yet
+    future = f'{int(high, 16) + 1:X}/{low}'
+
+    with pg_app.test_request_context('/api/status', headers={'Cookie': f'db_lsn={future}'}):
+        pg_app.preprocess_request()
+        assert not in_recovery()
+        db.session.remove()
@@ -0,0 +1,82 @@
+"""
+Tests for the apiary statistics.
+"""
+from types import SimpleNamespace
+from datetime import datetime
+
+from app import db
+from app.utils.rucher_stats import (
+    DATA_VERSION_SQL, REFRESH_VIEW_SQL, StatsViewRefresher, _stats_from_row, rucher_stats
+)
+
+
+class RecordingSession:
+    """Session stand-in returning a settable data version."""
+
+    def __init__(self):
+        self.version = 1
+        self.refreshes = 0
+
+    def execute(self, statement):
+        if statement is REFRESH_VIEW_SQL:
+            self.refreshes += 1
+        assert statement in (DATA_VERSION_SQL, REFRESH_VIEW_SQL)
+        return SimpleNamespace(scalar=lambda: self.version)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+
+def test_stats_from_row():
+    row = SimpleNamespace(
+        rucher_id=1, hive_count=3, active_count=2, centroid_lon=-73.96, centroid_lat=40.78,
+        min_lon=-73.97, min_lat=40.77, max_lon=-73.95, max_lat=40.79,
+        latest_avg_weight=42.5, latest_weight_at=datetime(2024, 5, 1, 12)
+    )
+    assert _stats_from_row(row) == {
+        'hive_count': 3,
+        'active_count': 2,
+        'centroid': [-73.96, 40.78],
+        'extent': [-73.97, 40.77, -73.95, 40.79],
+        'latest_avg_weight': 42.5,
+        'latest_weight_at': '2024-05-01T12:00:00'
+    }
+
+
+def test_rucher_stats_without_ids_skips_the_query(app):
+    assert rucher_stats(db.session, []) == {}
+
+
+def test_include_stats_requires_geojson(client):
+    response = client.get('/api/geo/ruchers?include=stats&format=arrow')
+    assert response.status_code == 400
+
+
+def test_stats_view_refresh_is_debounced(app, monkeypatch):
+    app.config['RUCHER_STATS_MATERIALIZED'] = True
+    app.config['RUCHER_STATS_REFRESH_INTERVAL'] = 60
+    clock = [1000.0]
+    monkeypatch.setattr('app.utils.rucher_stats.time.monotonic', lambda: clock[0])
+    session = RecordingSession()
+    refresher = StatsViewRefresher()
+
+    assert refresher.maybe_refresh(session)
+    # Measurements ingested, but within the interval
+    session.version = 2
+    clock[0] += 30
+    assert not refresher.maybe_refresh(session)
+    clock[0] += 31
+    assert refresher.maybe_refresh(session)
+    # Nothing written since
+    clock[0] += 61
+    assert not refresher.maybe_refresh(session)
+    assert session.refreshes == 2
+
+
+def test_stats_view_refresh_requires_the_view(app):
+    session = RecordingSession()
+    assert not StatsViewRefresher().maybe_refresh(session)
+    assert session.refreshes == 0
@@ -0,0 +1,56 @@
+"""
+Tests for zoom-dependent apiary geometry simplification.
+"""
+import pytest
+from geoalchemy2.shape import from_shape
+from shapely.geometry import Point
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.schema import CreateTable
+
+from app.models import Rucher
+from app.models.rucher import pixel_degrees
+from app.utils.geojson import to_geojson
+from app.utils.simplify import simplified_column
+
+
+@pytest.mark.parametrize('args, column', [
+    ({}, None),
+    ({'zoom': '0'}, 'geom_z4'),
+    ({'zoom': '4'}, 'geom_z4'),
+    ({'zoom': '5'}, 'geom_z8'),
+    ({'zoom': '12'}, 'geom_z12'),
+    ({'zoom': '13'}, None),
+    ({'simplify': 'false'}, None),
+    ({'simplify': '0.1'}, 'geom_z4'),
+    ({'simplify': '0.001'}, 'geom_z12'),
+    ({'simplify': '0.0000001'}, None),
+])
+def test_simplified_column_for_zoom_band(args, column):
+    assert simplified_column(args) == column
+
+
+@pytest.mark.parametrize('args', [{'zoom': 'far'}, {'zoom': '31'}, {'simplify': '-1'}, {'zoom': '3', 'simplify': '0.1'}])
+def test_simplified_column_rejects_invalid_input(args):
+    with pytest.raises(ValueError):
+        simplified_column(args)
+
+
+def test_simplified_geometries_are_generated_columns():
+    """Maintained by PostgreSQL on every write, with a sub-pixel tolerance."""
+    ddl = str(CreateTable(Rucher.__table__).compile(dialect=postgresql.dialect()))
+    assert f'GENERATED ALWAYS AS (ST_SimplifyPreserveTopology(geom, {pixel_degrees(8)!r})) STORED' in ddl
+    assert pixel_degrees(0) == 360 / 256
+
+
+def test_to_geojson_serializes_requested_geometry():
+    rucher = Rucher(id=1, name='Apiary', geom=from_shape(Point(1, 2).buffer(1), srid=4326))
+    rucher.geom_z4 = from_shape(Point(1, 2), srid=4326)
+
+    assert to_geojson(rucher, 'geom_z4')['geometry'] == {'type': 'Point', 'coordinates': (1.0, 2.0)}
+    assert to_geojson([rucher])['features'][0]['geometry']['type'] == 'Polygon'
+
+
+def test_rucher_endpoint_rejects_invalid_zoom(client):
+    response = client.get('/api/geo/ruchers?zoom=99')
+    assert response.status_code == 400
+    assert 'zoom' in response.get_json()['error']
@@ -0,0 +1,115 @@
+"""
+Tests for single-flight coalescing.
+"""
+import threading
+import time
+
+from app.utils.singleflight import SingleFlight, file_flight, key_digest, read_result, write_result
+
+
+def run_concurrently(target, count):
+    results = [None] * count
+
+    def worker(i):
+        results[i] = target()
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    return results
+
+
+def slow(calls, value=b'result', delay=0.2):
+    def fn():
+        calls.append(threading.get_ident())
+        time.sleep(delay)
+        return value
+    return fn
+
+
+def test_concurrent_calls_share_one_computation():
+    flight = SingleFlight()
+    calls = []
+    results = run_concurrently(lambda: flight.do(('clusters', 8), slow(calls)), 8)
+    assert len(calls) == 1
+    assert results == [b'result'] * 8
+
+
+def test_different_keys_compute_separately():
+    flight = SingleFlight()
+    calls = []
+    keys = iter([('clusters', 3), ('clusters', 8)])
+    lock = threading.Lock()
+
+    def call():
+        with lock:
+            key = next(keys)
+        return flight.do(key, slow(calls, value=repr(key).encode()))
+
+    results = run_concurrently(call, 2)
+    assert len(calls) == 2
+    assert sorted(results) == [b"('clusters', 3)", b"('clusters', 8)"]
+
+
+def test_waiters_get_the_exception():
+    flight = SingleFlight()
+    calls = []
+
+    def fail():
+        calls.append(1)
+        time.sleep(0.2)
+        raise ValueError('Need at least 8 hives to cluster')
+
+    errors = []
+
+    def call():
+        try:
+            flight.do('key', fail)
+        except ValueError as e:
+            errors.append(str(e))
+
+    run_concurrently(call, 4)
+    assert len(calls) == 1
+    assert errors == ['Need at least 8 hives to cluster'] * 4
+
+
+def test_later_calls_compute_again():
+    flight = SingleFlight()
+    calls = []
+    assert flight.do('key', slow(calls, delay=0)) == b'result'
+    assert flight.do('key', slow(calls, delay=0)) == b'result'
+    assert len(calls) == 2
+
+
+def test_file_flight_shares_result_across_lock_holders(tmp_path):
+    # Each call opens the lock file itself, as separate workers do
+    calls = []
+    results = run_concurrently(lambda: file_flight('key', slow(calls), str(tmp_path), timeout=5), 4)
+    assert len(calls) == 1
+    assert results == [b'result'] * 4
+
+
+def test_file_flight_ignores_results_older_than_the_wait(tmp_path):
+    stem = tmp_path / key_digest('key')
+    write_result(f'{stem}.result', b'old')
+    assert read_result(f'{stem}.result', since=time.time() + 1) is None
+    assert read_result(f'{stem}.result', since=0) == b'old'
+
+    calls = []
+    assert file_flight('key', slow(calls, value=b'new', delay=0), str(tmp_path), timeout=5) == b'new'
+    assert calls
+
+
+def test_coalesce_respects_config(app, tmp_path):
+    from app.utils.singleflight import coalesce
+
+    app.config['SINGLEFLIGHT_LOCK_DIR'] = str(tmp_path)
+    assert coalesce('key', lambda: b'value') == b'value'
+    assert (tmp_path / f"{key_digest('key')}.result").exists()
+
+    app.config['SINGLEFLIGHT_ENABLED'] = False
+    assert coalesce('other', lambda: b'value') == b'value'
+    assert not (tmp_path / f"{key_digest('other')}.result").exists()
+
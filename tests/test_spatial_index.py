@@ -0,0 +1,247 @@
+"""
+Tests for the in-process spatial index.
+
+The PostGIS comparison tests run only when POSTGIS_TEST_DATABASE_URL points
+to a disposable PostGIS database.
+"""
+import json
+import os
+
+import numpy as np
+import pytest
+import shapely
+from geographiclib.geodesic import Geodesic
+
+from app.utils.spatial_index import LayerSnapshot
+
+
+def make_snapshot(coordinates, active=None):
+    """Build a point snapshot without a database."""
+    ids = np.arange(1, len(coordinates) + 1)
+    wkbs = list(shapely.to_wkb(shapely.points(coordinates)))
+    blobs = [
+        json.dumps({
+            'type': 'Feature',
+            'geometry': {'type': 'Point', 'coordinates': list(xy)},
+            'properties': {'id': int(i)}
+        }, separators=(',', ':')).encode()
+        for i, xy in zip(ids, coordinates)
+    ]
+    attributes = {'active': np.asarray(active if active is not None else [True] * len(ids), dtype=bool)}
+    return LayerSnapshot(ids, wkbs, blobs, attributes)
+
+
+def exact_distances(lon, lat, coordinates):
+    return np.array([
+        Geodesic.WGS84.Inverse(lat, lon, y, x, Geodesic.DISTANCE)['s12'] for x, y in coordinates
+    ])
+
+
+@pytest.fixture
+def hives():
+    rng = np.random.default_rng(42)
+    return rng.uniform([-74.5, 40.2], [-73.5, 41.2], size=(2000, 2))
+
+
+def test_within_matches_geodesic(hives):
+    """Radius search returns exactly the points within the geodesic radius."""
+    snapshot = make_snapshot(hives)
+    lon, lat, radius = -74.0, 40.7, 8000
+
+    indices, distances = snapshot.within(lon, lat, radius)
+    reference = exact_distances(lon, lat, hives)
+
+    assert set(indices) == set(np.flatnonzero(reference <= radius))
+    assert np.allclose(distances, reference[indices], atol=1e-3)
+
+
+def test_nearest_matches_geodesic(hives):
+    """KNN returns the k geodesically nearest points, nearest first."""
+    active = np.arange(len(hives)) % 3 != 0
+    snapshot = make_snapshot(hives, active)
+    lon, lat, k = -73.9, 40.9, 15
+
+    indices, distances = snapshot.nearest(lon, lat, k, snapshot.filter_mask({'active': True}))
+    reference = exact_distances(lon, lat, hives)
+    reference[~active] = np.inf
+
+    assert list(indices) == list(np.argsort(reference)[:k])
+    assert np.all(np.diff(distances) >= 0)
+
+
+def test_nearest_far_from_data(hives):
+    """KNN still finds neighbours when the query point is far away."""
+    snapshot = make_snapshot(hives)
+    indices, _ = snapshot.nearest(2.35, 48.85, 3)
+    assert len(indices) == 3
+
+
+def test_bbox(hives):
+    """Bbox search returns the points inside the box."""
+    snapshot = make_snapshot(hives)
+    indices = snapshot.bbox(-74.2, 40.5, -74.0, 40.8)
+    inside = (
+        (hives[:, 0] >= -74.2) & (hives[:, 0] <= -74.0) & (hives[:, 1] >= 40.5) & (hives[:, 1] <= 40.8)
+    )
+    assert list(indices) == list(np.flatnonzero(inside))
+
+
+def test_collection_bytes(hives):
+    """Pre-serialized features assemble into a valid FeatureCollection."""
+    snapshot = make_snapshot(hives[:3])
+    payload = json.loads(snapshot.collection_bytes(
+        np.array([2, 0]), np.array([12.5, 30.0]), extra={'query': {'k': 2}}
+    ))
+
+    assert payload['type'] == 'FeatureCollection'
+    assert payload['query'] == {'k': 2}
+    assert [f['properties']['id'] for f in payload['features']] == [3, 1]
+    assert payload['features'][0]['properties']['distance_meters'] == 12.5
+
+
+def test_collection_bytes_view(hives):
+    """A view serves its own features."""
+    snapshot = make_snapshot(hives[:2])
+    snapshot.views['knn'] = [b'{"type":"Feature","geometry":null,"properties":{"id":%d,"name":"x"}}' % i for i in (1, 2)]
+    payload = json.loads(snapshot.collection_bytes(np.array([1]), np.array([5.0]), view='knn'))
+    assert payload['features'][0]['properties'] == {'id': 2, 'name': 'x', 'distance_meters': 5.0}
+
+
+def test_memory_usage(hives):
+    """Memory usage is reported per component."""
+    usage = make_snapshot(hives).memory_usage()
+    assert usage['rows'] == len(hives)
+    assert usage['arrays_bytes'] >= hives.nbytes
+    assert usage['total_bytes_estimated'] > usage['blobs_bytes']
+
+
+@pytest.fixture
+def postgis_app():
+    url = os.getenv('POSTGIS_TEST_DATABASE_URL')
+    if not url:
+        pytest.skip('POSTGIS_TEST_DATABASE_URL not set')
+
+    from sqlalchemy import text
+    from app import create_app, db
+    from config import TestingConfig
+
+    class PostGISConfig(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = url
+        SPATIAL_INDEX_ENABLED = False
+
+    app = create_app(PostGISConfig)
+    with app.app_context():
+        db.session.execute(text('CREATE EXTENSION IF NOT EXISTS postgis'))
+        db.session.commit()
+        db.drop_all()
+        db.create_all()
+        db.session.execute(text("""
+            INSERT INTO ruches (name, created_at, geom, active)
+            SELECT 'hive-' || g, now(),
+                   ST_SetSRID(ST_MakePoint(-74.5 + random(), 40.2 + random()), 4326),
+                   g % 4 <> 0
+            FROM generate_series(1, 3000) AS g
+        """))
+        db.session.execute(text("""
+            INSERT INTO ruchers (name, created_at, geom)
+            SELECT 'apiary-' || g, now(),
+                   ST_SetSRID(ST_MakePoint(-74.5 + random(), 40.2 + random()), 4326)
+            FROM generate_series(1, 200) AS g
+        """))
+        db.session.commit()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+def feature_ids(response):
+    return sorted(feature['properties']['id'] for feature in response.get_json()['features'])
+
+
+def assert_same_features(actual, expected, ordered=True):
+    """Features are equal, with distances equal to the millimetre."""
+    if not ordered:
+        actual = sorted(actual, key=lambda f: f['properties']['id'])
+        expected = sorted(expected, key=lambda f: f['properties']['id'])
+    got_distances = [f['properties'].pop('distance_meters') for f in actual]
+    want_distances = [f['properties'].pop('distance_meters') for f in expected]
+    assert actual == expected
+    assert np.allclose(got_distances, want_distances, atol=1e-3)
+
+
+@pytest.mark.parametrize('query', [
+    '/api/geo/ruches',
+    '/api/geo/ruches?active=true',
+    '/api/geo/ruches?radius=5000&lat=40.7&lon=-74.0',
+    '/api/geo/ruches?radius=5000&lat=40.7&lon=-74.0&active=false',
+    '/api/geo/ruches?bbox=-74.2,40.5,-74.0,40.8',
+    '/api/geo/ruchers?radius=10000&lat=40.7&lon=-74.0',
+    '/api/geo/ruchers?bbox=-74.2,40.5,-74.0,40.8',
+])
+def test_matches_postgis(postgis_app, query):
+    """The spatial index returns exactly the rows PostGIS returns."""
+    from app.utils.spatial_index import spatial_index
+
+    client = postgis_app.test_client()
+    expected = client.get(query)
+
+    with postgis_app.app_context():
+        spatial_index.refresh(force=True)
+    postgis_app.config['SPATIAL_INDEX_ENABLED'] = True
+    try:
+        actual = client.get(query)
+    finally:
+        postgis_app.config['SPATIAL_INDEX_ENABLED'] = False
+
+    assert expected.status_code == actual.status_code == 200
+    assert feature_ids(actual) == feature_ids(expected)
+
+
+@pytest.mark.parametrize('query', [
+    '/api/geo/ruches/nearby?lat=40.7&lon=-74.0&radius=3000',
+    '/api/geo/ruches/nearby?lat=40.7&lon=-74.0&radius=3000&order=distance&limit=20',
+])
+def test_nearby_matches_postgis(postgis_app, query):
+    """Nearby features from the spatial index equal those of PostGIS (NEARBY_COLUMNS)."""
+    from app.utils.query_params import NEARBY_COLUMNS
+    from app.utils.spatial_index import spatial_index
+
+    client = postgis_app.test_client()
+    expected = client.get(query).get_json()
+
+    with postgis_app.app_context():
+        spatial_index.refresh(force=True)
+    postgis_app.config['SPATIAL_INDEX_ENABLED'] = True
+    try:
+        actual = client.get(query).get_json()
+    finally:
+        postgis_app.config['SPATIAL_INDEX_ENABLED'] = False
+
+    assert expected['features']
+    assert set(expected['features'][0]['properties']) == {c.key for c in NEARBY_COLUMNS} | {'distance_meters'}
+    assert_same_features(actual['features'], expected['features'], ordered='order=' in query)
+    assert actual['query'] == expected['query']
+
+
+def test_knn_matches_postgis(postgis_app):
+    """KNN from the spatial index matches the LATERAL KNN query (KNN_COLUMNS)."""
+    from app.utils.query_params import KNN_COLUMNS
+    from app.utils.spatial_index import spatial_index
+
+    client = postgis_app.test_client()
+    body = {'points': [{'lat': 40.7, 'lon': -74.0}, {'lat': 41.0, 'lon': -73.6}], 'k': 10}
+    expected = client.post('/api/geo/ruches/knn', json=body).get_json()
+
+    with postgis_app.app_context():
+        spatial_index.refresh(force=True)
+    postgis_app.config['SPATIAL_INDEX_ENABLED'] = True
+    try:
+        actual = client.post('/api/geo/ruches/knn', json=body).get_json()
+    finally:
+        postgis_app.config['SPATIAL_INDEX_ENABLED'] = False
+
+    assert len(actual['results']) == len(expected['results']) == 2
+    for got, want in zip(actual['results'], expected['results']):
+        assert (got['index'], got['query']) == (want['index'], want['query'])
+        assert set(want['features'][0]['properties']) == {c.key for c in KNN_COLUMNS} | {'distance_meters'}
+        assert_same_features(got['features'], want['features'])
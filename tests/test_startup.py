@@ -0,0 +1,66 @@
+"""
+Tests for cold-start cost: import time and worker warm-up.
+"""
+import os
+import subprocess
+import sys
+
+from app import create_app
+from app.utils.warmup import warm_up
+from tests.conftest import TestConfigNoDb
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Import plus create_app, in milliseconds; override on slow machines
+IMPORT_TIME_BUDGET_MS = float(os.getenv('IMPORT_TIME_BUDGET_MS', '1500'))
+
+# Imported on first use only; none of them may be loaded by create_app
+LAZY_MODULES = ('sklearn', 'scipy', 'geopy', 'pyarrow', 'pyogrio', 'pyproj')
+
+STARTUP_CODE = (
+    'import sys\n'
+    'from app import create_app\n'
+    'from tests.conftest import TestConfigNoDb\n'
+    'create_app(TestConfigNoDb)\n'
+    f'print(",".join(m for m in {LAZY_MODULES!r} if m in sys.modules))\n'
+)
+
+
+def run_startup():
+    return subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', STARTUP_CODE],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    )
+
+
+def total_import_ms(importtime_output):
+    """Sum the cumulative time of top-level imports in -X importtime output."""
+    total = 0
+    for line in importtime_output.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if cumulative.strip().isdigit() and not name.startswith('  '):
+            total += int(cumulative)
+    return total / 1000
+
+
+def test_create_app_does_not_import_heavy_modules():
+    """sklearn, geopy and friends are deferred until a request needs them."""
+    assert run_startup().stdout.strip() == ''
+
+
+def test_import_time_budget():
+    """Importing the app and creating it stays under the budget."""
+    elapsed = min(total_import_ms(run_startup().stderr) for _ in range(3))
+    assert elapsed < IMPORT_TIME_BUDGET_MS, f'import took {elapsed:.0f} ms'
+
+
+def test_warm_up():
+    """Warm-up imports the deferred modules and opens a connection."""
+    app = create_app(TestConfigNoDb)
+    summary = warm_up(app)
+
+    assert summary['connections'] == 1
+    assert 'sklearn.cluster' in summary['modules']
+    assert 'sklearn' in sys.modules
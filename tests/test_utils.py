@@ -55,3 +55,156 @@ def test_cluster_points():
     assert 'labels' in result
     assert 'n_clusters' in result
     assert len(result['labels']) == len(points)
+
+
+def test_geodesic_distance():
+    """Test vectorized geodesic distances against known values."""
+    import numpy as np
+    from app.utils.geodesic import geodesic_distance, haversine
+
+    # JFK to LAX on WGS84 is about 3983 km
+    distance = geodesic_distance(-73.7781, 40.6413, -118.4085, 33.9416)
+    assert abs(float(distance) - 3983000) < 5000
+
+    # Identical and nearly antipodal points
+    distances = geodesic_distance([0, 0], [0, 0], [0, 179.9], [0, 0.5])
+    assert distances[0] == 0
+    assert np.isfinite(distances[1])
+
+    # Haversine stays within 0.6% of the ellipsoidal distance
+    assert abs(haversine(-73.7781, 40.6413, -118.4085, 33.9416) / distance - 1) < 0.006
+
+
+def test_vincenty_known_distances(monkeypatch):
+    """Test the NumPy Vincenty fallback, including its nearly antipodal rescue."""
+    import numpy as np
+    from geographiclib.geodesic import Geodesic
+    from app.utils.geodesic import vincenty
+
+    # Vincenty's (1975) Flinders Peak to Buninyong test line
+    flinders = (144 + 25 / 60 + 29.5244 / 3600, -(37 + 57 / 60 + 3.7203 / 3600))
+    buninyong = (143 + 55 / 60 + 35.3839 / 3600, -(37 + 39 / 60 + 10.1561 / 3600))
+    assert abs(float(vincenty(*flinders, *buninyong)) - 54972.271) < 0.001
+
+    # One degree along the equator, equator to pole, pole to pole
+    distances = vincenty([0, 0, 0], [0, 0, 90], [1, 0, 0], [0, 90, -90])
+    assert distances.shape == (3,)
+    assert np.allclose(distances, [111319.491, 10001965.729, 20003931.459], atol=0.001)
+    assert vincenty(2.35, 48.85, 2.35, 48.85) == 0
+
+    inverse = Geodesic.WGS84.Inverse
+    rescued = []
+    monkeypatch.setattr(Geodesic.WGS84, 'Inverse', lambda *args: rescued.append(args) or inverse(*args))
+
+    # Nearly antipodal: the iteration does not converge and geographiclib takes over
+    expected = inverse(0, 0, 0.2, 179.7)['s12']
+    assert abs(float(vincenty(0, 0, 179.7, 0.2)) - expected) < 0.001
+    assert len(rescued) == 1
+
+    distances = vincenty([[0.0], [2.35]], [[0.0], [48.85]], [179.7, 1.0], [0.2, 0.0])
+    assert distances.shape == (2, 2)
+    assert abs(distances[0, 0] - expected) < 0.001
+    assert abs(distances[0, 1] - 111319.491) < 0.001
+    assert len(rescued) == 2
+
+
+def test_distance_matrix_endpoint(app, client):
+    """Test the streamed distance matrix JSON."""
+    import numpy as np
+    from app.utils.geodesic import distance_matrix
+
+    app.config['DISTANCE_MATRIX_CHUNK_ELEMENTS'] = 2  # one origin row per block
+    origins = [{'lat': 40.6413, 'lon': -73.7781}, {'lat': 33.9416, 'lon': -118.4085}, {'lat': 0, 'lon': 0}]
+    destinations = [{'lat': 48.85, 'lon': 2.35}, {'lat': 0, 'lon': 1}]
+
+    response = client.post('/api/geo/distance/matrix', json={'origins': origins, 'destinations': destinations})
+    assert response.status_code == 200
+    assert response.mimetype == 'application/json'
+    data = response.get_json()
+    assert data['units'] == 'meters' and data['shape'] == [3, 2]
+    assert data['method'].startswith('geodesic (')
+
+    expected = distance_matrix(
+        [(p['lon'], p['lat']) for p in origins], [(p['lon'], p['lat']) for p in destinations]
+    )
+    assert np.allclose(data['matrix'], expected, atol=0.001)
+
+    response = client.post('/api/geo/distance/matrix', json={
+        'origins': origins[:1], 'destinations': destinations, 'method': 'haversine'
+    })
+    assert response.get_json()['method'] == 'haversine'
+    assert len(response.get_json()['matrix']) == 1
+
+    response = client.post('/api/geo/distance/matrix', json={'origins': origins, 'destinations': destinations,
+                                                               'method': 'manhattan'})
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'method must be one of: geodesic, haversine'
+
+
+def test_distance_matrix_chunks():
+    """Test that chunked distance matrices match the direct computation."""
+    import numpy as np
+    from app.utils.geodesic import distance_matrix, geodesic_distance
+
+    rng = np.random.default_rng(0)
+    origins = rng.uniform([-180, -90], [180, 90], size=(37, 2))
+    destinations = rng.uniform([-180, -90], [180, 90], size=(11, 2))
+
+    matrix = distance_matrix(origins, destinations, chunk_elements=50)
+    assert matrix.shape == (37, 11)
+    assert np.isclose(matrix[5, 7], geodesic_distance(*origins[5], *destinations[7]))
+
+    haversine_matrix = distance_matrix(origins, destinations, method='haversine')
+    assert np.allclose(haversine_matrix, matrix, rtol=0.006)
+
+
+def test_ttl_cache():
+    """Test that cached values expire after the TTL."""
+    import time
+    from app.utils.cache import TTLCache
+
+    cache = TTLCache(ttl=0.05, maxsize=2)
+    calls = []
+    assert cache.get_or_set('a', lambda: calls.append(1) or 'value') == 'value'
+    assert cache.get_or_set('a', lambda: calls.append(1) or 'other') == 'value'
+    assert len(calls) == 1
+
+    cache.set('b', 2)
+    cache.set('c', 3)
+    assert cache.get('a') is None  # evicted by maxsize
+    assert len(cache) == 2
+
+    time.sleep(0.06)
+    assert cache.get('b') is None
+    assert cache.age('c') is None
+
+
+def test_wkb_decoding_matches_to_shape():
+    """Test that vectorized WKB decoding matches per-row to_shape."""
+    import numpy as np
+    import shapely
+    from geoalchemy2.elements import WKBElement, WKTElement
+    from geoalchemy2.shape import to_shape
+    from shapely.geometry import mapping
+    from app.utils.wkb import geojson_geometries, point_coordinates
+
+    geometries = [
+        shapely.Point(2.35, 48.85),
+        shapely.Point(-73.9654, 40.7829),
+        shapely.Point(1.0, 2.0, 3.0),
+        shapely.Polygon([(0, 0), (1, 0), (1, 1), (0, 0)]),
+        shapely.from_wkt('POINT EMPTY'),
+    ]
+    elements = [WKBElement(shapely.to_wkb(geom, include_srid=False), srid=4326) for geom in geometries]
+    elements.append(WKBElement(shapely.to_wkb(shapely.set_srid(geometries[0], 4326), include_srid=True)))
+    elements.append(WKBElement(shapely.to_wkb(geometries[1], byte_order=0, hex=True), srid=4326))
+    elements.append(WKTElement('POINT(5 6)', srid=4326))
+
+    mappable = elements[:4] + elements[5:]  # shapely cannot map an empty point
+    assert geojson_geometries(mappable) == [mapping(to_shape(element)) for element in mappable]
+    assert geojson_geometries([None]) == [None]
+
+    coords = point_coordinates(elements + [None])
+    assert coords[:3].tolist() == [[2.35, 48.85], [-73.9654, 40.7829], [1.0, 2.0]]
+    assert np.isnan(coords[[3, 4, 8]]).all()
+    assert coords[5:8].tolist() == [[2.35, 48.85], [-73.9654, 40.7829], [5.0, 6.0]]